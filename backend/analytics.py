@@ -0,0 +1,386 @@
+"""
+Optional in-memory columnar store for attendance analytics.
+
+With ATTENDANCE_ANALYTICS=1 (and numpy installed), each server process
+keeps attendance in three parallel arrays sorted by (student, day):
+
+    student   int32   student index: rank of the student by (course, id)
+    day       int32   proleptic Gregorian ordinal of the date
+    status    uint8   index into STATUSES
+
+That is 9 bytes per record, about 9 MB per million, instead of a Python
+tuple or sqlite3.Row per record. Notes are not loaded; no analytic view
+uses them. Because students are ranked by course, one student's records
+and one course's records are each a contiguous slice found by binary
+search. Counts, percentages and per-course rollups are numpy operations
+over those slices instead of SQL scans that build Python rows. Streaks
+come from the per-student timelines (timelines.py).
+
+The store follows writes through changes.py (stores.Store): the next
+query re-reads just the students that changed and splices their records
+in. Queries work on an immutable Columns snapshot, so a refresh never
+disturbs a query already running. Each database file (tenants.py) has a
+store of its own.
+"""
+import logging
+import os
+from datetime import date
+
+import archive
+import db
+import stores
+from summaries import STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Imported by load_numpy() only: numpy alone takes about a fifth of the
+# backend's start-up time (benchmarks/bench_startup.py)
+np = None
+
+
+def load_numpy():
+    """Import numpy for the store; returns False if it is not installed"""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:  # optional dependency, see requirements.txt
+            return False
+        np = numpy
+    return True
+
+
+ENABLED = os.environ.get('ATTENDANCE_ANALYTICS', '0') == '1'
+if ENABLED and not load_numpy():
+    logger.warning('ATTENDANCE_ANALYTICS=1 needs numpy; the analytics store is disabled')
+    ENABLED = False
+
+# date.toordinal() of numpy's datetime64 epoch, 1970-01-01
+EPOCH_ORDINAL = 719163
+
+
+def day_number(value):
+    """Ordinal of an ISO date string, or None"""
+    return None if value is None else date.fromisoformat(value).toordinal()
+
+
+def _status_codes():
+    codes = np.zeros(256, dtype=np.uint8)
+    for code, status in enumerate(STATUSES):
+        codes[ord(status[0])] = code
+    return codes
+
+
+def read_timelines(conn, student_ids=None):
+    """(students.id, day, status) arrays for all students or the given ones"""
+    ids, lengths, timelines = [], [], []
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    for query, params in stores.timeline_queries(conn, 's.id', student_ids):
+        for student, timeline in cursor.execute(query, params):
+            if timeline:
+                ids.append(student)
+                lengths.append(len(timeline) // stores.RECORD_WIDTH)
+                timelines.append(timeline)
+
+    records = np.frombuffer(''.join(timelines).encode('ascii'), dtype=np.uint8)
+    records = records.reshape(-1, stores.RECORD_WIDTH)
+    day = np.ascontiguousarray(records[:, :10]).view('S10').ravel()
+    day = (day.astype('datetime64[D]').astype(np.int64) + EPOCH_ORDINAL).astype(np.int32)
+    status = _status_codes()[records[:, 10]]
+    return np.repeat(np.array(ids, dtype=np.int64), lengths), day, status
+
+
+class Students:
+    """Student metadata: the (course, id) ranking behind the student column"""
+
+    def __init__(self, rows):
+        courses = sorted({course for _, _, course in rows if course is not None})
+        codes = {course: code for code, course in enumerate(courses)}
+        # Students without a course rank last, as if in course len(courses)
+        rows = sorted(rows, key=lambda row: (codes.get(row[2], len(courses)), row[0]))
+        self.courses = courses
+        self.codes = codes
+        self.index = {student_id: rank for rank, (_, student_id, _) in enumerate(rows)}
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.rank_of_id = np.full(int(self.ids.max(initial=0)) + 1, -1, dtype=np.int32)
+        self.rank_of_id[self.ids] = np.arange(len(rows), dtype=np.int32)
+        ranked_codes = np.array([codes.get(row[2], len(courses)) for row in rows], dtype=np.int64)
+        # bounds[code]:bounds[code + 1] are the ranks of the course's students
+        self.bounds = np.searchsorted(ranked_codes, np.arange(len(courses) + 2)).tolist()
+
+    def __len__(self):
+        return len(self.index)
+
+    @classmethod
+    def read(cls, conn):
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        return cls(cursor.execute('SELECT id, student_id, course FROM students').fetchall())
+
+    def ranks(self, ids):
+        """Student index for each students.id; -1 for ids no longer present"""
+        known = ids < len(self.rank_of_id)
+        return np.where(known, self.rank_of_id[np.where(known, ids, 0)], -1).astype(np.int32)
+
+
+class Moved:
+    """Archived records filed under another course than their student's
+    current one: archive.py keeps the course a record was archived with.
+
+    Course counts start from the slice of the course's current students
+    and then move these records from there to the course they were
+    archived under, so a course's numbers match the summary tables.
+    """
+
+    def __init__(self, rows, students):
+        rank = students.ranks(np.array([row[0] for row in rows], dtype=np.int64))
+        self.day = np.array([day_number(row[1]) for row in rows], dtype=np.int32)
+        self.status = _status_codes()[np.array([ord(row[2][0]) for row in rows],
+                                               dtype=np.uint8)]
+        self.courses = sorted({row[3] for row in rows})
+        self.codes = {course: code for code, course in enumerate(self.courses)}
+        # Archived course (an index into self.courses), and the current
+        # course (as in students.codes) of the record's student
+        self.course = np.array([self.codes[row[3]] for row in rows], dtype=np.int32)
+        self.current = (np.searchsorted(students.bounds, rank, 'right') - 1).astype(np.int32)
+        self.rank = rank
+
+    @classmethod
+    def read(cls, conn, students):
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        rows = []
+        for table in archive.tables(conn)[1:]:
+            rows += cursor.execute(f'''
+                SELECT s.id, a.date, a.status, a.course
+                FROM {table} a JOIN students s ON s.student_id = a.student_id
+                WHERE a.course <> COALESCE(s.course, '')''').fetchall()
+        return cls(rows, students)
+
+    def __len__(self):
+        return len(self.status)
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in (self.rank, self.day, self.status,
+                                                self.course, self.current))
+
+    def _mask(self, first, last, rank=None):
+        mask = np.ones(len(self.status), dtype=bool)
+        if first is not None:
+            mask &= self.day >= first
+        if last is not None:
+            mask &= self.day <= last
+        if rank is not None:
+            mask &= self.rank == rank
+        return mask
+
+    def shift(self, course, current_code, first, last, rank=None):
+        """Per-status counts to add to a course's current students' counts
+        (of one student rank, if given)"""
+        mask = self._mask(first, last, rank)
+        joined = self.status[mask & (self.course == self.codes.get(course, -1))]
+        left = self.status[mask & (self.current == current_code)]
+        width = len(STATUSES)
+        return np.bincount(joined, minlength=width) - np.bincount(left, minlength=width)
+
+    def course_shifts(self, first, last):
+        """(counts archived under each of self.courses, counts leaving each
+        current course code), as arrays of shape (courses, statuses)"""
+        mask = self._mask(first, last)
+        width = len(STATUSES)
+
+        def per_course(codes, courses):
+            keys = codes[mask].astype(np.int64) * width + self.status[mask]
+            return np.bincount(keys, minlength=courses * width).reshape(-1, width)
+
+        return (per_course(self.course, len(self.courses)),
+                per_course(self.current, int(self.current.max(initial=-1)) + 1))
+
+
+class Columns:
+    """Immutable snapshot of the attendance columns"""
+
+    def __init__(self, student, day, status, students, moved):
+        self.student = student
+        self.day = day
+        self.status = status
+        self.students = students
+        self.moved = moved
+
+    @property
+    def nbytes(self):
+        return (self.student.nbytes + self.day.nbytes + self.status.nbytes
+                + self.moved.nbytes)
+
+    def _rows(self, first_rank, end_rank):
+        """Record positions of the students ranked first_rank .. end_rank - 1"""
+        keys = np.array([first_rank, end_rank], dtype=np.int32)
+        lo, hi = np.searchsorted(self.student, keys).tolist()
+        return lo, hi
+
+    def _counts(self, status):
+        return dict(zip(STATUSES, np.bincount(status, minlength=len(STATUSES)).tolist()))
+
+    def counts(self, student_id=None, course=None, date_from=None, date_to=None):
+        """{status: count} for the records matching the filters"""
+        counts = self._current_counts(student_id, course, date_from, date_to)
+        if course is None or not len(self.moved):
+            return counts
+        rank = None
+        if student_id is not None:
+            rank = self.students.index.get(student_id)
+            if rank is None:
+                return counts
+        shift = self.moved.shift(course, self.students.codes.get(course, -1),
+                                 day_number(date_from), day_number(date_to), rank)
+        return {status: counts[status] + count for status, count in zip(STATUSES, shift.tolist())}
+
+    def _current_counts(self, student_id, course, date_from, date_to):
+        """counts(), with course meaning the students' current course"""
+        first, last = day_number(date_from), day_number(date_to)
+        students = self.students
+        lo, hi = 0, len(self.status)
+        if course is not None:
+            code = students.codes.get(course)
+            if code is None:
+                return self._counts(self.status[:0])
+            lo, hi = self._rows(students.bounds[code], students.bounds[code + 1])
+        if student_id is not None:
+            rank = students.index.get(student_id)
+            if rank is None:
+                return self._counts(self.status[:0])
+            student_lo, student_hi = self._rows(rank, rank + 1)
+            lo, hi = max(lo, student_lo), min(hi, student_hi)
+            if lo >= hi:
+                return self._counts(self.status[:0])
+            # One student's days are sorted: bisect instead of masking
+            # (int32 keys, or numpy would upcast the whole column to compare)
+            days = self.day[lo:hi]
+            if last is not None:
+                hi = lo + int(np.searchsorted(days, np.int32(last), 'right'))
+            if first is not None:
+                lo += int(np.searchsorted(days, np.int32(first), 'left'))
+            return self._counts(self.status[lo:hi])
+
+        status, day = self.status[lo:hi], self.day[lo:hi]
+        if first is not None and last is not None:
+            status = status[(day >= first) & (day <= last)]
+        elif first is not None:
+            status = status[day >= first]
+        elif last is not None:
+            status = status[day <= last]
+        return self._counts(status)
+
+    def course_counts(self, date_from=None, date_to=None):
+        """{course: ({status: count}, enrolled students)} for each named course"""
+        first, last = day_number(date_from), day_number(date_to)
+        mask = None
+        if first is not None:
+            mask = self.day >= first
+        if last is not None:
+            mask = (self.day <= last) if mask is None else mask & (self.day <= last)
+        students = self.students
+        rollup = {}
+        for code, course in enumerate(students.courses):
+            if not course:
+                continue
+            first_rank, end_rank = students.bounds[code], students.bounds[code + 1]
+            lo, hi = self._rows(first_rank, end_rank)
+            status = self.status[lo:hi] if mask is None else self.status[lo:hi][mask[lo:hi]]
+            rollup[course] = (self._counts(status), end_rank - first_rank)
+        if len(self.moved):
+            joined, left = self.moved.course_shifts(first, last)
+            for code, counts in enumerate(left.tolist()):
+                if code < len(students.courses) and students.courses[code] in rollup:
+                    current = rollup[students.courses[code]][0]
+                    for status, count in zip(STATUSES, counts):
+                        current[status] -= count
+            for course, counts in zip(self.moved.courses, joined.tolist()):
+                if course and (course in rollup or any(counts)):
+                    current = rollup.setdefault(course, (dict.fromkeys(STATUSES, 0), 0))[0]
+                    for status, count in zip(STATUSES, counts):
+                        current[status] += count
+        return rollup
+
+    def student_counts(self, student_ids, date_from=None, date_to=None):
+        """Status counts per student: an array of shape (len(student_ids), 3)"""
+        first, last = day_number(date_from), day_number(date_to)
+        position = np.full(len(self.students.index), -1, dtype=np.int64)
+        for i, student_id in enumerate(student_ids):
+            rank = self.students.index.get(student_id)
+            if rank is not None:
+                position[rank] = i
+        mask = position[self.student] >= 0
+        if first is not None:
+            mask &= self.day >= first
+        if last is not None:
+            mask &= self.day <= last
+        width = len(STATUSES)
+        counts = np.bincount(position[self.student[mask]] * width + self.status[mask],
+                             minlength=len(student_ids) * width)
+        return counts.reshape(-1, width)
+
+
+class AttendanceStore(stores.Store):
+    """The process-wide columnar store, refreshed lazily from the change log"""
+
+    def read(self, conn):
+        students = Students.read(conn)
+        ids, day, status = read_timelines(conn)
+        student = students.ranks(ids)
+        order = np.lexsort((day, student))
+        return Columns(student[order], day[order], status[order], students,
+                       Moved.read(conn, students))
+
+    def read_students(self, conn):
+        return Students.read(conn)
+
+    def splice(self, conn, old, dirty, students, students_changed):
+        keep = np.ones(len(old.status), dtype=bool)
+        for student_id in dirty:
+            rank = old.students.index.get(student_id)
+            if rank is not None:
+                lo, hi = old._rows(rank, rank + 1)
+                keep[lo:hi] = False
+        student, day, status = old.student[keep], old.day[keep], old.status[keep]
+        if students_changed:
+            # Re-rank the remaining records; each student's block stays day-sorted
+            student = students.ranks(old.students.ids[student])
+            order = np.argsort(student, kind='stable')
+            order = order[student[order] >= 0]
+            student, day, status = student[order], day[order], status[order]
+        ids, new_day, new_status = read_timelines(conn, dirty)
+        new_student = students.ranks(ids)
+        order = np.lexsort((new_day, new_student))
+        new_student, new_day, new_status = new_student[order], new_day[order], new_status[order]
+        at = np.searchsorted(student, new_student)
+        # Archived records only change with the students (or after a reset)
+        moved = Moved.read(conn, students) if students_changed else old.moved
+        return Columns(np.insert(student, at, new_student), np.insert(day, at, new_day),
+                       np.insert(status, at, new_status), students, moved)
+
+    def describe(self, columns):
+        return f'{len(columns.status)} attendance records into the analytics store'
+
+    def stats(self):
+        columns = self._snapshot
+        records = 0 if columns is None else len(columns.status)
+        return {
+            'enabled': ENABLED,
+            'loaded': columns is not None,
+            'records': records,
+            'students': 0 if columns is None else len(columns.students.index),
+            'bytes': 0 if columns is None else columns.nbytes,
+            'bytes_per_record': round(columns.nbytes / records, 2) if records else 0,
+            **self.timings(),
+        }
+
+
+store = db.PerDatabase(lambda path: AttendanceStore())
+
+
+def on_change(kind, dates, student_ids):
+    """changes.py listener for the current database's store"""
+    store.on_change(kind, dates, student_ids)
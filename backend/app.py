@@ -1,54 +1,89 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from datetime import datetime, date
+import math
 import sqlite3
 import os
 
+import db
+from db import DB_PATH, configure_connection, get_pool, all_pool_stats
+from cache import response_cache
+import analytics
+import archive
+import batching
+import cache
+import changes
+import deltas
+import export
+import ingest
+import layout
+import metrics
+import migrations
+import pagination
+import reports
+import responses
+import search
+import stats
+import streams
+import tenants
+import timelines
+
 app = Flask(__name__)
 CORS(app)
+responses.init_app(app)
+metrics.init_app(app)
+# Outermost: everything below runs against the tenant's database
+app.wsgi_app = tenants.TenantRouter(app.wsgi_app)
 
-DB_PATH = 'attendance.db'
+changes.subscribe(cache.on_change)
+if analytics.ENABLED:
+    changes.subscribe(analytics.on_change)
+changes.subscribe(timelines.on_change)
 
 def init_db():
-    """Initialize the database with tables"""
+    """Initialize the database, applying any pending schema migrations"""
     conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Students table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS students (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id TEXT UNIQUE NOT NULL,
-            name TEXT NOT NULL,
-            email TEXT,
-            phone TEXT,
-            course TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Attendance table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS attendance (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id TEXT NOT NULL,
-            date TEXT NOT NULL,
-            status TEXT NOT NULL CHECK(status IN ('present', 'absent', 'late')),
-            notes TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (student_id) REFERENCES students(student_id),
-            UNIQUE(student_id, date)
-        )
-    ''')
-    
-    conn.commit()
+    configure_connection(conn)
+    applied = migrations.migrate(conn)
     conn.close()
+    return applied
 
 def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Check out a pooled database connection (use as a context manager)"""
+    return get_pool().connection()
+
+def cached_json(key, tags, compute):
+    """Serve compute()'s JSON payload through the response cache.
+
+    Responses carry an ETag (and no Last-Modified, see cache.py), so a
+    client revalidating an unchanged resource gets 304 Not Modified.
+    Changes committed by other worker processes are picked up from the
+    change log first. Compressed bodies are kept with the entry, so each
+    is compressed only once.
+    """
+    if response_cache.enabled:
+        with get_db_connection() as conn:
+            changes.sync(conn)
+    entry = response_cache.get(key)
+    if entry is None:
+        generation = response_cache.generation()
+        body = jsonify(compute()).get_data()
+        entry = response_cache.set(key, body, tags, generation)
+    
+    encoding, body = responses.cached_encoding(entry.body, entry.encoded)
+    response = Response(body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    if encoding is not None:
+        responses.set_encoding(response, encoding)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def columnar_page(rows, fields, dictionary_fields, paged, limit):
+    """?shape=columns body for fetched rows (fields + sort key)"""
+    body = responses.columns(rows[:limit] if paged else rows, fields, dictionary_fields)
+    if paged:
+        body['next_cursor'] = pagination.next_cursor(rows, len(fields), limit)
+    return body
 
 # ========== HEALTH CHECK ==========
 
@@ -61,26 +96,163 @@ def health_check():
         'database': 'connected'
     })
 
+@app.route('/api/health/pool', methods=['GET'])
+def pool_metrics():
+    """Connection pool metrics (checkouts, wait time, in-use count)"""
+    return jsonify(all_pool_stats())
+
+@app.route('/api/health/cache', methods=['GET'])
+def cache_metrics():
+    """Response cache metrics (hits, misses, evictions)"""
+    return jsonify(response_cache.stats())
+
+@app.route('/api/health/write-queue', methods=['GET'])
+def write_queue_metrics():
+    """Write-coalescing queue metrics (depth, batch sizes, flush time)"""
+    return jsonify(batching.queue.stats())
+
+@app.route('/api/health/streams', methods=['GET'])
+def stream_metrics():
+    """Live event stream metrics (subscribers, events published)"""
+    return jsonify(live.stats())
+
+@app.route('/api/health/analytics', methods=['GET'])
+def analytics_metrics():
+    """In-memory analytics store metrics (records, bytes, load/refresh time)"""
+    return jsonify(analytics.store.stats())
+
+@app.route('/api/health/timelines', methods=['GET'])
+def timeline_metrics():
+    """Per-student timeline metrics (students, records, load/refresh time)"""
+    return jsonify(timelines.store.stats())
+
+# ========== METRICS ==========
+
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Request, SQL and JSON metrics in the Prometheus text format"""
+    pools = all_pool_stats()
+    cache_stats = response_cache.stats()
+    gauges = [
+        ('attendance_db_pool_in_use', 'Pooled connections checked out.',
+         [({'db': p['db_path']}, p['in_use']) for p in pools]),
+        ('attendance_cache_entries', 'Entries in the response cache.',
+         [({}, cache_stats['size'])]),
+    ]
+    counters = [
+        ('attendance_db_pool_checkouts_total', 'Connections handed out since start.',
+         [({'db': p['db_path']}, p['checkouts']) for p in pools]),
+        ('attendance_db_pool_wait_seconds_total', 'Total time spent waiting for a connection.',
+         [({'db': p['db_path']}, p['total_wait_ms'] / 1000) for p in pools]),
+        ('attendance_cache_hits_total', 'Response cache hits since start.',
+         [({}, cache_stats['hits'])]),
+        ('attendance_cache_misses_total', 'Response cache misses since start.',
+         [({}, cache_stats['misses'])]),
+    ]
+    stream_stats = live.stats()
+    gauges.append(('attendance_stream_subscribers', 'Open live event streams.',
+                   [({}, stream_stats['subscribers'])]))
+    counters.append(('attendance_stream_events_total', 'Live events published since start.',
+                     [({}, stream_stats['published_events'])]))
+    if batching.ENABLED:
+        queue_stats = batching.queue.stats()
+        gauges.append(('attendance_write_queue_depth', 'Attendance records waiting for the writer.',
+                       [({}, queue_stats['depth_records'])]))
+        counters += [
+            ('attendance_write_queue_flushes_total', 'Batches committed since start.',
+             [({}, queue_stats['flushes'])]),
+            ('attendance_write_queue_records_total', 'Records committed through the queue.',
+             [({}, queue_stats['flushed_records'])]),
+            ('attendance_write_queue_flush_seconds_total', 'Total time spent committing batches.',
+             [({}, queue_stats['total_flush_ms'] / 1000)]),
+            ('attendance_write_queue_rejected_total', 'Requests refused because the queue was full.',
+             [({}, queue_stats['rejected'])]),
+        ]
+    return Response(metrics.render_prometheus(gauges, counters),
+                    mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/metrics/slow-queries', methods=['GET'])
+def slow_query_log():
+    """Most recent statements slower than ATTENDANCE_SLOW_QUERY_MS"""
+    return jsonify({'threshold_ms': metrics.SLOW_QUERY_MS, 'queries': metrics.slow_queries()})
+
 # ========== STUDENT ROUTES ==========
 
+STUDENT_COLUMNS = {
+    'id': 'id',
+    'student_id': 'student_id',
+    'name': 'name',
+    'email': 'email',
+    'phone': 'phone',
+    'course': 'course',
+    'created_at': 'created_at',
+}
+
+# Fields sent once per distinct value in the columnar shape
+STUDENT_DICTIONARY_FIELDS = ('course',)
+
 @app.route('/api/students', methods=['GET'])
 def get_students():
-    """Get all students"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM students ORDER BY name')
-    students = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(students)
+    """Get all students (optional: ?fields=&limit=&cursor=&shape=columns)"""
+    paged = 'limit' in request.args or 'cursor' in request.args
+    try:
+        fields = pagination.parse_fields(request.args.get('fields'), STUDENT_COLUMNS)
+        limit = pagination.parse_limit(request.args.get('limit'))
+        cursor_token = request.args.get('cursor')
+        after = pagination.decode_cursor(cursor_token, (str, str)) if cursor_token else None
+        shape = responses.parse_shape(request.args.get('shape'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    query = f"SELECT {pagination.select_list(fields, STUDENT_COLUMNS, ('name', 'student_id'))} FROM students"
+    params = []
+    
+    if after:
+        query += ' WHERE (name > ? OR (name = ? AND student_id > ?))'
+        params.extend([after[0], after[0], after[1]])
+    
+    query += ' ORDER BY name, student_id'
+    
+    if paged:
+        query += ' LIMIT ?'
+        params.append(limit + 1)
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+    
+    if shape == 'columns':
+        return jsonify(columnar_page(rows, fields, STUDENT_DICTIONARY_FIELDS, paged, limit))
+    
+    if not paged:
+        return jsonify([dict(zip(fields, row)) for row in rows])
+    
+    students, next_cursor = pagination.page(rows, fields, limit)
+    return jsonify({'items': students, 'next_cursor': next_cursor})
+
+@app.route('/api/students/search', methods=['GET'])
+def search_students():
+    """Typeahead search over students (?q=jo sm&limit=10&course=...)"""
+    query = request.args.get('q', '')
+    try:
+        limit = pagination.parse_limit(request.args.get('limit', str(search.DEFAULT_LIMIT)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    with get_db_connection() as conn:
+        students = search.search(conn, query, min(limit, search.MAX_LIMIT),
+                                 course=request.args.get('course'))
+    return jsonify({'query': query, 'items': students})
 
 @app.route('/api/students/<student_id>', methods=['GET'])
 def get_student(student_id):
     """Get a specific student"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM students WHERE student_id = ?', (student_id,))
-    student = cursor.fetchone()
-    conn.close()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM students WHERE student_id = ?', (student_id,))
+        student = cursor.fetchone()
     
     if student:
         return jsonify(dict(student))
@@ -90,266 +262,790 @@ def get_student(student_id):
 def create_student():
     """Create a new student"""
     data = request.json
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                INSERT INTO students (student_id, name, email, phone, course)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (data['student_id'], data['name'], data.get('email'), 
+                  data.get('phone'), data.get('course')))
+            conn.commit()
+        except sqlite3.IntegrityError:
+            return jsonify({'error': 'Student ID already exists'}), 400
+        changes.sync(conn)
     
-    try:
-        cursor.execute('''
-            INSERT INTO students (student_id, name, email, phone, course)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (data['student_id'], data['name'], data.get('email'), 
-              data.get('phone'), data.get('course')))
-        conn.commit()
-        student_id = data['student_id']
-        conn.close()
-        return jsonify({'message': 'Student created successfully', 'student_id': student_id}), 201
-    except sqlite3.IntegrityError:
-        conn.close()
-        return jsonify({'error': 'Student ID already exists'}), 400
+    student_id = data['student_id']
+    return jsonify({'message': 'Student created successfully', 'student_id': student_id}), 201
 
 @app.route('/api/students/<student_id>', methods=['PUT'])
 def update_student(student_id):
     """Update a student"""
     data = request.json
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        UPDATE students 
-        SET name = ?, email = ?, phone = ?, course = ?
-        WHERE student_id = ?
-    ''', (data['name'], data.get('email'), data.get('phone'), 
-          data.get('course'), student_id))
-    
-    if cursor.rowcount == 0:
-        conn.close()
-        return jsonify({'error': 'Student not found'}), 404
-    
-    conn.commit()
-    conn.close()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE students 
+            SET name = ?, email = ?, phone = ?, course = ?
+            WHERE student_id = ?
+        ''', (data['name'], data.get('email'), data.get('phone'), 
+              data.get('course'), student_id))
+        
+        if cursor.rowcount == 0:
+            return jsonify({'error': 'Student not found'}), 404
+        
+        conn.commit()
+        changes.sync(conn)
     return jsonify({'message': 'Student updated successfully'})
 
 @app.route('/api/students/<student_id>', methods=['DELETE'])
 def delete_student(student_id):
     """Delete a student"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('DELETE FROM students WHERE student_id = ?', (student_id,))
-    
-    if cursor.rowcount == 0:
-        conn.close()
-        return jsonify({'error': 'Student not found'}), 404
-    
-    # Also delete attendance records
-    cursor.execute('DELETE FROM attendance WHERE student_id = ?', (student_id,))
-    conn.commit()
-    conn.close()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Attendance records first: compact rows refer to the student's row
+        cursor.execute(layout.statement(conn, 'delete_student'), (student_id,))
+        cursor.execute('DELETE FROM students WHERE student_id = ?', (student_id,))
+        
+        if cursor.rowcount == 0:
+            conn.rollback()
+            return jsonify({'error': 'Student not found'}), 404
+        
+        conn.commit()
+        changes.sync(conn)
     return jsonify({'message': 'Student deleted successfully'})
 
 # ========== ATTENDANCE ROUTES ==========
 
+ATTENDANCE_COLUMNS = {
+    'id': 'a.id',
+    'student_id': 'a.student_id',
+    'date': 'a.date',
+    'status': 'a.status',
+    'notes': 'a.notes',
+    'created_at': 'a.created_at',
+    'student_name': 's.name',
+    'course': 's.course',
+}
+
+# Fields sent once per distinct value in the columnar shape
+ATTENDANCE_DICTIONARY_FIELDS = ('student_id', 'date', 'status', 'notes', 'student_name', 'course')
+
+def attendance_range(args):
+    """The inclusive (from, to) dates the shared filters select, None for an
+    open end; raises ValueError on a bad date"""
+    date_from, date_to = (stats.validate_date(args.get('from')),
+                          stats.validate_date(args.get('to')))
+    if args.get('date'):
+        return args['date'], args['date']
+    return date_from, date_to
+
+def attendance_filters(args, columns=ATTENDANCE_COLUMNS):
+    """WHERE conditions for the shared attendance filters.
+
+    Supports ?date=, ?student_id=, ?course= and an inclusive ?from=/?to=
+    date range over `columns` (as returned by archive.joined()). Returns
+    (sql, params); raises ValueError on a bad date.
+    """
+    date_from, date_to = (stats.validate_date(args.get('from')),
+                          stats.validate_date(args.get('to')))
+    sql = ''
+    params = []
+    
+    if args.get('date'):
+        sql += f" AND {columns['date']} = ?"
+        params.append(args['date'])
+    
+    if date_from:
+        sql += f" AND {columns['date']} >= ?"
+        params.append(date_from)
+    
+    if date_to:
+        sql += f" AND {columns['date']} <= ?"
+        params.append(date_to)
+    
+    if args.get('student_id'):
+        sql += f" AND {columns['student_id']} = ?"
+        params.append(args['student_id'])
+    
+    if args.get('course'):
+        sql += f" AND {columns['course']} = ?"
+        params.append(args['course'])
+    
+    return sql, params
+
 @app.route('/api/attendance', methods=['GET'])
 def get_attendance():
-    """Get attendance records with optional filters"""
-    date_filter = request.args.get('date')
-    student_id_filter = request.args.get('student_id')
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    query = '''
-        SELECT a.*, s.name as student_name, s.course
-        FROM attendance a
-        JOIN students s ON a.student_id = s.student_id
-        WHERE 1=1
-    '''
-    params = []
+    """Get attendance records with optional filters.
+
+    Pass ?limit= and/or ?cursor= to page through the records newest first
+    (keyset on date, student name, id), ?fields= to select columns and
+    ?shape=columns for the compact columnar shape (responses.py).
+    """
+    paged = 'limit' in request.args or 'cursor' in request.args
+    try:
+        date_from, date_to = attendance_range(request.args)
+        fields = pagination.parse_fields(request.args.get('fields'), ATTENDANCE_COLUMNS)
+        limit = pagination.parse_limit(request.args.get('limit'))
+        cursor_token = request.args.get('cursor')
+        after = pagination.decode_cursor(cursor_token, (str, str, int)) if cursor_token else None
+        shape = responses.parse_shape(request.args.get('shape'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    if date_filter:
-        query += ' AND a.date = ?'
-        params.append(date_filter)
+    # Nothing newer than the cursor's date is on the page: partitions
+    # beyond it are not even attached
+    newest = after[0] if after and (date_to is None or after[0] < date_to) else date_to
+    rows = []
+    with get_db_connection() as conn:
+        # The hot table and each archived partition in turn, newest first,
+        # until the page is full
+        for source, columns, segment_sql, params in archive.segments(
+                conn, ATTENDANCE_COLUMNS, date_from, newest):
+            filter_sql, filter_params = attendance_filters(request.args, columns)
+            params += filter_params
+            date_sql, name_sql, id_sql = columns['date'], columns['student_name'], columns['id']
+            query = f'''
+                SELECT {pagination.select_list(fields, columns, (date_sql, name_sql, id_sql))}
+                FROM {source}
+                WHERE 1=1
+            ''' + segment_sql + filter_sql
+            
+            if after:
+                # The separate date bound keeps this an ordered walk of the date index
+                query += f''' AND {date_sql} <= ?
+                           AND ({date_sql} < ? OR {name_sql} > ? OR ({name_sql} = ? AND {id_sql} > ?))'''
+                params.extend([after[0], after[0], after[1], after[1], after[2]])
+            
+            query += f' ORDER BY {date_sql} DESC, {name_sql}, {id_sql}'
+            
+            if paged:
+                query += ' LIMIT ?'
+                params.append(limit + 1 - len(rows))
+            
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(query, params)
+            rows += cursor.fetchall()
+            if paged and len(rows) > limit:
+                break
     
-    if student_id_filter:
-        query += ' AND a.student_id = ?'
-        params.append(student_id_filter)
+    if shape == 'columns':
+        return jsonify(columnar_page(rows, fields, ATTENDANCE_DICTIONARY_FIELDS, paged, limit))
     
-    query += ' ORDER BY a.date DESC, s.name'
+    if not paged:
+        return jsonify([dict(zip(fields, row)) for row in rows])
     
-    cursor.execute(query, params)
-    records = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(records)
+    records, next_cursor = pagination.page(rows, fields, limit)
+    return jsonify({'items': records, 'next_cursor': next_cursor})
+
+EXPORT_BATCH_SIZE = 2000
+
+@app.route('/api/attendance/export', methods=['GET'])
+def export_attendance():
+    """Stream attendance records as NDJSON (default) or CSV.
+
+    Accepts the same filters as GET /api/attendance plus ?format=ndjson|csv
+    and ?fields=. Rows come out in (date, student_id) order, which is the
+    date index order, so no sort step delays the first byte. They are read
+    from the cursor in batches and written to the response as they arrive,
+    so memory use does not grow with the result size.
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+    try:
+        date_from, date_to = attendance_range(request.args)
+        fields = pagination.parse_fields(request.args.get('fields'), ATTENDANCE_COLUMNS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if export_format == 'csv':
+        encode_batch = export.encode_csv
+        mimetype = 'text/csv'
+    else:
+        encode_batch = export.ndjson_encoder(fields)
+        mimetype = 'application/x-ndjson'
+    
+    def generate():
+        if export_format == 'csv':
+            yield export.csv_header(fields)
+        with get_db_connection() as conn:
+            # The archived partitions and the hot table in turn, oldest first
+            for source, columns, segment_sql, params in archive.segments(
+                    conn, ATTENDANCE_COLUMNS, date_from, date_to, newest_first=False):
+                filter_sql, filter_params = attendance_filters(request.args, columns)
+                query = f'''
+                    SELECT {', '.join(columns[field] for field in fields)}
+                    FROM {source}
+                    WHERE 1=1
+                ''' + segment_sql + filter_sql + f" ORDER BY {columns['date']}, {columns['student_id']}"
+                cursor = conn.cursor()
+                cursor.row_factory = None
+                cursor.execute(query, params + filter_params)
+                while True:
+                    rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                    if not rows:
+                        break
+                    yield encode_batch(rows)
+    
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=attendance.{export_format}'
+    return response
 
 @app.route('/api/attendance', methods=['POST'])
 def mark_attendance():
-    """Mark attendance for students"""
+    """Mark attendance for students (single record or a list, all or nothing)"""
     data = request.json
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    records = data if isinstance(data, list) else [data]
+    if batching.ENABLED:
+        return mark_attendance_batched(records)
+    with get_db_connection() as conn:
+        result, _ = ingest.ingest(conn, records, atomic=True)
+        changes.sync(conn)
     
+    if result['errors']:
+        return jsonify({'error': 'Invalid attendance record(s)', 'errors': result['errors']}), 400
+    return jsonify({'message': 'Attendance marked successfully'}), 201
+
+def mark_attendance_batched(records):
+    """mark_attendance() through the write-coalescing queue (batching.py)"""
+    with get_db_connection() as conn:
+        rows, errors = ingest.validate(conn, records)
+    if errors:
+        return jsonify({'error': 'Invalid attendance record(s)', 'errors': errors}), 400
     try:
-        # Handle bulk attendance marking
-        if isinstance(data, list):
-            for record in data:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO attendance (student_id, date, status, notes)
-                    VALUES (?, ?, ?, ?)
-                ''', (record['student_id'], record['date'], 
-                      record['status'], record.get('notes')))
-        else:
-            # Single record
-            cursor.execute('''
-                INSERT OR REPLACE INTO attendance (student_id, date, status, notes)
-                VALUES (?, ?, ?, ?)
-            ''', (data['student_id'], data['date'], 
-                  data['status'], data.get('notes')))
-        
-        conn.commit()
-        conn.close()
-        return jsonify({'message': 'Attendance marked successfully'}), 201
-    except Exception as e:
-        conn.close()
-        return jsonify({'error': str(e)}), 400
+        batching.queue.submit([row for _, row in rows])
+    except batching.QueueFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+    except batching.WriteFailed as e:
+        return jsonify({'error': f'Attendance could not be saved: {e}'}), 503
+    return jsonify({'message': 'Attendance marked successfully'}), 201
+
+@app.route('/api/attendance/bulk', methods=['POST'])
+def bulk_mark_attendance():
+    """Bulk-ingest attendance from a JSON list or a CSV body.
+
+    CSV bodies (Content-Type: text/csv) need a student_id,date,status[,notes]
+    header. Valid rows are upserted in one transaction and invalid rows are
+    reported per row; with ?atomic=1 nothing is written if any row is
+    invalid.
+    """
+    atomic = request.args.get('atomic', '').lower() in ('1', 'true', 'yes')
+    if request.mimetype == 'text/csv':
+        try:
+            records = ingest.parse_csv(request.get_data(as_text=True))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    else:
+        records = request.get_json(silent=True)
+        if isinstance(records, dict):
+            records = records.get('records')
+        if not isinstance(records, list):
+            return jsonify({'error': 'Expected a JSON list of records or a text/csv body'}), 400
+    
+    with get_db_connection() as conn:
+        result, _ = ingest.ingest(conn, records, atomic=atomic)
+        changes.sync(conn)
+    
+    if result['errors'] and not result['written']:
+        return jsonify(result), 400
+    return jsonify(result), 201 if not result['errors'] else 200
 
 @app.route('/api/attendance/<int:attendance_id>', methods=['PUT'])
 def update_attendance(attendance_id):
     """Update an attendance record"""
     data = request.json
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        UPDATE attendance 
-        SET status = ?, notes = ?
-        WHERE id = ?
-    ''', (data['status'], data.get('notes'), attendance_id))
-    
-    if cursor.rowcount == 0:
-        conn.close()
-        return jsonify({'error': 'Attendance record not found'}), 404
-    
-    conn.commit()
-    conn.close()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute(layout.statement(conn, 'update'),
+                       (data['status'], data.get('notes'), attendance_id))
+        
+        if cursor.rowcount == 0:
+            return jsonify({'error': 'Attendance record not found'}), 404
+        
+        conn.commit()
+        changes.sync(conn)
     return jsonify({'message': 'Attendance updated successfully'})
 
 @app.route('/api/attendance/<int:attendance_id>', methods=['DELETE'])
 def delete_attendance(attendance_id):
     """Delete an attendance record"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('DELETE FROM attendance WHERE id = ?', (attendance_id,))
-    
-    if cursor.rowcount == 0:
-        conn.close()
-        return jsonify({'error': 'Attendance record not found'}), 404
-    
-    conn.commit()
-    conn.close()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute(layout.statement(conn, 'delete'), (attendance_id,))
+        
+        if cursor.rowcount == 0:
+            return jsonify({'error': 'Attendance record not found'}), 404
+        
+        conn.commit()
+        changes.sync(conn)
     return jsonify({'message': 'Attendance record deleted successfully'})
 
+# ========== TERM ROUTES ==========
+
+@app.route('/api/terms', methods=['GET'])
+def get_terms():
+    """Get the term calendar, ordered by start date"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM terms ORDER BY start_date, id')
+        terms = [dict(row) for row in cursor.fetchall()]
+    return jsonify(terms)
+
+@app.route('/api/terms', methods=['POST'])
+def create_term():
+    """Create a term ({name, start_date, end_date})"""
+    try:
+        name, start_date, end_date = reports.validate_term(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('INSERT INTO terms (name, start_date, end_date) VALUES (?, ?, ?)',
+                           (name, start_date, end_date))
+            conn.commit()
+        except sqlite3.IntegrityError:
+            return jsonify({'error': 'Term name already exists'}), 400
+        changes.sync(conn)
+    return jsonify({'message': 'Term created successfully', 'id': cursor.lastrowid}), 201
+
+@app.route('/api/terms/<int:term_id>', methods=['PUT'])
+def update_term(term_id):
+    """Update a term"""
+    try:
+        name, start_date, end_date = reports.validate_term(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('UPDATE terms SET name = ?, start_date = ?, end_date = ? WHERE id = ?',
+                           (name, start_date, end_date, term_id))
+        except sqlite3.IntegrityError:
+            return jsonify({'error': 'Term name already exists'}), 400
+        
+        if cursor.rowcount == 0:
+            return jsonify({'error': 'Term not found'}), 404
+        
+        conn.commit()
+        changes.sync(conn)
+    return jsonify({'message': 'Term updated successfully'})
+
+@app.route('/api/terms/<int:term_id>', methods=['DELETE'])
+def delete_term(term_id):
+    """Delete a term"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM terms WHERE id = ?', (term_id,))
+        
+        if cursor.rowcount == 0:
+            return jsonify({'error': 'Term not found'}), 404
+        
+        conn.commit()
+        changes.sync(conn)
+    return jsonify({'message': 'Term deleted successfully'})
+
 # ========== STATISTICS ROUTES ==========
 
+def get_date_range_args():
+    """Read optional ?from=&to= ISO dates from the query string"""
+    return (stats.validate_date(request.args.get('from')),
+            stats.validate_date(request.args.get('to')))
+
 @app.route('/api/statistics/overview', methods=['GET'])
 def get_statistics():
-    """Get overall attendance statistics"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    """Get overall attendance statistics (optional: ?course=&from=&to=)"""
+    try:
+        date_from, date_to = get_date_range_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Total students
-    cursor.execute('SELECT COUNT(*) as count FROM students')
-    total_students = cursor.fetchone()['count']
+    course = request.args.get('course')
     
-    # Total attendance records
-    cursor.execute('SELECT COUNT(*) as count FROM attendance')
-    total_records = cursor.fetchone()['count']
+    def compute():
+        with get_db_connection() as conn:
+            return stats.overview(conn, course=course, date_from=date_from, date_to=date_to)
     
-    # Present count
-    cursor.execute("SELECT COUNT(*) as count FROM attendance WHERE status = 'present'")
-    present_count = cursor.fetchone()['count']
+    return cached_json(('overview', course, date_from, date_to), ['overview'], compute)
+
+@app.route('/api/statistics/tenants', methods=['GET'])
+def get_tenant_statistics():
+    """Overview statistics of every tenant database and the default one,
+    and their sum (optional: ?course=&from=&to=); see tenants.py.
+
+    Only for untenanted requests: a school must not read the others' counts.
+    """
+    if db.current_path() != DB_PATH:
+        return jsonify({'error': 'Not available to tenant requests'}), 403
     
-    # Absent count
-    cursor.execute("SELECT COUNT(*) as count FROM attendance WHERE status = 'absent'")
-    absent_count = cursor.fetchone()['count']
+    try:
+        date_from, date_to = get_date_range_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Late count
-    cursor.execute("SELECT COUNT(*) as count FROM attendance WHERE status = 'late'")
-    late_count = cursor.fetchone()['count']
+    course = request.args.get('course')
+    results = tenants.fan_out(lambda conn: stats.overview(
+        conn, course=course, date_from=date_from, date_to=date_to), tenants.databases())
+    total = {'tenants': len(results) - 1,
+             'total_students': sum(result['total_students'] for result in results.values())}
+    total.update(stats.summarize({
+        status: sum(result[f'{status}_count'] for result in results.values())
+        for status in stats.STATUSES}))
+    return jsonify({'tenants': results, 'total': total})
+
+@app.route('/api/statistics/student/<student_id>', methods=['GET'])
+def get_student_statistics(student_id):
+    """Attendance statistics for a specific student (optional: ?from=&to=)"""
+    try:
+        date_from, date_to = get_date_range_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Attendance percentage
-    attendance_percentage = (present_count / total_records * 100) if total_records > 0 else 0
+    def compute():
+        with get_db_connection() as conn:
+            return stats.student_overview(conn, student_id,
+                                          date_from=date_from, date_to=date_to)
     
-    conn.close()
+    return cached_json(('student', student_id, date_from, date_to),
+                       [f'student:{student_id}'], compute)
+
+@app.route('/api/statistics/courses', methods=['GET'])
+def get_course_statistics():
+    """Get attendance statistics for every course (optional: ?from=&to=)"""
+    try:
+        date_from, date_to = get_date_range_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({
-        'total_students': total_students,
-        'total_records': total_records,
-        'present_count': present_count,
-        'absent_count': absent_count,
-        'late_count': late_count,
-        'attendance_percentage': round(attendance_percentage, 2)
-    })
+    def compute():
+        with get_db_connection() as conn:
+            return stats.course_overview(conn, date_from=date_from, date_to=date_to)
+    
+    return cached_json(('courses', date_from, date_to), ['overview'], compute)
 
-@app.route('/api/statistics/student/<student_id>', methods=['GET'])
-def get_student_statistics(student_id):
-    """Get attendance statistics for a specific student"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+@app.route('/api/statistics/series', methods=['GET'])
+def get_statistics_series():
+    """Get status counts per day, week, month or term as parallel arrays.
+
+    ?group=day|week|month|term (default week), optional ?from=&to=, and
+    ?course= or ?student_id= to narrow the scope from school-wide.
+    """
+    group = request.args.get('group', 'week')
+    if group not in reports.GROUPS:
+        return jsonify({'error': f"group must be one of: {', '.join(reports.GROUPS)}"}), 400
+    try:
+        date_from, date_to = get_date_range_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Total records for student
-    cursor.execute('SELECT COUNT(*) as count FROM attendance WHERE student_id = ?', (student_id,))
-    total_records = cursor.fetchone()['count']
+    course = request.args.get('course')
+    student_id = request.args.get('student_id')
     
-    # Present count
-    cursor.execute("SELECT COUNT(*) as count FROM attendance WHERE student_id = ? AND status = 'present'", (student_id,))
-    present_count = cursor.fetchone()['count']
+    def compute():
+        with get_db_connection() as conn:
+            return reports.series(conn, group, student_id=student_id, course=course,
+                                  date_from=date_from, date_to=date_to)
     
-    # Absent count
-    cursor.execute("SELECT COUNT(*) as count FROM attendance WHERE student_id = ? AND status = 'absent'", (student_id,))
-    absent_count = cursor.fetchone()['count']
+    tags = [f'student:{student_id}'] if student_id is not None else ['overview']
+    if group == 'term':
+        tags.append('terms')
+    return cached_json(('series', group, student_id, course, date_from, date_to), tags, compute)
+
+def parse_number(value, name):
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number') from None
+    if not math.isfinite(number):
+        raise ValueError(f'{name} must be a number')
+    return number
+
+def parse_whole_number(value, name):
+    """A non-negative integer from the query string or a JSON body"""
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f'{name} must be a non-negative integer')
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be a non-negative integer') from None
+    if number < 0:
+        raise ValueError(f'{name} must be a non-negative integer')
+    return number
+
+@app.route('/api/statistics/students', methods=['GET', 'POST'])
+def get_students_statistics():
+    """Get statistics for many students in one request.
+
+    Pick students with ?course= and/or ?student_ids=a,b,c (or POST a JSON
+    body with a "student_ids" list and the same options). Filter with
+    ?below=75 / ?above=90 (attendance percentage, exclusive) and
+    ?min_records=, sort with ?sort=&order=asc|desc, and cap with ?limit=.
+    """
+    options = request.args.to_dict()
+    student_ids = None
+    if request.method == 'POST':
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return jsonify({'error': 'Expected a JSON object'}), 400
+        options.update({key: value for key, value in body.items() if key != 'student_ids'})
+        student_ids = body.get('student_ids')
+        if student_ids is not None and (not isinstance(student_ids, list) or
+                                        not all(isinstance(sid, str) for sid in student_ids)):
+            return jsonify({'error': 'student_ids must be a list of strings'}), 400
+    elif options.get('student_ids'):
+        student_ids = [sid.strip() for sid in options['student_ids'].split(',') if sid.strip()]
+    if student_ids is not None and len(student_ids) > stats.MAX_STUDENT_IDS:
+        return jsonify({'error': f'At most {stats.MAX_STUDENT_IDS} student_ids per request'}), 400
     
-    # Late count
-    cursor.execute("SELECT COUNT(*) as count FROM attendance WHERE student_id = ? AND status = 'late'", (student_id,))
-    late_count = cursor.fetchone()['count']
+    order = options.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': 'order must be asc or desc'}), 400
+    sort = options.get('sort', 'attendance_percentage')
+    if sort not in stats.STUDENT_SORTS:
+        return jsonify({'error': f"sort must be one of: {', '.join(stats.STUDENT_SORTS)}"}), 400
+    try:
+        date_from = stats.validate_date(options.get('from'))
+        date_to = stats.validate_date(options.get('to'))
+        below = parse_number(options.get('below'), 'below')
+        above = parse_number(options.get('above'), 'above')
+        min_records = parse_whole_number(options.get('min_records', 0), 'min_records')
+        limit = options.get('limit')
+        limit = pagination.parse_limit(str(limit)) if limit is not None else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Attendance percentage
-    attendance_percentage = (present_count / total_records * 100) if total_records > 0 else 0
+    course = options.get('course')
     
-    conn.close()
+    def compute():
+        with get_db_connection() as conn:
+            items, matched = stats.student_table(
+                conn, student_ids=student_ids, course=course, date_from=date_from,
+                date_to=date_to, below=below, above=above, min_records=min_records,
+                sort=sort, descending=order == 'desc', limit=limit)
+        return {'items': items, 'matched': matched}
     
-    return jsonify({
-        'student_id': student_id,
-        'total_records': total_records,
-        'present_count': present_count,
-        'absent_count': absent_count,
-        'late_count': late_count,
-        'attendance_percentage': round(attendance_percentage, 2)
-    })
+    key = ('students', tuple(student_ids) if student_ids is not None else None, course,
+           date_from, date_to, below, above, min_records, sort, order, limit)
+    return cached_json(key, ['overview'], compute)
+
+@app.route('/api/statistics/student/<student_id>/streaks', methods=['GET'])
+def get_student_streaks(student_id):
+    """Get a student's current and longest present/absent/late streaks
+    (see timelines.py)"""
+    def compute():
+        with get_db_connection() as conn:
+            snapshot = timelines.store.snapshot(conn)
+        return snapshot.streaks(student_id)
+    
+    return cached_json(('streaks', student_id), [f'student:{student_id}'], compute)
+
+def parse_count(value, name, default=None, maximum=None):
+    """A positive whole number from the query string (None: default)"""
+    if value is None:
+        return default
+    try:
+        count = int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer') from None
+    if count < 1 or (maximum is not None and count > maximum):
+        raise ValueError(f'{name} must be between 1 and {maximum}' if maximum is not None
+                         else f'{name} must be positive')
+    return count
+
+def parse_status(value, default=None):
+    if value is None:
+        return default
+    if value not in stats.STATUSES:
+        raise ValueError(f"status must be one of: {', '.join(stats.STATUSES)}")
+    return value
+
+def limited(items, limit):
+    return {'items': items if limit is None else items[:limit], 'matched': len(items)}
+
+@app.route('/api/statistics/streaks', methods=['GET'])
+def get_course_streaks():
+    """Get every student's current and longest streaks (see timelines.py).
+
+    Optional ?course=, and ?status=absent&min_length=3 for only the
+    students currently on such a run (longest first); cap with ?limit=.
+    """
+    try:
+        status = parse_status(request.args.get('status'))
+        min_length = parse_count(request.args.get('min_length'), 'min_length', 1)
+        limit = request.args.get('limit')
+        limit = pagination.parse_limit(limit) if limit is not None else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    course = request.args.get('course')
+    
+    def compute():
+        with get_db_connection() as conn:
+            snapshot = timelines.store.snapshot(conn)
+        return limited(snapshot.course_streaks(course, status, min_length), limit)
+    
+    return cached_json(('course-streaks', course, status, min_length, limit), ['overview'],
+                       compute)
+
+@app.route('/api/statistics/windows', methods=['GET'])
+def get_rolling_windows():
+    """Get every student's statistics over their last N sessions.
+
+    ?sessions=10 (default), optional ?course=, ?to= (windows ending on
+    or before that date), ?sort=&order=asc|desc and ?limit=.
+    """
+    order = request.args.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': 'order must be asc or desc'}), 400
+    sort = request.args.get('sort', 'attendance_percentage')
+    if sort not in timelines.WINDOW_SORTS:
+        return jsonify({'error': f"sort must be one of: {', '.join(timelines.WINDOW_SORTS)}"}), 400
+    try:
+        sessions = parse_count(request.args.get('sessions'), 'sessions', 10,
+                               timelines.MAX_SESSIONS)
+        date_to = stats.validate_date(request.args.get('to'))
+        limit = request.args.get('limit')
+        limit = pagination.parse_limit(limit) if limit is not None else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    course = request.args.get('course')
+    
+    def compute():
+        with get_db_connection() as conn:
+            snapshot = timelines.store.snapshot(conn)
+        return limited(snapshot.course_windows(course, sessions, date_to, sort,
+                                               order == 'desc'), limit)
+    
+    return cached_json(('windows', course, sessions, date_to, sort, order, limit),
+                       ['overview'], compute)
+
+@app.route('/api/statistics/alerts', methods=['GET'])
+def get_attendance_alerts():
+    """Get the students absent (or late) at least N of their last M sessions.
+
+    ?status=absent|late|present (default absent), ?min=3&sessions=10,
+    optional ?streak=K to also flag current runs of K or more, ?course=,
+    ?to= and ?limit=. Most records of the status first.
+    """
+    try:
+        status = parse_status(request.args.get('status'), 'absent')
+        sessions = parse_count(request.args.get('sessions'), 'sessions', 10,
+                               timelines.MAX_SESSIONS)
+        minimum = parse_count(request.args.get('min'), 'min', 3, sessions)
+        streak = parse_count(request.args.get('streak'), 'streak')
+        date_to = stats.validate_date(request.args.get('to'))
+        limit = request.args.get('limit')
+        limit = pagination.parse_limit(limit) if limit is not None else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    course = request.args.get('course')
+    
+    def compute():
+        with get_db_connection() as conn:
+            snapshot = timelines.store.snapshot(conn)
+        return limited(snapshot.alerts(course, status, minimum, sessions, streak, date_to),
+                       limit)
+    
+    return cached_json(('alerts', course, status, minimum, sessions, streak, date_to, limit),
+                       ['overview'], compute)
 
 @app.route('/api/attendance/date/<date_str>', methods=['GET'])
 def get_attendance_by_date(date_str):
     """Get all attendance records for a specific date"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT a.*, s.name as student_name, s.course
-        FROM attendance a
-        JOIN students s ON a.student_id = s.student_id
-        WHERE a.date = ?
-        ORDER BY s.name
-    ''', (date_str,))
-    
-    records = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(records)
+    def compute():
+        with get_db_connection() as conn:
+            source, columns, params = archive.joined(conn, ATTENDANCE_COLUMNS, date_str, date_str)
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            
+            cursor.execute(f'''
+                SELECT {', '.join(columns.values())}
+                FROM {source}
+                WHERE {columns['date']} = ?
+                ORDER BY {columns['student_name']}, {columns['student_id']}
+            ''', params + [date_str])
+            
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    return cached_json(('date', date_str), [f'date:{date_str}', 'dates'], compute)
 
-if __name__ == '__main__':
-    # Initialize database on startup
-    init_db()
-    print("✅ Database initialized!")
-    print("🚀 Starting Flask server on http://localhost:5001")
-    print("📡 API endpoints available at http://localhost:5001/api/")
-    app.run(debug=True, port=5001, host='0.0.0.0')
+# ========== SYNC ROUTES ==========
+
+@app.route('/api/sync', methods=['GET'])
+def sync_attendance():
+    """Attendance changed since a change-log version (see deltas.py).
 
+    Without ?since= returns a snapshot of the records for ?date= and/or
+    ?student_id= with the current version; with ?since= only what changed
+    after it, including tombstones for deleted records. ?limit= caps the
+    log entries read per call (default and maximum 1000).
+    """
+    date_str = request.args.get('date')
+    student_id = request.args.get('student_id')
+    try:
+        stats.validate_date(date_str)
+        since = request.args.get('since')
+        if since is not None:
+            if not since.isdigit():
+                raise ValueError('since must be a non-negative integer')
+            since = int(since)
+        limit = (pagination.parse_limit(request.args['limit']) if 'limit' in request.args
+                 else deltas.DEFAULT_LIMIT)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    with get_db_connection() as conn:
+        if since is None:
+            if date_str is None and student_id is None:
+                return jsonify({'error': 'A snapshot needs date or student_id'}), 400
+            result = deltas.snapshot(conn, ATTENDANCE_COLUMNS, date_str, student_id)
+        else:
+            result = deltas.delta(conn, ATTENDANCE_COLUMNS, since, date_str, student_id, limit)
+    return jsonify(result)
+
+# ========== LIVE ROUTES ==========
+
+# One broadcaster per database (tenants.py)
+live = db.PerDatabase(lambda path: streams.Broadcaster(ATTENDANCE_COLUMNS, path))
+
+@changes.subscribe
+def on_change_live(kind, dates, student_ids):
+    """Feed the changed database's live streams"""
+    live.on_change(kind, dates, student_ids)
+
+@app.route('/api/stream', methods=['GET'])
+def stream_events():
+    """Server-sent events with attendance changes and overview counters.
+
+    See streams.py. Reconnecting clients send Last-Event-ID (or
+    ?last_event_id=) and get the events they missed.
+    """
+    last_event_id = streams.parse_event_id(
+        request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    try:
+        cursor, first_chunk = live.open(last_event_id)
+    except streams.TooManySubscribers as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+    response = Response(live.stream(cursor, first_chunk), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+if __name__ == '__main__':
+    # Same options as serve.py; the debug server needs an explicit --dev
+    import serve
+    raise SystemExit(serve.main())
@@ -0,0 +1,690 @@
+"""
+Time-partitioned archive of closed attendance periods.
+
+The records of a closed month, term or date range can be moved out of the
+hot attendance table into a SQLite file of their own, a partition, listed
+in the ``archive_partitions`` table. Partition files are written once, in
+(date, student_id) order with date and student indexes. They may live on
+slower, cheaper storage (ATTENDANCE_ARCHIVE_DIR, default ``archive/`` next
+to the database).
+
+Readers attach partitions on demand. Streaks and reports read
+``source()`` or ``joined()``. These return the hot table alone unless the
+requested date range reaches an archived partition. Otherwise they return
+a UNION ALL of the hot table and only the partitions the range overlaps.
+Listings and exports, which return records in date order, read
+``segments()`` one after another instead. A page of the newest records is
+then read from the hot table alone, and a partition is only attached once
+a page or export reaches its dates. Statistics scans count each of those
+tables separately (``tables()``, ``student_counts()``). At most
+SQLITE_LIMIT_ATTACHED partitions (10 in standard builds) can exist at
+once; merge old ones with ``compact --merge``.
+
+The summary tables keep counting archived records, so summary-backed
+statistics are unchanged by archiving. An archived record keeps the course
+its student had when it was archived: listings, exports, course filters
+and course statistics file it under that course, not the student's
+current one.
+
+Archived dates are closed. Triggers reject new or moved records on them,
+and bulk marks report them per row. PUT or DELETE of an archived record's
+id returns 404. Deleting a student leaves their archived records in place.
+Delta sync (deltas.py) covers the hot table only; archiving, restoring and
+merging log a reset.
+
+Usage (from the backend directory):
+    python3 archive.py                                 # list partitions
+    python3 archive.py archive --month 2025-09
+    python3 archive.py archive --term "Fall 2025"
+    python3 archive.py archive --from 2025-01-01 --to 2025-06-30 --name 2025-h1
+    python3 archive.py restore 2025-09
+    python3 archive.py compact                         # VACUUM the hot database
+    python3 archive.py compact --merge 2025 --from 2025-01-01 --to 2025-12-31
+"""
+import argparse
+import calendar
+import json
+import os
+import re
+import sqlite3
+import sys
+from contextlib import contextmanager
+from datetime import date
+
+import changes
+import layout
+import summaries
+
+ARCHIVE_DIR = os.environ.get('ATTENDANCE_ARCHIVE_DIR')
+
+# Columns of a partition's attendance table; course is the student's course
+# when the record was archived
+COLUMNS = ('id', 'student_id', 'date', 'status', 'notes', 'created_at', 'course')
+
+# The columns statistics read; a union of just these is answered from the
+# covering (date, student_id, status) and (student_id, date, status) indexes
+COUNTED = ('student_id', 'date', 'status')
+
+# The course of an archived record ``a`` ('' is stored for none), used
+# instead of its student's current course wherever records are filtered
+# or labelled by course, as the summary tables do
+ARCHIVED_COURSE = "NULLIF(a.course, '')"
+# The same over a union of hot and archived records joined onto
+# ``students s``, where hot records have no course of their own (NULL)
+RECORD_COURSE = f'CASE WHEN a.course IS NULL THEN s.course ELSE {ARCHIVED_COURSE} END'
+
+FIELDS = ('id', 'name', 'path', 'date_from', 'date_to', 'records', 'created_at')
+
+
+def create_schema(conn):
+    """Create the partition manifest and the archived-date write guards"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archive_partitions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            path TEXT NOT NULL,
+            date_from TEXT NOT NULL,
+            date_to TEXT NOT NULL,
+            records INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            CHECK (date_from <= date_to)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_archive_partitions_dates '
+                 'ON archive_partitions (date_from, date_to)')
+    create_attendance_triggers(conn, layout.LAYOUTS[layout.current(conn)])
+
+
+def _has_manifest(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                        "AND name = 'archive_partitions'").fetchone() is not None
+
+
+def create_attendance_triggers(conn, storage):
+    """Triggers rejecting records on archived dates in an attendance storage
+    table (a layout.LAYOUTS entry); nothing before the manifest exists"""
+    if not _has_manifest(conn):
+        return
+    day = storage['row']['date'].format(row='NEW')
+    for op, event in (('insert', 'INSERT'),
+                      ('update', f"UPDATE OF {', '.join(storage['moves'])}")):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_archive_attendance_{op}
+            BEFORE {event} ON {storage['table']}
+            WHEN EXISTS (SELECT 1 FROM archive_partitions
+                         WHERE date_from <= {day} AND date_to >= {day}) BEGIN
+            SELECT RAISE(ABORT, 'date is archived');
+            END''')
+
+
+# ========== READING ==========
+
+def _manifest(conn, sql, params=()):
+    """Rows of a query on archive_partitions; none before migration 7"""
+    try:
+        return [tuple(row) for row in conn.execute(sql, params)]
+    except sqlite3.OperationalError as e:
+        if 'no such table' in str(e):
+            return []
+        raise
+
+
+def partitions(conn, date_from=None, date_to=None):
+    """Partitions overlapping an inclusive date range (all by default), as
+    dicts of FIELDS in date order"""
+    conditions, params = [], []
+    if date_from is not None:
+        conditions.append('date_to >= ?')
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append('date_from <= ?')
+        params.append(date_to)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    rows = _manifest(conn, f"SELECT {', '.join(FIELDS)} FROM archive_partitions {where} "
+                           f"ORDER BY date_from", params)
+    return [dict(zip(FIELDS, row)) for row in rows]
+
+
+def archived_dates(conn, dates):
+    """The subset of `dates` that lie in an archived partition"""
+    if not dates:
+        return set()
+    rows = _manifest(conn, '''
+        SELECT value FROM json_each(?)
+        WHERE EXISTS (SELECT 1 FROM archive_partitions
+                      WHERE date_from <= value AND date_to >= value)''',
+        (json.dumps(sorted(dates)),))
+    return {row[0] for row in rows}
+
+
+def _schema(partition):
+    return f"archive_{partition['id']}"
+
+
+def _database_dir(conn):
+    path = next(row[2] for row in conn.execute('PRAGMA database_list') if row[1] == 'main')
+    if not path:
+        raise ValueError('Archiving needs a database file')
+    return os.path.dirname(path)
+
+
+def _resolve(conn, path):
+    """A manifest path (relative to the database's directory) as a file path"""
+    return os.path.join(_database_dir(conn), path)
+
+
+def _attach(conn, parts):
+    """Attach the partitions' files, detaching unneeded ones to make room"""
+    attached = [row[1] for row in conn.execute('PRAGMA database_list')
+                if row[1] not in ('main', 'temp')]
+    needed = {_schema(part) for part in parts}
+    missing = [part for part in parts if _schema(part) not in attached]
+    if not missing:
+        return
+    spare = [name for name in attached if name not in needed]
+    free = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) - len(attached)
+    while spare and free < len(missing):
+        conn.execute(f'DETACH DATABASE {spare.pop()}')
+        free += 1
+    for part in missing:
+        path = _resolve(conn, part['path'])
+        if not os.path.exists(path):
+            # ATTACH would silently create an empty database instead
+            raise FileNotFoundError(f"Archive partition {part['name']} is missing: {path}")
+        conn.execute(f'ATTACH DATABASE ? AS {_schema(part)}', (path,))
+        # Page cache and memory-mapping are set per schema, not per connection
+        for pragma in ('cache_size', 'mmap_size'):
+            value = conn.execute(f'PRAGMA main.{pragma}').fetchone()[0]
+            conn.execute(f'PRAGMA {_schema(part)}.{pragma} = {value}')
+
+
+def tables(conn, date_from=None, date_to=None):
+    """The tables holding the attendance records of an inclusive date range.
+
+    'main.attendance', then 'archive_<id>.attendance' for every partition
+    overlapping the range, which is attached to conn first. SQLite cannot
+    attach inside a transaction, so readers that open one call this before
+    BEGIN.
+    """
+    parts = partitions(conn, date_from, date_to)
+    _attach(conn, parts)
+    return ['main.attendance'] + [f'{_schema(part)}.attendance' for part in parts]
+
+
+def _with_course(columns, course):
+    """`columns` (as in layout.joined()) reading the course from `course`"""
+    return {name: course if sql == 's.course' else sql for name, sql in columns.items()}
+
+
+def _range(date_from, date_to):
+    """(WHERE clause, params) limiting a table's records to the range"""
+    conditions, bounds = [], []
+    if date_from is not None:
+        conditions.append('date >= ?')
+        bounds.append(date_from)
+    if date_to is not None:
+        conditions.append('date <= ?')
+        bounds.append(date_to)
+    return (f" WHERE {' AND '.join(conditions)}" if conditions else ''), bounds
+
+
+def _union(names, date_from, date_to, columns=COLUMNS):
+    """UNION ALL of the tables' records in the range, with `columns`; the
+    hot table has no course column (NULL)"""
+    where, bounds = _range(date_from, date_to)
+    hot = ', '.join('NULL AS course' if column == 'course' else column for column in columns)
+    arms = [f'SELECT {hot} FROM {names[0]}{where}']
+    arms += [f"SELECT {', '.join(columns)} FROM {name}{where}" for name in names[1:]]
+    return f"({' UNION ALL '.join(arms)})", bounds * len(arms)
+
+
+def source(conn, date_from=None, date_to=None, columns=COLUMNS):
+    """FROM-clause SQL for the attendance records of an inclusive date range.
+
+    Returns (sql, params): ('attendance', []) when no archived partition
+    overlaps the range, else a UNION ALL subquery with `columns` (a subset
+    of COLUMNS) over the hot table and the overlapping partitions. The
+    params belong to the subquery, so they come before the params of the
+    rest of the query.
+
+    Every row of the union passes through a co-routine, so aggregates over
+    many records are better computed per table (tables(), student_counts()).
+    """
+    names = tables(conn, date_from, date_to)
+    if len(names) == 1:
+        return 'attendance', []
+    return _union(names, date_from, date_to, columns)
+
+
+def joined(conn, columns, date_from=None, date_to=None):
+    """layout.joined() over the records of an inclusive date range.
+
+    Returns (from_sql, columns, params). Without overlapping partitions
+    this is the layout's own join, without params; with them, the course
+    column is the one archived records were archived under.
+    """
+    names = tables(conn, date_from, date_to)
+    if len(names) == 1:
+        from_sql, columns = layout.joined(conn, columns)
+        return from_sql, columns, []
+    union, params = _union(names, date_from, date_to)
+    return (f'{union} a JOIN students s ON a.student_id = s.student_id',
+            _with_course(columns, RECORD_COURSE), params)
+
+
+def segments(conn, columns, date_from=None, date_to=None, newest_first=True):
+    """layout.joined() over the records of an inclusive date range, split
+    into stretches of dates that follow each other.
+
+    Yields (from_sql, columns, condition, params) for each stretch, newest
+    first (or oldest first). The stretches alternate between the hot table
+    and one partition each, e.g. the hot records newer than the newest
+    partition in the range, then that partition, then the hot records
+    before it. `condition` is SQL such as ' AND a.date > ?' that limits a
+    hot stretch to its dates, with `params`. Partitions need none, because
+    hot records never fall on archived dates. A partition's course column
+    is the course its records were archived under (ARCHIVED_COURSE).
+
+    Reading the stretches in turn gives the records in date order, each
+    stretch in its own index order. A partition is attached only when the
+    generator reaches it, so a reader that stops early never touches it.
+    Without overlapping partitions there is one stretch with no condition:
+    the layout's own join, or its date-order join if the range is bounded
+    (a page cursor bounds it too).
+    """
+    hot_sql, hot_columns = layout.joined(conn, columns)
+    bounded_sql, _ = layout.joined(conn, columns, date_order=True)
+    if date_from is not None or date_to is not None:
+        hot_sql = bounded_sql
+    date_sql = hot_columns['date']
+    stretches, after = [], None
+    for part in partitions(conn, date_from, date_to):
+        stretches += [(None, after, part['date_from']), (part, None, None)]
+        after = part['date_to']
+    stretches.append((None, after, None))
+    if newest_first:
+        stretches.reverse()
+    for part, after, before in stretches:
+        if part is not None:
+            _attach(conn, [part])
+            yield (f'{_schema(part)}.attendance a JOIN students s ON a.student_id = s.student_id',
+                   _with_course(columns, ARCHIVED_COURSE), '', [])
+            continue
+        condition, params = '', []
+        if after is not None:
+            condition += f' AND {date_sql} > ?'
+            params.append(after)
+        if before is not None:
+            condition += f' AND {date_sql} < ?'
+            params.append(before)
+        yield bounded_sql if condition else hot_sql, hot_columns, condition, params
+
+
+def student_counts(conn, date_from=None, date_to=None):
+    """Each student's status counts in the range, as a join onto students s.
+
+    Returns (join_sql, sums, params), where sums maps each status to the
+    SQL to SUM() per student. Without overlapping partitions this is
+    layout.student_join(); with them, every table counts its own records
+    per student and the join is onto those few rows per student.
+    """
+    names = tables(conn, date_from, date_to)
+    if len(names) == 1:
+        join, status_sql, params = layout.student_join(conn, date_from, date_to)
+        return join, {status: f"{status_sql} = '{status}'" for status in summaries.STATUSES}, params
+    where, bounds = _range(date_from, date_to)
+    counts = ', '.join(f"SUM(status = '{status}') AS {status}" for status in summaries.STATUSES)
+    arms = [f'SELECT student_id, {counts} FROM {name}{where} GROUP BY student_id'
+            for name in names]
+    return (f"LEFT JOIN ({' UNION ALL '.join(arms)}) a ON a.student_id = s.student_id",
+            {status: f'a.{status}' for status in summaries.STATUSES}, bounds * len(arms))
+
+
+# ========== ARCHIVE / RESTORE / COMPACT ==========
+
+@contextmanager
+def _transaction(conn):
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # explicit BEGIN/COMMIT, DDL included
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        conn.isolation_level = isolation_level
+
+
+@contextmanager
+def _untracked(conn):
+    """Suspend the summary and change-log triggers on the attendance storage
+    table: moved records stay counted in the summaries, and one reset is
+    logged instead of a change per record. Use inside a transaction."""
+    triggers = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ? "
+        "AND (name GLOB 'trg_summary_attendance_*' OR name GLOB 'trg_change_log_attendance_*')",
+        (layout.table(conn),)).fetchall()
+    for name, _ in triggers:
+        conn.execute(f'DROP TRIGGER {name}')
+    yield
+    for _, sql in triggers:
+        conn.execute(sql)
+    changes.log_reset(conn)
+
+
+def _file_name(name):
+    return (re.sub(r'[^A-Za-z0-9._-]+', '-', name).strip('-.') or 'partition') + '.db'
+
+
+def _new_path(conn, name, directory):
+    directory = directory or ARCHIVE_DIR or os.path.join(_database_dir(conn), 'archive')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, _file_name(name))
+    if os.path.exists(path):
+        raise ValueError(f'{path} already exists')
+    return path
+
+
+def _stored_path(conn, path):
+    """path relative to the database's directory, if it lies beneath it"""
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath(_database_dir(conn)))
+    return os.path.abspath(path) if relative.startswith('..') else relative
+
+
+def _write_partition(conn, path, select, params=(), parts=()):
+    """Create a partition file holding the rows of `select` (COLUMNS).
+
+    The copy runs on a separate connection to the same database (with
+    `parts` attached), so it sees what conn's write transaction has locked
+    but not changed yet, and it is committed to disk before conn deletes
+    anything. Returns the number of rows written.
+    """
+    copier = sqlite3.connect(next(row[2] for row in conn.execute('PRAGMA database_list')
+                                  if row[1] == 'main'))
+    try:
+        for part in parts:
+            copier.execute(f'ATTACH DATABASE ? AS {_schema(part)}', (_resolve(conn, part['path']),))
+        copier.execute('ATTACH DATABASE ? AS part', (path,))
+        copier.execute('''
+            CREATE TABLE part.attendance (
+                id INTEGER PRIMARY KEY,
+                student_id TEXT NOT NULL,
+                date TEXT NOT NULL,
+                status TEXT NOT NULL,
+                notes TEXT,
+                created_at TIMESTAMP,
+                course TEXT NOT NULL
+            )''')
+        copier.execute(f"INSERT INTO part.attendance ({', '.join(COLUMNS)}) "
+                       f"SELECT * FROM ({select}) ORDER BY date, student_id", params)
+        copier.execute('CREATE INDEX part.idx_archive_date ON attendance (date, student_id, status)')
+        copier.execute('CREATE INDEX part.idx_archive_student ON attendance (student_id, date, status)')
+        copier.commit()
+        copier.execute('ANALYZE part')
+        return copier.execute('SELECT COUNT(*) FROM part.attendance').fetchone()[0]
+    finally:
+        copier.close()
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def archive(conn, name, date_from, date_to, directory=None):
+    """Move the records dated date_from..date_to (inclusive) into a new
+    partition named `name`; returns the number of records moved.
+
+    Only closed periods (ending before today) can be archived, and a
+    range may not overlap an existing partition. Raises ValueError.
+    """
+    for value in (date_from, date_to):
+        try:
+            date.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid date: {value} (expected YYYY-MM-DD)') from None
+    if date_from > date_to:
+        raise ValueError('The range must not end before it starts')
+    if date_to >= date.today().isoformat():
+        raise ValueError('Only closed periods can be archived: the range must end before today')
+    existing = partitions(conn)
+    if any(part['name'] == name for part in existing):
+        raise ValueError(f'Partition {name} already exists')
+    overlapping = partitions(conn, date_from, date_to)
+    if overlapping:
+        raise ValueError('The range overlaps archived partition(s) '
+                         + ', '.join(part['name'] for part in overlapping))
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    if len(existing) >= limit:
+        raise ValueError(f'{len(existing)} partitions exist and at most {limit} can be read '
+                         f'at once; merge some first (compact --merge)')
+
+    path = _new_path(conn, name, directory)
+    try:
+        with _transaction(conn):
+            records = conn.execute('SELECT COUNT(*) FROM attendance WHERE date BETWEEN ? AND ?',
+                                   (date_from, date_to)).fetchone()[0]
+            if not records:
+                raise ValueError(f'No attendance records between {date_from} and {date_to}')
+            copied = _write_partition(conn, path, '''
+                SELECT a.id, a.student_id, a.date, a.status, a.notes, a.created_at,
+                       COALESCE(s.course, '')
+                FROM main.attendance a LEFT JOIN main.students s ON s.student_id = a.student_id
+                WHERE a.date BETWEEN ? AND ?''', (date_from, date_to))
+            if copied != records:
+                raise RuntimeError(f'Copied {copied} of {records} records; nothing was archived')
+            with _untracked(conn):
+                conn.execute(layout.statement(conn, 'delete_range'), (date_from, date_to))
+            conn.execute('INSERT INTO archive_partitions (name, path, date_from, date_to, records) '
+                         'VALUES (?, ?, ?, ?, ?)',
+                         (name, _stored_path(conn, path), date_from, date_to, records))
+    except BaseException:
+        _remove(path)
+        raise
+    return records
+
+
+def _partition(conn, name):
+    for part in partitions(conn):
+        if part['name'] == name:
+            return part
+    raise ValueError(f'No partition named {name}')
+
+
+def restore(conn, name, keep_file=False):
+    """Move a partition's records back into the hot table and drop the
+    partition (deleting its file unless keep_file); returns the record count.
+
+    The summaries are rebuilt, so the records count under their student's
+    current course again.
+    """
+    part = _partition(conn, name)
+    schema = _schema(part)
+    tables(conn)  # attach every partition: summaries.rebuild() reads them all
+    with _transaction(conn):
+        if layout.current(conn) == 'compact':
+            orphans = conn.execute(f'''
+                SELECT COUNT(*) FROM {schema}.attendance a
+                WHERE NOT EXISTS (SELECT 1 FROM students s WHERE s.student_id = a.student_id)
+                ''').fetchone()[0]
+            if orphans:
+                raise ValueError(f'{orphans} archived record(s) belong to deleted students, '
+                                 f'which the compact layout cannot hold')
+        # Lifts the write guard on the partition's dates
+        conn.execute('DELETE FROM archive_partitions WHERE id = ?', (part['id'],))
+        with _untracked(conn):
+            columns = ', '.join(COLUMNS[:-1])
+            conn.execute(f'INSERT INTO attendance ({columns}) SELECT {columns} '
+                         f'FROM {schema}.attendance ORDER BY date, student_id')
+            summaries.rebuild(conn)
+    conn.execute(f'DETACH DATABASE {schema}')
+    if not keep_file:
+        _remove(_resolve(conn, part['path']))
+    return part['records']
+
+
+def merge(conn, name, date_from, date_to, directory=None):
+    """Merge the partitions lying within date_from..date_to into one new
+    partition `name`; returns the number of partitions merged.
+
+    The merged partition spans its parts' dates, including any gap
+    between them, so the gaps must hold no hot records.
+    """
+    parts = [part for part in partitions(conn, date_from, date_to)
+             if date_from <= part['date_from'] and part['date_to'] <= date_to]
+    if len(parts) < 2:
+        raise ValueError('Fewer than two partitions lie within the range; nothing to merge')
+    if any(part['name'] == name for part in partitions(conn)):
+        raise ValueError(f'Partition {name} already exists')
+    first, last = parts[0]['date_from'], max(part['date_to'] for part in parts)
+    records = sum(part['records'] for part in parts)
+
+    path = _new_path(conn, name, directory)
+    try:
+        with _transaction(conn):
+            between = conn.execute('SELECT COUNT(*) FROM attendance WHERE date BETWEEN ? AND ?',
+                                   (first, last)).fetchone()[0]
+            if between:
+                raise ValueError(f'{between} hot record(s) lie between the partitions; '
+                                 f'archive them first')
+            select = ' UNION ALL '.join(f"SELECT {', '.join(COLUMNS)} FROM {_schema(part)}.attendance"
+                                        for part in parts)
+            copied = _write_partition(conn, path, select, parts=parts)
+            if copied != records:
+                raise RuntimeError(f'Copied {copied} of {records} records; nothing was merged')
+            conn.executemany('DELETE FROM archive_partitions WHERE id = ?',
+                             [(part['id'],) for part in parts])
+            conn.execute('INSERT INTO archive_partitions (name, path, date_from, date_to, records) '
+                         'VALUES (?, ?, ?, ?, ?)',
+                         (name, _stored_path(conn, path), first, last, records))
+            changes.log_reset(conn)
+    except BaseException:
+        _remove(path)
+        raise
+    attached = {row[1] for row in conn.execute('PRAGMA database_list')}
+    for part in parts:
+        if _schema(part) in attached:
+            conn.execute(f'DETACH DATABASE {_schema(part)}')
+        _remove(_resolve(conn, part['path']))
+    return len(parts)
+
+
+def clear(conn):
+    """Forget every partition (in conn's transaction); returns their file
+    paths for the caller to delete once committed"""
+    paths = [_resolve(conn, part['path']) for part in partitions(conn)]
+    if paths:
+        conn.execute('DELETE FROM archive_partitions')
+    return paths
+
+
+def vacuum(conn):
+    """Return the pages freed by archiving to the file system; returns the
+    database size before and after, in bytes"""
+    path = next(row[2] for row in conn.execute('PRAGMA database_list') if row[1] == 'main')
+    before = os.path.getsize(path)
+    conn.execute('VACUUM')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    return before, os.path.getsize(path)
+
+
+# ========== COMMAND LINE ==========
+
+def _period(conn, args):
+    """(name, date_from, date_to) from the archive command's options"""
+    if args.month:
+        try:
+            year, month = (int(part) for part in args.month.split('-'))
+            last = calendar.monthrange(year, month)[1]
+        except ValueError:
+            raise ValueError(f'Invalid month: {args.month} (expected YYYY-MM)') from None
+        return args.name or args.month, f'{year:04d}-{month:02d}-01', f'{year:04d}-{month:02d}-{last:02d}'
+    if args.term:
+        row = conn.execute('SELECT start_date, end_date FROM terms WHERE name = ?',
+                           (args.term,)).fetchone()
+        if row is None:
+            raise ValueError(f'No term named {args.term}')
+        return args.name or args.term, row[0], row[1]
+    if args.date_to is None:
+        raise ValueError('--from needs --to')
+    return args.name or f'{args.date_from}_{args.date_to}', args.date_from, args.date_to
+
+
+def print_status(conn):
+    parts = partitions(conn)
+    hot = conn.execute('SELECT COUNT(*), MIN(date), MAX(date) FROM attendance').fetchone()
+    print(f'Hot table: {hot[0]} records' + (f' ({hot[1]} .. {hot[2]})' if hot[0] else ''))
+    if not parts:
+        print('No archived partitions')
+        return
+    print(f"  {'partition':<20} {'from':<10} {'to':<10} {'records':>9} {'MB':>7}  file")
+    for part in parts:
+        path = _resolve(conn, part['path'])
+        size = f'{os.path.getsize(path) / 1e6:7.1f}' if os.path.exists(path) else 'missing'
+        print(f"  {part['name']:<20} {part['date_from']:<10} {part['date_to']:<10} "
+              f"{part['records']:>9} {size:>7}  {part['path']}")
+
+
+def main():
+    import migrations
+    from db import DB_PATH, configure_connection
+
+    parser = argparse.ArgumentParser(description='Attendance archive partitions')
+    parser.add_argument('--db', default=DB_PATH, help='database file (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command')
+
+    add = commands.add_parser('archive', help='move a closed period into a new partition')
+    period = add.add_mutually_exclusive_group(required=True)
+    period.add_argument('--month', help='a calendar month, YYYY-MM')
+    period.add_argument('--term', help='a term of the term calendar')
+    period.add_argument('--from', dest='date_from', help='first date of a range (with --to)')
+    add.add_argument('--to', dest='date_to', help='last date of the range')
+    add.add_argument('--name', help='partition name (default: the month, term or range)')
+    add.add_argument('--dir', help='directory for the partition file '
+                                   '(default: $ATTENDANCE_ARCHIVE_DIR or archive/)')
+
+    back = commands.add_parser('restore', help='move a partition back into the hot table')
+    back.add_argument('name')
+    back.add_argument('--keep-file', action='store_true', help='keep the partition file')
+
+    compact = commands.add_parser('compact', help='VACUUM the hot database, after merging '
+                                                  'partitions with --merge')
+    compact.add_argument('--merge', metavar='NAME', help='merge the partitions within '
+                                                         '--from/--to into partition NAME')
+    compact.add_argument('--from', dest='date_from')
+    compact.add_argument('--to', dest='date_to')
+    compact.add_argument('--dir', help='directory for the merged partition file')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    configure_connection(conn)
+    migrations.migrate(conn)
+    try:
+        if args.command == 'archive':
+            name, date_from, date_to = _period(conn, args)
+            records = archive(conn, name, date_from, date_to, args.dir)
+            print(f'✅ Archived {records} records ({date_from} .. {date_to}) as {name}')
+        elif args.command == 'restore':
+            records = restore(conn, args.name, args.keep_file)
+            print(f'✅ Restored {records} records from {args.name}')
+        elif args.command == 'compact':
+            if args.merge:
+                if args.date_from is None or args.date_to is None:
+                    raise ValueError('--merge needs --from and --to')
+                merged = merge(conn, args.merge, args.date_from, args.date_to, args.dir)
+                print(f'✅ Merged {merged} partitions into {args.merge}')
+            before, after = vacuum(conn)
+            print(f'✅ Compacted the hot database ({before / 1e6:.1f} MB -> {after / 1e6:.1f} MB)')
+        else:
+            print_status(conn)
+    except ValueError as e:
+        print(f'❌ {e}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
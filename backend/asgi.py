@@ -0,0 +1,361 @@
+"""
+asyncio serving mode: the Flask app behind an ASGI adapter.
+
+Requests are accepted by an event loop (uvicorn) and the unchanged Flask
+routes run on bounded thread pools, so one process keeps many connections
+open without a thread per socket. Two lanes keep long work from starving
+the dashboard:
+
+    heavy  exports and bulk imports (ATTENDANCE_ASYNC_HEAVY_THREADS, default 2)
+    light  everything else (ATTENDANCE_ASYNC_THREADS, default: the rest of
+           the DB pool, so light requests never wait for a connection)
+
+Backpressure: each lane admits at most its thread count plus
+ATTENDANCE_ASYNC_QUEUE waiting requests. Beyond that, requests are refused
+at once with 503 and Retry-After instead of piling up. Request bodies
+larger than ATTENDANCE_MAX_BODY_MB are refused with 413.
+
+Cancellation: when a client disconnects, a queued request is dropped, a
+running query is interrupted (db.cancel_on) and a streamed response stops
+after the current chunk.
+
+Live event streams (GET /api/stream, streams.py) are served on the event
+loop itself: a lane thread only opens the subscription, then the stream
+waits on the loop for the broadcaster's next event, so open streams hold
+no threads. That holds for every tenant's stream (tenants.py): each
+database has its own broadcaster.
+
+Run it with ``python3 serve.py --server uvicorn``.
+"""
+import asyncio
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import db
+import streams
+import tenants
+from db import POOL_SIZE, cancel_on
+
+HEAVY_THREADS = int(os.environ.get('ATTENDANCE_ASYNC_HEAVY_THREADS', '2'))
+LIGHT_THREADS = int(os.environ.get('ATTENDANCE_ASYNC_THREADS',
+                                   str(max(1, POOL_SIZE - HEAVY_THREADS))))
+QUEUE_LIMIT = int(os.environ.get('ATTENDANCE_ASYNC_QUEUE', '64'))
+MAX_BODY_SIZE = int(float(os.environ.get('ATTENDANCE_MAX_BODY_MB', '64')) * 1024 * 1024)
+
+# (method, path) pairs routed to the heavy lane
+HEAVY_ROUTES = {
+    ('GET', '/api/attendance/export'),
+    ('POST', '/api/attendance/bulk'),
+}
+
+# (method, path) pairs served on the event loop (see AsgiAdapter.stream)
+STREAM_ROUTES = {
+    ('GET', '/api/stream'),
+}
+
+STREAM_HEADERS = [
+    (b'content-type', b'text/event-stream; charset=utf-8'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+    (b'access-control-allow-origin', b'*'),
+]
+
+
+class Lane:
+    """A bounded executor plus an admission limit (event loop use only)"""
+
+    def __init__(self, name, threads, queue_limit):
+        self.name = name
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix=f'asgi-{name}')
+        self.limit = threads + queue_limit
+        self.in_flight = 0
+
+    def try_acquire(self):
+        if self.in_flight >= self.limit:
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI http scope"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = name
+        else:
+            key = f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def read_body(receive):
+    """The full request body, or None if it exceeds MAX_BODY_SIZE"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ConnectionError('client disconnected')
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_SIZE:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def send_error(send, status, message, headers=()):
+    body = ('{"error": "%s"}\n' % message).encode()
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'),
+                            (b'content-length', str(len(body)).encode())] + list(headers)})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def start_message(response):
+    return {'type': 'http.response.start', 'status': response['status'],
+            'headers': response['headers']}
+
+
+class AsgiAdapter:
+    """Serve a WSGI app with lanes, backpressure and cancellation"""
+
+    def __init__(self, wsgi_app, light_threads=LIGHT_THREADS, heavy_threads=HEAVY_THREADS,
+                 queue_limit=QUEUE_LIMIT, broadcaster=None):
+        self.wsgi_app = wsgi_app
+        self.light = Lane('light', light_threads, queue_limit)
+        self.heavy = Lane('heavy', heavy_threads, queue_limit)
+        # A db.PerDatabase of streams.Broadcaster (app.live)
+        self.broadcaster = broadcaster
+        self._tick = None
+        self._waking = set()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for lane in (self.light, self.heavy):
+                    lane.executor.shutdown(wait=False, cancel_futures=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        tenant, path = tenants.split_path(scope['path'])
+        route = (scope['method'], path)
+        if self.broadcaster is not None and route in STREAM_ROUTES:
+            await self.stream(scope, receive, send, tenant)
+            return
+        lane = self.heavy if route in HEAVY_ROUTES else self.light
+        if not lane.try_acquire():
+            await send_error(send, 503, 'Server busy, retry shortly', [(b'retry-after', b'1')])
+            return
+        try:
+            try:
+                body = await read_body(receive)
+            except ConnectionError:
+                return
+            if body is None:
+                await send_error(send, 413, 'Request body too large')
+                return
+
+            loop = asyncio.get_running_loop()
+            cancelled = threading.Event()
+
+            async def send_all(messages):
+                for message in messages:
+                    await send(message)
+
+            def send_threadsafe(*messages):
+                asyncio.run_coroutine_threadsafe(send_all(messages), loop).result()
+
+            work = lane.executor.submit(self.run_wsgi, build_environ(scope, body),
+                                        send_threadsafe, cancelled)
+            future = asyncio.wrap_future(work)
+            watcher = asyncio.ensure_future(wait_for_disconnect(receive))
+            await asyncio.wait({future, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not future.done():
+                # Client went away: drop queued work, interrupt running work
+                # (which still holds its lane slot until the thread returns)
+                cancelled.set()
+                work.cancel()
+            watcher.cancel()
+            try:
+                await future
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                # An interrupted query surfaces as an error nobody will read
+                if not cancelled.is_set():
+                    raise
+        finally:
+            lane.release()
+
+    def _install_waker(self, loop, broadcaster):
+        """Resolve self._tick on the loop whenever a broadcaster publishes"""
+        if self._tick is None:
+            self._tick = loop.create_future()
+        if broadcaster not in self._waking:
+            self._waking.add(broadcaster)
+            broadcaster.add_waker(lambda: loop.call_soon_threadsafe(self._next_tick))
+
+    def _next_tick(self):
+        tick, self._tick = self._tick, asyncio.get_running_loop().create_future()
+        tick.set_result(None)
+
+    def _open(self, tenant, last_event_id):
+        """(broadcaster, (cursor, first chunk)) of a new stream on the
+        tenant's database (None: the default one)"""
+        path = db.DB_PATH if tenant is None else tenants.lookup(tenant)
+        broadcaster = self.broadcaster.instance(path)
+        return broadcaster, broadcaster.open(last_event_id)
+
+    async def stream(self, scope, receive, send, tenant=None):
+        """Serve an event stream without holding a thread.
+
+        Every open stream awaits the same per-loop future, which the
+        broadcasters resolve once per event; each stream then copies the
+        new event bytes from its broadcaster's shared ring.
+        """
+        loop = asyncio.get_running_loop()
+        headers = dict(scope['headers'])
+        header = headers.get(b'x-tenant', b'').decode('latin-1') or None
+        if tenant is not None and header is not None and tenant != header:
+            await send_error(send, 400,
+                             'X-Tenant header and /t/ path prefix name different tenants')
+            return
+        query = parse_qs(scope['query_string'].decode('latin-1'))
+        last_event_id = streams.parse_event_id(
+            headers.get(b'last-event-id', b'').decode('latin-1')
+            or query.get('last_event_id', [''])[0])
+        if not self.light.try_acquire():
+            await send_error(send, 503, 'Server busy, retry shortly', [(b'retry-after', b'1')])
+            return
+        try:
+            broadcaster, (cursor, first_chunk) = await loop.run_in_executor(
+                self.light.executor, self._open, tenant or header, last_event_id)
+        except tenants.UnknownTenant as e:
+            await send_error(send, 404, str(e))
+            return
+        except streams.TooManySubscribers as e:
+            await send_error(send, 503, str(e), [(b'retry-after', b'5')])
+            return
+        finally:
+            self.light.release()
+        self._install_waker(loop, broadcaster)
+
+        watcher = asyncio.ensure_future(wait_for_disconnect(receive))
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': STREAM_HEADERS})
+            await send({'type': 'http.response.body', 'body': first_chunk, 'more_body': True})
+            deadline = loop.time() + streams.MAX_DURATION
+            while not watcher.done() and loop.time() < deadline:
+                # Take the future before looking, so no event slips in between
+                tick = self._tick
+                chunks, cursor, _ = broadcaster.events_after(cursor)
+                if chunks:
+                    body = b''.join(chunks)
+                else:
+                    done, _ = await asyncio.wait({tick, watcher}, timeout=streams.HEARTBEAT,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    if done:
+                        continue
+                    body = streams.HEARTBEAT_CHUNK
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+            if not watcher.done():
+                await send({'type': 'http.response.body', 'body': b''})
+        except OSError:
+            pass  # the client went away mid-send
+        finally:
+            watcher.cancel()
+            broadcaster.unsubscribe()
+
+    def run_wsgi(self, environ, send, cancelled):
+        """Run one request on an executor thread, streaming the response out.
+
+        Each chunk is handed to the event loop and this thread waits until
+        it is sent, so a slow client throttles the producer instead of the
+        response being buffered in memory. Chunks are sent one behind, so a
+        single-chunk response goes out in one hop to the event loop.
+        """
+        if cancelled.is_set():
+            return
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        with cancel_on(cancelled):
+            result = self.wsgi_app(environ, start_response)
+            try:
+                started = False
+                held = None
+                for chunk in result:
+                    if cancelled.is_set():
+                        return
+                    if not chunk:
+                        continue
+                    if held is not None:
+                        messages = [] if started else [start_message(response)]
+                        send(*messages, {'type': 'http.response.body', 'body': held,
+                                         'more_body': True})
+                        started = True
+                    held = chunk
+                if not cancelled.is_set():
+                    messages = [] if started else [start_message(response)]
+                    send(*messages, {'type': 'http.response.body', 'body': held or b''})
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+
+
+def create_app():
+    from app import app, live
+    return AsgiAdapter(app, broadcaster=live)
+
+
+application = create_app()
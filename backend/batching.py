@@ -0,0 +1,279 @@
+"""
+Opt-in write coalescing for attendance marks (ATTENDANCE_WRITE_BATCHING=1).
+
+When classes start, hundreds of single-record POSTs arrive at once. Written
+one transaction each, they queue on SQLite's single write lock and some
+give up with "database is locked". In batching mode a request validates
+its records as usual (ingest.validate), then hands the rows to this
+process's WriteQueue and waits. One writer thread takes everything queued,
+upserts it in a single transaction and only then acknowledges each
+request, so a 201 still means the records are committed.
+
+A batch is flushed once its oldest request has waited
+ATTENDANCE_BATCH_MAX_DELAY_MS (default 5), or as soon as
+ATTENDANCE_BATCH_MAX_RECORDS (default 500) records are queued. A longer delay
+makes batches bigger and commits fewer, at the cost of latency. Beyond
+ATTENDANCE_BATCH_QUEUE_LIMIT queued records (default 10000), new requests
+are refused with QueueFull (503) instead of waiting. The writer uses
+PRAGMA synchronous=ATTENDANCE_BATCH_SYNCHRONOUS (default FULL: each batch
+is fsynced before it is acknowledged, so an acknowledged mark survives a
+power failure; NORMAL trades that for fewer fsyncs, as on every other
+connection).
+
+Each request's rows are written all together or not at all. If a batch
+fails as a whole, its requests are retried one transaction each, so one
+failing request does not fail the others. An unexpected error fails its
+batch's requests, and the writer goes on with the next batch. A request
+that gives up waiting (ATTENDANCE_BATCH_ACK_TIMEOUT seconds) may still be
+written later; marks are upserts, so retrying it is safe.
+
+The queue is per process and per database file (db.PerDatabase; each
+tenant in tenants.py has its own writer): under gunicorn every worker
+coalesces its own requests, and a batch can be no bigger than the number
+of requests one process handles at once (its threads).
+"""
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import changes
+import db
+import ingest
+import layout
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get('ATTENDANCE_WRITE_BATCHING', '0') == '1'
+MAX_DELAY = float(os.environ.get('ATTENDANCE_BATCH_MAX_DELAY_MS', '5')) / 1000
+MAX_RECORDS = int(os.environ.get('ATTENDANCE_BATCH_MAX_RECORDS', '500'))
+QUEUE_LIMIT = int(os.environ.get('ATTENDANCE_BATCH_QUEUE_LIMIT', '10000'))
+SYNCHRONOUS = os.environ.get('ATTENDANCE_BATCH_SYNCHRONOUS', 'FULL')
+
+# Longest a request waits for its batch to commit
+ACK_TIMEOUT = float(os.environ.get('ATTENDANCE_BATCH_ACK_TIMEOUT', '30'))
+
+
+class QueueFull(Exception):
+    """Raised when the queue already holds QUEUE_LIMIT records"""
+
+
+class WriteFailed(Exception):
+    """Raised when a request's rows could not be committed"""
+
+
+class _Pending:
+    __slots__ = ('rows', 'enqueued', 'done', 'error')
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.enqueued = time.monotonic()
+        self.done = threading.Event()
+        self.error = None
+
+
+class WriteQueue:
+    """Per-process queue of validated rows and the writer thread flushing it"""
+
+    def __init__(self, db_path=None, max_delay=MAX_DELAY, max_records=MAX_RECORDS,
+                 limit=QUEUE_LIMIT):
+        self.db_path = db_path
+        self.max_delay = max_delay
+        self.max_records = max_records
+        self.limit = limit
+        self._cond = threading.Condition()
+        self._reset()
+
+    def _reset(self):
+        """Forget the queue and writer (on creation and after fork)"""
+        self._pid = os.getpid()
+        self._pending = deque()
+        self._depth = 0
+        self._writer = None
+        self._stopping = False
+        self._submitted = 0
+        self._acknowledged = 0
+        self._rejected = 0
+        self._flushes = 0
+        self._flushed_records = 0
+        self._failures = 0
+        self._flush_time = 0.0
+        self._max_flush_time = 0.0
+        self._max_batch = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+
+    def submit(self, rows, timeout=ACK_TIMEOUT):
+        """Queue (student_id, date, status, notes) rows; return on commit"""
+        if not rows:
+            return
+        pending = _Pending(rows)
+        with self._cond:
+            if os.getpid() != self._pid:
+                self._reset()  # the parent's writer thread did not survive fork
+            if self._depth + len(rows) > self.limit:
+                self._rejected += 1
+                raise QueueFull(f'Write queue is full ({self._depth} records waiting)')
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name='write-queue', daemon=True)
+                self._writer.start()
+            self._pending.append(pending)
+            self._depth += len(rows)
+            self._submitted += 1
+            self._cond.notify()
+        if not pending.done.wait(timeout):
+            raise WriteFailed(f'Write not acknowledged within {timeout}s')
+        if pending.error is not None:
+            raise WriteFailed(str(pending.error)) from pending.error
+
+    def _take_batch(self):
+        """Wait for the next batch to be due and take it off the queue"""
+        with self._cond:
+            while not self._pending and not self._stopping:
+                self._cond.wait()
+            while self._pending and self._depth < self.max_records:
+                remaining = self._pending[0].enqueued + self.max_delay - time.monotonic()
+                if remaining <= 0 or self._stopping:
+                    break
+                self._cond.wait(remaining)
+            batch, records = [], 0
+            while self._pending and (not batch or records + len(self._pending[0].rows)
+                                     <= self.max_records):
+                pending = self._pending.popleft()
+                batch.append(pending)
+                records += len(pending.rows)
+            self._depth -= records
+            return batch
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path or db.DB_PATH)
+        db.configure_connection(conn)
+        conn.execute(f'PRAGMA synchronous = {SYNCHRONOUS}')
+        return conn
+
+    def _run(self):
+        # Listeners notified by changes.sync() act on this queue's database
+        with db.using(self.db_path):
+            conn = self._connect()
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    if self._stopping:
+                        break
+                    continue
+                try:
+                    self._flush(conn, batch)
+                except Exception as e:
+                    logger.exception('Write batch of %d request(s) failed', len(batch))
+                    self._abandon(conn, batch, e)
+            conn.close()
+
+    def _flush(self, conn, batch):
+        started = time.monotonic()
+        upsert = layout.statement(conn, 'upsert')
+        try:
+            conn.executemany(upsert, (row for p in batch for row in p.rows))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            # Isolate the failure: one transaction per request
+            for pending in batch:
+                try:
+                    conn.executemany(upsert, pending.rows)
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    pending.error = e
+        try:
+            # Invalidate this worker's caches before anyone reads their write
+            changes.sync(conn)
+        except Exception:
+            logger.exception('Could not sync the change log after a batch')
+        self._acknowledge(batch, started)
+
+    def _abandon(self, conn, batch, error):
+        """Fail the batch's unacknowledged requests with `error`"""
+        try:
+            conn.rollback()
+        except sqlite3.Error:
+            pass
+        batch = [p for p in batch if not p.done.is_set()]
+        for pending in batch:
+            if pending.error is None:
+                pending.error = error
+        self._acknowledge(batch, None)
+
+    def _acknowledge(self, batch, started):
+        """Record the batch in the metrics and wake its requests (started:
+        when its flush began; None for an abandoned batch)"""
+        finished = time.monotonic()
+        records = sum(len(p.rows) for p in batch)
+        with self._cond:
+            self._acknowledged += len(batch)
+            self._failures += sum(1 for p in batch if p.error is not None)
+            if started is not None:
+                self._flushes += 1
+                self._flushed_records += records
+                self._flush_time += finished - started
+                self._max_flush_time = max(self._max_flush_time, finished - started)
+                self._max_batch = max(self._max_batch, records)
+            for pending in batch:
+                waited = finished - pending.enqueued
+                self._wait_time += waited
+                self._max_wait = max(self._max_wait, waited)
+        for pending in batch:
+            pending.done.set()
+
+    def stop(self):
+        """Flush everything queued, then stop the writer"""
+        with self._cond:
+            writer = self._writer if os.getpid() == self._pid else None
+            self._stopping = True
+            self._cond.notify()
+        if writer is not None:
+            writer.join()
+        with self._cond:
+            self._writer = None
+            self._stopping = False
+
+    def stats(self):
+        """Queue depth and flush metrics"""
+        with self._cond:
+            acknowledged = self._acknowledged
+            return {
+                'enabled': ENABLED,
+                'max_delay_ms': self.max_delay * 1000,
+                'max_records': self.max_records,
+                'queue_limit': self.limit,
+                'depth_records': self._depth,
+                'depth_requests': len(self._pending),
+                'submitted': self._submitted,
+                'acknowledged': acknowledged,
+                'rejected': self._rejected,
+                'failed': self._failures,
+                'flushes': self._flushes,
+                'flushed_records': self._flushed_records,
+                'avg_batch_records': (round(self._flushed_records / self._flushes, 2)
+                                      if self._flushes else 0),
+                'max_batch_records': self._max_batch,
+                'total_flush_ms': round(self._flush_time * 1000, 3),
+                'avg_flush_ms': (round(self._flush_time * 1000 / self._flushes, 3)
+                                 if self._flushes else 0),
+                'max_flush_ms': round(self._max_flush_time * 1000, 3),
+                'avg_wait_ms': (round(self._wait_time * 1000 / acknowledged, 3)
+                                if acknowledged else 0),
+                'max_wait_ms': round(self._max_wait * 1000, 3),
+            }
+
+
+queue = db.PerDatabase(lambda path: WriteQueue(db_path=path))
+
+
+@atexit.register
+def stop_all():
+    """Flush and stop the writer of every database's queue"""
+    for _, writer in queue.instances():
+        writer.stop()
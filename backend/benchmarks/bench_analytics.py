@@ -0,0 +1,146 @@
+"""
+Benchmark: the in-memory columnar analytics store (analytics.py) against
+the SQL paths in stats.py, across data sizes.
+
+For every STUDENTSxDAYS size (generated with create_mock_data, fixed seed)
+it reports how long the store takes to load, its memory per million
+records, how long a refresh after a single write takes, and the latency of
+each analytic query through SQL and through the store.
+
+Usage (from the backend directory):
+    python3 benchmarks/bench_analytics.py
+    python3 benchmarks/bench_analytics.py --sizes 2000x365 10000x365 --json
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics  # noqa: E402
+import create_mock_data  # noqa: E402
+import migrations  # noqa: E402
+import stats  # noqa: E402
+from db import configure_connection  # noqa: E402
+
+DEFAULT_SIZES = ['1000x365', '10000x365']
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def parse_size(value):
+    students, _, days = value.partition('x')
+    return int(students), int(days)
+
+
+def scenarios(conn, columns):
+    """(name, SQL fn, store fn) for each analytic query"""
+    student_id = conn.execute('SELECT student_id FROM students LIMIT 1 OFFSET 7').fetchone()[0]
+    course = conn.execute('SELECT course FROM students LIMIT 1').fetchone()[0]
+    date_to = conn.execute('SELECT MAX(date) FROM attendance').fetchone()[0]
+    date_from = (date.fromisoformat(date_to) - timedelta(days=90)).isoformat()
+    return [
+        ('student, 90 days',
+         lambda: stats.scan_status_counts(conn, student_id, date_from=date_from),
+         lambda: columns.counts(student_id, date_from=date_from)),
+        ('student in course',
+         lambda: stats.scan_status_counts(conn, student_id, course),
+         lambda: columns.counts(student_id, course)),
+        ('course, 90 days (summary)',
+         lambda: stats.summary_counts(conn, course=course, date_from=date_from),
+         lambda: columns.counts(course=course, date_from=date_from)),
+        ('course, full scan',
+         lambda: stats.scan_status_counts(conn, course=course),
+         lambda: columns.counts(course=course)),
+        ('school, 90 days (summary)',
+         lambda: stats.summary_counts(conn, date_from=date_from),
+         lambda: columns.counts(date_from=date_from)),
+        ('per-course rollup (summary)',
+         lambda: stats.summary_course_counts(conn, date_from=date_from),
+         lambda: columns.course_counts(date_from=date_from)),
+    ]
+
+
+def run(sizes, repeat):
+    results = []
+    for students, days in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+            configure_connection(conn)
+            migrations.migrate(conn)
+            _, records = create_mock_data.generate(conn, students=students, days=days, seed=42)
+
+            store = analytics.AttendanceStore()
+            started = time.perf_counter()
+            columns = store.snapshot(conn)
+            load_ms = (time.perf_counter() - started) * 1000
+
+            student_id = conn.execute('SELECT student_id FROM students LIMIT 1').fetchone()[0]
+            conn.execute("UPDATE attendance SET status = 'late' WHERE id = "
+                         "(SELECT MIN(id) FROM attendance WHERE student_id = ?)", (student_id,))
+            conn.commit()
+            store.on_change('attendance', (), {student_id})
+            started = time.perf_counter()
+            store.snapshot(conn)
+            refresh_ms = (time.perf_counter() - started) * 1000
+
+            result = {
+                'size': f'{students}x{days}',
+                'records': records,
+                'load_ms': round(load_ms, 1),
+                'mb_per_million': round(columns.nbytes / records * 1e6 / 2**20, 2),
+                'refresh_one_student_ms': round(refresh_ms, 2),
+                'queries': [],
+            }
+            for name, sql, vectorized in scenarios(conn, columns):
+                result['queries'].append({
+                    'query': name,
+                    'sql_ms': round(best_of(sql, repeat), 3),
+                    'store_ms': round(best_of(vectorized, repeat), 3),
+                })
+            conn.close()
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=parse_size, nargs='+',
+                        default=[parse_size(size) for size in DEFAULT_SIZES],
+                        help='STUDENTSxDAYS pairs (default: %s)' % ' '.join(DEFAULT_SIZES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='emit machine-readable results')
+    args = parser.parse_args()
+    if not analytics.load_numpy():
+        parser.error('the analytics store needs numpy (pip install numpy)')
+
+    results = run(args.sizes, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for result in results:
+        print(f"{result['size']}: {result['records']:,} records, load {result['load_ms']} ms, "
+              f"{result['mb_per_million']} MB per million records, "
+              f"refresh after one write {result['refresh_one_student_ms']} ms")
+        print(f"  {'query':<30} {'SQL ms':>10} {'store ms':>10} {'speedup':>8}")
+        for q in result['queries']:
+            speedup = q['sql_ms'] / q['store_ms'] if q['store_ms'] else float('inf')
+            print(f"  {q['query']:<30} {q['sql_ms']:>10.3f} {q['store_ms']:>10.3f} "
+                  f"{speedup:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
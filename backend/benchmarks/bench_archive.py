@@ -0,0 +1,210 @@
+"""
+Benchmark: archiving closed quarters into partition files (archive.py).
+
+Generates one database with create_mock_data (fixed seed) and copies it;
+in the copy every calendar quarter that ends more than --hot-days before
+the newest record is archived into its own partition file, then the hot
+database is VACUUMed. The report shows:
+
+    size     the hot database file before and after archiving and
+             VACUUM, and the partition files
+    queries  the median latency over --repeat warm runs of each read the
+             API makes, on the original and the archived database: the
+             hot-range reads that never touch a partition, and the
+             history reads that union the hot table with the partitions
+
+It also checks that both databases give the same answer to every query.
+
+Usage (from the backend directory):
+    python3 benchmarks/bench_archive.py
+    python3 benchmarks/bench_archive.py --students 5000 --days 730 --hot-days 60 --json
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive  # noqa: E402
+import create_mock_data  # noqa: E402
+import migrations  # noqa: E402
+import reports  # noqa: E402
+import stats  # noqa: E402
+from db import configure_connection  # noqa: E402
+
+# The API's attendance columns (app.ATTENDANCE_COLUMNS)
+COLUMNS = {
+    'id': 'a.id',
+    'student_id': 'a.student_id',
+    'date': 'a.date',
+    'status': 'a.status',
+    'notes': 'a.notes',
+    'created_at': 'a.created_at',
+    'student_name': 's.name',
+    'course': 's.course',
+}
+
+
+def listing(conn, date_from, date_to, limit=101):
+    """GET /api/attendance?from=&to= (first page)"""
+    source, columns, params = archive.joined(conn, COLUMNS, date_from, date_to)
+    sql = (f"SELECT {', '.join(columns.values())} FROM {source} "
+           f"WHERE {columns['date']} BETWEEN ? AND ? "
+           f"ORDER BY {columns['date']} DESC, {columns['student_name']}, {columns['id']} "
+           f'LIMIT {limit}')
+    return conn.execute(sql, params + [date_from, date_to]).fetchall()
+
+
+def student_table(conn, date_from):
+    rows, matched = stats.student_table(conn, date_from=date_from)
+    return [dict(row) for row in rows], matched
+
+
+# name -> function(conn, fixtures). Hot reads stay inside the hot range;
+# history reads reach back into the archived quarters.
+QUERIES = {
+    'hot: list 30 days': lambda c, f: listing(c, f['month_ago'], f['last']),
+    'hot: counts 30 days': lambda c, f: stats.scan_status_counts(c, date_from=f['month_ago']),
+    'hot: per student 30 days': lambda c, f: student_table(c, f['month_ago']),
+    'hot: student by week': lambda c, f: reports.series(
+        c, 'week', student_id=f['student_id'], date_from=f['month_ago']),
+    'history: list old date': lambda c, f: listing(c, f['first'], f['first']),
+    'history: counts year': lambda c, f: stats.scan_status_counts(c, date_from=f['year_ago']),
+    'history: student by month': lambda c, f: reports.series(
+        c, 'month', student_id=f['student_id']),
+    'history: per student year': lambda c, f: student_table(c, f['year_ago']),
+}
+
+
+def build(path, students, days):
+    conn = sqlite3.connect(path)
+    configure_connection(conn)
+    conn.execute('PRAGMA synchronous = OFF')
+    migrations.migrate(conn)
+    create_mock_data.generate(conn, students=students, days=days, seed=42)
+    conn.execute('VACUUM')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+
+
+def quarters(first, cutoff):
+    """(name, date_from, date_to) of the calendar quarters from the one
+    holding `first` up to the last one ending before `cutoff`"""
+    day = date.fromisoformat(first)
+    start = date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+    while True:
+        month = start.month + 3
+        following = date(start.year + (month > 12), (month - 1) % 12 + 1, 1)
+        end = following - timedelta(days=1)
+        if end.isoformat() >= cutoff:
+            return
+        yield f'{start.year}-q{(start.month - 1) // 3 + 1}', start.isoformat(), end.isoformat()
+        start = following
+
+
+def archive_quarters(path, hot_days):
+    """Archive every closed quarter older than hot_days; returns the seconds
+    taken and the partitions made"""
+    conn = sqlite3.connect(path)
+    configure_connection(conn)
+    first, last = conn.execute('SELECT MIN(date), MAX(date) FROM attendance').fetchone()
+    cutoff = (date.fromisoformat(last) - timedelta(days=hot_days)).isoformat()
+    started = time.perf_counter()
+    for name, date_from, date_to in quarters(first, cutoff):
+        archive.archive(conn, name, date_from, date_to)
+    seconds = time.perf_counter() - started
+    parts = archive.partitions(conn)
+    archive.vacuum(conn)
+    conn.close()
+    return seconds, parts
+
+
+def measure(path, repeat, fixtures):
+    conn = sqlite3.connect(path)
+    configure_connection(conn)
+    timings, answers = {}, {}
+    for name, run in QUERIES.items():
+        answers[name] = run(conn, fixtures)  # also warms the cache
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run(conn, fixtures)
+            samples.append(time.perf_counter() - started)
+        timings[name] = round(statistics.median(samples) * 1000, 2)
+    conn.close()
+    return timings, answers
+
+
+def fixtures_of(path):
+    conn = sqlite3.connect(path)
+    first, last = conn.execute('SELECT MIN(date), MAX(date) FROM attendance').fetchone()
+    student_id = conn.execute('SELECT MIN(student_id) FROM students').fetchone()[0]
+    conn.close()
+    last_day = date.fromisoformat(last)
+    return {'first': first, 'last': last, 'student_id': student_id,
+            'month_ago': (last_day - timedelta(days=30)).isoformat(),
+            'year_ago': (last_day - timedelta(days=365)).isoformat()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--hot-days', type=int, default=90,
+                        help='keep quarters ending within this many days hot')
+    parser.add_argument('--repeat', type=int, default=10, help='timed runs per query')
+    parser.add_argument('--json', action='store_true', help='emit machine-readable results')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_path = os.path.join(tmp, 'base.db')
+        archived_path = os.path.join(tmp, 'archived.db')
+        build(base_path, args.students, args.days)
+        shutil.copy(base_path, archived_path)
+        fixtures = fixtures_of(base_path)
+        archive_seconds, parts = archive_quarters(archived_path, args.hot_days)
+        if not parts:
+            print(f'❌ Nothing older than {args.hot_days} days to archive; raise --days')
+            return 1
+        partition_bytes = sum(os.path.getsize(os.path.join(tmp, part['path']))
+                              for part in parts)
+        sizes = {'base_bytes': os.path.getsize(base_path),
+                 'hot_bytes': os.path.getsize(archived_path),
+                 'partition_bytes': partition_bytes}
+
+        base, base_answers = measure(base_path, args.repeat, fixtures)
+        archived, archived_answers = measure(archived_path, args.repeat, fixtures)
+    mismatches = [name for name in QUERIES if base_answers[name] != archived_answers[name]]
+    results = {'students': args.students, 'days': args.days, 'hot_days': args.hot_days,
+               'archive_seconds': round(archive_seconds, 2),
+               'partitions': [{key: part[key] for key in ('name', 'date_from', 'date_to',
+                                                          'records')} for part in parts],
+               **sizes, 'base_ms': base, 'archived_ms': archived, 'mismatches': mismatches}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 1 if mismatches else 0
+    archived_records = sum(part['records'] for part in parts)
+    print(f'{args.students} students x {args.days} days: archived {archived_records} records '
+          f'into {len(parts)} partitions in {archive_seconds:.1f} s')
+    print(f"  database   {sizes['base_bytes'] / 1e6:.1f} MB -> hot {sizes['hot_bytes'] / 1e6:.1f} MB"
+          f" + partitions {partition_bytes / 1e6:.1f} MB")
+    print(f"\n  {'query':<28} {'base ms':>9} {'archived ms':>12}")
+    for name in QUERIES:
+        print(f'  {name:<28} {base[name]:>9.2f} {archived[name]:>12.2f}')
+    if mismatches:
+        print(f"\n❌ Different results after archiving: {', '.join(mismatches)}")
+        return 1
+    print('\n✅ Identical results before and after archiving for every query')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""
+Benchmark suite: every API endpoint through the Flask test client, across data sizes.
+
+Each data size is a STUDENTSxDAYS pair generated with create_mock_data
+(fixed seed, so runs are comparable). Every route in app.py has at least
+one scenario; routes without one are reported as untimed. Read endpoints
+behind the response cache are timed cold (cache cleared before each call)
+and, as separate scenarios, warm.
+
+Results can be written as JSON and compared with an earlier run to catch
+regressions between commits:
+
+Usage (from the backend directory):
+    python3 benchmarks/bench_endpoints.py --sizes 100x30 1000x365 --output before.json
+    python3 benchmarks/bench_endpoints.py --sizes 100x30 1000x365 --compare before.json
+    python3 benchmarks/bench_endpoints.py --only statistics --repeat 50
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_mock_data  # noqa: E402
+import db  # noqa: E402
+import migrations  # noqa: E402
+from db import configure_connection  # noqa: E402
+
+DEFAULT_SIZES = ['100x30', '1000x365', '10000x365']
+BULK_RECORDS = 1000
+FUTURE_DATE = '2099-01-01'
+
+
+class Context:
+    """Fixtures shared by the scenarios of one data size"""
+
+    def __init__(self, client, conn):
+        self.client = client
+        self.conn = conn
+        self.student_id = conn.execute(
+            'SELECT student_id FROM students ORDER BY student_id LIMIT 1').fetchone()[0]
+        self.student_ids = [row[0] for row in conn.execute(
+            'SELECT student_id FROM students ORDER BY student_id LIMIT ?', (BULK_RECORDS,))]
+        self.date = conn.execute('SELECT MAX(date) FROM attendance').fetchone()[0]
+        self.attendance_id = conn.execute(
+            'SELECT id FROM attendance WHERE student_id = ? ORDER BY date LIMIT 1',
+            (self.student_id,)).fetchone()[0]
+        self.counter = 0
+
+    def next_id(self, prefix):
+        self.counter += 1
+        return f'{prefix}{self.counter:08d}'
+
+    def new_student(self):
+        student_id = self.next_id('BENCHDEL')
+        self.client.post('/api/students', json={'student_id': student_id, 'name': 'Bench Delete'})
+        self.client.post('/api/attendance', json=[
+            {'student_id': student_id, 'date': f'2098-01-{day:02d}', 'status': 'present'}
+            for day in range(1, 21)])
+        return student_id
+
+    def new_term(self):
+        response = self.client.post('/api/terms', json={
+            'name': self.next_id('Term '), 'start_date': '2097-01-01', 'end_date': '2097-06-30'})
+        return response.get_json()['id']
+
+    def new_record(self):
+        self.client.post('/api/attendance', json={
+            'student_id': self.student_id, 'date': FUTURE_DATE, 'status': 'late'})
+        return self.conn.execute('SELECT id FROM attendance WHERE student_id = ? AND date = ?',
+                                 (self.student_id, FUTURE_DATE)).fetchone()[0]
+
+    def version_before_mark(self):
+        """Change-log version just before marking one record on self.date"""
+        version = self.conn.execute('SELECT MAX(version) FROM change_log').fetchone()[0]
+        self.client.post('/api/attendance', json={
+            'student_id': self.student_id, 'date': self.date, 'status': 'late'})
+        return version
+
+
+def bulk_records(ctx):
+    return [{'student_id': sid, 'date': FUTURE_DATE, 'status': 'present'}
+            for sid in ctx.student_ids]
+
+
+# (name, method, route, request factory, options); the factory runs untimed
+# before each call and returns (url, keyword arguments for the test client).
+# Options: 'cold' clears the response cache first, 'heavy' runs fewer times.
+SCENARIOS = [
+    ('health', 'GET', '/api/health', lambda c: ('/api/health', {}), ()),
+    ('health pool', 'GET', '/api/health/pool', lambda c: ('/api/health/pool', {}), ()),
+    ('health cache', 'GET', '/api/health/cache', lambda c: ('/api/health/cache', {}), ()),
+    ('health write queue', 'GET', '/api/health/write-queue',
+     lambda c: ('/api/health/write-queue', {}), ()),
+    ('health streams', 'GET', '/api/health/streams',
+     lambda c: ('/api/health/streams', {}), ()),
+    ('health analytics', 'GET', '/api/health/analytics',
+     lambda c: ('/api/health/analytics', {}), ()),
+    ('metrics', 'GET', '/api/metrics', lambda c: ('/api/metrics', {}), ()),
+    ('slow queries', 'GET', '/api/metrics/slow-queries',
+     lambda c: ('/api/metrics/slow-queries', {}), ()),
+    ('students all', 'GET', '/api/students', lambda c: ('/api/students', {}), ('heavy',)),
+    ('students page', 'GET', '/api/students',
+     lambda c: ('/api/students?limit=100', {}), ()),
+    ('students search', 'GET', '/api/students/search',
+     lambda c: ('/api/students/search?q=jo%20sm', {}), ()),
+    ('students search one letter', 'GET', '/api/students/search',
+     lambda c: ('/api/students/search?q=j', {}), ()),
+    ('student', 'GET', '/api/students/<student_id>',
+     lambda c: (f'/api/students/{c.student_id}', {}), ()),
+    ('student create', 'POST', '/api/students',
+     lambda c: ('/api/students', {'json': {'student_id': c.next_id('BENCH'), 'name': 'Bench',
+                                           'course': 'Physics'}}), ()),
+    ('student update', 'PUT', '/api/students/<student_id>',
+     lambda c: (f'/api/students/{c.student_id}',
+                {'json': {'name': 'Bench Student', 'course': 'Physics'}}), ()),
+    ('student delete', 'DELETE', '/api/students/<student_id>',
+     lambda c: (f'/api/students/{c.new_student()}', {}), ()),
+    ('attendance all', 'GET', '/api/attendance', lambda c: ('/api/attendance', {}), ('heavy',)),
+    ('attendance page', 'GET', '/api/attendance',
+     lambda c: ('/api/attendance?limit=100', {}), ()),
+    ('attendance by student', 'GET', '/api/attendance',
+     lambda c: (f'/api/attendance?student_id={c.student_id}', {}), ()),
+    ('attendance by date', 'GET', '/api/attendance',
+     lambda c: (f'/api/attendance?date={c.date}', {}), ()),
+    ('export ndjson', 'GET', '/api/attendance/export',
+     lambda c: ('/api/attendance/export', {}), ('heavy',)),
+    ('export csv', 'GET', '/api/attendance/export',
+     lambda c: ('/api/attendance/export?format=csv', {}), ('heavy',)),
+    ('mark attendance', 'POST', '/api/attendance',
+     lambda c: ('/api/attendance', {'json': {'student_id': c.student_id, 'date': FUTURE_DATE,
+                                             'status': 'present'}}), ()),
+    ('bulk ingest', 'POST', '/api/attendance/bulk',
+     lambda c: ('/api/attendance/bulk', {'json': bulk_records(c)}), ()),
+    ('attendance update', 'PUT', '/api/attendance/<int:attendance_id>',
+     lambda c: (f'/api/attendance/{c.attendance_id}',
+                {'json': {'status': 'present', 'notes': None}}), ()),
+    ('attendance delete', 'DELETE', '/api/attendance/<int:attendance_id>',
+     lambda c: (f'/api/attendance/{c.new_record()}', {}), ()),
+    ('sync snapshot date', 'GET', '/api/sync',
+     lambda c: (f'/api/sync?date={c.date}', {}), ()),
+    ('sync delta date', 'GET', '/api/sync',
+     lambda c: (f'/api/sync?date={c.date}&since={c.version_before_mark()}', {}), ()),
+    ('statistics overview', 'GET', '/api/statistics/overview',
+     lambda c: ('/api/statistics/overview', {}), ('cold',)),
+    ('statistics overview warm', 'GET', '/api/statistics/overview',
+     lambda c: ('/api/statistics/overview', {}), ()),
+    ('statistics overview course', 'GET', '/api/statistics/overview',
+     lambda c: ('/api/statistics/overview?course=Physics', {}), ('cold',)),
+    ('statistics student', 'GET', '/api/statistics/student/<student_id>',
+     lambda c: (f'/api/statistics/student/{c.student_id}', {}), ('cold',)),
+    ('statistics student warm', 'GET', '/api/statistics/student/<student_id>',
+     lambda c: (f'/api/statistics/student/{c.student_id}', {}), ()),
+    ('statistics courses', 'GET', '/api/statistics/courses',
+     lambda c: ('/api/statistics/courses', {}), ('cold',)),
+    ('statistics streaks', 'GET', '/api/statistics/student/<student_id>/streaks',
+     lambda c: (f'/api/statistics/student/{c.student_id}/streaks', {}), ('cold',)),
+    ('statistics students course', 'GET', '/api/statistics/students',
+     lambda c: ('/api/statistics/students?course=Physics&below=75', {}), ('cold',)),
+    ('statistics students ids', 'POST', '/api/statistics/students',
+     lambda c: ('/api/statistics/students',
+                {'json': {'student_ids': c.student_ids[:200], 'sort': 'absent_count',
+                          'order': 'desc'}}), ('cold',)),
+    ('series weekly', 'GET', '/api/statistics/series',
+     lambda c: ('/api/statistics/series?group=week', {}), ('cold',)),
+    ('series monthly course', 'GET', '/api/statistics/series',
+     lambda c: ('/api/statistics/series?group=month&course=Physics', {}), ('cold',)),
+    ('series daily student', 'GET', '/api/statistics/series',
+     lambda c: (f'/api/statistics/series?group=day&student_id={c.student_id}', {}), ('cold',)),
+    ('series by term', 'GET', '/api/statistics/series',
+     lambda c: ('/api/statistics/series?group=term', {}), ('cold',)),
+    ('terms', 'GET', '/api/terms', lambda c: ('/api/terms', {}), ()),
+    ('term create', 'POST', '/api/terms',
+     lambda c: ('/api/terms', {'json': {'name': c.next_id('Term '), 'start_date': '2097-01-01',
+                                        'end_date': '2097-06-30'}}), ()),
+    ('term update', 'PUT', '/api/terms/<int:term_id>',
+     lambda c: (f'/api/terms/{c.new_term()}',
+                {'json': {'name': c.next_id('Term '), 'start_date': '2097-01-01',
+                          'end_date': '2097-12-31'}}), ()),
+    ('term delete', 'DELETE', '/api/terms/<int:term_id>',
+     lambda c: (f'/api/terms/{c.new_term()}', {}), ()),
+    ('attendance for date', 'GET', '/api/attendance/date/<date_str>',
+     lambda c: (f'/api/attendance/date/{c.date}', {}), ('cold',)),
+    ('attendance for date warm', 'GET', '/api/attendance/date/<date_str>',
+     lambda c: (f'/api/attendance/date/{c.date}', {}), ()),
+]
+
+# Routes with their own benchmark: event streams never end (bench_streams.py)
+UNTIMED_ROUTES = {('GET', '/api/stream')}
+
+
+def parse_size(value):
+    match = re.fullmatch(r'(\d+)x(\d+)', value)
+    if not match:
+        raise argparse.ArgumentTypeError(f'expected STUDENTSxDAYS, got {value!r}')
+    return int(match.group(1)), int(match.group(2))
+
+
+def untimed_routes(app):
+    """(method, route) pairs served by the app that no scenario covers"""
+    covered = {(method, route) for _, method, route, _, _ in SCENARIOS}
+    served = {(method, rule.rule) for rule in app.url_map.iter_rules()
+              if rule.endpoint != 'static'
+              for method in rule.methods - {'HEAD', 'OPTIONS'}}
+    return sorted(served - covered - UNTIMED_ROUTES)
+
+
+def time_scenario(ctx, scenario, repeat):
+    from cache import response_cache
+
+    name, method, route, make_request, options = scenario
+    runs = max(1, repeat // 10) if 'heavy' in options else repeat
+    timings = []
+    status = None
+    for _ in range(runs + 1):
+        url, kwargs = make_request(ctx)
+        if 'cold' in options:
+            response_cache.clear()
+        started = time.perf_counter()
+        response = ctx.client.open(url, method=method, **kwargs)
+        for _ in response.iter_encoded():
+            pass
+        elapsed = time.perf_counter() - started
+        status = response.status_code
+        response.close()
+        timings.append(elapsed * 1000)
+    timings = sorted(timings[1:])  # the first call only warms up
+    return {
+        'endpoint': name,
+        'method': method,
+        'route': route,
+        'status': status,
+        'runs': len(timings),
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'min_ms': round(timings[0], 3),
+    }
+
+
+def run(sizes, repeat, only=None):
+    results = []
+    untimed = []
+    for students, days in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            conn = sqlite3.connect(path)
+            configure_connection(conn)
+            migrations.migrate(conn)
+            create_mock_data.generate(conn, students=students, days=days, seed=42)
+            db.DB_PATH = path
+            from app import app
+            untimed = untimed_routes(app)
+
+            rows = conn.execute('SELECT COUNT(*) FROM attendance').fetchone()[0]
+            ctx = Context(app.test_client(), conn)
+            for scenario in SCENARIOS:
+                if only and not re.search(only, scenario[0]):
+                    continue
+                result = time_scenario(ctx, scenario, repeat)
+                result.update({'students': students, 'days': days, 'rows': rows})
+                results.append(result)
+            conn.close()
+            db.get_pool(path).close_all()
+    return results, untimed
+
+
+def metadata(repeat):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'repeat': repeat,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print per-scenario changes against a baseline; returns the regressions"""
+    key = lambda r: (r['students'], r['days'], r['endpoint'])
+    before = {key(r): r for r in baseline['results']}
+    regressions = []
+    print(f"{'size':>12} {'endpoint':>28} {'before ms':>10} {'after ms':>10} {'change':>8}")
+    for r in results:
+        old = before.get(key(r))
+        if old is None or not old['median_ms']:
+            continue
+        change = (r['median_ms'] - old['median_ms']) / old['median_ms'] * 100
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(r)
+        print(f"{r['students']:>6}x{r['days']:<5} {r['endpoint']:>28} {old['median_ms']:>10.3f} "
+              f"{r['median_ms']:>10.3f} {change:>+7.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=parse_size, nargs='+',
+                        default=[parse_size(s) for s in DEFAULT_SIZES],
+                        help=f"STUDENTSxDAYS data sizes (default: {' '.join(DEFAULT_SIZES)})")
+    parser.add_argument('--repeat', type=int, default=20, help='timed calls per scenario')
+    parser.add_argument('--only', help='regex selecting scenarios by name')
+    parser.add_argument('--output', help='write JSON results to this file')
+    parser.add_argument('--json', action='store_true', help='print JSON results')
+    parser.add_argument('--compare', help='baseline JSON file from an earlier run')
+    parser.add_argument('--threshold', type=float, default=20,
+                        help='median slowdown in percent that counts as a regression')
+    args = parser.parse_args()
+
+    results, untimed = run(args.sizes, args.repeat, args.only)
+    report = {'meta': metadata(args.repeat), 'untimed_routes': untimed, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    for method, route in untimed:
+        print(f'⚠️  no scenario for {method} {route}', file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        return 1 if regressions else 0
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(f"{'size':>12} {'endpoint':>28} {'status':>6} {'median ms':>10} {'p95 ms':>9} {'min ms':>9}")
+    for r in results:
+        print(f"{r['students']:>6}x{r['days']:<5} {r['endpoint']:>28} {r['status']:>6} "
+              f"{r['median_ms']:>10.3f} {r['p95_ms']:>9.3f} {r['min_ms']:>9.3f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Benchmark: streamed attendance export throughput and peak memory.
+
+Drives GET /api/attendance/export through the Flask test client, consuming
+the response chunk by chunk, and reports rows/s plus the peak Python heap
+allocation (tracemalloc) for each export size.
+
+Usage (from the backend directory):
+    python3 benchmarks/bench_export.py --sizes 100000 1000000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_statistics import build_database  # noqa: E402
+
+
+def measure(client, url, trace_memory):
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    rows = 0
+    size = 0
+    for chunk in response.iter_encoded():
+        rows += chunk.count(b'\n')
+        size += len(chunk)
+    response.close()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+    return rows, size, elapsed, peak
+
+
+def run(sizes):
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            build_database(path, size).close()
+            os.environ['ATTENDANCE_DB_PATH'] = path
+
+            import db
+            db.DB_PATH = path
+            from app import app
+            client = app.test_client()
+
+            for export_format in ('ndjson', 'csv'):
+                url = f'/api/attendance/export?format={export_format}'
+                rows, nbytes, elapsed, _ = measure(client, url, trace_memory=False)
+                _, _, _, peak = measure(client, url, trace_memory=True)
+                results.append({
+                    'rows': size,
+                    'format': export_format,
+                    'rows_exported': rows - (1 if export_format == 'csv' else 0),
+                    'bytes': nbytes,
+                    'seconds': round(elapsed, 3),
+                    'rows_per_second': round(size / elapsed),
+                    'peak_heap_mb': round(peak / 1024 / 1024, 2),
+                })
+            db.get_pool(path).close_all()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--json', action='store_true', help='emit machine-readable results')
+    args = parser.parse_args()
+
+    results = run(args.sizes)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'rows':>10} {'format':>7} {'seconds':>9} {'rows/s':>10} {'MB out':>8} {'peak heap MB':>13}")
+    for r in results:
+        print(f"{r['rows']:>10} {r['format']:>7} {r['seconds']:>9.3f} {r['rows_per_second']:>10} "
+              f"{r['bytes'] / 1024 / 1024:>8.1f} {r['peak_heap_mb']:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: bulk attendance ingest vs the original per-row insert loop.
+
+Compares, for the same batch of records:
+  * legacy   - one cursor.execute(INSERT OR REPLACE) per record
+  * ingest   - ingest.ingest(): columnar validation + executemany upsert
+  * endpoint - POST /api/attendance/bulk through the Flask test client
+
+Usage (from the backend directory):
+    python3 benchmarks/bench_ingest.py --records 100000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import ingest  # noqa: E402
+import migrations  # noqa: E402
+from db import configure_connection  # noqa: E402
+
+STUDENTS = 2000
+
+
+def make_database(path):
+    conn = sqlite3.connect(path)
+    configure_connection(conn)
+    migrations.migrate(conn)
+    conn.executemany('INSERT INTO students (student_id, name, course) VALUES (?, ?, ?)',
+                     ((f'STU{i:06d}', f'Student {i}', f'Course {i % 10}')
+                      for i in range(STUDENTS)))
+    conn.commit()
+    return conn
+
+
+def make_records(count, seed=7):
+    rng = random.Random(seed)
+    statuses = rng.choices(('present', 'absent', 'late'), weights=(70, 20, 10), k=count)
+    start = date(2024, 1, 1)
+    return [{'student_id': f'STU{n % STUDENTS:06d}',
+             'date': (start + timedelta(days=n // STUDENTS)).isoformat(),
+             'status': statuses[n],
+             'notes': None}
+            for n in range(count)]
+
+
+def legacy_loop(conn, records):
+    """The original mark_attendance() bulk path"""
+    cursor = conn.cursor()
+    for record in records:
+        cursor.execute('''
+            INSERT OR REPLACE INTO attendance (student_id, date, status, notes)
+            VALUES (?, ?, ?, ?)
+        ''', (record['student_id'], record['date'],
+              record['status'], record.get('notes')))
+    conn.commit()
+
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def run(count):
+    records = make_records(count)
+    results = {'records': count}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ('legacy', 'ingest'):
+            conn = make_database(os.path.join(tmp, f'{name}.db'))
+            if name == 'legacy':
+                results['legacy_seconds'] = timed(lambda: legacy_loop(conn, records))
+                # Second pass: every record already exists (REPLACE = delete + insert)
+                results['legacy_update_seconds'] = timed(lambda: legacy_loop(conn, records))
+            else:
+                results['validate_seconds'] = timed(lambda: ingest.validate(conn, records))
+                results['ingest_seconds'] = timed(lambda: ingest.ingest(conn, records))
+                # Second pass exercises the ON CONFLICT update path
+                results['ingest_update_seconds'] = timed(lambda: ingest.ingest(conn, records))
+            conn.close()
+
+        path = os.path.join(tmp, 'endpoint.db')
+        make_database(path).close()
+        db.DB_PATH = path
+        from app import app
+        client = app.test_client()
+        body = json.dumps(records)
+        results['endpoint_seconds'] = timed(lambda: client.post(
+            '/api/attendance/bulk', data=body, content_type='application/json'))
+        db.get_pool(path).close_all()
+
+    results['speedup'] = results['legacy_seconds'] / results['ingest_seconds']
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--records', type=int, default=100_000)
+    parser.add_argument('--json', action='store_true', help='emit machine-readable results')
+    args = parser.parse_args()
+
+    results = run(args.records)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for key, value in results.items():
+        print(f'{key:>22}: {value:.3f}' if isinstance(value, float) else f'{key:>22}: {value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""
+Benchmark: the rowid and compact attendance storage layouts (layout.py).
+
+Generates one database with create_mock_data (fixed seed), copies it and
+converts the copy to the compact layout; both are VACUUMed. The report
+shows, per layout:
+
+    size     the file size and the bytes taken by the attendance storage
+             (table plus indexes, from the dbstat virtual table)
+    queries  for each query the API runs on attendance: the median
+             latency over --repeat warm runs, and the pages read from the
+             file by one run on a fresh connection (SQLite's default 2 MB
+             page cache, memory-mapping off): the bytes read according to
+             /proc/self/io divided by the page size
+
+It also checks that both layouts return the same rows for every query.
+
+Usage (from the backend directory):
+    python3 benchmarks/bench_layout.py
+    python3 benchmarks/bench_layout.py --students 10000 --days 365 --repeat 10 --json
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_mock_data  # noqa: E402
+import layout  # noqa: E402
+import migrations  # noqa: E402
+from db import configure_connection  # noqa: E402
+
+# The API's attendance columns (app.ATTENDANCE_COLUMNS)
+COLUMNS = {
+    'id': 'a.id',
+    'student_id': 'a.student_id',
+    'date': 'a.date',
+    'status': 'a.status',
+    'notes': 'a.notes',
+    'created_at': 'a.created_at',
+    'student_name': 's.name',
+    'course': 's.course',
+}
+
+COUNTS = ', '.join(f"SUM(a.status = '{status}')" for status in ('present', 'absent', 'late'))
+
+
+def joined(conn, where='', order='date DESC, student_name, id', limit=None):
+    """SQL for a GET /api/attendance style query over the layout"""
+    source, columns = layout.joined(conn, COLUMNS)
+    for name in ('date', 'student_id', 'course'):
+        where = where.replace('{' + name + '}', columns[name])
+    order_by = ', '.join(
+        ' '.join([columns[term.split()[0]]] + term.split()[1:]) for term in order.split(', '))
+    sql = f"SELECT {', '.join(columns.values())} FROM {source} WHERE 1=1{where} ORDER BY {order_by}"
+    return sql + (f' LIMIT {limit}' if limit else '')
+
+
+def per_student(conn, fixtures):
+    """GET /api/statistics/students?from= (stats.student_table)"""
+    join, status_sql, params = layout.student_join(conn, fixtures['month_ago'])
+    counts = ', '.join(f"COALESCE(SUM({status_sql} = '{status}'), 0)"
+                       for status in ('present', 'absent', 'late'))
+    return (f'SELECT s.student_id, {counts} FROM students s {join} GROUP BY s.student_id',
+            params)
+
+
+# name -> function(conn, fixtures) returning (sql, params). The listings and
+# per-student counts are built as the API builds them; the rest read the
+# attendance view (a student's history, scan_status_counts() and the
+# summary rebuild after a bulk load).
+QUERIES = {
+    'list one date': lambda c, f: (joined(c, ' AND {date} = ?'), (f['date'],)),
+    'list newest page': lambda c, f: (joined(c, limit=101), ()),
+    'list student': lambda c, f: (joined(c, ' AND {student_id} = ?'), (f['student_id'],)),
+    'list course, 30 days': lambda c, f: (
+        joined(c, ' AND {date} >= ? AND {course} = ?'), (f['month_ago'], 'Physics')),
+    'export 30 days': lambda c, f: (
+        joined(c, ' AND {date} >= ?', order='date, student_id'), (f['month_ago'],)),
+    'student history': lambda c, f: (
+        'SELECT date, status FROM attendance WHERE student_id = ? ORDER BY date',
+        (f['student_id'],)),
+    'counts, student+range': lambda c, f: (
+        f'SELECT {COUNTS} FROM attendance a WHERE a.student_id = ? AND a.date >= ?',
+        (f['student_id'], f['month_ago'])),
+    'counts per student, range': per_student,
+    'rebuild: per student': lambda c, f: (
+        f'SELECT a.student_id, {COUNTS} FROM attendance a GROUP BY a.student_id', ()),
+    'rebuild: per date': lambda c, f: (
+        f'SELECT a.date, {COUNTS} FROM attendance a GROUP BY a.date', ()),
+}
+
+
+def build(path, students, days):
+    conn = sqlite3.connect(path)
+    configure_connection(conn)
+    conn.execute('PRAGMA synchronous = OFF')
+    migrations.migrate(conn)
+    create_mock_data.generate(conn, students=students, days=days, seed=42)
+    conn.close()
+
+
+def finish(path):
+    """VACUUM and checkpoint so the file holds everything, compactly"""
+    conn = sqlite3.connect(path)
+    conn.execute('VACUUM')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+
+
+def storage_bytes(conn):
+    """Bytes used by the attendance storage table and its indexes"""
+    storage = layout.table(conn)
+    names = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE tbl_name = ? AND type IN ('table', 'index')",
+        (storage,))]
+    placeholders = ', '.join('?' * len(names))
+    return conn.execute(f'SELECT SUM(pgsize) FROM dbstat WHERE name IN ({placeholders})',
+                        names).fetchone()[0]
+
+
+def read_bytes():
+    with open('/proc/self/io') as f:
+        return int(next(line for line in f if line.startswith('rchar:')).split()[1])
+
+
+def pages_read(path, sql, params):
+    """Pages one cold run of the query reads from the file"""
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA mmap_size = 0')
+    conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()  # load the schema
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    started = read_bytes()
+    conn.execute(sql, params).fetchall()
+    pages = (read_bytes() - started) // page_size
+    conn.close()
+    return pages
+
+
+def measure(path, repeat):
+    conn = sqlite3.connect(path)
+    configure_connection(conn)
+    fixtures = {
+        'date': conn.execute('SELECT MAX(date) FROM attendance').fetchone()[0],
+        'student_id': conn.execute('SELECT MIN(student_id) FROM students').fetchone()[0],
+    }
+    fixtures['month_ago'] = conn.execute("SELECT date(?, '-30 days')",
+                                         (fixtures['date'],)).fetchone()[0]
+    result = {
+        'layout': layout.current(conn),
+        'file_bytes': os.path.getsize(path),
+        'storage_bytes': storage_bytes(conn),
+        'rows': conn.execute('SELECT COUNT(*) FROM attendance').fetchone()[0],
+        'queries': {},
+    }
+    answers = {}
+    for name, make in QUERIES.items():
+        sql, params = make(conn, fixtures)
+        answers[name] = conn.execute(sql, params).fetchall()  # also warms the cache
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            timings.append(time.perf_counter() - started)
+        result['queries'][name] = {
+            'median_ms': round(statistics.median(timings) * 1000, 2),
+            'pages': pages_read(path, sql, params),
+            'rows': len(answers[name]),
+        }
+    conn.close()
+    return result, answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=10, help='timed runs per query')
+    parser.add_argument('--json', action='store_true', help='emit machine-readable results')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rowid_path = os.path.join(tmp, 'rowid.db')
+        compact_path = os.path.join(tmp, 'compact.db')
+        build(rowid_path, args.students, args.days)
+        finish(rowid_path)
+        shutil.copy(rowid_path, compact_path)
+        conn = sqlite3.connect(compact_path)
+        started = time.perf_counter()
+        layout.convert(conn, 'compact')
+        conversion_seconds = time.perf_counter() - started
+        conn.close()
+        finish(compact_path)
+
+        rowid, rowid_answers = measure(rowid_path, args.repeat)
+        compact, compact_answers = measure(compact_path, args.repeat)
+    mismatches = [name for name in QUERIES if rowid_answers[name] != compact_answers[name]]
+    results = {'students': args.students, 'days': args.days,
+               'conversion_seconds': round(conversion_seconds, 2),
+               'layouts': [rowid, compact], 'mismatches': mismatches}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 1 if mismatches else 0
+    print(f"{args.students} students x {args.days} days: {rowid['rows']} records; "
+          f"conversion took {conversion_seconds:.1f} s")
+    print(f"  {'':<22} {'rowid':>10} {'compact':>10}")
+    for key, label in (('file_bytes', 'file MB'), ('storage_bytes', 'attendance MB')):
+        print(f"  {label:<22} {rowid[key] / 1e6:>10.1f} {compact[key] / 1e6:>10.1f}")
+    print(f"\n  {'query':<22} {'rows':>7} {'rowid ms':>9} {'compact ms':>11} "
+          f"{'rowid pages':>12} {'compact pages':>14}")
+    for name in QUERIES:
+        before, after = rowid['queries'][name], compact['queries'][name]
+        print(f"  {name:<22} {before['rows']:>7} {before['median_ms']:>9.2f} "
+              f"{after['median_ms']:>11.2f} {before['pages']:>12} {after['pages']:>14}")
+    if mismatches:
+        print(f"\n❌ Different results from the two layouts: {', '.join(mismatches)}")
+        return 1
+    print('\n✅ Both layouts return identical rows for every query')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Benchmark: bytes on the wire and serialization CPU for large list responses.
+
+For every STUDENTSxDAYS size (generated with create_mock_data, fixed seed)
+it fetches the rows behind GET /api/attendance for the last DAYS_WINDOW
+days and GET /api/students, then reports for each response shape (rows,
+columns) and content coding (identity, gzip, br when installed):
+
+    bytes      size of the body sent
+    encode ms  JSON serialization (Flask's stdlib provider vs orjson)
+    compress   time to compress the serialized body
+
+and the end-to-end median latency of the endpoints through the Flask test
+client with and without Accept-Encoding.
+
+Usage (from the backend directory):
+    python3 benchmarks/bench_responses.py
+    python3 benchmarks/bench_responses.py --sizes 10000x365 --json
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+import create_mock_data  # noqa: E402
+import db  # noqa: E402
+import migrations  # noqa: E402
+import responses  # noqa: E402
+from db import configure_connection  # noqa: E402
+
+DEFAULT_SIZES = ['1000x365', '10000x365']
+
+# Days of attendance in the list response
+DAYS_WINDOW = 7
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def parse_size(value):
+    students, _, days = value.partition('x')
+    return int(students), int(days)
+
+
+def payloads(app_module, conn):
+    """{name: (rows shape, columns shape)} for the large list responses"""
+    date_to = conn.execute('SELECT MAX(date) FROM attendance').fetchone()[0]
+    date_from = conn.execute('SELECT date(?, ?)', (date_to, f'-{DAYS_WINDOW - 1} days')).fetchone()[0]
+
+    fields = list(app_module.ATTENDANCE_COLUMNS)
+    rows = conn.execute(f'''
+        SELECT {', '.join(app_module.ATTENDANCE_COLUMNS.values())}
+        FROM attendance a JOIN students s ON a.student_id = s.student_id
+        WHERE a.date >= ? ORDER BY a.date DESC, s.name, a.id''', (date_from,)).fetchall()
+    attendance = ([dict(zip(fields, row)) for row in rows],
+                  responses.columns(rows, fields, app_module.ATTENDANCE_DICTIONARY_FIELDS))
+
+    fields = list(app_module.STUDENT_COLUMNS)
+    rows = conn.execute(f"SELECT {', '.join(fields)} FROM students ORDER BY name, student_id").fetchall()
+    students = ([dict(zip(fields, row)) for row in rows],
+                responses.columns(rows, fields, app_module.STUDENT_DICTIONARY_FIELDS))
+    return {f'attendance, {DAYS_WINDOW} days': attendance, 'students': students}, date_from
+
+
+def measure_payloads(app_module, conn, repeat):
+    stdlib = DefaultJSONProvider(app_module.app)
+    fast = responses.JSONProvider(app_module.app)
+    results = []
+    named, date_from = payloads(app_module, conn)
+    for name, (rows_shape, columns_shape) in named.items():
+        assert responses.records(columns_shape) == rows_shape
+        for shape, obj in (('rows', rows_shape), ('columns', columns_shape)):
+            body = fast.encode(obj)
+            result = {
+                'payload': name,
+                'shape': shape,
+                'stdlib_encode_ms': round(best_of(
+                    lambda: stdlib.dumps(obj, separators=(',', ':')), repeat), 2),
+                'orjson_encode_ms': (round(best_of(lambda: fast.encode(obj), repeat), 2)
+                                     if responses.orjson else None),
+                'encodings': {'identity': {'bytes': len(body), 'compress_ms': 0}},
+            }
+            for encoding in responses.COMPRESSORS:
+                compressed = responses.compress(encoding, body)
+                result['encodings'][encoding] = {
+                    'bytes': len(compressed),
+                    'compress_ms': round(best_of(
+                        lambda: responses.compress(encoding, body), repeat), 2),
+                }
+            results.append(result)
+    return results, date_from
+
+
+def measure_endpoints(app_module, date_from, repeat):
+    client = app_module.app.test_client()
+    results = []
+    for path in (f'/api/attendance?from={date_from}',
+                 f'/api/attendance?from={date_from}&shape=columns',
+                 '/api/students', '/api/students?shape=columns'):
+        for accept in ('identity', 'gzip'):
+            timings, size = [], 0
+            for _ in range(repeat):
+                started = time.perf_counter()
+                response = client.get(path, headers={'Accept-Encoding': accept})
+                size = len(response.get_data())
+                timings.append((time.perf_counter() - started) * 1000)
+            results.append({'path': path, 'accept_encoding': accept, 'bytes': size,
+                            'median_ms': round(statistics.median(timings), 2)})
+    return results
+
+
+def run(sizes, repeat):
+    results = []
+    for students, days in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            conn = sqlite3.connect(path)
+            configure_connection(conn)
+            migrations.migrate(conn)
+            _, records = create_mock_data.generate(conn, students=students, days=days, seed=42)
+            db.DB_PATH = path
+            import app as app_module
+
+            payload_results, date_from = measure_payloads(app_module, conn, repeat)
+            results.append({
+                'size': f'{students}x{days}',
+                'records': records,
+                'payloads': payload_results,
+                'endpoints': measure_endpoints(app_module, date_from, repeat),
+            })
+            conn.close()
+            db.get_pool(path).close_all()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=parse_size, nargs='+',
+                        default=[parse_size(size) for size in DEFAULT_SIZES],
+                        help='STUDENTSxDAYS pairs (default: %s)' % ' '.join(DEFAULT_SIZES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='emit machine-readable results')
+    args = parser.parse_args()
+    # The unpaged list queries are slow on purpose; keep the log out of the report
+    logging.getLogger('attendance.slow_query').setLevel(logging.ERROR)
+
+    results = run(args.sizes, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for result in results:
+        print(f"{result['size']}: {result['records']:,} records")
+        print(f"  {'payload':<22} {'shape':<8} {'stdlib ms':>10} {'orjson ms':>10}  "
+              f"{'encoding':<9} {'bytes':>11} {'compress ms':>12}")
+        for p in result['payloads']:
+            orjson_ms = '-' if p['orjson_encode_ms'] is None else f"{p['orjson_encode_ms']:.2f}"
+            for encoding, e in p['encodings'].items():
+                print(f"  {p['payload']:<22} {p['shape']:<8} {p['stdlib_encode_ms']:>10.2f} "
+                      f"{orjson_ms:>10}  {encoding:<9} {e['bytes']:>11,} {e['compress_ms']:>12.2f}")
+        print(f"  {'endpoint':<52} {'accept':<9} {'bytes':>11} {'median ms':>10}")
+        for e in result['endpoints']:
+            print(f"  {e['path']:<52} {e['accept_encoding']:<9} {e['bytes']:>11,} "
+                  f"{e['median_ms']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark: backend cold start, as the time to the first successful request.
+
+Each scenario launches the backend in fresh processes, as start.py does,
+with serve.py bound to a unix socket in a temporary directory. It polls
+GET /api/health every few milliseconds until the answer is 200. The
+report gives the median over --repeat launches of the wall time from
+launch until:
+
+    health      the first 200 from /api/health
+    data        the first 200 from /api/statistics/overview, requested
+                right after health succeeds
+
+The scenarios:
+
+    full        start.py on a new database: init_db.py and
+                create_mock_data.py in interpreters of their own, then
+                serve.py
+    fast        start.py --fast on a seeded database at the latest schema:
+                serve.py alone
+
+pip is left out of both (start.py --fast skips it while requirements.txt
+is unchanged), as are the fixed sleeps start.py used to wait with (3 s
+for the backend). The report also lists the modules that take longest to
+import with app (python -X importtime).
+
+Usage (from the backend directory):
+    python3 benchmarks/bench_startup.py
+    python3 benchmarks/bench_startup.py --server gunicorn --repeat 10 --json
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import UnixHTTPConnection  # noqa: E402
+
+POLL_SECONDS = 0.005
+
+
+def get(socket_path, url):
+    """Status of GET url, or None while nothing accepts connections"""
+    try:
+        conn = UnixHTTPConnection(socket_path, timeout=10)
+        conn.request('GET', url)
+        status = conn.getresponse().status
+        conn.close()
+        return status
+    except OSError:
+        return None
+
+
+def run(command, env):
+    subprocess.run([sys.executable] + command, cwd=BACKEND_DIR, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def launch(scenario, db_path, socket_path, server):
+    """Start the backend as the scenario does; returns {point: seconds}"""
+    env = dict(os.environ, ATTENDANCE_DB_PATH=db_path, ATTENDANCE_METRICS='0')
+    serve = ['serve.py', '--server', server, '--bind', f'unix:{socket_path}',
+             '--workers', '1']
+    started = time.perf_counter()
+    if scenario == 'full':
+        run(['init_db.py'], env)
+        run(['create_mock_data.py'], env)
+    process = subprocess.Popen([sys.executable] + serve, cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while get(socket_path, '/api/health') != 200:
+            if process.poll() is not None:
+                raise RuntimeError(f'serve.py exited with status {process.returncode}')
+            time.sleep(POLL_SECONDS)
+        times = {'health': time.perf_counter() - started}
+        if get(socket_path, '/api/statistics/overview') != 200:
+            raise RuntimeError('/api/statistics/overview failed')
+        times['data'] = time.perf_counter() - started
+        return times
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def import_profile(top):
+    """(seconds to import app, [(module, cumulative seconds)] of the slowest
+    imports), from python -X importtime"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+                            env=dict(os.environ, ATTENDANCE_METRICS='0'))
+    # A module's line follows those of the modules it imported, which are
+    # indented two spaces deeper
+    children = []
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)', line)
+        if not match:
+            continue
+        seconds, depth, module = int(match.group(1)) / 1e6, len(match.group(2)), match.group(3)
+        if depth == 2:
+            children.append((module, seconds))
+        elif depth == 0 and module == 'app':
+            return seconds, sorted(children, key=lambda child: -child[1])[:top]
+        elif depth == 0:
+            children = []
+    raise RuntimeError('app was not imported')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--server', default='waitress', choices=('gunicorn', 'waitress'))
+    parser.add_argument('--repeat', type=int, default=5, help='launches per scenario')
+    parser.add_argument('--top', type=int, default=8, help='slowest imports to list')
+    parser.add_argument('--json', action='store_true', help='emit machine-readable results')
+    args = parser.parse_args()
+
+    scenarios = ('full', 'fast')
+    samples = {scenario: [] for scenario in scenarios}
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, 'api.sock')
+        seeded = os.path.join(tmp, 'seeded.db')
+        env = dict(os.environ, ATTENDANCE_DB_PATH=seeded, ATTENDANCE_METRICS='0')
+        run(['init_db.py'], env)
+        run(['create_mock_data.py'], env)
+        for _ in range(args.repeat):
+            for scenario in scenarios:
+                db_path = os.path.join(tmp, 'attendance.db')
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(db_path + suffix):
+                        os.remove(db_path + suffix)
+                shutil.copy(seeded, db_path)
+                samples[scenario].append(launch(scenario, db_path, socket_path, args.server))
+    import_seconds, slowest = import_profile(args.top)
+
+    results = {'server': args.server, 'repeat': args.repeat,
+               'import_app_ms': round(import_seconds * 1000, 1),
+               'slowest_imports_ms': {module: round(seconds * 1000, 1)
+                                      for module, seconds in slowest},
+               'scenarios': {
+                   scenario: {point: round(statistics.median(times[point] for times in runs) * 1000, 1)
+                              for point in ('health', 'data')}
+                   for scenario, runs in samples.items()}}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    print(f'serve.py --server {args.server}, median of {args.repeat} launches')
+    print(f"  {'scenario':<8} {'health ms':>10} {'data ms':>10}")
+    for scenario, times in results['scenarios'].items():
+        print(f"  {scenario:<8} {times['health']:>10.1f} {times['data']:>10.1f}")
+    print(f"\nimport app: {results['import_app_ms']:.1f} ms; slowest top-level imports:")
+    for module, ms in results['slowest_imports_ms'].items():
+        print(f'  {module:<20} {ms:>7.1f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
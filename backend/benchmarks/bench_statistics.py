@@ -0,0 +1,140 @@
+"""
+Benchmark: legacy per-status COUNT(*) queries vs the single-pass scans and
+the summary-table reads in stats.py, across attendance table sizes.
+
+Usage (from the backend directory):
+    python3 benchmarks/bench_statistics.py --sizes 100000 1000000 2000000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrations  # noqa: E402
+import stats  # noqa: E402
+from db import configure_connection  # noqa: E402
+
+STUDENTS = 2000
+
+
+def build_database(path, rows):
+    """Create a database with `rows` attendance records over STUDENTS students"""
+    conn = sqlite3.connect(path)
+    configure_connection(conn)
+    migrations.migrate(conn)
+    student_ids = [f'STU{i:06d}' for i in range(STUDENTS)]
+    conn.executemany(
+        'INSERT INTO students (student_id, name, course) VALUES (?, ?, ?)',
+        ((sid, f'Student {sid}', f'Course {i % 10}') for i, sid in enumerate(student_ids)))
+
+    days = -(-rows // STUDENTS)
+    start = date(2020, 1, 1)
+    statuses = random.Random(42).choices(stats.STATUSES, weights=(70, 20, 10), k=rows)
+
+    def records():
+        n = 0
+        for d in range(days):
+            day = (start + timedelta(days=d)).isoformat()
+            for sid in student_ids:
+                if n == rows:
+                    return
+                yield sid, day, statuses[n]
+                n += 1
+
+    conn.executemany('INSERT INTO attendance (student_id, date, status) VALUES (?, ?, ?)',
+                     records())
+    conn.commit()
+    conn.execute('ANALYZE')
+    return conn
+
+
+def legacy_overview(conn):
+    """The original five-query implementation of /api/statistics/overview"""
+    total_students = conn.execute('SELECT COUNT(*) FROM students').fetchone()[0]
+    counts = {'total': conn.execute('SELECT COUNT(*) FROM attendance').fetchone()[0]}
+    for status in stats.STATUSES:
+        counts[status] = conn.execute(
+            'SELECT COUNT(*) FROM attendance WHERE status = ?', (status,)).fetchone()[0]
+    return total_students, counts
+
+
+def legacy_student(conn, student_id):
+    """The original four-query implementation of /api/statistics/student/<id>"""
+    counts = {'total': conn.execute('SELECT COUNT(*) FROM attendance WHERE student_id = ?',
+                                    (student_id,)).fetchone()[0]}
+    for status in stats.STATUSES:
+        counts[status] = conn.execute(
+            'SELECT COUNT(*) FROM attendance WHERE student_id = ? AND status = ?',
+            (student_id, status)).fetchone()[0]
+    return counts
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def run(sizes, repeat):
+    results = []
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = build_database(os.path.join(tmp, 'bench.db'), rows)
+            student_id = 'STU000007'
+            date_to = conn.execute('SELECT MAX(date) FROM attendance').fetchone()[0]
+            date_from = (date.fromisoformat(date_to) - timedelta(days=30)).isoformat()
+            result = {
+                'rows': rows,
+                'overview_legacy_ms': best_of(lambda: legacy_overview(conn), repeat),
+                'overview_scan_ms': best_of(lambda: stats.scan_status_counts(conn), repeat),
+                'overview_summary_ms': best_of(lambda: stats.overview(conn), repeat),
+                'student_legacy_ms': best_of(lambda: legacy_student(conn, student_id), repeat),
+                'student_scan_ms': best_of(
+                    lambda: stats.scan_status_counts(conn, student_id=student_id), repeat),
+                'student_summary_ms': best_of(
+                    lambda: stats.student_overview(conn, student_id), repeat),
+                'range_30d_scan_ms': best_of(
+                    lambda: stats.scan_status_counts(conn, date_from=date_from,
+                                                     date_to=date_to), repeat),
+                'range_30d_summary_ms': best_of(
+                    lambda: stats.overview(conn, date_from=date_from, date_to=date_to), repeat),
+                'course_scan_ms': best_of(
+                    lambda: stats.scan_status_counts(conn, course='Course 3'), repeat),
+                'course_summary_ms': best_of(
+                    lambda: stats.overview(conn, course='Course 3'), repeat),
+            }
+            conn.close()
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='emit machine-readable results')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    columns = [key for key in results[0] if key != 'rows']
+    print(f"{'rows':>10} " + ' '.join(f'{c:>21}' for c in columns))
+    for result in results:
+        print(f"{result['rows']:>10} " + ' '.join(f'{result[c]:>21.2f}' for c in columns))
+
+
+if __name__ == '__main__':
+    main()
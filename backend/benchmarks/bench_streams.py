@@ -0,0 +1,201 @@
+"""
+Benchmark: live dashboards over server-sent events vs polling.
+
+Runs the ASGI adapter (asgi.py) in-process with --subscribers simulated
+dashboards while one writer thread marks --marks single records spread
+over --seconds. Two modes:
+
+    stream   every dashboard holds GET /api/stream open (one event loop,
+             no thread per stream)
+    poll     every dashboard re-fetches GET /api/statistics/overview and
+             GET /api/attendance/date/<today> every --interval seconds
+
+The report shows the server CPU time spent (writer included), the
+requests served, the bytes sent to each dashboard and how long a mark took
+to reach a dashboard (for polling, until the next poll after it).
+
+Usage (from the backend directory):
+    python3 benchmarks/bench_streams.py
+    python3 benchmarks/bench_streams.py --subscribers 100 500 --interval 2 --json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('ATTENDANCE_METRICS', '0')
+
+import create_mock_data  # noqa: E402
+import db  # noqa: E402
+import migrations  # noqa: E402
+
+EVENT_ID = re.compile(rb'id: (\d+)\nevent: attendance')
+
+
+def scope(path, headers=()):
+    path, _, query = path.partition('?')
+    return {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query.encode(),
+            'http_version': '1.1', 'headers': list(headers), 'scheme': 'http',
+            'server': ('bench', 80), 'client': ('127.0.0.1', 0), 'root_path': ''}
+
+
+def writer(app_module, conn, student_ids, marks, seconds, commits):
+    """Mark `marks` records evenly over `seconds`, logging (time, version)"""
+    client = app_module.app.test_client()
+    today = date.today().isoformat()
+    started = time.perf_counter()
+    for i in range(marks):
+        delay = started + seconds * i / marks - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        client.post('/api/attendance', json={'student_id': student_ids[i % len(student_ids)],
+                                             'date': today, 'status': 'late'})
+        version = conn.execute('SELECT MAX(version) FROM change_log').fetchone()[0]
+        commits.append((time.perf_counter(), version))
+
+
+async def run_mode(mode, adapter, app_module, conn, student_ids, args, subscribers):
+    stop = asyncio.Event()
+    received = [[] for _ in range(subscribers)]   # (time, version) per dashboard
+    sent_bytes = [0] * subscribers
+    requests = [0]
+
+    async def receive():
+        await stop.wait()
+        return {'type': 'http.disconnect'}
+
+    def sender(n):
+        async def send(message):
+            body = message.get('body')
+            if body:
+                sent_bytes[n] += len(body)
+                now = time.perf_counter()
+                for match in EVENT_ID.finditer(body):
+                    received[n].append((now, int(match.group(1))))
+        return send
+
+    async def dashboard_stream(n):
+        await adapter(scope('/api/stream'), receive, sender(n))
+
+    async def dashboard_poll(n):
+        today = date.today().isoformat()
+        send = sender(n)
+
+        async def get(path):
+            messages = [{'type': 'http.request', 'body': b''}]
+
+            async def request_body():
+                # The body, then the connection stays open until the run ends
+                return messages.pop() if messages else await receive()
+            await adapter(scope(path), request_body, send)
+            requests[0] += 1
+
+        await asyncio.sleep(args.interval * n / subscribers)  # spread the polls
+        while not stop.is_set():
+            polled = time.perf_counter()
+            version = conn.execute('SELECT MAX(version) FROM change_log').fetchone()[0]
+            await get('/api/statistics/overview')
+            await get(f'/api/attendance/date/{today}')
+            received[n].append((time.perf_counter(), version))
+            await asyncio.sleep(max(0, args.interval - (time.perf_counter() - polled)))
+
+    task_fn = dashboard_stream if mode == 'stream' else dashboard_poll
+    tasks = [asyncio.ensure_future(task_fn(n)) for n in range(subscribers)]
+    await asyncio.sleep(1)  # let every dashboard connect
+    loop = asyncio.get_running_loop()
+    commits = []
+    events_before = app_module.live.stats()['published_events']
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    await loop.run_in_executor(None, writer, app_module, conn, student_ids, args.marks,
+                               args.seconds, commits)
+    await asyncio.sleep(max(args.interval, 1))  # let the last marks arrive
+    cpu = time.process_time() - cpu_started
+    wall = time.perf_counter() - wall_started
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    latencies = []
+    for events in received:
+        index = 0
+        for committed, version in commits:
+            while index < len(events) and (events[index][1] < version
+                                           or events[index][0] < committed):
+                index += 1
+            if index < len(events):
+                latencies.append(events[index][0] - committed)
+    latencies.sort()
+    return {
+        'mode': mode,
+        'subscribers': subscribers,
+        'marks': args.marks,
+        'cpu_seconds': round(cpu, 2),
+        'cpu_share': round(cpu / wall, 3),
+        'requests': requests[0] if mode == 'poll' else subscribers,
+        'events': (app_module.live.stats()['published_events'] - events_before
+                   if mode == 'stream' else None),
+        'kb_per_dashboard': round(sum(sent_bytes) / subscribers / 1024, 1),
+        'delivered': f'{len(latencies)}/{args.marks * subscribers}',
+        'p50_ms': round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--subscribers', type=int, nargs='+', default=[100, 500])
+    parser.add_argument('--marks', type=int, default=200, help='records marked per run')
+    parser.add_argument('--seconds', type=float, default=10, help='spread the marks over this')
+    parser.add_argument('--interval', type=float, default=2, help='polling interval (seconds)')
+    parser.add_argument('--json', action='store_true', help='emit machine-readable results')
+    args = parser.parse_args()
+    logging.getLogger('attendance.slow_query').setLevel(logging.ERROR)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        conn = sqlite3.connect(path, check_same_thread=False)
+        db.configure_connection(conn)
+        migrations.migrate(conn)
+        create_mock_data.generate(conn, students=1000, days=30, seed=42)
+        student_ids = [row[0] for row in conn.execute('SELECT student_id FROM students')]
+        db.DB_PATH = path
+        import app as app_module
+        import asgi
+
+        adapter = asgi.AsgiAdapter(app_module.app, queue_limit=100_000,
+                                   broadcaster=app_module.live)
+
+        async def run_all():
+            for subscribers in args.subscribers:
+                for mode in ('stream', 'poll'):
+                    results.append(await run_mode(mode, adapter, app_module, conn,
+                                                  student_ids, args, subscribers))
+
+        asyncio.run(run_all())
+        conn.close()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f'{args.marks} marks over {args.seconds:g} s; polling every {args.interval:g} s')
+    print(f"  {'dashboards':>10} {'mode':<7} {'CPU s':>7} {'CPU %':>6} {'requests':>9} "
+          f"{'events':>7} {'KB each':>8} {'p50 ms':>8} {'p99 ms':>8}  delivered")
+    for r in results:
+        events = '-' if r['events'] is None else r['events']
+        print(f"  {r['subscribers']:>10} {r['mode']:<7} {r['cpu_seconds']:>7.2f} "
+              f"{r['cpu_share'] * 100:>5.0f}% {r['requests']:>9} {events:>7} "
+              f"{r['kb_per_dashboard']:>8.1f} {r['p50_ms']:>8} {r['p99_ms']:>8}  {r['delivered']}")
+
+
+if __name__ == '__main__':
+    main()
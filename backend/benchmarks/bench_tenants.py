@@ -0,0 +1,175 @@
+"""
+Benchmark: write throughput with one database for every school against one
+database per school (tenants.py).
+
+A burst of single-record attendance marks, as in bench_write_queue.py:
+each of --processes processes (like gunicorn workers) runs --threads
+threads, and every thread POSTs --requests single records to
+/api/attendance through the Flask test client, all starting together.
+Thread n marks for school n % --tenants. The modes:
+
+    shared     every school's students in one database: all marks
+               queue on its write lock
+    sharded    one database per school, each thread naming its school
+               with X-Tenant: marks for different schools commit in
+               parallel
+
+The report shows throughput, latency percentiles and failed requests.
+
+Usage (from the backend directory):
+    python3 benchmarks/bench_tenants.py
+    python3 benchmarks/bench_tenants.py --tenants 8 --processes 4 --threads 16 --json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+import create_mock_data  # noqa: E402
+import migrations  # noqa: E402
+from db import configure_connection  # noqa: E402
+
+STUDENTS_PER_TENANT = 500
+
+
+def worker(path, env, sharded, args, student_ids, barrier, results):
+    """One server process: `threads` clients marking attendance concurrently"""
+    os.environ.update(env)
+    os.environ['ATTENDANCE_METRICS'] = '0'
+    import db
+    db.DB_PATH = path
+    import app as app_module
+
+    latencies, statuses = [], Counter()
+    lock = threading.Lock()
+
+    def client(n):
+        tenant = n % args.tenants
+        headers = {'X-Tenant': f'school-{tenant}'} if sharded else {}
+        students = student_ids[tenant]
+        test_client = app_module.app.test_client()
+        for i in range(args.requests):
+            record = {'student_id': students[(n + i) % len(students)],
+                      'date': f'2031-01-{1 + i % 28:02d}', 'status': 'present'}
+            started = time.perf_counter()
+            status = test_client.post('/api/attendance', json=record,
+                                      headers=headers).status_code
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] += 1
+
+    offset = os.getpid() * args.threads
+    pool = [threading.Thread(target=client, args=(offset + n,)) for n in range(args.threads)]
+    barrier.wait()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put({'latencies': latencies, 'statuses': dict(statuses)})
+
+
+def run_mode(path, env, sharded, args, student_ids):
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(args.processes + 1)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(path, env, sharded, args, student_ids,
+                                                  barrier, results))
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    started = time.perf_counter()
+    collected = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+
+    latencies = sorted(x for r in collected for x in r['latencies'])
+    statuses = Counter()
+    for r in collected:
+        statuses.update(r['statuses'])
+    return {
+        'requests': len(latencies),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2),
+        'statuses': {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def build(path, students):
+    conn = sqlite3.connect(path)
+    configure_connection(conn)
+    migrations.migrate(conn)
+    create_mock_data.generate(conn, students=students, days=30, seed=42)
+    student_ids = [row[0] for row in conn.execute('SELECT student_id FROM students')]
+    conn.close()
+    return student_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tenants', type=int, default=4, help='schools')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=16, help='concurrent clients per process')
+    parser.add_argument('--requests', type=int, default=50, help='marks per client')
+    parser.add_argument('--json', action='store_true', help='emit machine-readable results')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {'ATTENDANCE_TENANTS_DB': os.path.join(tmp, 'tenants.db'),
+               'ATTENDANCE_SHARD_DIRS': os.path.join(tmp, 'shard')}
+        os.environ.update(env)
+        import tenants  # reads the environment above
+
+        # shared: every school's students in one database
+        shared = os.path.join(tmp, 'shared.db')
+        everyone = build(shared, STUDENTS_PER_TENANT * args.tenants)
+        student_ids = [everyone[n::args.tenants] for n in range(args.tenants)]
+        # sharded: each school's students and records in a database of its own
+        for n in range(args.tenants):
+            conn = sqlite3.connect(tenants.create(f'school-{n}'))
+            configure_connection(conn)
+            conn.execute(f"ATTACH DATABASE '{shared}' AS shared")
+            conn.execute('CREATE TEMP TABLE school (student_id TEXT PRIMARY KEY)')
+            conn.executemany('INSERT INTO school VALUES (?)', ((s,) for s in student_ids[n]))
+            conn.execute('INSERT INTO students SELECT * FROM shared.students '
+                         'WHERE student_id IN (SELECT student_id FROM school)')
+            conn.execute('INSERT INTO attendance (student_id, date, status, notes) '
+                         'SELECT student_id, date, status, notes FROM shared.attendance '
+                         'WHERE student_id IN (SELECT student_id FROM school)')
+            conn.commit()
+            conn.close()
+
+        for name, sharded in (('shared', False), ('sharded', True)):
+            result = run_mode(shared, env, sharded, args, student_ids)
+            result['mode'] = name
+            results.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f'{args.tenants} schools; {args.processes} processes x {args.threads} threads x '
+          f'{args.requests} single-record marks')
+    print(f"  {'mode':<10} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>9} {'max ms':>9}  statuses")
+    for r in results:
+        print(f"  {r['mode']:<10} {r['requests_per_second']:>8.1f} {r['p50_ms']:>8.2f} "
+              f"{r['p99_ms']:>9.2f} {r['max_ms']:>9.2f}  {r['statuses']}")
+
+
+if __name__ == '__main__':
+    main()
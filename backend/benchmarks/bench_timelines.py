@@ -0,0 +1,188 @@
+"""
+Benchmark: course-wide streak, rolling-window and alert queries through SQL
+against the per-student timelines (timelines.py), across data sizes.
+
+For every STUDENTSxDAYS size (generated with create_mock_data, fixed seed)
+it reports how long the timelines take to load, how long a refresh after a
+single write takes, and the latency of each query:
+
+    course streaks      each student's records in date order, grouped into
+                        runs, for every student of a course, against
+                        Timelines.course_streaks()
+    course windows      a ROW_NUMBER() window over each student's last 10
+                        records, against Timelines.course_windows()
+    school alerts       the same window, keeping students absent at least
+                        3 of their last 10 records, against Timelines.alerts()
+
+Both sides of each query are checked to find the same students.
+
+Usage (from the backend directory):
+    python3 benchmarks/bench_timelines.py
+    python3 benchmarks/bench_timelines.py --sizes 2000x730 --json
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from itertools import groupby
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_mock_data  # noqa: E402
+import migrations  # noqa: E402
+import timelines  # noqa: E402
+from db import configure_connection  # noqa: E402
+
+DEFAULT_SIZES = ['1000x365', '2000x730']
+SESSIONS = 10
+MINIMUM = 3
+
+WINDOW_SQL = '''
+    SELECT student_id,
+           SUM(status = 'present'), SUM(status = 'absent'), SUM(status = 'late')
+    FROM (SELECT a.student_id, a.status,
+                 ROW_NUMBER() OVER (PARTITION BY a.student_id ORDER BY a.date DESC) AS n
+          FROM attendance a JOIN students s ON s.student_id = a.student_id
+          {where})
+    WHERE n <= ?
+    GROUP BY student_id
+'''
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def parse_size(value):
+    students, _, days = value.partition('x')
+    return int(students), int(days)
+
+
+def sql_runs(conn, student_id):
+    """(status, length) for each run of equal statuses, in date order"""
+    rows = conn.execute('SELECT status FROM attendance WHERE student_id = ? ORDER BY date',
+                        (student_id,))
+    return [(status, len(list(group))) for status, group in groupby(row[0] for row in rows)]
+
+
+def sql_course_streaks(conn, course):
+    ids = [row[0] for row in conn.execute(
+        'SELECT student_id FROM students WHERE course = ? ORDER BY student_id', (course,))]
+    return {student_id: sql_runs(conn, student_id) for student_id in ids}
+
+
+def sql_windows(conn, course=None):
+    where, params = ('WHERE s.course = ?', [course]) if course else ('', [])
+    return {row[0]: row[1:] for row in
+            conn.execute(WINDOW_SQL.format(where=where), params + [SESSIONS])}
+
+
+def sql_alerts(conn):
+    return {student_id for student_id, counts in sql_windows(conn).items()
+            if counts[1] >= MINIMUM}
+
+
+def check(conn, snapshot, course):
+    streaks = sql_course_streaks(conn, course)
+    for item in snapshot.course_streaks(course):
+        runs = streaks.pop(item['student_id'])
+        current = item['current_streak']
+        assert (current['status'], current['length']) == runs[-1], item['student_id']
+    assert not streaks
+    windows = sql_windows(conn, course)
+    for item in snapshot.course_windows(course, SESSIONS):
+        counts = (item['present_count'], item['absent_count'], item['late_count'])
+        assert windows.pop(item['student_id']) == counts, item['student_id']
+    assert not windows
+    alerted = {item['student_id'] for item in snapshot.alerts(None, 'absent', MINIMUM, SESSIONS)}
+    assert alerted == sql_alerts(conn)
+
+
+def run(sizes, repeat):
+    results = []
+    for students, days in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+            configure_connection(conn)
+            migrations.migrate(conn)
+            _, records = create_mock_data.generate(conn, students=students, days=days, seed=42)
+
+            store = timelines.TimelineStore()
+            started = time.perf_counter()
+            snapshot = store.snapshot(conn)
+            load_ms = (time.perf_counter() - started) * 1000
+
+            student_id = conn.execute('SELECT student_id FROM students LIMIT 1').fetchone()[0]
+            conn.execute("UPDATE attendance SET status = 'late' WHERE id = "
+                         "(SELECT MAX(id) FROM attendance WHERE student_id = ?)", (student_id,))
+            conn.commit()
+            store.on_change('attendance', (), {student_id})
+            started = time.perf_counter()
+            snapshot = store.snapshot(conn)
+            refresh_ms = (time.perf_counter() - started) * 1000
+
+            course = conn.execute('SELECT course FROM students LIMIT 1').fetchone()[0]
+            check(conn, snapshot, course)
+            result = {
+                'size': f'{students}x{days}',
+                'records': records,
+                'load_ms': round(load_ms, 1),
+                'refresh_one_student_ms': round(refresh_ms, 2),
+                'queries': [],
+            }
+            scenarios = [
+                ('course streaks',
+                 lambda: sql_course_streaks(conn, course),
+                 lambda: snapshot.course_streaks(course)),
+                (f'course windows, last {SESSIONS}',
+                 lambda: sql_windows(conn, course),
+                 lambda: snapshot.course_windows(course, SESSIONS)),
+                (f'school alerts, {MINIMUM} of {SESSIONS}',
+                 lambda: sql_alerts(conn),
+                 lambda: snapshot.alerts(None, 'absent', MINIMUM, SESSIONS)),
+            ]
+            for name, sql, timeline in scenarios:
+                result['queries'].append({
+                    'query': name,
+                    'sql_ms': round(best_of(sql, repeat), 3),
+                    'timelines_ms': round(best_of(timeline, repeat), 3),
+                })
+            conn.close()
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=parse_size, nargs='+',
+                        default=[parse_size(size) for size in DEFAULT_SIZES],
+                        help='STUDENTSxDAYS pairs (default: %s)' % ' '.join(DEFAULT_SIZES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help='emit machine-readable results')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for result in results:
+        print(f"{result['size']}: {result['records']:,} records, load {result['load_ms']} ms, "
+              f"refresh after one write {result['refresh_one_student_ms']} ms")
+        print(f"  {'query':<30} {'SQL ms':>10} {'timelines ms':>13} {'speedup':>8}")
+        for q in result['queries']:
+            speedup = q['sql_ms'] / q['timelines_ms'] if q['timelines_ms'] else float('inf')
+            print(f"  {q['query']:<30} {q['sql_ms']:>10.3f} {q['timelines_ms']:>13.3f} "
+                  f"{speedup:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
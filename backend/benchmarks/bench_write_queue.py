@@ -0,0 +1,147 @@
+"""
+Benchmark: a burst of single-record attendance marks from several worker
+processes, with and without the write-coalescing queue (batching.py).
+
+Each of --processes processes (like gunicorn workers) runs --threads
+threads. Every thread POSTs --requests single records to /api/attendance
+through the Flask test client, all starting together. The report shows
+throughput, latency percentiles, failed requests and, with batching, how
+many records each commit carried.
+
+Usage (from the backend directory):
+    python3 benchmarks/bench_write_queue.py
+    python3 benchmarks/bench_write_queue.py --processes 4 --threads 32 --delay-ms 2 10
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+import create_mock_data  # noqa: E402
+import migrations  # noqa: E402
+from db import configure_connection  # noqa: E402
+
+
+def worker(path, env, threads, requests, student_ids, barrier, results):
+    """One server process: `threads` clients marking attendance concurrently"""
+    os.environ.update(env)
+    os.environ['ATTENDANCE_METRICS'] = '0'
+    import db
+    db.DB_PATH = path
+    import app as app_module
+    import batching
+
+    latencies, statuses = [], Counter()
+    lock = threading.Lock()
+
+    def client(offset):
+        test_client = app_module.app.test_client()
+        for i in range(requests):
+            record = {'student_id': student_ids[(offset + i) % len(student_ids)],
+                      'date': f'2031-01-{1 + i % 28:02d}', 'status': 'present'}
+            started = time.perf_counter()
+            status = test_client.post('/api/attendance', json=record).status_code
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] += 1
+
+    pool = [threading.Thread(target=client, args=(os.getpid() * threads + n,))
+            for n in range(threads)]
+    barrier.wait()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put({'latencies': latencies, 'statuses': dict(statuses),
+                 'queue': batching.queue.stats() if batching.ENABLED else None})
+
+
+def run_mode(path, env, args, student_ids):
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(args.processes + 1)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(path, env, args.threads, args.requests,
+                                                  student_ids, barrier, results))
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    started = time.perf_counter()
+    collected = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+
+    latencies = sorted(x for r in collected for x in r['latencies'])
+    statuses = Counter()
+    for r in collected:
+        statuses.update(r['statuses'])
+    queues = [r['queue'] for r in collected if r['queue']]
+    flushes = sum(q['flushes'] for q in queues)
+    return {
+        'requests': len(latencies),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2),
+        'statuses': {str(k): v for k, v in sorted(statuses.items())},
+        'commits': flushes if queues else len(latencies),
+        'avg_batch_records': (round(sum(q['flushed_records'] for q in queues) / flushes, 2)
+                              if flushes else 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=16, help='concurrent clients per process')
+    parser.add_argument('--requests', type=int, default=50, help='marks per client')
+    parser.add_argument('--delay-ms', type=float, nargs='+', default=[5],
+                        help='ATTENDANCE_BATCH_MAX_DELAY_MS values to try')
+    parser.add_argument('--json', action='store_true', help='emit machine-readable results')
+    args = parser.parse_args()
+
+    modes = [('direct', {'ATTENDANCE_WRITE_BATCHING': '0'})]
+    modes += [(f'batched, {delay:g} ms', {'ATTENDANCE_WRITE_BATCHING': '1',
+                                          'ATTENDANCE_BATCH_MAX_DELAY_MS': str(delay)})
+              for delay in args.delay_ms]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        conn = sqlite3.connect(path)
+        configure_connection(conn)
+        migrations.migrate(conn)
+        create_mock_data.generate(conn, students=2000, days=30, seed=42)
+        student_ids = [row[0] for row in conn.execute('SELECT student_id FROM students')]
+        conn.close()
+        for name, env in modes:
+            result = run_mode(path, env, args, student_ids)
+            result['mode'] = name
+            results.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f'{args.processes} processes x {args.threads} threads x {args.requests} single-record marks')
+    print(f"  {'mode':<18} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>9} {'max ms':>9} "
+          f"{'commits':>8} {'per commit':>10}  statuses")
+    for r in results:
+        print(f"  {r['mode']:<18} {r['requests_per_second']:>8.1f} {r['p50_ms']:>8.2f} "
+              f"{r['p99_ms']:>9.2f} {r['max_ms']:>9.2f} {r['commits']:>8} "
+              f"{r['avg_batch_records']:>10.2f}  {r['statuses']}")
+
+
+if __name__ == '__main__':
+    main()
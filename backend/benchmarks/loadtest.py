@@ -0,0 +1,237 @@
+"""
+Load test: requests/s and latency of the main endpoints under each serving mode.
+
+Each mode (see serve.py) is started as a subprocess bound to a unix socket
+in a temporary directory, so nothing listens on the network. Client
+processes with one keep-alive connection each hit one endpoint at a time
+for a fixed duration, and the harness reports requests/s plus p50/p99
+latency per endpoint and mode. With --background, a client streaming
+full exports or posting bulk imports runs throughout, to show how light
+requests fare next to heavy ones.
+
+Usage (from the backend directory):
+    python3 benchmarks/loadtest.py
+    python3 benchmarks/loadtest.py --modes gunicorn waitress --concurrency 32 --duration 10
+    python3 benchmarks/loadtest.py --rows 1000000 --workers 8 --json
+    python3 benchmarks/loadtest.py --modes gunicorn uvicorn --background export
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from bench_statistics import build_database  # noqa: E402
+
+MODES = {
+    'dev': ['--dev', '--no-reload'],
+    'waitress': ['--server', 'waitress'],
+    'gunicorn': ['--server', 'gunicorn'],
+    'uvicorn': ['--server', 'uvicorn'],
+}
+
+IMPORT_BATCH = 20_000
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP over a unix domain socket"""
+
+    def __init__(self, path, timeout=30):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+def endpoints(db_path):
+    """Representative requests for the dashboard, reports and student pages"""
+    conn = sqlite3.connect(db_path)
+    student_id = conn.execute('SELECT student_id FROM students LIMIT 1').fetchone()[0]
+    day = conn.execute('SELECT MAX(date) FROM attendance').fetchone()[0]
+    conn.close()
+    return {
+        'health': '/api/health',
+        'students page': '/api/students?limit=100',
+        'attendance page': '/api/attendance?limit=100',
+        'attendance by date': f'/api/attendance/date/{day}',
+        'overview': '/api/statistics/overview',
+        'student statistics': f'/api/statistics/student/{student_id}',
+    }
+
+
+def student_ids(db_path):
+    conn = sqlite3.connect(db_path)
+    ids = [row[0] for row in conn.execute('SELECT student_id FROM students LIMIT 500')]
+    conn.close()
+    return ids
+
+
+def wait_for_server(path, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with status {process.returncode}')
+        try:
+            conn = UnixHTTPConnection(path, timeout=1)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError('server did not start in time')
+
+
+def client(task):
+    """One client process: hammer `url` until `deadline`, return latencies (s)"""
+    path, url, deadline = task
+    conn = UnixHTTPConnection(path)
+    latencies = []
+    errors = 0
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            conn.request('GET', url)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+    conn.close()
+    return latencies, errors
+
+
+def background(path, kind, stop, student_ids):
+    """Keep one heavy request in flight until `stop` is set"""
+    conn = UnixHTTPConnection(path, timeout=600)
+    body = '\n'.join(['student_id,date,status'] + [
+        f'{student_ids[i % len(student_ids)]},2030-{1 + i // 28 % 12:02d}-{1 + i % 28:02d},present'
+        for i in range(IMPORT_BATCH)])
+    while not stop.is_set():
+        try:
+            if kind == 'export':
+                conn.request('GET', '/api/attendance/export')
+            else:
+                conn.request('POST', '/api/attendance/bulk', body=body,
+                             headers={'Content-Type': 'text/csv'})
+            response = conn.getresponse()
+            while response.read(65536):
+                if stop.is_set():
+                    break
+        except (OSError, http.client.HTTPException):
+            pass
+        conn.close()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run_mode(mode, db_path, socket_path, urls, args, pool):
+    env = dict(os.environ, ATTENDANCE_DB_PATH=db_path)
+    command = [sys.executable, 'serve.py', '--bind', f'unix:{socket_path}',
+               '--workers', str(args.workers), '--threads', str(args.threads)]
+    process = subprocess.Popen(command + MODES[mode], cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    results = []
+    stop = multiprocessing.Event()
+    heavy = []
+    try:
+        wait_for_server(socket_path, process)
+        for kind in args.background:
+            heavy.append(multiprocessing.Process(
+                target=background, args=(socket_path, kind, stop, student_ids(db_path))))
+            heavy[-1].start()
+        for name, url in urls.items():
+            # Warm-up: caches, connection pools, first-request imports
+            pool.map(client, [(socket_path, url, time.time() + 0.5)] * args.concurrency)
+            started = time.time()
+            outcomes = pool.map(client, [(socket_path, url, started + args.duration)]
+                                * args.concurrency)
+            elapsed = time.time() - started
+            latencies = sorted(t for lat, _ in outcomes for t in lat)
+            results.append({
+                'mode': mode,
+                'background': '+'.join(args.background) or None,
+                'endpoint': name,
+                'requests': len(latencies),
+                'errors': sum(e for _, e in outcomes),
+                'requests_per_second': round(len(latencies) / elapsed, 1),
+                'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+                'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            })
+    finally:
+        stop.set()
+        for p in heavy:
+            p.join(timeout=30)
+            if p.is_alive():
+                p.terminate()
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    return results
+
+
+def run(args):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'loadtest.db')
+        build_database(db_path, args.rows).close()
+        urls = endpoints(db_path)
+        with multiprocessing.Pool(args.concurrency) as pool:
+            for mode in args.modes:
+                socket_path = os.path.join(tmp, f'{mode}.sock')
+                results += run_mode(mode, db_path, socket_path, urls, args, pool)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--rows', type=int, default=100_000, help='attendance rows')
+    parser.add_argument('--concurrency', type=int, default=16, help='client processes')
+    parser.add_argument('--duration', type=float, default=5, help='seconds per endpoint')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='server worker processes (gunicorn)')
+    parser.add_argument('--threads', type=int, default=4,
+                        help='threads per worker (uvicorn: light-lane threads)')
+    parser.add_argument('--background', nargs='+', choices=['export', 'import'], default=[],
+                        help='heavy requests to keep running during the measurements')
+    parser.add_argument('--json', action='store_true', help='emit machine-readable results')
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'mode':>9} {'endpoint':>20} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for r in results:
+        print(f"{r['mode']:>9} {r['endpoint']:>20} {r['requests_per_second']:>9} "
+              f"{r['p50_ms']:>8} {r['p99_ms']:>8} {r['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Read-through response cache with TTL + LRU eviction and tag invalidation.
+
+Entries hold the serialized JSON body together with its ETag, so a hit
+costs neither a query nor serialization, and an unchanged response can be
+answered with 304 Not Modified. There is no Last-Modified: two writes in
+the same second would share one, and a client revalidating by date would
+get a stale 304. The ETag is a hash of the body and is always exact.
+Compressed copies of the body are kept alongside it once a client has
+asked for them, so a hit does not recompress either.
+
+Each entry carries tags (e.g. 'overview', 'date:2026-10-17',
+'student:STU0001'); writes invalidate exactly the tags they touch.
+Every database file (tenants.py) has a cache of its own (db.PerDatabase).
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import db
+
+CACHE_TTL = float(os.environ.get('ATTENDANCE_CACHE_TTL', '30'))
+CACHE_SIZE = int(os.environ.get('ATTENDANCE_CACHE_SIZE', '1024'))
+
+# `encoded` memoizes compressed copies of body, keyed by content coding
+CacheEntry = namedtuple('CacheEntry', 'body etag expires tags encoded')
+
+
+class ResponseCache:
+    """Thread-safe TTL/LRU cache of serialized responses"""
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys_by_tag = {}
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.maxsize > 0
+
+    def generation(self):
+        """Token for set(); fills started before an invalidation are dropped"""
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def set(self, key, body, tags, generation):
+        """Store a serialized body; returns the entry (stored or not)"""
+        tags = frozenset(tags)
+        with self._lock:
+            entry = CacheEntry(body, hashlib.sha1(body).hexdigest(),
+                               time.monotonic() + self.ttl, tags, {})
+            if not self.enabled or generation != self._generation:
+                return entry
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+            return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        for tag in entry.tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of the given tags"""
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._remove(key)
+                    self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+            }
+
+
+response_cache = db.PerDatabase(lambda path: ResponseCache())
+
+
+def on_change(kind, dates, student_ids):
+    """changes.py listener: invalidate exactly what a write can affect"""
+    if kind == 'reset':
+        response_cache.clear()
+        return
+    if kind == 'terms':
+        response_cache.invalidate('terms')
+        return
+    tags = ['overview']
+    tags += [f'student:{student_id}' for student_id in student_ids]
+    if kind == 'students':
+        # Names and courses are joined into every date view
+        tags.append('dates')
+    else:
+        tags += [f'date:{d}' for d in dates]
+    response_cache.invalidate(*tags)
@@ -0,0 +1,168 @@
+"""
+Notifications for committed writes, coherent across worker processes.
+
+Triggers on the attendance (in the compact layout, attendance_compact;
+see layout.py) and students tables append every committed insert, update
+and delete to a ``change_log`` table. ``sync(conn)`` reads
+the entries this process has not seen yet and notifies subscribers, so a
+write made by one server worker also invalidates the caches of every other
+worker. Write routes call ``sync()`` right after committing; cached read
+paths call it before serving.
+
+Listeners are called as ``fn(kind, dates, student_ids)`` where kind is
+'attendance' (records added, changed or removed), 'students' (student
+rows added, changed or removed), 'terms' (the term calendar in
+reports.py changed) or 'reset' (a bulk load bypassed the
+triggers, or the log was pruned past this process's position; everything
+derived must be dropped), and
+dates/student_ids are sets of the affected keys.
+"""
+import logging
+import os
+import threading
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# Log entries kept by prune(); delta sync (deltas.py) reaches back this far
+KEEP = int(os.environ.get('ATTENDANCE_CHANGE_LOG_KEEP', '100000'))
+
+_listeners = []
+
+_lock = threading.Lock()
+# Database file -> the last log version published
+_last_seen = {}
+
+
+def _log_entry(entity, op, row, fields=None):
+    if entity == 'attendance':
+        student_id, date = (sql.format(row=row) for sql in (fields['student_id'], fields['date']))
+    else:
+        student_id, date = f'{row}.student_id', 'NULL'
+    return (f"INSERT INTO change_log (entity, op, row_id, student_id, date) "
+            f"VALUES ('{entity}', '{op}', {row}.id, {student_id}, {date});")
+
+
+def create_schema(conn):
+    """Create the change_log table and the triggers that fill it"""
+    from layout import LAYOUTS
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            op TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            student_id TEXT,
+            date TEXT,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    for op, event, row in (('insert', 'INSERT', 'NEW'), ('update', 'UPDATE', 'NEW'),
+                           ('delete', 'DELETE', 'OLD')):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_change_log_students_{op}
+            AFTER {event} ON students BEGIN
+            {_log_entry('student', op, row)}
+            END''')
+    create_attendance_triggers(conn, LAYOUTS['rowid'])
+
+
+def create_attendance_triggers(conn, storage):
+    """Triggers logging every write to an attendance storage table (a
+    layout.LAYOUTS entry)"""
+    table, fields = storage['table'], storage['row']
+    for op, event, row in (('insert', 'INSERT', 'NEW'), ('update', 'UPDATE', 'NEW'),
+                           ('delete', 'DELETE', 'OLD')):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_change_log_attendance_{op}
+            AFTER {event} ON {table} BEGIN
+            {_log_entry('attendance', op, row, fields)}
+            END''')
+    # A record moved to another student or date also changed the old keys
+    moved = ' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in storage['moves'])
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_change_log_attendance_move
+        AFTER UPDATE OF {', '.join(storage['moves'])} ON {table}
+        WHEN {moved} BEGIN
+        {_log_entry('attendance', 'delete', 'OLD', fields)}
+        END''')
+
+
+def log_reset(conn):
+    """Record that the tables changed wholesale without per-row log entries"""
+    conn.execute("INSERT INTO change_log (entity, op, row_id) VALUES ('all', 'reset', 0)")
+
+
+def subscribe(fn):
+    """Register a change listener (usable as a decorator)"""
+    _listeners.append(fn)
+    return fn
+
+
+def publish(kind, dates=(), student_ids=()):
+    """Notify every listener of a committed change"""
+    dates, student_ids = set(dates), set(student_ids)
+    for fn in list(_listeners):
+        try:
+            fn(kind, dates, student_ids)
+        except Exception:
+            # A broken listener must not fail the write that already committed
+            logger.exception('Change listener %r failed', fn)
+
+
+def latest_version(conn):
+    return conn.execute('SELECT MAX(version) FROM change_log').fetchone()[0] or 0
+
+
+def sync(conn):
+    """Publish every change committed since this process last synced.
+
+    The first call only records the current position. Returns the number
+    of log entries published.
+    """
+    path = db.current_path()
+    latest = latest_version(conn)
+    if latest == _last_seen.get(path):
+        return 0
+    with _lock:
+        last_seen = _last_seen.get(path)
+        if last_seen is None or latest <= last_seen:
+            # First sync, or the log was recreated (e.g. a restored backup)
+            if last_seen is not None:
+                publish('reset')
+            _last_seen[path] = latest
+            return 0
+        rows = conn.execute(
+            'SELECT version, entity, student_id, date FROM change_log '
+            'WHERE version > ? AND version <= ? ORDER BY version',
+            (last_seen, latest)).fetchall()
+        if not rows or rows[0][0] != last_seen + 1 or any(r[1] == 'all' for r in rows):
+            publish('reset')
+        else:
+            student_ids, attendance_dates, attendance_ids = set(), set(), set()
+            terms_changed = False
+            for _, entity, student_id, date in rows:
+                if entity == 'student':
+                    student_ids.add(student_id)
+                elif entity == 'term':
+                    terms_changed = True
+                else:
+                    attendance_ids.add(student_id)
+                    attendance_dates.add(date)
+            if attendance_ids:
+                publish('attendance', attendance_dates, attendance_ids)
+            if student_ids:
+                publish('students', student_ids=student_ids)
+            if terms_changed:
+                publish('terms')
+        _last_seen[path] = latest
+        return len(rows)
+
+
+def prune(conn, keep=None):
+    """Delete all but the newest `keep` (default KEEP) log entries"""
+    keep = KEEP if keep is None else keep
+    conn.execute('DELETE FROM change_log WHERE version <= ?',
+                 (latest_version(conn) - keep,))
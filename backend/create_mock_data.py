@@ -1,12 +1,36 @@
-import sqlite3
+"""
+Generate synthetic students and attendance records.
+
+The defaults reproduce the original demo data (50 students, last 30 days,
+weekdays only, 70% present / 20% absent / 10% late). Every dimension is
+parameterized. Outcomes are drawn per student with one random.choices()
+call and expanded into rows by a single INSERT ... SELECT per batch, and
+index and trigger maintenance is suspended during the load (see
+migrations.bulk_load), so millions of rows take seconds.
+
+Usage (from the backend directory):
+    python3 create_mock_data.py
+    python3 create_mock_data.py --students 100000 --days 1826 --seed 1
+    python3 create_mock_data.py --students 5000 --courses 40 --distribution 80,15,5 --db /tmp/big.db
+
+Run it with the server stopped: existing students and attendance are
+replaced, and archived partitions (archive.py) are deleted.
+"""
+import argparse
+import os
 import random
-from datetime import datetime, timedelta
+import sqlite3
+import time
+from datetime import date, timedelta
 
-DB_PATH = 'attendance.db'
+import archive
+import layout
+import migrations
+from db import DB_PATH, configure_connection
 
 # Sample data
-FIRST_NAMES = ['John', 'Jane', 'Michael', 'Emily', 'David', 'Sarah', 'James', 'Jessica', 
-               'Robert', 'Amanda', 'William', 'Ashley', 'Richard', 'Melissa', 'Joseph', 
+FIRST_NAMES = ['John', 'Jane', 'Michael', 'Emily', 'David', 'Sarah', 'James', 'Jessica',
+               'Robert', 'Amanda', 'William', 'Ashley', 'Richard', 'Melissa', 'Joseph',
                'Nicole', 'Thomas', 'Michelle', 'Christopher', 'Kimberly', 'Daniel', 'Amy',
                'Matthew', 'Angela', 'Anthony', 'Lisa', 'Mark', 'Nancy', 'Donald', 'Karen',
                'Steven', 'Betty', 'Paul', 'Helen', 'Andrew', 'Sandra', 'Joshua', 'Donna',
@@ -19,73 +43,173 @@ LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Mille
               'Sanchez', 'Clark', 'Ramirez', 'Lewis', 'Robinson', 'Walker', 'Young', 'Allen',
               'King', 'Wright', 'Scott', 'Torres', 'Nguyen', 'Hill', 'Flores', 'Green', 'Adams']
 
-COURSES = ['Computer Science', 'Mathematics', 'Physics', 'Chemistry', 'Biology', 
+COURSES = ['Computer Science', 'Mathematics', 'Physics', 'Chemistry', 'Biology',
            'Engineering', 'Business', 'Economics', 'Psychology', 'History']
 
-def create_mock_data():
+STATUSES = ('present', 'absent', 'late')
+DEFAULT_DISTRIBUTION = (70, 20, 10)
+
+# Per status: (probability of a note, possible notes)
+NOTES = {
+    'present': (0, []),
+    'absent': (0.3, ['Sick', 'Family emergency', 'Personal reason', 'Medical appointment']),
+    'late': (0.5, ['Traffic', 'Public transport delay', 'Overslept']),
+}
+
+BATCH_SIZE = 50000
+
+
+def course_names(count):
+    """The standard course list, extended with numbered sections if needed"""
+    names = COURSES[:count]
+    section = 2
+    while len(names) < count:
+        names += [f'{course} {section}' for course in COURSES][:count - len(names)]
+        section += 1
+    return names
+
+
+def school_days(days, end=None, weekends=False):
+    """ISO dates of the last `days` calendar days up to `end`, oldest first"""
+    end = end or date.today()
+    dates = (end - timedelta(days=offset) for offset in range(days - 1, -1, -1))
+    return [d.isoformat() for d in dates if weekends or d.weekday() < 5]
+
+
+def student_rows(count, courses, rng):
+    width = max(4, len(str(count)))
+    for i in range(1, count + 1):
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        yield (f'STU{i:0{width}d}', f'{first_name} {last_name}',
+               f'{first_name.lower()}.{last_name.lower()}@university.edu',
+               f'+1-{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+               rng.choice(courses))
+
+
+def outcomes(distribution):
+    """[(status, note)] and their weights: one draw picks the status and note"""
+    total = sum(distribution)
+    choices, weights = [], []
+    for status, weight in zip(STATUSES, distribution):
+        probability, notes = NOTES[status]
+        choices.append((status, None))
+        weights.append(weight / total * (1 - probability))
+        for note in notes:
+            choices.append((status, note))
+            weights.append(weight / total * probability / len(notes))
+    return choices, weights
+
+
+def _case(column, codes, values):
+    branches = ' '.join(f"WHEN '{code}' THEN {value}" for code, value in zip(codes, values))
+    return f'CASE {column} {branches} END'
+
+
+def insert_attendance(conn, student_ids, dates, distribution, rng, batch_size=BATCH_SIZE):
+    """Insert a record for every (student, date); return the row count.
+
+    Each student's outcomes are drawn in one random.choices() call and
+    stored as a string with one character per date. SQL then expands those
+    strings against the date list, so no Python code runs per row.
+    """
+    choices, weights = outcomes(distribution)
+    codes = [chr(ord('a') + i) for i in range(len(choices))]
+    quote = lambda value: 'NULL' if value is None else "'" + value.replace("'", "''") + "'"
+    code = 'substr(g.draws, d.n, 1)'
+    status_sql = _case(code, codes, [quote(status) for status, _ in choices])
+    note_sql = _case(code, codes, [quote(note) for _, note in choices])
+
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS gen_dates (n INTEGER PRIMARY KEY, date TEXT)')
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS gen_draws '
+                 '(seq INTEGER PRIMARY KEY, student_id TEXT, draws TEXT)')
+    conn.execute('DELETE FROM gen_dates')
+    conn.executemany('INSERT INTO gen_dates (n, date) VALUES (?, ?)',
+                     ((n, day) for n, day in enumerate(dates, 1)))
+    per_batch = max(1, batch_size // max(1, len(dates)))
+    written = 0
+    for start in range(0, len(student_ids), per_batch):
+        chunk = student_ids[start:start + per_batch]
+        conn.execute('DELETE FROM gen_draws')
+        conn.executemany('INSERT INTO gen_draws (student_id, draws) VALUES (?, ?)',
+                         ((student_id, ''.join(rng.choices(codes, weights, k=len(dates))))
+                          for student_id in chunk))
+        conn.execute(f'''
+            INSERT INTO attendance (student_id, date, status, notes)
+            SELECT g.student_id, d.date, {status_sql}, {note_sql}
+            FROM gen_draws g CROSS JOIN gen_dates d
+            ORDER BY g.seq, d.n''')
+        conn.commit()
+        # Counted here: an insert through the compact layout's view reports no rows
+        written += len(chunk) * len(dates)
+    return written
+
+
+def generate(conn, students=50, days=30, courses=len(COURSES),
+             distribution=DEFAULT_DISTRIBUTION, seed=None, weekends=False, end=None,
+             batch_size=BATCH_SIZE):
+    """Replace all students and attendance with generated data, deleting
+    any archived partitions.
+
+    Returns (student count, attendance row count).
+    """
+    rng = random.Random(seed)
+    dates = school_days(days, end, weekends)
+    with migrations.bulk_load(conn):
+        archived = archive.clear(conn)
+        conn.execute(f'DELETE FROM {layout.table(conn)}')
+        conn.execute('DELETE FROM students')
+        rows = list(student_rows(students, course_names(courses), rng))
+        conn.executemany('INSERT INTO students (student_id, name, email, phone, course) '
+                         'VALUES (?, ?, ?, ?, ?)', rows)
+        conn.commit()
+        written = insert_attendance(conn, [row[0] for row in rows], dates, distribution, rng,
+                                    batch_size)
+    for path in archived:
+        if os.path.exists(path):
+            os.remove(path)
+    return len(rows), written
+
+
+def create_mock_data(db_path=DB_PATH, **options):
     """Create mock students and attendance data"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Clear existing data
-    cursor.execute('DELETE FROM attendance')
-    cursor.execute('DELETE FROM students')
-    
-    # Create students
-    students = []
-    for i in range(1, 51):  # Create 50 students
-        first_name = random.choice(FIRST_NAMES)
-        last_name = random.choice(LAST_NAMES)
-        name = f"{first_name} {last_name}"
-        student_id = f"STU{str(i).zfill(4)}"
-        email = f"{first_name.lower()}.{last_name.lower()}@university.edu"
-        phone = f"+1-{random.randint(200, 999)}-{random.randint(200, 999)}-{random.randint(1000, 9999)}"
-        course = random.choice(COURSES)
-        
-        cursor.execute('''
-            INSERT INTO students (student_id, name, email, phone, course)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (student_id, name, email, phone, course))
-        
-        students.append(student_id)
-    
-    # Create attendance records for the last 30 days
-    today = datetime.now().date()
-    for day_offset in range(30):
-        attendance_date = today - timedelta(days=day_offset)
-        date_str = attendance_date.strftime('%Y-%m-%d')
-        
-        # Skip weekends (optional - you can remove this if you want weekend data)
-        if attendance_date.weekday() >= 5:  # Saturday = 5, Sunday = 6
-            continue
-        
-        for student_id in students:
-            # Random attendance status (70% present, 20% absent, 10% late)
-            rand = random.random()
-            if rand < 0.70:
-                status = 'present'
-            elif rand < 0.90:
-                status = 'absent'
-            else:
-                status = 'late'
-            
-            # Sometimes add notes
-            notes = None
-            if status == 'absent' and random.random() < 0.3:
-                notes = random.choice(['Sick', 'Family emergency', 'Personal reason', 'Medical appointment'])
-            elif status == 'late' and random.random() < 0.5:
-                notes = random.choice(['Traffic', 'Public transport delay', 'Overslept'])
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO attendance (student_id, date, status, notes)
-                VALUES (?, ?, ?, ?)
-            ''', (student_id, date_str, status, notes))
-    
-    conn.commit()
+    conn = sqlite3.connect(db_path)
+    configure_connection(conn)
+    conn.execute('PRAGMA synchronous = OFF')
+    migrations.migrate(conn)
+    started = time.perf_counter()
+    students, records = generate(conn, **options)
     conn.close()
-    print(f"Created {len(students)} students with attendance records for the last 30 days!")
+    elapsed = time.perf_counter() - started
+    print(f"Created {students} students with {records} attendance records "
+          f"for the last {options.get('days', 30)} days in {elapsed:.1f}s!")
     print("Mock data generation completed successfully!")
 
-if __name__ == '__main__':
-    create_mock_data()
 
+def parse_distribution(value):
+    weights = tuple(float(part) for part in value.split(','))
+    if len(weights) != len(STATUSES) or any(w < 0 for w in weights) or not any(weights):
+        raise argparse.ArgumentTypeError('expected three non-negative weights: present,absent,late')
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate mock attendance data')
+    parser.add_argument('--db', default=DB_PATH, help='database file (default: %(default)s)')
+    parser.add_argument('--students', type=int, default=50)
+    parser.add_argument('--days', type=int, default=30, help='calendar days of history')
+    parser.add_argument('--courses', type=int, default=len(COURSES))
+    parser.add_argument('--distribution', type=parse_distribution, default=DEFAULT_DISTRIBUTION,
+                        help='present,absent,late weights (default: 70,20,10)')
+    parser.add_argument('--seed', type=int, help='random seed for reproducible data')
+    parser.add_argument('--weekends', action='store_true', help='include Saturdays and Sundays')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    create_mock_data(args.db, students=args.students, days=args.days, courses=args.courses,
+                     distribution=args.distribution, seed=args.seed, weekends=args.weekends,
+                     batch_size=args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
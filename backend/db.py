@@ -0,0 +1,306 @@
+"""
+SQLite connection pooling for the attendance API.
+
+Connections are long-lived and configured once (WAL journaling, cache and
+mmap sizing, busy timeout) instead of being opened and torn down on every
+request. Use them through the ``connection()`` context manager:
+
+    with get_pool().connection() as conn:
+        conn.execute('SELECT 1')
+
+Requests for a tenant (tenants.py) are routed to the tenant's own
+database file: ``use()`` sets the database for the current context, and
+``get_pool()`` and the ``PerDatabase`` singletons follow it.
+"""
+import contextvars
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DB_PATH = os.environ.get('ATTENDANCE_DB_PATH', 'attendance.db')
+
+POOL_SIZE = int(os.environ.get('ATTENDANCE_DB_POOL_SIZE', '8'))
+POOL_TIMEOUT = float(os.environ.get('ATTENDANCE_DB_POOL_TIMEOUT', '10'))
+
+# Connections idle for longer than this are pinged before being handed out
+HEALTH_CHECK_INTERVAL = 30.0
+
+# SQLite VM instructions between checks of a request's cancel event
+CANCEL_CHECK_INTERVAL = 10000
+
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 5000),
+    ('cache_size', -16000),          # 16 MB page cache per connection
+    ('mmap_size', 256 * 1024 * 1024),
+    ('temp_store', 'MEMORY'),
+    # REPLACE conflict resolution must fire delete triggers (summary tables)
+    ('recursive_triggers', 'ON'),
+)
+
+
+# Database file of the request being served; None means DB_PATH
+_current = contextvars.ContextVar('attendance_database', default=None)
+
+
+def current_path():
+    """The database file of the current context (DB_PATH unless routed)"""
+    return _current.get() or DB_PATH
+
+
+def use(path):
+    """Route this context's database work to `path` (None: DB_PATH).
+
+    Returns a token for restore().
+    """
+    return _current.set(path)
+
+
+def restore(token):
+    _current.reset(token)
+
+
+@contextmanager
+def using(path):
+    """use(path) for the duration of the block"""
+    token = use(path)
+    try:
+        yield
+    finally:
+        restore(token)
+
+
+class PerDatabase:
+    """One lazily created ``factory(db_path)`` object per database file.
+
+    Attribute access is forwarded to the current database's object, so a
+    module-level singleton (the response cache, the write queue...) keeps
+    its interface while every tenant gets an object of its own.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._objects = {}
+        self._lock = threading.Lock()
+
+    def instance(self, path=None):
+        path = path or current_path()
+        obj = self._objects.get(path)
+        if obj is None:
+            with self._lock:
+                obj = self._objects.get(path)
+                if obj is None:
+                    obj = self._objects[path] = self._factory(path)
+        return obj
+
+    def instances(self):
+        """[(db_path, object)] for every database used so far"""
+        return list(self._objects.items())
+
+    def __getattr__(self, name):
+        return getattr(self.instance(), name)
+
+
+def configure_connection(conn):
+    """Apply the standard PRAGMA settings to a new connection"""
+    for name, value in PRAGMAS:
+        conn.execute(f'PRAGMA {name} = {value}')
+
+
+_cancel = threading.local()
+
+
+@contextmanager
+def cancel_on(event):
+    """Interrupt queries run by this thread once `event` is set.
+
+    Connections checked out inside the block get a progress handler that
+    aborts the running statement with sqlite3.OperationalError
+    ('interrupted'), e.g. when the client of a request has disconnected.
+    """
+    _cancel.event = event
+    try:
+        yield
+    finally:
+        _cancel.event = None
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the pool timeout"""
+
+
+class ConnectionPool:
+    """A bounded pool of pre-configured SQLite connections"""
+
+    def __init__(self, db_path, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """Drop every pooled connection (used on creation and after fork)"""
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._health_check_failures = 0
+
+    def _connect(self):
+        import metrics  # deferred: metrics imports Flask
+        factory = metrics.Connection if metrics.ENABLED else sqlite3.Connection
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, factory=factory)
+        conn.row_factory = sqlite3.Row
+        configure_connection(conn)
+        return conn
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _acquire(self):
+        if os.getpid() != self._pid:
+            # Connections must never be shared with a forked parent/child
+            with self._lock:
+                if os.getpid() != self._pid:
+                    self._reset()
+
+        started = time.perf_counter()
+        conn, last_used = None, None
+        with self._lock:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                if self._created < self.size:
+                    self._created += 1
+                    conn = False  # reserve a slot, connect outside the lock
+
+        if conn is False:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        elif conn is None:
+            try:
+                conn, last_used = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise PoolTimeout(
+                    f'No database connection available after {self.timeout}s')
+
+        if last_used is not None and time.monotonic() - last_used > HEALTH_CHECK_INTERVAL:
+            if not self._is_healthy(conn):
+                with self._lock:
+                    self._health_check_failures += 1
+                conn.close()
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            self._wait_time += waited
+            self._max_wait = max(self._max_wait, waited)
+        return conn
+
+    def _release(self, conn, pid):
+        if pid != os.getpid():
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Broken handles are not worth reusing
+            conn.close()
+            with self._lock:
+                self._in_use -= 1
+                self._created -= 1
+            return
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection, returning it to the pool afterwards.
+
+        Any transaction left open (e.g. after an exception) is rolled back
+        before the connection is reused.
+        """
+        pid = os.getpid()
+        conn = self._acquire()
+        event = getattr(_cancel, 'event', None)
+        if event is not None:
+            conn.set_progress_handler(event.is_set, CANCEL_CHECK_INTERVAL)
+        try:
+            yield conn
+        finally:
+            if event is not None:
+                conn.set_progress_handler(None, 0)
+            self._release(conn, pid)
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            while True:
+                try:
+                    conn, _ = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._created -= 1
+
+    def stats(self):
+        """Pool metrics for sizing decisions"""
+        with self._lock:
+            return {
+                'db_path': self.db_path,
+                'size': self.size,
+                'created': self._created,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize(),
+                'checkouts': self._checkouts,
+                'total_wait_ms': round(self._wait_time * 1000, 3),
+                'avg_wait_ms': round(self._wait_time * 1000 / self._checkouts, 3) if self._checkouts else 0,
+                'max_wait_ms': round(self._max_wait * 1000, 3),
+                'health_check_failures': self._health_check_failures,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=None):
+    """Return the process-wide pool for a database file (default: the
+    current context's, see use())"""
+    path = db_path or current_path()
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                pool = _pools[path] = ConnectionPool(path)
+    return pool
+
+
+def all_pool_stats():
+    """Metrics for every pool in this process"""
+    return [pool.stats() for pool in list(_pools.values())]
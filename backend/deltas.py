@@ -0,0 +1,135 @@
+"""
+Delta sync: what changed since a change-log version (GET /api/sync).
+
+Every insert, update and delete of attendance and students is recorded in
+``change_log`` (changes.py) with a monotonically increasing version,
+including the attendance rows removed by delete_student(). A client keeps
+a local replica like this:
+
+1. Snapshot: ``GET /api/sync?date=2026-10-17`` (or ``?student_id=``)
+   returns the matching records and the current ``version``.
+2. Delta: ``GET /api/sync?date=2026-10-17&since=<version>`` returns only
+   the records that changed after that version (their current state), a
+   tombstone for each one deleted, and the new ``version``. Apply
+   ``deleted`` first, then the upserts: a record moved to another date or
+   student has a tombstone for its old key and an upsert with its new one.
+3. While ``more`` is true, ask again straight away with the new version.
+4. ``reset`` means the log no longer reaches back to ``since`` (it was
+   pruned, or a bulk load bypassed it): drop the replica and take a new
+   snapshot.
+
+Snapshot and delta are each read in one transaction, so the rows and the
+version describe the same state.
+"""
+import layout
+from changes import latest_version
+
+# Log entries read per call
+DEFAULT_LIMIT = 1000
+
+STUDENT_FIELDS = ('id', 'student_id', 'name', 'email', 'phone', 'course', 'created_at')
+
+
+def _attendance(conn, columns, date, student_id, ids=None):
+    """Records matching the filters (and ids), in (date, student_id) order"""
+    source, columns = layout.joined(conn, columns)
+    conditions, params = [], []
+    if date is not None:
+        conditions.append(f"{columns['date']} = ?")
+        params.append(date)
+    if student_id is not None:
+        conditions.append(f"{columns['student_id']} = ?")
+        params.append(student_id)
+    if ids is not None:
+        conditions.append(f"{columns['id']} IN ({', '.join('?' * len(ids))})")
+        params.extend(ids)
+    select = ', '.join(f'{sql} AS {field}' for field, sql in columns.items())
+    rows = conn.execute(f'''
+        SELECT {select}
+        FROM {source}
+        WHERE {' AND '.join(conditions)}
+        ORDER BY {columns['date']}, {columns['student_id']}''', params).fetchall()
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def snapshot(conn, columns, date=None, student_id=None):
+    """The current records matching the filters, with the current version"""
+    conn.execute('BEGIN')
+    try:
+        version = latest_version(conn)
+        records = _attendance(conn, columns, date, student_id)
+    finally:
+        conn.rollback()
+    return {'version': version, 'since': None, 'more': False, 'reset': False,
+            'attendance': records, 'students': [],
+            'deleted': {'attendance': [], 'students': []}}
+
+
+def delta(conn, columns, since, date=None, student_id=None, limit=DEFAULT_LIMIT):
+    """Changes after version `since` matching the filters (see above)"""
+    result = {'since': since, 'more': False, 'reset': False, 'attendance': [],
+              'students': [], 'deleted': {'attendance': [], 'students': []}}
+    conn.execute('BEGIN')
+    try:
+        latest = latest_version(conn)
+        oldest = conn.execute('SELECT MIN(version) FROM change_log').fetchone()[0]
+        result['version'] = latest
+        if since > latest or (since < latest and (oldest is None or oldest > since + 1)):
+            result['reset'] = True
+            return result
+
+        conditions, params = ['version > ?', "entity IN ('attendance', 'student', 'all')"], [since]
+        if date is not None:
+            conditions.append("(entity != 'attendance' OR date = ?)")
+            params.append(date)
+        if student_id is not None:
+            conditions.append("(entity = 'all' OR student_id = ?)")
+            params.append(student_id)
+        entries = conn.execute(f'''
+            SELECT version, entity, op, row_id, student_id, date FROM change_log
+            WHERE {' AND '.join(conditions)}
+            ORDER BY version LIMIT ?''', params + [limit + 1]).fetchall()
+        if len(entries) > limit:
+            entries = entries[:limit]
+            result['more'] = True
+            result['version'] = entries[-1][0]
+        if any(entry[1] == 'all' for entry in entries):
+            result['reset'] = True
+            result['version'] = latest
+            result['more'] = False
+            return result
+
+        attendance_ids, student_row_ids = set(), set()
+        attendance_deletes, student_deletes = {}, {}
+        for _, entity, op, row_id, key, day in entries:
+            if entity == 'attendance':
+                attendance_ids.add(row_id)
+                if op == 'delete':
+                    attendance_deletes[(row_id, key, day)] = None
+            else:
+                student_row_ids.add(row_id)
+                if op == 'delete':
+                    student_deletes[(row_id, key)] = None
+
+        if attendance_ids:
+            records = _attendance(conn, columns, date, student_id, sorted(attendance_ids))
+            current = {(r['id'], r['student_id'], r['date']) for r in records}
+            result['attendance'] = records
+            # A delete entry is a tombstone unless the row still has that key
+            result['deleted']['attendance'] = [
+                {'id': row_id, 'student_id': key, 'date': day}
+                for row_id, key, day in attendance_deletes if (row_id, key, day) not in current]
+
+        if student_row_ids:
+            id_list = sorted(student_row_ids)
+            rows = conn.execute(
+                f"SELECT {', '.join(STUDENT_FIELDS)} FROM students "
+                f"WHERE id IN ({', '.join('?' * len(id_list))}) ORDER BY id", id_list).fetchall()
+            result['students'] = [dict(zip(STUDENT_FIELDS, row)) for row in rows]
+            present = {student['id'] for student in result['students']}
+            result['deleted']['students'] = [
+                {'id': row_id, 'student_id': key}
+                for row_id, key in student_deletes if row_id not in present]
+    finally:
+        conn.rollback()
+    return result
@@ -0,0 +1,49 @@
+"""
+Batch encoders for streamed attendance exports.
+
+Each encoder turns a batch of plain tuple rows into one text chunk, so the
+export route never holds more than one batch in memory.
+"""
+import csv
+import io
+import json
+from json.encoder import encode_basestring
+
+
+def _json_value(value):
+    """JSON-encode one SQLite column value (None, int, float or str)"""
+    if value is None:
+        return 'null'
+    if type(value) is int:
+        return str(value)
+    if type(value) is float:
+        return json.dumps(value)
+    return encode_basestring(value)
+
+
+def ndjson_encoder(fields):
+    """Return a function encoding rows as newline-delimited JSON objects.
+
+    The object layout is fixed per export, so keys are encoded once into a
+    format template and only the column values are encoded per row. This is
+    several times cheaper than building and serializing a dict per row.
+    """
+    template = '{' + ','.join(f'{json.dumps(field)}:%s' for field in fields) + '}\n'
+
+    def encode(rows):
+        return ''.join([template % tuple(map(_json_value, row)) for row in rows])
+    return encode
+
+
+def csv_header(fields):
+    """CSV header line for the exported fields"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(fields)
+    return buffer.getvalue()
+
+
+def encode_csv(rows):
+    """Encode rows as CSV lines (header not included)"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
@@ -0,0 +1,130 @@
+"""
+Bulk attendance ingest: columnar validation plus one executemany upsert.
+
+The payload is validated column by column before anything touches the
+database, so every bad row is reported at once instead of the first bad row
+aborting the batch. Valid rows are written in a single transaction with a
+real upsert, which keeps the id of an existing (student_id, date) record
+stable, unlike INSERT OR REPLACE.
+"""
+import csv
+import io
+import json
+
+import archive
+import layout
+from stats import STATUSES, validate_date
+
+_STATUS_SET = frozenset(STATUSES)
+
+CSV_COLUMNS = ('student_id', 'date', 'status', 'notes')
+
+
+def parse_csv(text):
+    """Parse a CSV body with a student_id,date,status[,notes] header"""
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [column for column in CSV_COLUMNS[:3] if column not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f"CSV header is missing column(s): {', '.join(missing)}")
+    return [{column: (row.get(column) or None) for column in CSV_COLUMNS} for row in reader]
+
+
+def _valid_date(value):
+    try:
+        validate_date(value)
+        return True
+    except ValueError:
+        return False
+
+
+def known_student_ids(conn, student_ids):
+    """The subset of student_ids that exist, looked up in one query"""
+    rows = conn.execute(
+        'SELECT student_id FROM students WHERE student_id IN (SELECT value FROM json_each(?))',
+        (json.dumps(list(student_ids)),))
+    return {row[0] for row in rows}
+
+
+def validate(conn, records):
+    """Validate a list of attendance records.
+
+    Returns (rows, errors). rows holds (index, (student_id, date, status,
+    notes)) tuples for the valid records. errors holds
+    {'row': index, 'errors': [...]} entries for the rest.
+    """
+    problems = {}
+
+    def reject(indexes, message):
+        for i in indexes:
+            problems.setdefault(i, []).append(message)
+
+    objects = [record if isinstance(record, dict) else {} for record in records]
+
+    # Transpose into columns, keeping only well-typed values
+    student_ids = [r.get('student_id') for r in objects]
+    dates = [r.get('date') for r in objects]
+    statuses = [r.get('status') for r in objects]
+    notes = [r.get('notes') for r in objects]
+    student_ids = [v if isinstance(v, str) and v else None for v in student_ids]
+    dates = [v if isinstance(v, str) else None for v in dates]
+    statuses = [v if isinstance(v, str) else None for v in statuses]
+
+    reject((i for i, v in enumerate(student_ids) if v is None), 'student_id is required')
+
+    # Distinct dates and student ids are validated once each
+    good_dates = {d for d in set(dates) if d is not None and _valid_date(d)}
+    reject((i for i, d in enumerate(dates) if d not in good_dates),
+           'date must be YYYY-MM-DD')
+    closed = archive.archived_dates(conn, good_dates)
+    reject((i for i, d in enumerate(dates) if d in closed),
+           'date is archived (archive.py)')
+
+    reject((i for i, s in enumerate(statuses) if s not in _STATUS_SET),
+           f"status must be one of {', '.join(STATUSES)}")
+
+    reject((i for i, n in enumerate(notes) if n is not None and not isinstance(n, str)),
+           'notes must be a string')
+
+    distinct_ids = set(student_ids)
+    distinct_ids.discard(None)
+    known = known_student_ids(conn, distinct_ids) if distinct_ids else set()
+    reject((i for i, v in enumerate(student_ids) if v is not None and v not in known),
+           'unknown student_id')
+
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            problems[i] = ['record must be an object']
+
+    rows = [(i, (student_ids[i], dates[i], statuses[i], notes[i]))
+            for i in range(len(records)) if i not in problems]
+    errors = [{'row': i, 'errors': messages} for i, messages in sorted(problems.items())]
+    return rows, errors
+
+
+def write(conn, rows):
+    """Upsert validated rows in one transaction; returns the row count"""
+    conn.executemany(layout.statement(conn, 'upsert'), (row for _, row in rows))
+    conn.commit()
+    return len(rows)
+
+
+def ingest(conn, records, atomic=False):
+    """Validate and write a batch of records.
+
+    With atomic=True nothing is written if any record is invalid; otherwise
+    valid records are written and invalid ones are reported. Returns
+    (summary, written_rows) where written_rows are the upserted
+    (student_id, date, status, notes) tuples.
+    """
+    rows, errors = validate(conn, records)
+    if not rows or (atomic and errors):
+        rows = []
+    else:
+        write(conn, rows)
+    summary = {
+        'received': len(records),
+        'written': len(rows),
+        'rejected': len(errors),
+        'errors': errors,
+    }
+    return summary, [row for _, row in rows]
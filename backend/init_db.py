@@ -5,6 +5,7 @@ from app import init_db
 
 if __name__ == '__main__':
     print("Initializing database...")
-    init_db()
+    for version, description in init_db():
+        print(f"  applied migration {version}: {description}")
     print("✅ Database initialized successfully!")
 
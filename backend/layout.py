@@ -0,0 +1,430 @@
+"""
+Storage layouts for attendance records.
+
+``rowid`` (the default) stores each record in the ``attendance`` table as
+created by the migrations: a TEXT student_id, a TEXT date and a TEXT
+status, keyed by a rowid with separate indexes on (date, student_id) and
+(student_id, status).
+
+``compact`` stores the same records in ``attendance_compact``:
+
+    day      INTEGER  days since 1970-01-01 (attendance_days maps them back)
+    student  INTEGER  students.id
+    status   INTEGER  0 present, 1 absent, 2 late
+    id, notes, created_at as before
+
+clustered WITHOUT ROWID on (day, student), so a day's records sit together
+and the date index is the table itself. ``attendance`` becomes a view that
+decodes the rows into the original columns, with INSTEAD OF triggers for
+ad-hoc writes, so every reader sees the same rows and the API output is
+byte-identical. Record ids keep their AUTOINCREMENT behaviour through the
+``attendance_ids`` counter. The summary and change-log triggers move to
+the compact table, and the hot paths (listing, export, delta sync, marks,
+updates and deletes) use its integer keys directly through ``joined()``
+and ``statement()``.
+
+A student's attendance must be deleted before the student (the compact
+rows refer to students.id).
+
+Usage (from the backend directory):
+    python3 layout.py --status
+    python3 layout.py --convert compact   # or rowid to convert back
+"""
+import argparse
+import os
+import sqlite3
+import sys
+
+from summaries import STATUSES
+
+# julianday('1970-01-01'); day numbers count whole days from there
+EPOCH = 2440587.5
+
+_DAY_OF = f'CAST(julianday({{date}}) - {EPOCH} AS INTEGER)'
+_DATE_OF = f'date({{day}} + {EPOCH})'
+_STATUS_CODE = ('CASE {status} '
+                + ' '.join(f"WHEN '{status}' THEN {code}" for code, status in enumerate(STATUSES))
+                + ' END')
+_STATUS_NAME = ('CASE {code} '
+                + ' '.join(f"WHEN {code} THEN '{status}'" for code, status in enumerate(STATUSES))
+                + ' END')
+
+# What the summary (summaries.py) and change-log (changes.py) triggers need
+# to know about each layout's storage table: its name, the columns that
+# move a record to another student or date, and SQL for the decoded fields
+# of a NEW/OLD row.
+LAYOUTS = {
+    'rowid': {
+        'table': 'attendance',
+        'moves': ('student_id', 'date'),
+        'row': {
+            'student_id': '{row}.student_id',
+            'date': '{row}.date',
+            'status': '{row}.status',
+            'course': "(SELECT course FROM students WHERE student_id = {row}.student_id)",
+        },
+    },
+    'compact': {
+        'table': 'attendance_compact',
+        'moves': ('student', 'day'),
+        'row': {
+            'student_id': '(SELECT student_id FROM students WHERE id = {row}.student)',
+            'date': _DATE_OF.format(day='{row}.day'),
+            'status': _STATUS_NAME.format(code='{row}.status'),
+            'course': '(SELECT course FROM students WHERE id = {row}.student)',
+        },
+    },
+}
+
+# Attendance joined with its student, and the compact replacements for the
+# rowid layout's column expressions (see joined())
+_JOINS = {
+    'rowid': ('attendance a JOIN students s ON a.student_id = s.student_id', {}),
+    'compact': ('attendance_compact a JOIN students s ON s.id = a.student '
+                'JOIN attendance_days d ON d.day = a.day',
+                {'a.student_id': 's.student_id',
+                 'a.date': 'd.date',
+                 'a.status': _STATUS_NAME.format(code='a.status')}),
+}
+
+# The joins for reads in date order that are also bounded by date. With a
+# plain join the rowid layout's planner may start from students, seeking
+# each one's dates in the (student_id, date) index, and then sort every
+# row; CROSS JOIN keeps attendance the outer loop, read off the date index.
+_DATE_ORDER_JOINS = {
+    'rowid': 'attendance a CROSS JOIN students s ON a.student_id = s.student_id',
+    'compact': _JOINS['compact'][0],
+}
+
+# Write statements used by the API, per layout. Parameters are the same in
+# both layouts: upsert (student_id, date, status, notes), update (status,
+# notes, id), delete (id), delete_student (student_id), delete_range (first
+# date, last date; used by archive.py).
+STATEMENTS = {
+    'rowid': {
+        'upsert': '''
+            INSERT INTO attendance (student_id, date, status, notes)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (student_id, date) DO UPDATE
+            SET status = excluded.status, notes = excluded.notes''',
+        'update': 'UPDATE attendance SET status = ?, notes = ? WHERE id = ?',
+        'delete': 'DELETE FROM attendance WHERE id = ?',
+        'delete_student': 'DELETE FROM attendance WHERE student_id = ?',
+        'delete_range': 'DELETE FROM attendance WHERE date BETWEEN ? AND ?',
+    },
+    'compact': {
+        # The WHERE clause also keeps the SELECT from swallowing ON CONFLICT
+        'upsert': f'''
+            INSERT INTO attendance_compact (day, student, status, notes, id)
+            SELECT {_DAY_OF.format(date='?2')}, s.id, {_STATUS_CODE.format(status='?3')}, ?4,
+                   (SELECT seq + 1 FROM attendance_ids)
+            FROM students s WHERE s.student_id = ?1
+            ON CONFLICT (day, student) DO UPDATE
+            SET status = excluded.status, notes = excluded.notes, id = id''',
+        'update': f'''
+            UPDATE attendance_compact
+            SET status = {_STATUS_CODE.format(status='?1')}, notes = ?2 WHERE id = ?3''',
+        'delete': 'DELETE FROM attendance_compact WHERE id = ?',
+        'delete_student': ('DELETE FROM attendance_compact '
+                           'WHERE student = (SELECT id FROM students WHERE student_id = ?)'),
+        'delete_range': (f"DELETE FROM attendance_compact WHERE day "
+                         f"BETWEEN {_DAY_OF.format(date='?1')} AND {_DAY_OF.format(date='?2')}"),
+    },
+}
+
+
+def current(conn):
+    """'compact' when attendance is a view, else 'rowid'"""
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'attendance'").fetchone()
+    return 'compact' if row and row[0] == 'view' else 'rowid'
+
+
+def table(conn):
+    """The table attendance records are stored in"""
+    return LAYOUTS[current(conn)]['table']
+
+
+def statement(conn, name):
+    """The write statement `name` (see STATEMENTS) for the database's layout"""
+    return STATEMENTS[current(conn)][name]
+
+
+def joined(conn, columns, date_order=False):
+    """FROM clause and column SQL for reading attendance joined with students.
+
+    `columns` maps field names to expressions over ``attendance a`` and
+    ``students s`` as in the rowid layout (a.date, s.name, ...). Returns
+    (from_sql, columns) with the expressions rewritten for the database's
+    layout, so compact databases join and filter on the integer keys
+    instead of going through the attendance view. date_order=True gives a
+    join for reads ordered by date and bounded by date, which keeps them
+    in date index order (see _DATE_ORDER_JOINS).
+    """
+    storage = current(conn)
+    from_sql, replacements = _JOINS[storage]
+    if date_order:
+        from_sql = _DATE_ORDER_JOINS[storage]
+    return from_sql, {name: replacements.get(sql, sql) for name, sql in columns.items()}
+
+
+def student_join(conn, date_from=None, date_to=None):
+    """LEFT JOIN of each student's attendance rows ``a`` onto ``students s``.
+
+    The rows can be limited to an inclusive date range. Returns (join_sql,
+    status_sql, params), where status_sql is a row's status name. Either
+    way each student is one range read of a per-student index.
+    """
+    if current(conn) == 'compact':
+        sql = 'LEFT JOIN attendance_compact a ON a.student = s.id'
+        date_sql, bound = 'a.day', _DAY_OF.format(date='?')
+        status_sql = _STATUS_NAME.format(code='a.status')
+    else:
+        sql = 'LEFT JOIN attendance a ON a.student_id = s.student_id'
+        date_sql, bound, status_sql = 'a.date', '?', 'a.status'
+    params = []
+    if date_from is not None:
+        sql += f' AND {date_sql} >= {bound}'
+        params.append(date_from)
+    if date_to is not None:
+        sql += f' AND {date_sql} <= {bound}'
+        params.append(date_to)
+    return sql, status_sql, params
+
+
+# ========== COMPACT SCHEMA ==========
+
+def _create_compact(conn):
+    conn.execute(f'''
+        CREATE TABLE attendance_compact (
+            day INTEGER NOT NULL,
+            student INTEGER NOT NULL REFERENCES students(id),
+            status INTEGER NOT NULL CHECK(status IN ({', '.join(str(code) for code in range(len(STATUSES)))})),
+            id INTEGER NOT NULL UNIQUE,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (day, student)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE TABLE attendance_days (day INTEGER PRIMARY KEY, date TEXT NOT NULL UNIQUE)')
+    conn.execute('CREATE TABLE attendance_ids (seq INTEGER NOT NULL)')
+
+
+def _create_compact_objects(conn):
+    """Indexes, the decoding view and the triggers of the compact layout"""
+    import archive
+    import changes
+    import summaries
+
+    # (day, student) is the primary key; these carry it as their suffix
+    conn.execute('CREATE INDEX idx_attendance_student_day ON attendance_compact (student, day, status)')
+    conn.execute('CREATE INDEX idx_attendance_status ON attendance_compact (status)')
+    conn.execute(f'''
+        CREATE VIEW attendance AS
+        SELECT a.id AS id, s.student_id AS student_id, d.date AS date,
+               {_STATUS_NAME.format(code='a.status')} AS status,
+               a.notes AS notes, a.created_at AS created_at
+        FROM attendance_compact a
+        JOIN students s ON s.id = a.student
+        JOIN attendance_days d ON d.day = a.day''')
+
+    # Day names and the id counter follow every write path
+    conn.execute(f'''
+        CREATE TRIGGER trg_attendance_compact_insert
+        AFTER INSERT ON attendance_compact BEGIN
+        INSERT OR IGNORE INTO attendance_days (day, date) VALUES (NEW.day, {_DATE_OF.format(day='NEW.day')});
+        UPDATE attendance_ids SET seq = NEW.id WHERE seq < NEW.id;
+        END''')
+    # An upsert that updates a record still uses up an id, as AUTOINCREMENT
+    # does in the rowid layout, so both layouts hand out the same ids. The
+    # compact upsert statement lists id in its SET clause for this.
+    conn.execute('''
+        CREATE TRIGGER trg_attendance_compact_upsert
+        AFTER UPDATE OF id ON attendance_compact BEGIN
+        UPDATE attendance_ids SET seq = MAX(seq + (NEW.id = OLD.id), NEW.id);
+        END''')
+    conn.execute(f'''
+        CREATE TRIGGER trg_attendance_compact_day
+        AFTER UPDATE OF day ON attendance_compact BEGIN
+        INSERT OR IGNORE INTO attendance_days (day, date) VALUES (NEW.day, {_DATE_OF.format(day='NEW.day')});
+        END''')
+
+    # Writes through the view. The insert trigger allocates the id itself,
+    # so it keeps working while bulk_load() has the triggers above dropped.
+    student = '(SELECT id FROM students WHERE student_id = NEW.student_id)'
+    conn.execute(f'''
+        CREATE TRIGGER trg_attendance_view_insert
+        INSTEAD OF INSERT ON attendance BEGIN
+        SELECT RAISE(ABORT, 'unknown student_id') WHERE {student} IS NULL;
+        UPDATE attendance_ids SET seq = seq + 1;
+        INSERT INTO attendance_compact (day, student, status, id, notes, created_at)
+        VALUES ({_DAY_OF.format(date='NEW.date')}, {student},
+                {_STATUS_CODE.format(status='NEW.status')},
+                COALESCE(NEW.id, (SELECT seq FROM attendance_ids)), NEW.notes,
+                COALESCE(NEW.created_at, CURRENT_TIMESTAMP));
+        END''')
+    conn.execute(f'''
+        CREATE TRIGGER trg_attendance_view_update
+        INSTEAD OF UPDATE ON attendance BEGIN
+        SELECT RAISE(ABORT, 'unknown student_id') WHERE {student} IS NULL;
+        UPDATE attendance_compact
+        SET day = {_DAY_OF.format(date='NEW.date')}, student = {student},
+            status = {_STATUS_CODE.format(status='NEW.status')},
+            notes = NEW.notes, created_at = NEW.created_at
+        WHERE id = OLD.id;
+        UPDATE attendance_compact SET id = NEW.id WHERE id = OLD.id AND NEW.id IS NOT OLD.id;
+        END''')
+    conn.execute('''
+        CREATE TRIGGER trg_attendance_view_delete
+        INSTEAD OF DELETE ON attendance BEGIN
+        DELETE FROM attendance_compact WHERE id = OLD.id;
+        END''')
+
+    summaries.create_attendance_triggers(conn, LAYOUTS['compact'])
+    changes.create_attendance_triggers(conn, LAYOUTS['compact'])
+    archive.create_attendance_triggers(conn, LAYOUTS['compact'])
+
+
+def rebuild(conn):
+    """Refill the compact layout's day names and id counter from its rows.
+
+    Needed after loading with the triggers dropped (migrations.bulk_load());
+    a no-op for the rowid layout.
+    """
+    if current(conn) != 'compact':
+        return
+    conn.execute(f'''
+        INSERT OR IGNORE INTO attendance_days (day, date)
+        SELECT day, {_DATE_OF.format(day='day')} FROM attendance_compact GROUP BY day''')
+    conn.execute('UPDATE attendance_ids SET seq = MAX(seq, '
+                 '(SELECT COALESCE(MAX(id), 0) FROM attendance_compact))')
+
+
+# ========== CONVERSION ==========
+
+def _problems(conn):
+    """Rows the compact layout cannot represent, as messages"""
+    problems = []
+    orphans = conn.execute('''
+        SELECT COUNT(*) FROM attendance a
+        WHERE NOT EXISTS (SELECT 1 FROM students s WHERE s.student_id = a.student_id)''').fetchone()[0]
+    if orphans:
+        problems.append(f'{orphans} attendance row(s) refer to a missing student')
+    day = _DAY_OF.format(date='date')
+    bad_dates = conn.execute(f'''
+        SELECT COUNT(*) FROM attendance
+        WHERE {_DATE_OF.format(day=day)} IS NOT date''').fetchone()[0]
+    if bad_dates:
+        problems.append(f'{bad_dates} attendance row(s) have a date that is not YYYY-MM-DD')
+    return problems
+
+
+def _to_compact(conn):
+    problems = _problems(conn)
+    if problems:
+        raise ValueError('; '.join(problems))
+    _create_compact(conn)
+    conn.execute(f'''
+        INSERT INTO attendance_compact (day, student, status, id, notes, created_at)
+        SELECT {_DAY_OF.format(date='a.date')}, s.id, {_STATUS_CODE.format(status='a.status')},
+               a.id, a.notes, a.created_at
+        FROM attendance a JOIN students s ON s.student_id = a.student_id
+        ORDER BY 1, 2''')
+    conn.execute('''
+        INSERT INTO attendance_ids (seq)
+        SELECT MAX(COALESCE((SELECT MAX(id) FROM attendance), 0),
+                   COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'attendance'), 0))''')
+    conn.execute('DROP TABLE attendance')  # with its indexes and triggers
+    _create_compact_objects(conn)
+    rebuild(conn)
+
+
+def _to_rowid(conn):
+    import archive
+    import changes
+    import migrations
+    import summaries
+
+    conn.execute('DROP VIEW attendance')  # with its INSTEAD OF triggers
+    migrations._base_schema(conn)
+    conn.execute(f'''
+        INSERT INTO attendance (id, student_id, date, status, notes, created_at)
+        SELECT a.id, s.student_id, {_DATE_OF.format(day='a.day')},
+               {_STATUS_NAME.format(code='a.status')}, a.notes, a.created_at
+        FROM attendance_compact a JOIN students s ON s.id = a.student
+        ORDER BY a.id''')
+    conn.execute("DELETE FROM sqlite_sequence WHERE name = 'attendance'")
+    conn.execute('''
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT 'attendance', MAX(seq, (SELECT COALESCE(MAX(id), 0) FROM attendance))
+        FROM attendance_ids''')
+    for name in ('attendance_compact', 'attendance_days', 'attendance_ids'):
+        conn.execute(f'DROP TABLE {name}')
+    migrations._secondary_indexes(conn)
+    summaries.create_attendance_triggers(conn, LAYOUTS['rowid'])
+    changes.create_attendance_triggers(conn, LAYOUTS['rowid'])
+    archive.create_attendance_triggers(conn, LAYOUTS['rowid'])
+
+
+def convert(conn, target):
+    """Convert the attendance storage to `target` ('rowid' or 'compact').
+
+    Runs in one transaction; record ids, the summaries and the change log
+    are unchanged. Returns False if the database already uses `target`.
+    Raises ValueError if some rows cannot be converted.
+    """
+    if target not in LAYOUTS:
+        raise ValueError(f"layout must be one of {', '.join(LAYOUTS)}")
+    if current(conn) == target:
+        return False
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # explicit BEGIN/COMMIT, DDL included
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            (_to_compact if target == 'compact' else _to_rowid)(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        conn.isolation_level = isolation_level
+    conn.execute('ANALYZE')
+    return True
+
+
+def main():
+    from db import DB_PATH, configure_connection
+
+    parser = argparse.ArgumentParser(description='Attendance storage layout')
+    parser.add_argument('--db', default=DB_PATH, help='database file (default: %(default)s)')
+    parser.add_argument('--convert', choices=sorted(LAYOUTS), help='convert to this layout')
+    parser.add_argument('--no-vacuum', action='store_true',
+                        help='skip the VACUUM that returns freed pages after converting')
+    parser.add_argument('--status', action='store_true', help='show the current layout only')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    configure_connection(conn)
+    if args.status or not args.convert:
+        print(f'Layout: {current(conn)}')
+        return 0
+
+    before = os.path.getsize(args.db)
+    try:
+        converted = convert(conn, args.convert)
+    except ValueError as e:
+        print(f'❌ Cannot convert to {args.convert}: {e}')
+        return 1
+    if not converted:
+        print(f'Already using the {args.convert} layout')
+        return 0
+    if not args.no_vacuum:
+        conn.execute('VACUUM')
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    print(f'✅ Converted to the {args.convert} layout '
+          f'({before / 1e6:.1f} MB -> {os.path.getsize(args.db) / 1e6:.1f} MB)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
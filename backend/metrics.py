@@ -0,0 +1,492 @@
+"""
+Per-request instrumentation: latency histograms, SQL and JSON timings,
+a slow-query log and an opt-in sampling profiler.
+
+Every request records its route, status and latency (including the time
+spent streaming the body), the number of SQL statements it ran, the time
+spent in SQLite, the rows it fetched and the time spent serializing JSON.
+Pooled connections are created with ``Connection`` so statements are
+timed without touching the routes. ``render_prometheus()`` exposes the
+totals in the Prometheus text format; counters are per process, so under
+gunicorn each worker reports its own.
+
+Statements slower than ATTENDANCE_SLOW_QUERY_MS (default 100; 0 disables)
+are logged to the 'attendance.slow_query' logger and kept in a ring buffer
+(``slow_queries()``). ``recording()`` collects every statement a thread
+runs, for the query plan check (migrations.py --check).
+
+With ATTENDANCE_PROFILING=1, a request with ``?profile=1`` or an
+``X-Profile: 1`` header is sampled every ATTENDANCE_PROFILE_INTERVAL_MS
+(default 1) and answered with the collapsed stacks (flamegraph.pl /
+speedscope input) instead of its normal body.
+
+Set ATTENDANCE_METRICS=0 to turn the instrumentation off.
+"""
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from flask import request
+
+import responses
+
+ENABLED = os.environ.get('ATTENDANCE_METRICS', '1') != '0'
+SLOW_QUERY_MS = float(os.environ.get('ATTENDANCE_SLOW_QUERY_MS', '100'))
+PROFILING = os.environ.get('ATTENDANCE_PROFILING', '0') == '1'
+PROFILE_INTERVAL = float(os.environ.get('ATTENDANCE_PROFILE_INTERVAL_MS', '1')) / 1000
+
+# Latency histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+slow_query_logger = logging.getLogger('attendance.slow_query')
+
+_current = threading.local()
+_lock = threading.Lock()
+_recording = threading.local()
+
+
+# ========== AGGREGATES ==========
+
+class RouteMetrics:
+    """Totals for one (method, route)"""
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.statuses = Counter()
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.sql_rows = 0
+        self.json_seconds = 0.0
+
+    def observe(self, stats, status, elapsed):
+        for i, bound in enumerate(BUCKETS):
+            if elapsed <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.seconds += elapsed
+        self.statuses[status] += 1
+        self.sql_statements += stats.sql_statements
+        self.sql_seconds += stats.sql_seconds
+        self.sql_rows += stats.sql_rows
+        self.json_seconds += stats.json_seconds
+
+
+_routes = {}
+_slow_queries = deque(maxlen=100)
+
+
+class RequestStats:
+    """What one request spent its time on"""
+
+    __slots__ = ('route', 'sql_statements', 'sql_seconds', 'sql_rows', 'json_seconds')
+
+    def __init__(self):
+        self.route = None
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.sql_rows = 0
+        self.json_seconds = 0.0
+
+
+def current():
+    """The RequestStats of the request running on this thread, if any"""
+    return getattr(_current, 'stats', None)
+
+
+def record(method, route, status, elapsed, stats):
+    with _lock:
+        metrics = _routes.get((method, route))
+        if metrics is None:
+            metrics = _routes[(method, route)] = RouteMetrics()
+        metrics.observe(stats, status, elapsed)
+
+
+def reset():
+    with _lock:
+        _routes.clear()
+        _slow_queries.clear()
+
+
+# ========== SQL INSTRUMENTATION ==========
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _slow_query(sql, params, elapsed):
+    entry = {
+        'sql': _WHITESPACE.sub(' ', sql).strip(),
+        'params': repr(params)[:200],
+        'ms': round(elapsed * 1000, 3),
+        'route': getattr(current(), 'route', None),
+        'at': time.time(),
+    }
+    _slow_queries.append(entry)
+    slow_query_logger.warning('Slow query (%.1f ms, %s): %s %s', entry['ms'], entry['route'],
+                              entry['sql'], entry['params'])
+
+
+def slow_queries():
+    """The most recent slow statements, newest first"""
+    return list(reversed(_slow_queries))
+
+
+@contextmanager
+def recording():
+    """Collect the (sql, params) of every statement this thread executes
+    on an instrumented connection, into the list yielded"""
+    statements = []
+    _recording.statements = statements
+    try:
+        yield statements
+    finally:
+        _recording.statements = None
+
+
+class Cursor(sqlite3.Cursor):
+    """A cursor that charges statement and fetch time to the current request.
+
+    A statement's time is execute() plus every fetch until the cursor is
+    exhausted, re-executed or closed; that total is what the slow-query
+    threshold is compared against.
+    """
+
+    _sql = None
+    _params = None
+    _elapsed = 0.0
+
+    def _charge(self, elapsed, rows=0, statement=False):
+        self._elapsed += elapsed
+        stats = current()
+        if stats is not None:
+            stats.sql_seconds += elapsed
+            stats.sql_rows += rows
+            if statement:
+                stats.sql_statements += 1
+
+    def _finish(self):
+        if self._sql is not None and SLOW_QUERY_MS and self._elapsed * 1000 >= SLOW_QUERY_MS:
+            _slow_query(self._sql, self._params, self._elapsed)
+        self._sql = None
+        self._elapsed = 0.0
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        self._sql, self._params = sql, parameters
+        statements = getattr(_recording, 'statements', None)
+        if statements is not None:
+            statements.append((sql, parameters))
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._charge(time.perf_counter() - started, statement=True)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        self._sql, self._params = sql, '<many>'
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._charge(time.perf_counter() - started, statement=True)
+            self._finish()
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._charge(time.perf_counter() - started, row is not None)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._charge(time.perf_counter() - started, len(rows))
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._charge(time.perf_counter() - started, len(rows))
+        self._finish()
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._charge(time.perf_counter() - started)
+            self._finish()
+            raise
+        self._charge(time.perf_counter() - started, 1)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+
+class Connection(sqlite3.Connection):
+    """A connection whose cursors (including conn.execute()) are instrumented"""
+
+    def cursor(self, factory=Cursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# ========== JSON ==========
+
+class JSONProvider(responses.JSONProvider):
+    """The app's JSON provider, charging serialization time to the request"""
+
+    def encode(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().encode(obj, **kwargs)
+        finally:
+            stats = current()
+            if stats is not None:
+                stats.json_seconds += time.perf_counter() - started
+
+
+# ========== SAMPLING PROFILER ==========
+
+class Sampler:
+    """Samples one thread's stack at a fixed interval, from another thread"""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='attendance-profiler')
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:'
+                             f'{frame.f_lineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        """Stacks in collapsed format, one 'frame;frame;... count' per line"""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def _profile_requested(environ):
+    if not PROFILING:
+        return False
+    query = environ.get('QUERY_STRING', '')
+    return (environ.get('HTTP_X_PROFILE') == '1'
+            or re.search(r'(^|&)profile=1(&|$)', query) is not None)
+
+
+# ========== MIDDLEWARE ==========
+
+class Middleware:
+    """WSGI wrapper timing each request until its body has been sent"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        if _profile_requested(environ):
+            return self.profile(environ, start_response)
+        stats = RequestStats()
+        status = []
+
+        def capture_status(code, headers, exc_info=None):
+            status.append(int(code.split(' ', 1)[0]))
+            return start_response(code, headers, exc_info)
+
+        started = time.perf_counter()
+        _current.stats = stats
+        try:
+            body = self.wsgi_app(environ, capture_status)
+        except BaseException:
+            _current.stats = None
+            raise
+        return _TimedBody(body, environ['REQUEST_METHOD'], stats, status, started)
+
+    def profile(self, environ, start_response):
+        """Run the request under the sampler and answer with the profile"""
+        status = []
+
+        def discard(code, headers, exc_info=None):
+            status.append(code)
+            return lambda data: None
+
+        sampler = Sampler(threading.get_ident()).start()
+        started = time.perf_counter()
+        try:
+            body = self.wsgi_app(environ, discard)
+            try:
+                for _ in body:
+                    pass
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+        finally:
+            sampler.stop()
+        elapsed = time.perf_counter() - started
+        output = sampler.collapsed().encode()
+        start_response('200 OK', [
+            ('Content-Type', 'text/plain; charset=utf-8'),
+            ('Content-Length', str(len(output))),
+            ('X-Profile-Samples', str(sampler.samples)),
+            ('X-Profile-Elapsed-Ms', f'{elapsed * 1000:.1f}'),
+            ('X-Profile-Original-Status', status[0] if status else ''),
+        ])
+        return [output]
+
+
+class _TimedBody:
+    """Response iterable that records the request once the body is done"""
+
+    def __init__(self, body, method, stats, status, started):
+        self.body = body
+        self.method = method
+        self.stats = stats
+        self.status = status
+        self.started = started
+        self.recorded = False
+
+    def __iter__(self):
+        _current.stats = self.stats  # streamed bodies may run SQL too
+        yield from self.body
+        self._record()
+
+    def _record(self):
+        if self.recorded:
+            return
+        self.recorded = True
+        elapsed = time.perf_counter() - self.started
+        _current.stats = None
+        record(self.method, self.stats.route or 'unmatched',
+               self.status[0] if self.status else 500, elapsed, self.stats)
+
+    def close(self):
+        try:
+            if hasattr(self.body, 'close'):
+                self.body.close()
+        finally:
+            self._record()
+
+
+def init_app(app):
+    """Install the middleware, route tagging and timed JSON provider"""
+    if not ENABLED:
+        return
+    app.wsgi_app = Middleware(app.wsgi_app)
+    app.json = JSONProvider(app)
+
+    @app.before_request
+    def tag_route():
+        stats = current()
+        if stats is not None and request.url_rule is not None:
+            stats.route = request.url_rule.rule
+
+
+# ========== PROMETHEUS ==========
+
+def _label_value(value):
+    """Escape backslashes, quotes and newlines as the text format requires"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_label_value(v)}"' for k, v in labels.items()) + '}'
+
+
+def render_prometheus(gauges=(), counters=()):
+    """All metrics in the Prometheus text exposition format.
+
+    gauges is a list of (name, help, [(labels dict, value)]) for
+    point-in-time values owned by other modules (pool, cache); counters
+    has the same shape for their running totals, named *_total.
+    """
+    with _lock:
+        routes = sorted(_routes.items())
+        lines = [
+            '# HELP attendance_request_duration_seconds Request latency, including streaming.',
+            '# TYPE attendance_request_duration_seconds histogram',
+        ]
+        for (method, route), m in routes:
+            cumulative = 0
+            for bound, count in zip(BUCKETS, m.buckets):
+                cumulative += count
+                lines.append(f'attendance_request_duration_seconds_bucket'
+                             f'{_labels(method=method, route=route, le=bound)} {cumulative}')
+            lines.append(f'attendance_request_duration_seconds_bucket'
+                         f'{_labels(method=method, route=route, le="+Inf")} {m.count}')
+            lines.append(f'attendance_request_duration_seconds_sum'
+                         f'{_labels(method=method, route=route)} {m.seconds:.6f}')
+            lines.append(f'attendance_request_duration_seconds_count'
+                         f'{_labels(method=method, route=route)} {m.count}')
+
+        lines += ['# HELP attendance_requests_total Requests by route and status.',
+                  '# TYPE attendance_requests_total counter']
+        for (method, route), m in routes:
+            for status, count in sorted(m.statuses.items()):
+                lines.append(f'attendance_requests_total'
+                             f'{_labels(method=method, route=route, status=status)} {count}')
+
+        totals = (
+            ('attendance_sql_statements_total', 'SQL statements executed.', 'sql_statements', 'd'),
+            ('attendance_sql_seconds_total', 'Time spent executing SQL and fetching rows.',
+             'sql_seconds', '.6f'),
+            ('attendance_sql_rows_total', 'Rows fetched from SQLite.', 'sql_rows', 'd'),
+            ('attendance_json_seconds_total', 'Time spent serializing JSON.',
+             'json_seconds', '.6f'),
+        )
+        for name, help_text, attribute, fmt in totals:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for (method, route), m in routes:
+                lines.append(f'{name}{_labels(method=method, route=route)} '
+                             f'{getattr(m, attribute):{fmt}}')
+        slow = len(_slow_queries)
+
+    lines += ['# HELP attendance_slow_queries Slow statements held in the ring buffer.',
+              '# TYPE attendance_slow_queries gauge', f'attendance_slow_queries {slow}']
+    for kind, families in (('gauge', gauges), ('counter', counters)):
+        for name, help_text, samples in families:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for labels, value in samples:
+                lines.append(f'{name}{_labels(**labels) if labels else ""} {value}')
+    return '\n'.join(lines) + '\n'
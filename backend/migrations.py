@@ -0,0 +1,352 @@
+"""
+Versioned schema migrations for the attendance database.
+
+The schema version is stored in SQLite's ``PRAGMA user_version``. Each
+migration runs in its own transaction together with the version bump, so an
+existing attendance.db is upgraded in place and a failed step leaves the
+file at the previous version.
+
+Usage (from the backend directory):
+    python3 migrations.py            # apply pending migrations
+    python3 migrations.py --status   # show current/latest version
+    python3 migrations.py --check    # fail if a hot API request scans a table
+                                     # (on generated data, or on --db FILE)
+"""
+import argparse
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+from contextlib import contextmanager
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a function(conn) as the migration to `version`"""
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+@migration(1, 'Base students and attendance tables')
+def _base_schema(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            email TEXT,
+            phone TEXT,
+            course TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            status TEXT NOT NULL CHECK(status IN ('present', 'absent', 'late')),
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students(student_id),
+            UNIQUE(student_id, date)
+        )
+    ''')
+
+
+@migration(2, 'Secondary indexes for date, status, name and course lookups')
+def _secondary_indexes(conn):
+    # Date filters/sorts; student_id and status make it covering for counts
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_attendance_date_student '
+                 'ON attendance (date, student_id, status)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_attendance_status '
+                 'ON attendance (status)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_attendance_student_status '
+                 'ON attendance (student_id, status)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_students_name '
+                 'ON students (name, student_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_students_course '
+                 'ON students (course, student_id)')
+    conn.execute('ANALYZE')
+
+
+@migration(3, 'Trigger-maintained attendance summary tables')
+def _summary_tables(conn):
+    import summaries
+    summaries.create_schema(conn)
+    summaries.rebuild(conn)
+
+
+@migration(4, 'Trigger-written change log for cross-process cache invalidation')
+def _change_log(conn):
+    import changes
+    changes.create_schema(conn)
+
+
+@migration(5, 'Term calendar for reporting rollups')
+def _terms(conn):
+    import reports
+    reports.create_schema(conn)
+
+
+@migration(6, 'Full-text search index over students')
+def _student_search(conn):
+    import search
+    search.create_schema(conn)
+    search.rebuild(conn)
+
+
+@migration(7, 'Archive partition manifest and archived-date write guards')
+def _archive_partitions(conn):
+    import archive
+    archive.create_schema(conn)
+
+
+@contextmanager
+def bulk_load(conn, tables=('students', 'attendance')):
+    """Suspend index and trigger maintenance on `tables` while loading data.
+
+    Secondary indexes and triggers are dropped on entry and recreated from
+    their original SQL on exit, after which the summary tables and the
+    student search index are rebuilt and a reset is logged for running
+    servers. Loading without them is several times faster; meant for offline
+    loads (e.g. create_mock_data.py).
+    """
+    import changes
+    import layout
+    import search
+    import summaries
+
+    # In the compact layout the records live in attendance_compact
+    storage = layout.table(conn)
+    tables = tuple(storage if name == 'attendance' else name for name in tables)
+    placeholders = ', '.join('?' * len(tables))
+    objects = conn.execute(
+        f"SELECT type, name, sql FROM sqlite_master WHERE type IN ('index', 'trigger') "
+        f"AND tbl_name IN ({placeholders}) AND sql IS NOT NULL", tables).fetchall()
+    for object_type, name, _ in objects:
+        conn.execute(f'DROP {object_type.upper()} {name}')
+    conn.commit()
+    try:
+        yield conn
+    finally:
+        for _, _, sql in objects:
+            conn.execute(sql)
+        layout.rebuild(conn)
+        summaries.rebuild(conn)
+        if 'students' in tables:
+            search.rebuild(conn)
+        changes.log_reset(conn)
+        conn.commit()
+        conn.execute('ANALYZE')
+
+
+def current_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def migrate(conn, target=None):
+    """Apply every pending migration up to `target` (default: latest).
+
+    Returns the list of (version, description) tuples that were applied.
+    """
+    target = latest_version() if target is None else target
+    applied = []
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # explicit BEGIN/COMMIT, DDL included
+    try:
+        for version, description, fn in MIGRATIONS:
+            if version <= current_version(conn) or version > target:
+                continue
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                fn(conn)
+                conn.execute(f'PRAGMA user_version = {version:d}')
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            applied.append((version, description))
+    finally:
+        conn.isolation_level = isolation_level
+    return applied
+
+
+# ========== QUERY PLAN CHECKS ==========
+
+# Hot API requests whose statements check_query_plans() explains:
+# (name, URL, tables the request reads whole by design, ordered). With
+# ordered=True no statement may sort its rows for ORDER BY: they are
+# walked in index order. URLs are filled in from the database with
+# {date} (the newest record's), {first} (the oldest's), {student_id},
+# {course} and {cursor} (a cursor into the newest records).
+HOT_REQUESTS = (
+    ('attendance page', '/api/attendance?limit=100', (), True),
+    ('attendance page after cursor', '/api/attendance?limit=100&cursor={cursor}', (), True),
+    ('attendance by date', '/api/attendance?date={date}', (), False),
+    ('attendance by student', '/api/attendance?student_id={student_id}', (), False),
+    ('attendance by course', '/api/attendance?course={course}&from={first}&to={date}', (), False),
+    ('attendance of a date', '/api/attendance/date/{date}', (), False),
+    ('export', '/api/attendance/export?from={first}', (), True),
+    ('students', '/api/students', (), True),
+    ('students page', '/api/students?limit=50', (), True),
+    ('student', '/api/students/{student_id}', (), False),
+    ('student search', '/api/students/search?q=jo', (), False),
+    ('overview', '/api/statistics/overview', ('attendance_summary_total',), False),
+    ('overview of a range', '/api/statistics/overview?from={first}&to={date}', (), False),
+    ('course overview', '/api/statistics/overview?course={course}', (), False),
+    ('student statistics', '/api/statistics/student/{student_id}', (), False),
+    ('student statistics of a range', '/api/statistics/student/{student_id}?from={first}',
+     (), False),
+    ('course statistics', '/api/statistics/courses', ('attendance_summary_course_date',), False),
+    ('students statistics', '/api/statistics/students', ('s',), False),
+    ('students statistics of a range', '/api/statistics/students?from={first}', (), False),
+    ('monthly series', '/api/statistics/series?group=month&from={first}', (), False),
+    ('course series', '/api/statistics/series?group=week&course={course}&from={first}', (),
+     False),
+    ('student series', '/api/statistics/series?group=month&student_id={student_id}', (), False),
+    ('sync snapshot', '/api/sync?date={date}', (), False),
+)
+
+# A plan step that reads a whole table without any index
+_FULL_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+# A subquery computed first, whose rows are then scanned (not a table)
+_SUBQUERY = re.compile(r'^(?:MATERIALIZE|CO-ROUTINE) (\w+)$')
+
+
+def full_scans(conn, sql, params=()):
+    """Return the tables a query reads with a full table scan"""
+    plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+    subqueries = {m.group(1) for m in map(_SUBQUERY.match, plan) if m}
+    return [m.group(1) for m in map(_FULL_SCAN.match, plan)
+            if m and m.group(1) not in subqueries]
+
+
+def _request_fixtures(conn):
+    """Values for the placeholders of HOT_REQUESTS"""
+    import pagination
+    first, date = conn.execute('SELECT MIN(date), MAX(date) FROM attendance').fetchone()
+    student_id = conn.execute('SELECT MIN(student_id) FROM students').fetchone()[0]
+    course = conn.execute('SELECT course FROM students WHERE course IS NOT NULL '
+                          'GROUP BY course ORDER BY COUNT(*) DESC LIMIT 1').fetchone()[0]
+    key = conn.execute('''
+        SELECT a.date, s.name, a.id FROM attendance a JOIN students s USING (student_id)
+        ORDER BY a.date DESC, s.name, a.id LIMIT 1 OFFSET 100''').fetchone()
+    return {'first': first, 'date': date, 'student_id': student_id, 'course': course,
+            'cursor': pagination.encode_cursor(list(key))}
+
+
+def request_statements(path, url):
+    """(sql, params) of every SELECT the API runs to answer GET url on the
+    database file at path, with a cold response cache"""
+    import app as app_module  # deferred: app imports this module
+    import db
+    import metrics
+    from cache import response_cache
+
+    if not metrics.ENABLED:
+        raise RuntimeError('Statements are recorded through metrics.py; '
+                           'unset ATTENDANCE_METRICS=0')
+    app = app_module.app
+    with db.using(path):
+        response_cache.clear()
+        with metrics.recording() as statements, app.test_request_context(url):
+            response = app.full_dispatch_request()
+            response.get_data()  # streamed bodies run their queries here
+    if response.status_code != 200:
+        raise RuntimeError(f'GET {url} answered {response.status_code}')
+    return [(sql, params) for sql, params in statements
+            if sql.lstrip().upper().startswith(('SELECT', 'WITH'))]
+
+
+def check_query_plans(path, requests=HOT_REQUESTS):
+    """{request name: [problems]} for every hot request (HOT_REQUESTS) whose
+    statements on the database file at path scan a table without an index
+    or sort for ORDER BY where the rows must come in index order"""
+    import archive
+    from db import configure_connection
+
+    conn = sqlite3.connect(path)
+    configure_connection(conn)
+    try:
+        archive.tables(conn)  # statements may read any archived partition
+        fixtures = _request_fixtures(conn)
+        failures = {}
+        for name, url, whole, ordered in requests:
+            problems = []
+            for sql, params in request_statements(path, url.format(**fixtures)):
+                scanned = set(full_scans(conn, sql, params)) - set(whole) - {'sqlite_master'}
+                problems += [f'full scan of {table}' for table in sorted(scanned)]
+                plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+                if ordered and 'USE TEMP B-TREE FOR ORDER BY' in plan:
+                    problems.append('sorts its rows for ORDER BY')
+            if problems:
+                failures[name] = problems
+        return failures
+    finally:
+        conn.close()
+
+
+def check(path=None):
+    """--check: the query plans of HOT_REQUESTS on path, or on a fresh
+    schema with generated data (a regression check of the migrations)"""
+    directory = None
+    if path is None:
+        import create_mock_data
+        directory = tempfile.mkdtemp(prefix='attendance-check-')
+        path = os.path.join(directory, 'attendance.db')
+        conn = sqlite3.connect(path)
+        migrate(conn)
+        create_mock_data.generate(conn, students=100, days=60, seed=1)
+        conn.close()
+    try:
+        failures = check_query_plans(path)
+    finally:
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+    for name, problems in failures.items():
+        print(f"❌ {name}: {', '.join(problems)}")
+    if failures:
+        return 1
+    print(f'✅ All {len(HOT_REQUESTS)} hot requests use their indexes')
+    return 0
+
+
+def main():
+    from db import DB_PATH, configure_connection
+
+    parser = argparse.ArgumentParser(description='Attendance database migrations')
+    parser.add_argument('--db', help=f'database file (default: {DB_PATH})')
+    parser.add_argument('--status', action='store_true', help='show schema version only')
+    parser.add_argument('--check', action='store_true',
+                        help='fail if a hot API request scans a table or sorts a walk')
+    args = parser.parse_args()
+
+    if args.check:
+        return check(args.db)
+
+    conn = sqlite3.connect(args.db or DB_PATH)
+    configure_connection(conn)
+
+    if args.status:
+        print(f'Schema version {current_version(conn)} (latest {latest_version()})')
+        return 0
+
+    for version, description in migrate(conn):
+        print(f'Applied migration {version}: {description}')
+    print(f'Schema version {current_version(conn)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Keyset (cursor) pagination and field projection helpers for list endpoints.
+
+A cursor is the sort key of the last row on a page, encoded as an opaque
+URL-safe token. The next page is fetched with a ``WHERE (key) > (cursor)``
+condition, so each page costs the same no matter how deep the client has
+paged.
+"""
+import base64
+import json
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def encode_cursor(values):
+    """Encode a row's sort key as an opaque cursor token"""
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, types):
+    """Decode a cursor token into a list of sort key values, one of each
+    of `types` (str or int) in turn"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor') from None
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError('Invalid cursor')
+    for value, expected in zip(values, types):
+        # bool is an int subclass, but never a sort key
+        if type(value) is not expected:
+            raise ValueError('Invalid cursor')
+    return values
+
+
+def parse_limit(value):
+    """Parse the ?limit= argument, clamped to MAX_LIMIT"""
+    if value is None:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('limit must be an integer') from None
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, MAX_LIMIT)
+
+
+def parse_fields(value, columns):
+    """Resolve ?fields=a,b,c against a {field: SQL expression} mapping.
+
+    Returns the list of requested field names (all fields when not given).
+    """
+    if not value:
+        return list(columns)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in columns]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return list(dict.fromkeys(fields))
+
+
+def select_list(fields, columns, key_columns):
+    """SQL select list for the projected fields followed by the sort key"""
+    return ', '.join([f'{columns[field]} AS {field}' for field in fields] + list(key_columns))
+
+
+def page(rows, fields, limit):
+    """Split fetched rows (fields + sort key) into (items, next_cursor).
+
+    `rows` must hold up to limit + 1 rows; the extra row only signals that
+    another page exists.
+    """
+    width = len(fields)
+    items = [dict(zip(fields, row[:width])) for row in rows[:limit]]
+    return items, next_cursor(rows, width, limit)
+
+
+def next_cursor(rows, width, limit):
+    """Cursor for the page after rows[:limit], or None on the last page"""
+    if len(rows) > limit:
+        return encode_cursor(rows[limit - 1][width:])
+    return None
@@ -0,0 +1,151 @@
+"""
+Calendar rollups: attendance counts per day, ISO week, month or term.
+
+School-wide and course series are read from the per-date summary tables
+(summaries.py), so a year of weekly numbers is a range read of a few
+hundred summary rows. Student series read the student's own attendance
+rows through the (student_id, date) index, including the archived
+partitions (archive.py) the date range reaches. Grouping happens in SQL, and
+the result is a compact series of parallel arrays, one entry per period
+that has records:
+
+    {"group": "week", "periods": ["2026-W41", ...], "start": [...],
+     "end": [...], "present": [...], "absent": [...], "late": [...],
+     "total": [...], "attendance_percentage": [...]}
+
+Terms are a custom calendar kept in the ``terms`` table; they may leave
+gaps (holidays) but should not overlap, or records are counted in each
+term that contains them.
+"""
+import calendar
+from datetime import date, timedelta
+
+import archive
+from stats import STATUSES, validate_date
+
+GROUPS = ('day', 'week', 'month', 'term')
+
+# SQL giving the start date of the period containing {date}
+PERIOD_START = {
+    'day': '{date}',
+    # strftime('%w') is 0 for Sunday; ISO weeks start on Monday
+    'week': "date({date}, '-' || ((CAST(strftime('%w', {date}) AS INTEGER) + 6) % 7) || ' days')",
+    'month': "substr({date}, 1, 7) || '-01'",
+}
+
+
+def create_schema(conn):
+    """Create the terms table and the triggers logging its changes"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS terms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            CHECK (start_date <= end_date)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_terms_start ON terms (start_date, end_date)')
+    # Cached term series in every worker depend on the calendar (changes.py)
+    for op, row in (('insert', 'NEW'), ('update', 'NEW'), ('delete', 'OLD')):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_change_log_terms_{op}
+            AFTER {op.upper()} ON terms BEGIN
+            INSERT INTO change_log (entity, op, row_id) VALUES ('term', '{op}', {row}.id);
+            END''')
+
+
+def validate_term(data):
+    """(name, start_date, end_date) from a request body, or ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object')
+    name = data.get('name')
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError('name is required')
+    start_date, end_date = data.get('start_date'), data.get('end_date')
+    if start_date is None or end_date is None:
+        raise ValueError('start_date and end_date are required')
+    validate_date(start_date)
+    validate_date(end_date)
+    if start_date > end_date:
+        raise ValueError('start_date must not be after end_date')
+    return name.strip(), start_date, end_date
+
+
+def _source(conn, student_id, course, date_from, date_to):
+    """(FROM, date column, status sums, conditions, params) of the scope"""
+    if student_id is not None:
+        sums = [f"SUM(a.status = '{status}')" for status in STATUSES]
+        columns = archive.COUNTED if course is None else archive.COUNTED + ('course',)
+        source, params = archive.source(conn, date_from, date_to, columns)
+        source = f'{source} a'
+        conditions = ['a.student_id = ?']
+        params.append(student_id)
+        if course is not None:
+            # Archived records count under the course they were archived with
+            course_sql = 's.course' if source == 'attendance a' else archive.RECORD_COURSE
+            source += ' JOIN students s ON a.student_id = s.student_id'
+            conditions.append(f'{course_sql} = ?')
+            params.append(course)
+        return source, 'a.date', sums, conditions, params
+    sums = [f'SUM(d.{status}_count)' for status in STATUSES]
+    if course is not None:
+        return 'attendance_summary_course_date d', 'd.date', sums, ['d.course = ?'], [course]
+    return 'attendance_summary_date d', 'd.date', sums, [], []
+
+
+def _label(group, start):
+    day = date.fromisoformat(start)
+    if group == 'week':
+        year, week, _ = day.isocalendar()
+        return f'{year}-W{week:02d}', (day + timedelta(days=6)).isoformat()
+    if group == 'month':
+        last = calendar.monthrange(day.year, day.month)[1]
+        return start[:7], day.replace(day=last).isoformat()
+    return start, start
+
+
+def series(conn, group, student_id=None, course=None, date_from=None, date_to=None):
+    """Status counts per period, as parallel arrays"""
+    if group not in GROUPS:
+        raise ValueError(f"group must be one of: {', '.join(GROUPS)}")
+    source, date_column, sums, conditions, params = _source(conn, student_id, course,
+                                                           date_from, date_to)
+    if date_from is not None:
+        conditions.append(f'{date_column} >= ?')
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append(f'{date_column} <= ?')
+        params.append(date_to)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    if group == 'term':
+        query = f'''
+            SELECT t.name, t.start_date, t.end_date, {', '.join(sums)}
+            FROM {source} JOIN terms t ON {date_column} BETWEEN t.start_date AND t.end_date
+            {where}
+            GROUP BY t.id ORDER BY t.start_date, t.id'''
+        rows = conn.execute(query, params).fetchall()
+    else:
+        period = PERIOD_START[group].format(date=date_column)
+        query = f'''
+            SELECT {period} AS period, {', '.join(sums)}
+            FROM {source} {where}
+            GROUP BY period ORDER BY period'''
+        rows = []
+        for start, *counts in conn.execute(query, params):
+            label, end = _label(group, start)
+            rows.append((label, start, end, *counts))
+
+    result = {'group': group, 'from': date_from, 'to': date_to,
+              'course': course, 'student_id': student_id}
+    result['periods'] = [row[0] for row in rows]
+    result['start'] = [row[1] for row in rows]
+    result['end'] = [row[2] for row in rows]
+    for i, status in enumerate(STATUSES):
+        result[status] = [row[3 + i] or 0 for row in rows]
+    result['total'] = [sum(counts) for counts in zip(*(result[s] for s in STATUSES))]
+    result['attendance_percentage'] = [
+        round(present / total * 100, 2) if total else 0
+        for present, total in zip(result['present'], result['total'])]
+    return result
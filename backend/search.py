@@ -0,0 +1,138 @@
+"""
+Full-text and prefix search over students.
+
+``students_fts`` is an FTS5 index over the name, student_id, email and
+course of every student. It is an external-content table: it stores only
+the index and reads the text from ``students``. Triggers on the students
+table keep it in step, so create_student/update_student/delete_student
+and every other write path update the index in the same transaction.
+
+Queries are typeahead-style: every word of the query is a prefix, and all
+words must match (in any column):
+
+    "jo sm"      -> names like "John Smith", "Joseph Smithers"
+    "stu0004"    -> STU00040 .. STU00049
+    "hill phys"  -> Physics students named Hill
+
+Results are ranked by bm25 with name matches weighted highest, then by
+name. A very common prefix (one or two letters) can match thousands of
+students; those results come in index order (enrollment order) instead of
+being ranked, so typeahead latency does not grow with the table.
+
+Usage (from the backend directory):
+    python3 search.py "jo sm"     # try a query against the index
+    python3 search.py --rebuild   # rebuild the index from the students table
+"""
+import argparse
+import re
+import sqlite3
+import sys
+
+COLUMNS = ('student_id', 'name', 'email', 'course')
+
+# bm25 weights, in COLUMNS order
+WEIGHTS = (5.0, 10.0, 2.0, 1.0)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+# Above this many matches, skip ranking and return matches in index order
+RANK_LIMIT = 2000
+
+# unicode61 splits on everything but letters and digits (underscore included)
+_TOKEN = re.compile(r'[^\W_]+')
+
+
+def create_schema(conn):
+    """Create the FTS5 index and the triggers that maintain it"""
+    columns = ', '.join(COLUMNS)
+    old = ', '.join(f'OLD.{column}' for column in COLUMNS)
+    new = ', '.join(f'NEW.{column}' for column in COLUMNS)
+    # Prefix indexes make one- to three-character typeahead terms cheap
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+            {columns}, content='students', content_rowid='id', prefix='1 2 3')''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_students_fts_insert
+        AFTER INSERT ON students BEGIN
+        INSERT INTO students_fts (rowid, {columns}) VALUES (NEW.id, {new});
+        END''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_students_fts_delete
+        AFTER DELETE ON students BEGIN
+        INSERT INTO students_fts (students_fts, rowid, {columns}) VALUES ('delete', OLD.id, {old});
+        END''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_students_fts_update
+        AFTER UPDATE ON students BEGIN
+        INSERT INTO students_fts (students_fts, rowid, {columns}) VALUES ('delete', OLD.id, {old});
+        INSERT INTO students_fts (rowid, {columns}) VALUES (NEW.id, {new});
+        END''')
+
+
+def rebuild(conn):
+    """Re-index every student (after loads that bypassed the triggers)"""
+    conn.execute("INSERT INTO students_fts (students_fts) VALUES ('rebuild')")
+
+
+def match_expression(query):
+    """FTS5 MATCH expression for a typeahead query; None without words"""
+    tokens = _TOKEN.findall(query or '')
+    if not tokens:
+        return None
+    # Quoted, so FTS5 operators and column filters in user input are literal
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search(conn, query, limit=DEFAULT_LIMIT, course=None):
+    """Students matching a typeahead query, best matches first"""
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    conditions, params = ['students_fts MATCH ?'], [expression]
+    if course is not None:
+        conditions.append('s.course = ?')
+        params.append(course)
+    where = ' AND '.join(conditions)
+
+    # Stops reading the index after RANK_LIMIT + 1 matches
+    matches = conn.execute(
+        'SELECT COUNT(*) FROM (SELECT 1 FROM students_fts WHERE students_fts MATCH ? LIMIT ?)',
+        (expression, RANK_LIMIT + 1)).fetchone()[0]
+    if matches > RANK_LIMIT:
+        # Ranking (or sorting) every match of a one-letter prefix costs tens of
+        # ms at 100k students; index order streams and stops at `limit`
+        order = 'students_fts.rowid'
+    else:
+        order = f"bm25(students_fts, {', '.join(map(str, WEIGHTS))}), s.name, s.student_id"
+    rows = conn.execute(f'''
+        SELECT s.student_id, s.name, s.email, s.course
+        FROM students_fts JOIN students s ON s.id = students_fts.rowid
+        WHERE {where}
+        ORDER BY {order} LIMIT ?''', params + [limit]).fetchall()
+    return [dict(zip(COLUMNS, row)) for row in rows]
+
+
+def main():
+    from db import DB_PATH, configure_connection
+
+    parser = argparse.ArgumentParser(description='Student search index maintenance')
+    parser.add_argument('--db', default=DB_PATH, help='database file (default: %(default)s)')
+    parser.add_argument('--rebuild', action='store_true', help='rebuild the index')
+    parser.add_argument('query', nargs='?', help='search the index')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    configure_connection(conn)
+    if args.rebuild:
+        rebuild(conn)
+        conn.commit()
+        print('Search index rebuilt')
+    if args.query:
+        for student in search(conn, args.query):
+            print(f"{student['student_id']}  {student['name']}  {student['course'] or ''}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
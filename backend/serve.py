@@ -0,0 +1,208 @@
+"""
+Production entry point for the attendance API.
+
+Runs the Flask app under gunicorn: a master process that applies pending
+migrations once and then forks worker processes (preload), each serving
+requests on a pool of threads. Every worker opens its own SQLite
+connections after the fork (see db.ConnectionPool), and WAL mode lets the
+workers read concurrently while one of them writes. On Windows, where
+gunicorn is not available, waitress serves the app with a thread pool in a
+single process.
+
+Usage (from the backend directory):
+    python3 serve.py                          # gunicorn on 0.0.0.0:5001
+    python3 serve.py --workers 4 --threads 8
+    python3 serve.py --bind unix:/tmp/attendance.sock
+    python3 serve.py --server waitress
+    python3 serve.py --server uvicorn         # asyncio mode, see asgi.py
+    python3 serve.py --dev                    # Flask debug server with reloader
+
+Graceful restarts (gunicorn): ``kill -HUP <master pid>`` starts fresh
+workers and lets the old ones finish their in-flight requests within
+--graceful-timeout. Because the app is preloaded, new code is picked up by
+``kill -USR2 <master pid>`` (start a new master) followed by
+``kill -TERM <old master pid>``.
+"""
+import argparse
+import os
+import platform
+import sys
+
+DEFAULT_BIND = os.environ.get('ATTENDANCE_BIND', '0.0.0.0:5001')
+DEFAULT_WORKERS = int(os.environ.get('ATTENDANCE_WORKERS', str(min(os.cpu_count() or 1, 8))))
+DEFAULT_THREADS = int(os.environ.get('ATTENDANCE_THREADS', '4'))
+DEFAULT_TIMEOUT = int(os.environ.get('ATTENDANCE_WORKER_TIMEOUT', '120'))
+DEFAULT_GRACEFUL_TIMEOUT = int(os.environ.get('ATTENDANCE_GRACEFUL_TIMEOUT', '30'))
+
+
+def default_server():
+    if platform.system() == 'Windows':
+        return 'waitress'
+    try:
+        import gunicorn  # noqa: F401
+        return 'gunicorn'
+    except ImportError:
+        return 'waitress'
+
+
+def prepare(warm=True):
+    """Apply migrations and trim the change log before serving, for the
+    default database and every tenant database (tenants.py).
+
+    With warm=True the analytics store and the timelines (timelines.py)
+    are loaded too if enabled (ATTENDANCE_ANALYTICS=1,
+    ATTENDANCE_TIMELINES_PRELOAD=1), so workers forked from this process
+    start with them in memory. Both are off by default: a load takes
+    seconds on a large database and would hold up the bind.
+    """
+    import sqlite3
+    import analytics
+    import changes
+    import tenants
+    import timelines
+    from app import init_db
+    from db import DB_PATH, configure_connection
+
+    for version, description in init_db():
+        print(f'  applied migration {version}: {description}')
+    # Uses its own connection, closed again before any worker is forked
+    conn = sqlite3.connect(DB_PATH)
+    configure_connection(conn)
+    changes.prune(conn)
+    conn.commit()
+    if warm and timelines.PRELOAD:
+        timelines.store.snapshot(conn)
+    if warm and analytics.ENABLED:
+        analytics.store.snapshot(conn)
+    conn.close()
+    for name, applied in tenants.migrate().items():
+        for version, description in applied:
+            print(f'  {name}: applied migration {version}: {description}')
+    for path in tenants.catalog().values():
+        conn = tenants.connect(path)
+        changes.prune(conn)
+        conn.commit()
+        conn.close()
+
+
+def run_dev(args):
+    from app import app
+    prepare()
+    host, port = parse_bind(args.bind)
+    print(f'🚀 Starting Flask development server on {args.bind}')
+    app.run(debug=True, use_reloader=not args.no_reload, host=host, port=port)
+
+
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+    from app import app
+
+    class Server(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    options = {
+        'bind': [args.bind],
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'accesslog': '-' if args.access_log else None,
+        'on_starting': lambda server: prepare(),
+    }
+    print(f'🚀 Starting gunicorn on {args.bind} '
+          f'({args.workers} workers x {args.threads} threads)')
+    Server(app, options).run()
+
+
+def run_waitress(args):
+    import waitress
+    from app import app
+
+    prepare()
+    print(f'🚀 Starting waitress on {args.bind} ({args.threads} threads)')
+    if args.bind.startswith('unix:'):
+        waitress.serve(app, unix_socket=args.bind[len('unix:'):], threads=args.threads)
+    else:
+        waitress.serve(app, listen=args.bind, threads=args.threads)
+
+
+def run_uvicorn(args):
+    import uvicorn
+
+    # uvicorn workers are fresh interpreters, so a warm store would not reach them
+    prepare(warm=False)
+    # Worker processes import asgi.py afresh and read the lane size from here
+    if args.threads is not None:
+        os.environ['ATTENDANCE_ASYNC_THREADS'] = str(args.threads)
+    options = {
+        'workers': args.workers,
+        'timeout_graceful_shutdown': args.graceful_timeout,
+        'access_log': args.access_log,
+    }
+    if args.bind.startswith('unix:'):
+        options['uds'] = args.bind[len('unix:'):]
+    else:
+        options['host'], options['port'] = parse_bind(args.bind)
+    print(f'🚀 Starting uvicorn on {args.bind} ({args.workers} workers)')
+    uvicorn.run('asgi:application', **options)
+
+
+def parse_bind(bind):
+    """(host, port) for app.run(); unix sockets use werkzeug's unix:// host"""
+    if bind.startswith('unix:'):
+        return 'unix://' + bind[len('unix:'):], None
+    host, _, port = bind.rpartition(':')
+    return host or '0.0.0.0', int(port)
+
+
+SERVERS = {'gunicorn': run_gunicorn, 'uvicorn': run_uvicorn, 'waitress': run_waitress}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the attendance API')
+    parser.add_argument('--dev', action='store_true',
+                        help='run the Flask development server (debug, reloader)')
+    parser.add_argument('--no-reload', action='store_true',
+                        help='with --dev: disable the reloader')
+    parser.add_argument('--server', choices=sorted(SERVERS), default=default_server())
+    parser.add_argument('--bind', default=DEFAULT_BIND,
+                        help='HOST:PORT or unix:PATH (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='worker processes, gunicorn/uvicorn (default: %(default)s)')
+    parser.add_argument('--threads', type=int,
+                        help=f'threads per worker (default: {DEFAULT_THREADS}; '
+                             'uvicorn: light-lane threads, see asgi.py)')
+    parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT,
+                        help='seconds before a silent worker is restarted')
+    parser.add_argument('--graceful-timeout', type=int, default=DEFAULT_GRACEFUL_TIMEOUT,
+                        help='seconds workers get to finish requests on restart')
+    parser.add_argument('--max-requests', type=int, default=0,
+                        help='recycle a worker after this many requests (0: never)')
+    parser.add_argument('--access-log', action='store_true', help='log every request')
+    args = parser.parse_args(argv)
+
+    if args.threads is None and (args.dev or args.server != 'uvicorn'):
+        args.threads = DEFAULT_THREADS
+    if args.dev:
+        run_dev(args)
+    else:
+        SERVERS[args.server](args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""
+Attendance statistics.
+
+Counts are read from the trigger-maintained summary tables (summaries.py)
+whenever the filters allow it: one row for the whole school or a student,
+one row per day for course and date-range filters. Other filter
+combinations count all statuses in one pass over the matching attendance
+rows instead of issuing one ``COUNT(*)`` query per status, or read the
+in-memory columnar store when it is enabled (analytics.py). Scans include
+the archived partitions (archive.py) that the date range reaches.
+"""
+from datetime import date
+
+import analytics
+import archive
+
+STATUSES = ('present', 'absent', 'late')
+
+
+def validate_date(value):
+    """Return value if it is an ISO date (YYYY-MM-DD), else raise ValueError"""
+    if value is None:
+        return None
+    try:
+        if len(value) != 10:
+            raise ValueError
+        date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid date: {value} (expected YYYY-MM-DD)') from None
+    return value
+
+
+def summarize(counts):
+    """Build the standard statistics payload from a {status: count} mapping"""
+    total_records = sum(counts.get(status, 0) for status in STATUSES)
+    present_count = counts.get('present', 0)
+    attendance_percentage = (present_count / total_records * 100) if total_records > 0 else 0
+    return {
+        'total_records': total_records,
+        'present_count': present_count,
+        'absent_count': counts.get('absent', 0),
+        'late_count': counts.get('late', 0),
+        'attendance_percentage': round(attendance_percentage, 2)
+    }
+
+
+def _counts(row):
+    """{status: count} from a row of per-status counts (None: no rows)"""
+    return {status: (row[i] if row else None) or 0 for i, status in enumerate(STATUSES)}
+
+
+def summary_counts(conn, student_id=None, course=None, date_from=None, date_to=None):
+    """Return {status: count} from the summary tables, or None if the
+    filters cannot be answered from them"""
+    columns = ', '.join(f'{status}_count' for status in STATUSES)
+    sums = ', '.join(f'SUM({status}_count)' for status in STATUSES)
+    ranged = date_from is not None or date_to is not None
+
+    if course == '':
+        return None  # summaries file course-less rows under ''
+    if student_id is not None:
+        if course is not None or ranged:
+            return None
+        row = conn.execute(f'SELECT {columns} FROM attendance_summary_student '
+                           'WHERE student_id = ?', (student_id,)).fetchone()
+        return _counts(row)
+
+    if course is None and not ranged:
+        row = conn.execute(f'SELECT {columns} FROM attendance_summary_total').fetchone()
+        return _counts(row)
+
+    conditions = []
+    params = []
+    if course is not None:
+        table = 'attendance_summary_course_date'
+        conditions.append('course = ?')
+        params.append(course)
+    else:
+        table = 'attendance_summary_date'
+    if date_from is not None:
+        conditions.append('date >= ?')
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append('date <= ?')
+        params.append(date_to)
+    row = conn.execute(f"SELECT {sums} FROM {table} WHERE {' AND '.join(conditions)}",
+                       params).fetchone()
+    return _counts(row)
+
+
+def status_counts(conn, student_id=None, course=None, date_from=None, date_to=None):
+    """Return {status: count} for the attendance rows matching the filters"""
+    counts = summary_counts(conn, student_id, course, date_from, date_to)
+    if counts is None and analytics.ENABLED:
+        counts = analytics.store.snapshot(conn).counts(student_id, course, date_from, date_to)
+    elif counts is None:
+        counts = scan_status_counts(conn, student_id, course, date_from, date_to)
+    return counts
+
+
+def scan_status_counts(conn, student_id=None, course=None, date_from=None, date_to=None):
+    """Return {status: count} by scanning the matching attendance rows"""
+    conditions = []
+    params = []
+
+    if student_id is not None:
+        conditions.append('a.student_id = ?')
+        params.append(student_id)
+    if date_from is not None:
+        conditions.append('a.date >= ?')
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append('a.date <= ?')
+        params.append(date_to)
+
+    # One scan per table holding records of the range, added up here
+    counts = dict.fromkeys(STATUSES, 0)
+    for table in archive.tables(conn, date_from, date_to):
+        if not conditions and course is None:
+            # Ordered walk of the status index; no temp B-tree needed
+            for status, count in conn.execute(
+                    f'SELECT status, COUNT(*) FROM {table} GROUP BY status'):
+                counts[status] = counts.get(status, 0) + count
+            continue
+        query = ', '.join(f"SUM(a.status = '{status}')" for status in STATUSES)
+        query = f'SELECT {query} FROM {table} a'
+        table_conditions = list(conditions)
+        if course is not None and table == 'main.attendance':
+            query += ' JOIN students s ON a.student_id = s.student_id'
+            table_conditions.append('s.course = ?')
+        elif course is not None:
+            # Archived records count under the course they were archived with
+            table_conditions.append(f'{archive.ARCHIVED_COURSE} = ?')
+        query += ' WHERE ' + ' AND '.join(table_conditions)
+        table_params = params + ([course] if course is not None else [])
+        for status, count in _counts(conn.execute(query, table_params).fetchone()).items():
+            counts[status] += count
+    return counts
+
+
+def count_students(conn, course=None):
+    """Number of enrolled students, optionally within one course"""
+    if course is None:
+        return conn.execute('SELECT COUNT(*) FROM students').fetchone()[0]
+    return conn.execute('SELECT COUNT(*) FROM students WHERE course = ?',
+                        (course,)).fetchone()[0]
+
+
+def overview(conn, course=None, date_from=None, date_to=None):
+    """School-wide (or course-wide) statistics"""
+    result = {'total_students': count_students(conn, course)}
+    result.update(summarize(status_counts(conn, course=course,
+                                          date_from=date_from, date_to=date_to)))
+    return result
+
+
+def student_overview(conn, student_id, date_from=None, date_to=None):
+    """Statistics for one student"""
+    result = {'student_id': student_id}
+    result.update(summarize(status_counts(conn, student_id=student_id,
+                                          date_from=date_from, date_to=date_to)))
+    return result
+
+
+def summary_course_counts(conn, date_from=None, date_to=None):
+    """{course: ({status: count}, enrolled students)} from the summary tables"""
+    sums = ', '.join(f'SUM({status}_count)' for status in STATUSES)
+    conditions = ["course <> ''"]
+    params = []
+    if date_from is not None:
+        conditions.append('date >= ?')
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append('date <= ?')
+        params.append(date_to)
+    rollup = {course: ({}, enrolled) for course, enrolled in conn.execute(
+        "SELECT course, COUNT(*) FROM students WHERE course <> '' GROUP BY course")}
+    rows = conn.execute(f"SELECT course, {sums} FROM attendance_summary_course_date "
+                        f"WHERE {' AND '.join(conditions)} GROUP BY course", params)
+    for row in rows:
+        rollup[row[0]] = (_counts(row[1:]), rollup.get(row[0], ({}, 0))[1])
+    return rollup
+
+
+def course_overview(conn, date_from=None, date_to=None):
+    """Statistics for every course that has a name, ordered by course"""
+    if analytics.ENABLED:
+        rollup = analytics.store.snapshot(conn).course_counts(date_from, date_to)
+    else:
+        rollup = summary_course_counts(conn, date_from, date_to)
+    return [dict(course=course, total_students=enrolled, **summarize(counts))
+            for course, (counts, enrolled) in sorted(rollup.items())]
+
+
+# Sort keys of student_table() -> SQL expression
+STUDENT_SORTS = {
+    'attendance_percentage': 'percentage',
+    'total_records': 'total_records',
+    'present_count': 'present_count',
+    'absent_count': 'absent_count',
+    'late_count': 'late_count',
+    'name': 'name',
+    'student_id': 'student_id',
+}
+
+MAX_STUDENT_IDS = 10000
+
+
+def student_table(conn, student_ids=None, course=None, date_from=None, date_to=None,
+                  below=None, above=None, min_records=0, sort='attendance_percentage',
+                  descending=False, limit=None):
+    """Statistics for many students in one grouped query.
+
+    Students are picked by `student_ids` and/or `course` (all students if
+    neither), filtered by attendance percentage (strictly `below` / `above`)
+    and record count, sorted and optionally limited. Returns (rows, matched)
+    where matched counts the students that passed the filters before the
+    limit.
+    """
+    if sort not in STUDENT_SORTS:
+        raise ValueError(f"sort must be one of: {', '.join(STUDENT_SORTS)}")
+    if analytics.ENABLED and (date_from is not None or date_to is not None):
+        return _store_student_table(conn, student_ids, course, date_from, date_to, below,
+                                    above, min_records, sort, descending, limit)
+    params = []
+    if date_from is None and date_to is None:
+        counts = [f'COALESCE(c.{status}_count, 0) AS {status}_count' for status in STATUSES]
+        source = 'students s LEFT JOIN attendance_summary_student c ON c.student_id = s.student_id'
+        group_by = ''
+    else:
+        # Each student is a range read of its (student_id, date) index entries
+        join, sums, params = archive.student_counts(conn, date_from, date_to)
+        counts = [f"COALESCE(SUM({sums[status]}), 0) AS {status}_count" for status in STATUSES]
+        source = f'students s {join}'
+        group_by = 'GROUP BY s.student_id'
+
+    scope = []
+    if student_ids is not None:
+        scope.append(f"s.student_id IN ({', '.join('?' * len(student_ids))})")
+        params.extend(student_ids)
+    if course is not None:
+        scope.append('s.course = ?')
+        params.append(course)
+    where = f"WHERE {' AND '.join(scope)}" if scope else ''
+
+    total = ' + '.join(f'{status}_count' for status in STATUSES)
+    filters = ['total_records >= ?']
+    params.append(min_records)
+    if below is not None:
+        filters.append('percentage < ?')
+        params.append(below)
+    if above is not None:
+        filters.append('percentage > ?')
+        params.append(above)
+    query = f'''
+        SELECT student_id, name, course, {', '.join(f'{s}_count' for s in STATUSES)},
+               COUNT(*) OVER () AS matched
+        FROM (SELECT *, {total} AS total_records,
+                     CASE WHEN {total} > 0 THEN present_count * 100.0 / ({total})
+                          ELSE 0 END AS percentage
+              FROM (SELECT s.student_id, s.name, s.course, {', '.join(counts)}
+                    FROM {source} {where} {group_by}))
+        WHERE {' AND '.join(filters)}
+        ORDER BY {STUDENT_SORTS[sort]} {'DESC' if descending else 'ASC'}, student_id'''
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+
+    rows = conn.execute(query, params).fetchall()
+    results = []
+    for row in rows:
+        result = {'student_id': row[0], 'name': row[1], 'course': row[2]}
+        result.update(summarize(dict(zip(STATUSES, row[3:6]))))
+        results.append(result)
+    return results, rows[0][-1] if rows else 0
+
+
+def _store_student_table(conn, student_ids, course, date_from, date_to, below, above,
+                         min_records, sort, descending, limit):
+    """student_table() with date-range counts from the analytics store"""
+    scope, params = [], []
+    if student_ids is not None:
+        scope.append(f"student_id IN ({', '.join('?' * len(student_ids))})")
+        params.extend(student_ids)
+    if course is not None:
+        scope.append('course = ?')
+        params.append(course)
+    where = f"WHERE {' AND '.join(scope)}" if scope else ''
+    students = conn.execute(f'SELECT student_id, name, course FROM students {where}',
+                            params).fetchall()
+    counts = analytics.store.snapshot(conn).student_counts(
+        [row[0] for row in students], date_from, date_to).tolist()
+
+    rows = []
+    for (student_id, name, student_course), (present, absent, late) in zip(students, counts):
+        total = present + absent + late
+        percentage = present * 100.0 / total if total > 0 else 0
+        if total < min_records or (below is not None and not percentage < below) or \
+                (above is not None and not percentage > above):
+            continue
+        rows.append({'student_id': student_id, 'name': name, 'course': student_course,
+                     'total_records': total, 'present_count': present,
+                     'absent_count': absent, 'late_count': late, 'percentage': percentage})
+    # Same order as the SQL path: the sort key, then student_id ascending
+    rows.sort(key=lambda row: row['student_id'])
+    rows.sort(key=lambda row: row[STUDENT_SORTS[sort]], reverse=descending)
+    matched = len(rows)
+    results = []
+    for row in rows[:limit]:
+        result = {'student_id': row['student_id'], 'name': row['name'], 'course': row['course']}
+        result.update(summarize({status: row[f'{status}_count'] for status in STATUSES}))
+        results.append(result)
+    return results, matched
@@ -0,0 +1,131 @@
+"""
+Shared machinery of the in-memory stores: the analytics columns
+(analytics.py) and the per-student timelines (timelines.py).
+
+Both keep every student's records in each server process and follow
+writes through changes.py: a listener notes which students changed,
+whatever the write path, and the next query re-reads just those students,
+or everything after a reset or when too many changed. Changes made by
+other worker processes arrive the same way, because snapshot() syncs the
+change log first. A Store subclass says how to read and splice its
+snapshot; this module does the bookkeeping, the read transaction and the
+timings. Records are read as one string per student (timeline_queries()).
+"""
+import logging
+import threading
+import time
+
+import archive
+import changes
+
+logger = logging.getLogger(__name__)
+
+# Above this share of changed students, reload everything instead of splicing
+FULL_RELOAD_FRACTION = 0.25
+
+# Students per query when re-reading changed students
+REFRESH_BATCH = 500
+
+# One string per student: every record as 'YYYY-MM-DD' + first letter of
+# status, read from each table holding records (archive.tables())
+TIMELINE_PART = '''
+    COALESCE((SELECT group_concat(a.date || substr(a.status, 1, 1), '')
+              FROM {table} a
+              WHERE a.student_id = s.student_id AND length(a.date) = 10), '')'''
+RECORD_WIDTH = 11
+
+
+def timeline_queries(conn, key, student_ids=None):
+    """[(sql, params)] selecting (key, records) for all students or the
+    given ones, where key is a students column ('s.id', 's.student_id')
+    and records the student's RECORD_WIDTH-character records, unordered"""
+    records_sql = ' || '.join(TIMELINE_PART.format(table=table) for table in archive.tables(conn))
+    query = f'SELECT {key}, {records_sql} FROM students s'
+    if student_ids is None:
+        return [(query, ())]
+    student_ids = list(student_ids)
+    batches = []
+    for start in range(0, len(student_ids), REFRESH_BATCH):
+        chunk = student_ids[start:start + REFRESH_BATCH]
+        batches.append((f"{query} WHERE s.student_id IN ({', '.join('?' * len(chunk))})", chunk))
+    return batches
+
+
+class Store:
+    """A process-wide snapshot of the students' records, refreshed lazily
+    from the change log.
+
+    Subclasses implement read(conn) -> snapshot, read_students(conn),
+    splice(conn, old, dirty, students, students_changed) -> snapshot and
+    describe(snapshot) for the load log line. A snapshot is immutable and
+    has a ``students`` attribute whose len() is the number of students.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._snapshot = None
+        self._stale = True
+        self._students_changed = False
+        self._dirty = set()
+        self._loads = 0
+        self._refreshes = 0
+        self._load_seconds = 0.0
+        self._refresh_seconds = 0.0
+
+    def on_change(self, kind, dates, student_ids):
+        """changes.py listener: remember what to re-read on the next query"""
+        with self._pending_lock:
+            if kind == 'reset':
+                self._stale = True
+            elif kind == 'students':
+                self._students_changed = True
+            self._dirty.update(student_ids)
+
+    def snapshot(self, conn):
+        """Current snapshot, after applying every committed change"""
+        changes.sync(conn)
+        with self._lock:
+            with self._pending_lock:
+                stale, students_changed = self._stale, self._students_changed
+                dirty, self._dirty = self._dirty, set()
+                self._stale = self._students_changed = False
+            if stale or self._snapshot is None or dirty or students_changed:
+                archive.tables(conn)  # attach archived partitions; not possible after BEGIN
+                # One read transaction: students and records from the same commit
+                conn.execute('BEGIN')
+                try:
+                    if stale or self._snapshot is None:
+                        self._load(conn)
+                    else:
+                        self._refresh(conn, dirty, students_changed)
+                finally:
+                    conn.commit()
+            return self._snapshot
+
+    def _load(self, conn):
+        started = time.perf_counter()
+        self._snapshot = self.read(conn)
+        self._loads += 1
+        self._load_seconds = time.perf_counter() - started
+        logger.info('Loaded %s in %.2fs', self.describe(self._snapshot), self._load_seconds)
+
+    def _refresh(self, conn, dirty, students_changed):
+        old = self._snapshot
+        students = self.read_students(conn) if students_changed else old.students
+        if len(dirty) > FULL_RELOAD_FRACTION * max(len(students), 1):
+            self._load(conn)
+            return
+        started = time.perf_counter()
+        self._snapshot = self.splice(conn, old, dirty, students, students_changed)
+        self._refreshes += 1
+        self._refresh_seconds += time.perf_counter() - started
+
+    def timings(self):
+        """Load and refresh counts and times, for the subclasses' stats()"""
+        return {
+            'loads': self._loads,
+            'last_load_ms': round(self._load_seconds * 1000, 2),
+            'refreshes': self._refreshes,
+            'total_refresh_ms': round(self._refresh_seconds * 1000, 2),
+        }
@@ -0,0 +1,380 @@
+"""
+Server-sent events for live dashboards (GET /api/stream).
+
+One Broadcaster per process turns committed writes into events. Its pump
+thread collects the change notifications (changes.py) of a burst for
+ATTENDANCE_STREAM_COALESCE_MS (default 250), then reads what changed
+from the change log once (deltas.py), computes the overview counters
+once, and encodes the result once. The same bytes are appended to a
+shared ring of recent events and every subscriber picks them up from
+there, so a burst of marks costs one query set and one encoding however
+many dashboards are connected. Writes made by other worker processes are
+picked up by polling the change log every ATTENDANCE_STREAM_POLL_MS
+(default 500) while anyone is subscribed.
+
+Each event carries its change-log version as the SSE ``id``:
+
+    event: attendance   {since, version, dates, attendance, deleted, more}
+                        records added or changed and tombstones, as in
+                        GET /api/sync; with more: true the burst was too
+                        big to inline (ATTENDANCE_STREAM_EVENT_RECORDS,
+                        default 200) and clients re-fetch what they show
+    event: overview     {version, overall, today}: school-wide counters
+                        and today's, as in GET /api/statistics/overview
+    event: reset        the stream cannot say what changed; re-fetch
+
+A new subscriber first gets the current ``overview``. Browsers reconnect
+on their own after ``retry`` milliseconds and send ``Last-Event-ID``;
+events after it are replayed from the ring (the last
+ATTENDANCE_STREAM_BACKLOG events, default 256), or a ``reset`` is sent
+if they are gone. A comment line goes out every
+ATTENDANCE_STREAM_HEARTBEAT seconds (default 15) so proxies keep idle
+streams open, and a stream ends after ATTENDANCE_STREAM_MAX_SECONDS
+(default 3600) so clients reconnect, e.g. to a restarted worker.
+
+Each database file (tenants.py) has a Broadcaster of its own; its pump
+thread works in that database's context (db.using).
+
+Under WSGI servers each open stream holds a thread; asgi.py serves the
+stream on the event loop instead, so one process holds hundreds of
+subscribers.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import date
+
+import changes
+import db
+import deltas
+import stats
+
+logger = logging.getLogger(__name__)
+
+COALESCE = float(os.environ.get('ATTENDANCE_STREAM_COALESCE_MS', '250')) / 1000
+POLL_INTERVAL = float(os.environ.get('ATTENDANCE_STREAM_POLL_MS', '500')) / 1000
+HEARTBEAT = float(os.environ.get('ATTENDANCE_STREAM_HEARTBEAT', '15'))
+MAX_DURATION = float(os.environ.get('ATTENDANCE_STREAM_MAX_SECONDS', '3600'))
+BACKLOG = int(os.environ.get('ATTENDANCE_STREAM_BACKLOG', '256'))
+EVENT_RECORDS = int(os.environ.get('ATTENDANCE_STREAM_EVENT_RECORDS', '200'))
+MAX_SUBSCRIBERS = int(os.environ.get('ATTENDANCE_STREAM_MAX_SUBSCRIBERS', '1000'))
+RETRY_MS = int(os.environ.get('ATTENDANCE_STREAM_RETRY_MS', '3000'))
+
+HEARTBEAT_CHUNK = b': keepalive\n\n'
+
+
+class TooManySubscribers(Exception):
+    """Raised when this process already serves MAX_SUBSCRIBERS streams"""
+
+
+def format_event(event, data, event_id=None):
+    """One SSE event as bytes"""
+    head = f'id: {event_id}\n' if event_id is not None else ''
+    return f'{head}event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'.encode()
+
+
+def parse_event_id(value):
+    """The version in a Last-Event-ID header, or None"""
+    value = (value or '').strip()
+    return int(value) if value.isdigit() else None
+
+
+def overview(conn):
+    """The overview event's payload: school-wide and today's counters"""
+    today = date.today().isoformat()
+    result = {'date': today}
+    result.update(stats.overview(conn, date_from=today, date_to=today))
+    return {'overall': stats.overview(conn), 'today': result}
+
+
+class Broadcaster:
+    """Per-process fan-out of change events to stream subscribers"""
+
+    def __init__(self, columns, db_path=None):
+        self.columns = columns
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)    # wakes the pump
+        self._published = threading.Condition(self._lock)  # wakes subscribers
+        self._wakers = []
+        self._reset()
+
+    def _reset(self):
+        """Forget subscribers, events and the pump (creation, after fork)"""
+        self._pid = os.getpid()
+        self._events = deque(maxlen=BACKLOG)  # (since, version, chunk or None)
+        self._version = 0
+        self._subscribers = 0
+        self._pending_at = None
+        self._pending_dates = set()
+        self._pending_reset = False
+        self._pump = None
+        self._stopping = False
+        self._overview = (None, None)
+        self._published_events = 0
+        self._published_bytes = 0
+        self._max_subscribers = 0
+        self._rejected = 0
+
+    def add_waker(self, fn):
+        """Call fn() (from the pump thread) after every published event"""
+        self._wakers.append(fn)
+
+    # ----- subscribers -----
+
+    def open(self, last_event_id=None):
+        """Subscribe; returns (cursor, first chunk) for a new stream.
+
+        The first chunk holds the retry interval and either the current
+        overview (new subscribers) or the events missed since
+        last_event_id (reconnects).
+        """
+        with db.get_pool(self.db_path).connection() as conn:
+            replay = (last_event_id is not None
+                      and last_event_id <= changes.latest_version(conn))
+            if not replay:
+                cursor, chunk = self._overview_chunk(conn)
+                if last_event_id is not None:
+                    # An id from before a database restore
+                    chunk = format_event('reset', {'version': cursor}, cursor) + chunk
+        if replay:
+            cursor = last_event_id
+        self._subscribe(cursor)
+        if replay:
+            chunks, cursor, gap = self.events_after(cursor)
+            chunk = b''.join(chunks)
+            if gap:
+                with db.get_pool(self.db_path).connection() as conn:
+                    chunk += self._overview_chunk(conn)[1]
+        return cursor, f'retry: {RETRY_MS}\n\n'.encode() + chunk
+
+    def _overview_chunk(self, conn):
+        """(version, overview event), computed once per version and day"""
+        conn.execute('BEGIN')
+        try:
+            version = changes.latest_version(conn)
+            key = (version, date.today())
+            cached_key, chunk = self._overview
+            if cached_key != key:
+                data = overview(conn)
+                data['version'] = version
+                chunk = format_event('overview', data, version)
+                self._overview = (key, chunk)
+        finally:
+            conn.rollback()
+        return version, chunk
+
+    def _subscribe(self, version):
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._reset()  # the parent's pump thread did not survive fork
+            if self._subscribers >= MAX_SUBSCRIBERS:
+                self._rejected += 1
+                raise TooManySubscribers(f'Too many open streams ({self._subscribers})')
+            if self._subscribers == 0:
+                # Nothing was collected while nobody listened: start from here
+                self._version = max(self._version, version)
+            self._subscribers += 1
+            self._max_subscribers = max(self._max_subscribers, self._subscribers)
+            if self._pump is None:
+                self._pump = threading.Thread(target=self._run, name='stream-pump', daemon=True)
+                self._pump.start()
+            self._changed.notify()
+
+    def unsubscribe(self):
+        with self._lock:
+            if os.getpid() != self._pid:
+                return
+            self._subscribers -= 1
+            if self._subscribers == 0:
+                self._pending_at = None
+                self._pending_dates = set()
+                self._pending_reset = False
+
+    def events_after(self, cursor):
+        """(chunks, new cursor, gap) for the events after version `cursor`.
+
+        gap is True if some of them are gone; chunks is then a reset event.
+        """
+        with self._lock:
+            return self._events_after(cursor)
+
+    def _events_after(self, cursor):
+        newer = []
+        for event in reversed(self._events):
+            if event[1] <= cursor:
+                break
+            newer.append(event)
+        if (newer and newer[-1][0] > cursor) or (not newer and cursor < self._version):
+            # Events between the cursor and the ring are gone
+            reset = format_event('reset', {'version': self._version}, self._version)
+            return [reset], self._version, True
+        chunks = [chunk for _, _, chunk in reversed(newer) if chunk is not None]
+        return chunks, newer[0][1] if newer else cursor, False
+
+    def wait(self, cursor, timeout):
+        """events_after(), blocking up to `timeout` seconds for new events"""
+        with self._lock:
+            self._published.wait_for(
+                lambda: self._stopping or (self._events and self._events[-1][1] > cursor)
+                or cursor < self._version, timeout)
+            return self._events_after(cursor)
+
+    def stream(self, cursor, first_chunk):
+        """WSGI body: the first chunk, then events and heartbeats"""
+        try:
+            yield first_chunk
+            deadline = time.monotonic() + MAX_DURATION
+            while time.monotonic() < deadline and not self._stopping:
+                chunks, cursor, _ = self.wait(cursor, HEARTBEAT)
+                yield b''.join(chunks) if chunks else HEARTBEAT_CHUNK
+        finally:
+            self.unsubscribe()
+
+    # ----- pump -----
+
+    def on_change(self, kind, dates, student_ids):
+        """changes.py listener: note the change for the next event"""
+        if kind not in ('attendance', 'students', 'reset'):
+            return
+        with self._lock:
+            if self._subscribers == 0 or os.getpid() != self._pid:
+                return
+            self._pending_dates |= dates
+            self._pending_reset = self._pending_reset or kind == 'reset'
+            if self._pending_at is None:
+                self._pending_at = time.monotonic()
+                self._changed.notify()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path or db.DB_PATH)
+        db.configure_connection(conn)
+        return conn
+
+    def _run(self):
+        with db.using(self.db_path):
+            self._pump_events()
+
+    def _pump_events(self):
+        conn = self._connect()
+        try:
+            while self._await_work():
+                try:
+                    # Other workers' commits reach on_change() through here
+                    changes.sync(conn)
+                    batch = self._take_pending()
+                    if batch is not None:
+                        self._broadcast(conn, *batch)
+                except sqlite3.Error:
+                    logger.exception('Could not build a stream event')
+                    conn.rollback()
+                    time.sleep(POLL_INTERVAL)
+        finally:
+            conn.close()
+
+    def _await_work(self):
+        """Sleep until a poll or coalesced event is due; False when stopping"""
+        with self._lock:
+            while not self._stopping:
+                if self._subscribers == 0:
+                    self._changed.wait()
+                    continue
+                if self._pending_at is None:
+                    self._changed.wait(POLL_INTERVAL)
+                    if self._pending_at is None:
+                        return True
+                remaining = self._pending_at + COALESCE - time.monotonic()
+                if remaining <= 0:
+                    return True
+                self._changed.wait(remaining)
+            return False
+
+    def _take_pending(self):
+        with self._lock:
+            if self._pending_at is None or time.monotonic() < self._pending_at + COALESCE:
+                return None
+            batch = (self._version, self._pending_dates, self._pending_reset)
+            self._pending_at = None
+            self._pending_dates = set()
+            self._pending_reset = False
+            return batch
+
+    def _broadcast(self, conn, since, dates, reset):
+        """Build the event for everything after `since` and publish it"""
+        latest = changes.latest_version(conn)
+        delta = ({'reset': True, 'version': latest} if reset
+                 else deltas.delta(conn, self.columns, since, limit=EVENT_RECORDS))
+        if delta['reset']:
+            version = delta['version']
+            chunk = format_event('reset', {'version': version}, version)
+        else:
+            more = delta['more']
+            version = max(latest, delta['version']) if more else delta['version']
+            deleted = delta['deleted']['attendance']
+            chunk = None
+            if more or delta['attendance'] or deleted or delta['students'] \
+                    or delta['deleted']['students']:
+                changed_dates = set(dates)
+                changed_dates.update(r['date'] for r in delta['attendance'])
+                changed_dates.update(t['date'] for t in deleted)
+                chunk = format_event('attendance', {
+                    'since': since, 'version': version, 'dates': sorted(changed_dates),
+                    'more': more,
+                    'attendance': [] if more else delta['attendance'],
+                    'deleted': [] if more else deleted,
+                }, version)
+                data = overview(conn)
+                data['version'] = version
+                chunk += format_event('overview', data, version)
+        self._publish(since, version, chunk)
+
+    def _publish(self, since, version, chunk):
+        with self._lock:
+            if since != self._version or version <= since:
+                return  # superseded (the pump restarted from a newer version)
+            # A None chunk only advances the version (e.g. a term changed)
+            self._events.append((since, version, chunk))
+            self._version = version
+            if chunk is not None:
+                self._published_events += 1
+                self._published_bytes += len(chunk)
+            self._published.notify_all()
+        if chunk is not None:
+            for fn in list(self._wakers):
+                try:
+                    fn()
+                except Exception:
+                    logger.exception('Stream waker %r failed', fn)
+
+    def stop(self):
+        """Stop the pump and end the open streams"""
+        with self._lock:
+            pump = self._pump if os.getpid() == self._pid else None
+            self._stopping = True
+            self._changed.notify_all()
+            self._published.notify_all()
+        if pump is not None:
+            pump.join()
+        with self._lock:
+            self._pump = None
+            self._stopping = False
+
+    def stats(self):
+        """Subscriber and event counters"""
+        with self._lock:
+            return {
+                'subscribers': self._subscribers,
+                'max_subscribers': self._max_subscribers,
+                'subscriber_limit': MAX_SUBSCRIBERS,
+                'rejected': self._rejected,
+                'version': self._version,
+                'backlog_events': len(self._events),
+                'published_events': self._published_events,
+                'published_bytes': self._published_bytes,
+                'coalesce_ms': COALESCE * 1000,
+                'poll_ms': POLL_INTERVAL * 1000,
+            }
@@ -0,0 +1,252 @@
+"""
+Incrementally maintained attendance summary tables.
+
+Status counts are kept per student, per date, per (course, date) and for
+the whole school by triggers on the attendance (or, in the compact layout,
+attendance_compact; see layout.py) and students tables. Every
+write path is covered, including bulk upserts and the attendance rows
+deleted by delete_student(). The statistics endpoints can therefore read a
+handful of summary rows instead of scanning attendance.
+
+Rows without a known course are counted under course ''.
+
+Usage (from the backend directory):
+    python3 summaries.py --verify    # compare summaries with attendance
+    python3 summaries.py --rebuild   # recompute from scratch, then verify
+"""
+import argparse
+import sqlite3
+import sys
+
+STATUSES = ('present', 'absent', 'late')
+
+COUNT_COLUMNS = ', '.join(f'{status}_count' for status in STATUSES)
+
+# table name -> key columns
+TABLES = {
+    'attendance_summary_student': ('student_id',),
+    'attendance_summary_date': ('date',),
+    'attendance_summary_course_date': ('course', 'date'),
+    'attendance_summary_total': ('id',),
+}
+
+def _create_tables(conn):
+    counts = ', '.join(f'{status}_count INTEGER NOT NULL DEFAULT 0' for status in STATUSES)
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS attendance_summary_student (
+            student_id TEXT PRIMARY KEY, {counts}) WITHOUT ROWID''')
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS attendance_summary_date (
+            date TEXT PRIMARY KEY, {counts}) WITHOUT ROWID''')
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS attendance_summary_course_date (
+            course TEXT NOT NULL, date TEXT NOT NULL, {counts},
+            PRIMARY KEY (course, date)) WITHOUT ROWID''')
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS attendance_summary_total (
+            id INTEGER PRIMARY KEY CHECK (id = 1), {counts})''')
+
+
+def _adjust(table, keys, status_of, sign):
+    """SQL adding sign * (the row's status) to the summary row at keys"""
+    key_columns = ', '.join(keys)
+    key_values = ', '.join(keys.values())
+    values = ', '.join(f"{sign} * ({status_of} = '{status}')" for status in STATUSES)
+    updates = ', '.join(f'{status}_count = {status}_count + excluded.{status}_count'
+                        for status in STATUSES)
+    return (f'INSERT INTO {table} ({key_columns}, {COUNT_COLUMNS}) '
+            f'VALUES ({key_values}, {values}) '
+            f'ON CONFLICT ({key_columns}) DO UPDATE SET {updates};')
+
+
+def _prune(table, keys):
+    """SQL removing the summary row identified by keys once it is all zero"""
+    where = ' AND '.join(f'{column} = {value}' for column, value in keys.items())
+    zero = ' AND '.join(f'{status}_count = 0' for status in STATUSES)
+    return f'DELETE FROM {table} WHERE {where} AND {zero};'
+
+
+def _apply(storage, row, sign):
+    """Statements applying one attendance row (NEW or OLD) to every summary"""
+    fields = {name: sql.format(row=row) for name, sql in storage['row'].items()}
+    keysets = {
+        'attendance_summary_student': {'student_id': fields['student_id']},
+        'attendance_summary_date': {'date': fields['date']},
+        'attendance_summary_course_date': {'course': f"COALESCE({fields['course']}, '')",
+                                           'date': fields['date']},
+        'attendance_summary_total': {'id': '1'},
+    }
+    statements = [_adjust(table, keys, fields['status'], sign) for table, keys in keysets.items()]
+    if sign < 0:
+        statements += [_prune(table, keys) for table, keys in keysets.items()
+                       if table != 'attendance_summary_total']
+    return '\n'.join(statements)
+
+
+def _move_course(student_id, old_course, new_course):
+    """Statements moving a student's counts from one course to another"""
+    per_date = ', '.join(f"SUM(status = '{status}')" for status in STATUSES)
+    subtract = ', '.join(
+        f'''{status}_count = {status}_count - (
+                SELECT COUNT(*) FROM attendance a
+                WHERE a.student_id = {student_id}
+                  AND a.date = attendance_summary_course_date.date
+                  AND a.status = '{status}')'''
+        for status in STATUSES)
+    add = ', '.join(f'{status}_count = {status}_count + excluded.{status}_count'
+                    for status in STATUSES)
+    zero = ' AND '.join(f'{status}_count = 0' for status in STATUSES)
+    return f'''
+        UPDATE attendance_summary_course_date SET {subtract}
+        WHERE course = COALESCE({old_course}, '')
+          AND date IN (SELECT date FROM attendance WHERE student_id = {student_id});
+        DELETE FROM attendance_summary_course_date
+        WHERE course = COALESCE({old_course}, '') AND {zero};
+        INSERT INTO attendance_summary_course_date (course, date, {COUNT_COLUMNS})
+        SELECT COALESCE({new_course}, ''), date, {per_date}
+        FROM attendance WHERE student_id = {student_id} GROUP BY date
+        ON CONFLICT (course, date) DO UPDATE SET {add};'''
+
+
+def create_attendance_triggers(conn, storage):
+    """Triggers keeping the summaries in step with an attendance storage
+    table (a layout.LAYOUTS entry)"""
+    table = storage['table']
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_summary_attendance_insert
+        AFTER INSERT ON {table} BEGIN
+        {_apply(storage, 'NEW', 1)}
+        END''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_summary_attendance_delete
+        AFTER DELETE ON {table} BEGIN
+        {_apply(storage, 'OLD', -1)}
+        END''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_summary_attendance_update
+        AFTER UPDATE OF {', '.join(storage['moves'])}, status ON {table} BEGIN
+        {_apply(storage, 'OLD', -1)}
+        {_apply(storage, 'NEW', 1)}
+        END''')
+
+
+def _create_student_triggers(conn):
+    # Course changes (and students appearing/disappearing around their
+    # attendance rows) move that student's counts between course buckets
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_summary_student_course
+        AFTER UPDATE OF course ON students
+        WHEN COALESCE(OLD.course, '') <> COALESCE(NEW.course, '') BEGIN
+        {_move_course('NEW.student_id', 'OLD.course', 'NEW.course')}
+        END''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_summary_student_insert
+        AFTER INSERT ON students WHEN COALESCE(NEW.course, '') <> '' BEGIN
+        {_move_course('NEW.student_id', 'NULL', 'NEW.course')}
+        END''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_summary_student_delete
+        AFTER DELETE ON students WHEN COALESCE(OLD.course, '') <> '' BEGIN
+        {_move_course('OLD.student_id', 'OLD.course', 'NULL')}
+        END''')
+
+
+def create_schema(conn):
+    """Create the summary tables and their maintenance triggers"""
+    from layout import LAYOUTS
+
+    _create_tables(conn)
+    create_attendance_triggers(conn, LAYOUTS['rowid'])
+    _create_student_triggers(conn)
+
+
+# ========== REBUILD / VERIFY ==========
+
+def _queries(conn):
+    """Queries recomputing each summary table from attendance, archived
+    partitions (archive.py) included"""
+    import archive
+
+    source = archive.source(conn, columns=archive.COUNTED + ('course',))[0]
+    # Archived records carry the course they were archived under
+    course = ("COALESCE(s.course, '')" if source == 'attendance'
+              else "COALESCE(a.course, s.course, '')")
+    counts = ', '.join(f"SUM(a.status = '{status}')" for status in STATUSES)
+    return {
+        'attendance_summary_student':
+            f'SELECT a.student_id, {counts} FROM {source} a GROUP BY a.student_id',
+        'attendance_summary_date':
+            f'SELECT a.date, {counts} FROM {source} a GROUP BY a.date',
+        'attendance_summary_course_date':
+            f'''SELECT {course}, a.date, {counts}
+                FROM {source} a LEFT JOIN students s ON a.student_id = s.student_id
+                GROUP BY 1, 2''',
+        'attendance_summary_total':
+            f'SELECT 1, {counts} FROM {source} a HAVING COUNT(*) > 0',
+    }
+
+
+def _expected(conn):
+    """Summary contents recomputed from attendance: {table: {key: counts}}"""
+    expected = {}
+    for table, query in _queries(conn).items():
+        width = len(TABLES[table])
+        expected[table] = {tuple(row[:width]): tuple(row[width:])
+                           for row in conn.execute(query)}
+    return expected
+
+
+def _actual(conn):
+    actual = {}
+    for table, keys in TABLES.items():
+        rows = conn.execute(f"SELECT {', '.join(keys)}, {COUNT_COLUMNS} FROM {table}")
+        actual[table] = {tuple(row[:len(keys)]): tuple(row[len(keys):]) for row in rows
+                         if any(row[len(keys):])}
+    return actual
+
+
+def verify(conn):
+    """Return {table: mismatch count}; empty when every summary is consistent"""
+    expected, actual = _expected(conn), _actual(conn)
+    mismatches = {}
+    for table in TABLES:
+        keys = expected[table].keys() | actual[table].keys()
+        bad = sum(1 for key in keys if expected[table].get(key) != actual[table].get(key))
+        if bad:
+            mismatches[table] = bad
+    return mismatches
+
+
+def rebuild(conn):
+    """Recompute every summary table from the attendance records"""
+    for table, query in _queries(conn).items():
+        conn.execute(f'DELETE FROM {table}')
+        conn.execute(f"INSERT INTO {table} ({', '.join(TABLES[table])}, {COUNT_COLUMNS}) {query}")
+
+
+def main():
+    from db import DB_PATH, configure_connection
+
+    parser = argparse.ArgumentParser(description='Attendance summary tables')
+    parser.add_argument('--db', default=DB_PATH, help='database file (default: %(default)s)')
+    parser.add_argument('--rebuild', action='store_true', help='recompute from scratch first')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    configure_connection(conn)
+    if args.rebuild:
+        rebuild(conn)
+        conn.commit()
+        print('Rebuilt summary tables')
+
+    mismatches = verify(conn)
+    for table, count in mismatches.items():
+        print(f'❌ {table}: {count} inconsistent row(s)')
+    if mismatches:
+        return 1
+    print('✅ Summary tables are consistent with attendance')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
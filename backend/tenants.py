@@ -0,0 +1,430 @@
+"""
+Multi-tenant sharding: one SQLite database per school.
+
+Every tenant (a school) has a database of its own, with the full schema,
+its own write lock, WAL, change log and archive partitions. Tenants are
+listed in a catalog database (ATTENDANCE_TENANTS_DB, default tenants.db):
+
+    tenants(name, path, created_at)
+
+A tenant's database lives at ``<shard>/<name>/attendance.db``, where the
+shard is one of the directories in ATTENDANCE_SHARD_DIRS (separated by
+os.pathsep, default ``tenants``), e.g. one per disk. Because SQLite
+serializes writers per database file, marks for different schools commit
+in parallel instead of queueing on one lock.
+
+A request names its tenant with an ``X-Tenant`` header or a path prefix:
+
+    GET /t/north-high/api/attendance      same as
+    GET /api/attendance                   with X-Tenant: north-high
+
+TenantRouter (WSGI middleware) looks the name up and routes the request
+to the tenant's database (db.use): get_db_connection() then checks out
+connections from that database's pool, and the response cache, the
+analytics store, the write queue and the live stream are the tenant's
+own (db.PerDatabase). Requests without a tenant use DB_PATH, as before.
+Unknown tenants get 404.
+
+Admin commands (from the backend directory):
+    python3 tenants.py list
+    python3 tenants.py create north-high [--shard DIR] [--from attendance.db]
+    python3 tenants.py migrate [NAME ...]
+    python3 tenants.py rebalance [--apply]
+
+rebalance moves tenant directories from the fullest shard (by bytes) to
+the emptiest one; it only prints the plan unless --apply is given. Run
+create --from and rebalance --apply with the servers stopped: a server
+still holding a moved database open would keep writing to the old file.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+import migrations
+
+TENANTS_DB = os.environ.get('ATTENDANCE_TENANTS_DB', 'tenants.db')
+SHARD_DIRS = [path for path in
+              os.environ.get('ATTENDANCE_SHARD_DIRS', 'tenants').split(os.pathsep) if path]
+# Threads querying tenant databases at once in fan_out()
+FAN_OUT_THREADS = int(os.environ.get('ATTENDANCE_FAN_OUT_THREADS', '4'))
+
+HEADER = 'HTTP_X_TENANT'
+PREFIX = '/t/'
+NAME_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]{0,62}$')
+DB_FILE = 'attendance.db'
+
+# The default database (ATTENDANCE_DB_PATH) in databases(); not a valid
+# tenant name, so it cannot clash with one
+DEFAULT_NAME = '_default'
+
+# (catalog_version(), {name: database path}) as last read from the catalog
+_paths = (None, {})
+_paths_lock = threading.Lock()
+
+
+class UnknownTenant(LookupError):
+    """Raised for a tenant name that is not in the catalog"""
+
+
+# ========== CATALOG ==========
+
+def connect_catalog(create=False):
+    """Connection to the catalog, or None if it does not exist yet"""
+    if not create and not os.path.exists(TENANTS_DB):
+        return None
+    conn = sqlite3.connect(TENANTS_DB)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tenants (
+            name TEXT PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return conn
+
+
+def catalog():
+    """{name: database path} of every tenant"""
+    conn = connect_catalog()
+    if conn is None:
+        return {}
+    try:
+        return dict(conn.execute('SELECT name, path FROM tenants ORDER BY name'))
+    finally:
+        conn.close()
+
+
+def catalog_version():
+    """Changes whenever the catalog is written: the file's size and mtime
+    and SQLite's file change counter (header bytes 24-27, bumped by every
+    commit), or None if there is no catalog"""
+    try:
+        with open(TENANTS_DB, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            return stat.st_size, stat.st_mtime_ns, f.read(28)[24:]
+    except FileNotFoundError:
+        return None
+
+
+def databases():
+    """{name: database path} of the default database (DEFAULT_NAME) and
+    every tenant"""
+    return {DEFAULT_NAME: db.DB_PATH, **catalog()}
+
+
+def lookup(name):
+    """Database path of a tenant; raises UnknownTenant"""
+    global _paths
+    version, paths = _paths
+    path = paths.get(name)
+    if path is None:
+        if not NAME_PATTERN.match(name):
+            raise UnknownTenant('Invalid tenant name')
+        # Re-read on a miss, but only if the catalog was written since:
+        # tenants created since are picked up, and unknown names cost a
+        # stat and a header read, not a catalog query
+        current = catalog_version()
+        if current != version:
+            with _paths_lock:
+                if _paths[0] != current:
+                    # The version is read before the rows, so a write in
+                    # between only causes one more re-read
+                    _paths = (current, catalog())
+                paths = _paths[1]
+            path = paths.get(name)
+        if path is None:
+            raise UnknownTenant(f'Unknown tenant: {name}')
+    return path
+
+
+def connect(path):
+    """A configured connection to a tenant database"""
+    conn = sqlite3.connect(path)
+    db.configure_connection(conn)
+    return conn
+
+
+def database_bytes(path):
+    """Size of a database with its WAL and archive partitions"""
+    directory = os.path.dirname(path)
+    total = 0
+    for root, _, files in os.walk(directory):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def shard_of(path):
+    return os.path.dirname(os.path.dirname(path))
+
+
+def shard_usage(tenants=None):
+    """{shard directory: bytes used by its tenants} for every shard"""
+    usage = {shard: 0 for shard in SHARD_DIRS}
+    for path in (catalog() if tenants is None else tenants).values():
+        shard = shard_of(path)
+        usage[shard] = usage.get(shard, 0) + database_bytes(path)
+    return usage
+
+
+# ========== ADMIN ==========
+
+def create(name, shard=None, source=None):
+    """Create a tenant database (a copy of `source`, if given) on `shard`
+    (default: the least used one); returns its path"""
+    if not NAME_PATTERN.match(name):
+        raise ValueError('Tenant names are lowercase letters, digits, "-" and "_" '
+                         '(up to 63 characters)')
+    if name in catalog():
+        raise ValueError(f'Tenant {name} already exists')
+    if shard is None:
+        usage = shard_usage()
+        shard = min(SHARD_DIRS, key=usage.get)
+    directory = os.path.join(shard, name)
+    if os.path.exists(directory):
+        raise ValueError(f'{directory} already exists')
+    if source is not None:
+        import archive
+        conn = connect(source)
+        try:
+            if archive.partitions(conn):
+                raise ValueError(f'{source} has archived partitions; restore them first '
+                                 '(archive.py restore)')
+        finally:
+            conn.close()
+    os.makedirs(directory)
+    path = os.path.join(directory, DB_FILE)
+    try:
+        conn = connect(path)
+        if source is not None:
+            original = sqlite3.connect(source)
+            original.backup(conn)
+            original.close()
+        migrations.migrate(conn)
+        conn.close()
+        catalog_conn = connect_catalog(create=True)
+        with catalog_conn:
+            catalog_conn.execute('INSERT INTO tenants (name, path) VALUES (?, ?)', (name, path))
+        catalog_conn.close()
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    return path
+
+
+def migrate(names=None):
+    """Apply pending migrations to tenant databases (default: all);
+    returns {name: [(version, description)] applied}"""
+    tenants = catalog()
+    unknown = set(names or ()) - set(tenants)
+    if unknown:
+        raise UnknownTenant(f"Unknown tenant: {', '.join(sorted(unknown))}")
+    applied = {}
+    for name in names or tenants:
+        conn = connect(tenants[name])
+        applied[name] = migrations.migrate(conn)
+        conn.close()
+    return applied
+
+
+def plan_rebalance(tenants=None):
+    """[(name, from shard, to shard, bytes)] evening out the shards.
+
+    Greedy: repeatedly moves the fullest shard's largest tenant that still
+    fits (it must not leave the target fuller than the source was) to the
+    emptiest configured shard.
+    """
+    tenants = catalog() if tenants is None else tenants
+    usage = shard_usage(tenants)
+    sizes = {name: database_bytes(path) for name, path in tenants.items()}
+    placed = {name: shard_of(path) for name, path in tenants.items()}
+    moves = []
+    while True:
+        fullest = max(usage, key=usage.get)
+        emptiest = min(SHARD_DIRS, key=usage.get)
+        gap = usage[fullest] - usage[emptiest]
+        candidates = [name for name in placed if placed[name] == fullest and 0 < sizes[name] < gap]
+        if not candidates:
+            return moves
+        name = max(candidates, key=lambda candidate: sizes[candidate])
+        moves.append((name, fullest, emptiest, sizes[name]))
+        placed[name] = emptiest
+        usage[fullest] -= sizes[name]
+        usage[emptiest] += sizes[name]
+
+
+def move(name, shard):
+    """Move a tenant's directory to another shard (servers stopped)"""
+    global _paths
+    path = catalog()[name]
+    conn = connect(path)
+    # Fold the WAL into the database file before it changes places
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+    target = os.path.join(shard, name)
+    if os.path.exists(target):
+        raise ValueError(f'{target} already exists')
+    os.makedirs(shard, exist_ok=True)
+    shutil.move(os.path.dirname(path), target)
+    new_path = os.path.join(target, DB_FILE)
+    catalog_conn = connect_catalog()
+    with catalog_conn:
+        catalog_conn.execute('UPDATE tenants SET path = ? WHERE name = ?', (new_path, name))
+    catalog_conn.close()
+    with _paths_lock:
+        _paths = (None, {})
+    return new_path
+
+
+# ========== ROUTING ==========
+
+def split_path(path):
+    """(tenant name or None, path without the /t/<name> prefix)"""
+    if not path.startswith(PREFIX):
+        return None, path
+    name, slash, rest = path[len(PREFIX):].partition('/')
+    return name, slash + rest
+
+
+def _error(start_response, status, message):
+    body = json.dumps({'error': message}).encode()
+    start_response(status, [('Content-Type', 'application/json'),
+                            ('Content-Length', str(len(body))),
+                            ('Access-Control-Allow-Origin', '*')])
+    return [body]
+
+
+class TenantRouter:
+    """WSGI wrapper routing each request to its tenant's database"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        header = environ.get(HEADER) or None
+        prefixed, path_info = split_path(environ.get('PATH_INFO', ''))
+        if prefixed is not None and header is not None and prefixed != header:
+            return _error(start_response, '400 BAD REQUEST',
+                          'X-Tenant header and /t/ path prefix name different tenants')
+        name = prefixed or header
+        path = None
+        if name is not None:
+            try:
+                path = lookup(name)
+            except UnknownTenant as e:
+                return _error(start_response, '404 NOT FOUND', str(e))
+        if prefixed is not None:
+            environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + PREFIX + prefixed
+            environ['PATH_INFO'] = path_info
+        token = db.use(path)
+        try:
+            body = self.wsgi_app(environ, start_response)
+        except BaseException:
+            db.restore(token)
+            raise
+        return _RoutedBody(body, token)
+
+
+class _RoutedBody:
+    """Response iterable that keeps the tenant's database until closed"""
+
+    def __init__(self, body, token):
+        self.body = body
+        self.token = token
+
+    def __iter__(self):
+        return iter(self.body)
+
+    def close(self):
+        try:
+            if hasattr(self.body, 'close'):
+                self.body.close()
+        finally:
+            db.restore(self.token)
+
+
+# ========== FAN-OUT ==========
+
+def fan_out(fn, tenants=None):
+    """{name: fn(conn)} over every tenant database, FAN_OUT_THREADS at a time.
+
+    Each call runs in the tenant's context with a connection from its pool.
+    """
+    tenants = catalog() if tenants is None else tenants
+
+    def run(path):
+        with db.using(path), db.get_pool(path).connection() as conn:
+            return fn(conn)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(FAN_OUT_THREADS, len(tenants)))) as executor:
+        futures = {name: executor.submit(run, path) for name, path in tenants.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+# ========== CLI ==========
+
+def human_bytes(count):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if count < 1024 or unit == 'GB':
+            return f'{count:.0f} {unit}' if unit == 'B' else f'{count:.1f} {unit}'
+        count /= 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage per-school tenant databases')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='list tenants and shard usage')
+    create_parser = commands.add_parser('create', help='create a tenant database')
+    create_parser.add_argument('name')
+    create_parser.add_argument('--shard', help='shard directory (default: the least used)')
+    create_parser.add_argument('--from', dest='source', help='copy this database')
+    migrate_parser = commands.add_parser('migrate', help='apply pending migrations')
+    migrate_parser.add_argument('names', nargs='*', help='tenants (default: all)')
+    rebalance_parser = commands.add_parser('rebalance', help='even out shard usage')
+    rebalance_parser.add_argument('--apply', action='store_true',
+                                  help='move the databases (servers stopped)')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'list':
+            tenants = catalog()
+            for name, path in tenants.items():
+                print(f'  {name:<24} {human_bytes(database_bytes(path)):>10}  {path}')
+            print(f'{len(tenants)} tenants')
+            for shard, used in shard_usage(tenants).items():
+                print(f'  shard {shard}: {human_bytes(used)}')
+        elif args.command == 'create':
+            path = create(args.name, args.shard, args.source)
+            print(f'✅ Created tenant {args.name} at {path}')
+        elif args.command == 'migrate':
+            for name, applied in migrate(args.names).items():
+                for version, description in applied:
+                    print(f'  {name}: applied migration {version}: {description}')
+            print('✅ Tenant databases are up to date')
+        elif args.command == 'rebalance':
+            moves = plan_rebalance()
+            if not moves:
+                print('✅ Shards are balanced')
+                return 0
+            for name, source, target, size in moves:
+                print(f'  {name}: {source} -> {target} ({human_bytes(size)})')
+                if args.apply:
+                    move(name, target)
+            if args.apply:
+                print(f'✅ Moved {len(moves)} tenants')
+            else:
+                print(f'⏭️  Dry run; pass --apply to move {len(moves)} tenants')
+    except (ValueError, LookupError, sqlite3.Error, OSError) as e:
+        print(f'❌ {e}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Shared fixtures for the backend tests.
+
+app.py and the modules it imports read their configuration from the
+environment when first imported, so it is pointed at a scratch directory
+here, before any test imports them.
+
+Run from the backend directory:
+    python3 -m pytest tests
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+from datetime import date
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+SCRATCH = tempfile.mkdtemp(prefix='attendance-tests-')
+os.environ.update({
+    'ATTENDANCE_DB_PATH': os.path.join(SCRATCH, 'attendance.db'),
+    'ATTENDANCE_TENANTS_DB': os.path.join(SCRATCH, 'tenants.db'),
+    'ATTENDANCE_SHARD_DIRS': os.path.join(SCRATCH, 'tenants'),
+})
+
+# Last day of the generated history: fixed, and closed, so it can be archived
+END = date(2025, 3, 31)
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(SCRATCH, ignore_errors=True)
+
+
+@pytest.fixture
+def make_db(tmp_path):
+    """Factory for a migrated database file with generated data.
+
+    make_db(storage='rowid', students=30, days=90) returns an open
+    connection; storage='compact' converts it to the compact layout.
+    """
+    import create_mock_data
+    import layout
+    import migrations
+    from db import configure_connection
+
+    connections = []
+
+    def make(storage='rowid', students=30, days=90, name='attendance.db'):
+        conn = sqlite3.connect(str(tmp_path / name))
+        configure_connection(conn)
+        migrations.migrate(conn)
+        create_mock_data.generate(conn, students=students, days=days, seed=7, end=END)
+        layout.convert(conn, storage)
+        connections.append(conn)
+        return conn
+
+    yield make
+    for conn in connections:
+        conn.close()
+
+
+@pytest.fixture(scope='session')
+def app():
+    """The Flask app over a generated database of 40 students and 60 days"""
+    import create_mock_data
+    import app as app_module
+
+    app_module.init_db()
+    conn = sqlite3.connect(os.environ['ATTENDANCE_DB_PATH'])
+    create_mock_data.generate(conn, students=40, days=60, seed=7, end=END)
+    conn.close()
+    return app_module.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,89 @@
+"""The columnar analytics store (analytics.py) against the SQL path"""
+import pytest
+
+import analytics
+import changes
+import db
+import layout
+import stats
+from cache import response_cache
+
+pytest.importorskip('numpy')
+
+# Routes the store answers when it is enabled
+URLS = [
+    '/api/statistics/overview?course={course}&from={middle}',
+    '/api/statistics/overview?course={course}&to={middle}',
+    '/api/statistics/student/{student_id}?from={middle}',
+    '/api/statistics/courses',
+    '/api/statistics/courses?from={middle}',
+    '/api/statistics/students?from={middle}&sort=absent_count&order=desc',
+    '/api/statistics/students?to={middle}&course={course}',
+]
+
+
+@pytest.fixture(params=sorted(layout.LAYOUTS))
+def database(request, make_db):
+    """(connection, file path) of a generated database in each layout"""
+    analytics.load_numpy()
+    conn = make_db(request.param, students=20, days=30)
+    return conn, conn.execute('PRAGMA database_list').fetchone()[2]
+
+
+def fixtures(conn):
+    student_id, course = conn.execute(
+        'SELECT student_id, course FROM students ORDER BY student_id').fetchone()
+    middle = conn.execute('SELECT date FROM attendance GROUP BY date ORDER BY date '
+                          'LIMIT 1 OFFSET 15').fetchone()[0]
+    return {'student_id': student_id, 'course': course, 'middle': middle}
+
+
+def test_counts_match_a_scan(database):
+    conn, _ = database
+    values = fixtures(conn)
+    columns = analytics.AttendanceStore().read(conn)
+    for where in ({}, {'student_id': values['student_id']}, {'course': values['course']},
+                  {'date_from': values['middle']}, {'date_to': values['middle']},
+                  {'course': values['course'], 'date_from': values['middle']},
+                  {'student_id': values['student_id'], 'date_to': values['middle']},
+                  {'student_id': values['student_id'], 'course': 'No such course'},
+                  {'student_id': 'NOBODY'}):
+        assert columns.counts(**where) == stats.scan_status_counts(conn, **where), where
+
+    for date_from in (None, values['middle']):
+        assert columns.course_counts(date_from) == stats.summary_course_counts(conn, date_from)
+
+    student_ids = [row[0] for row in conn.execute('SELECT student_id FROM students')]
+    per_student = columns.student_counts(student_ids + ['NOBODY'], values['middle']).tolist()
+    for student_id, counts in zip(student_ids + ['NOBODY'], per_student):
+        expected = stats.scan_status_counts(conn, student_id=student_id,
+                                            date_from=values['middle'])
+        assert counts == [expected[status] for status in stats.STATUSES], student_id
+
+
+def test_routes_answer_as_without_the_store(app, database, monkeypatch):
+    conn, path = database
+    values = fixtures(conn)
+    monkeypatch.setattr(changes, '_listeners', changes._listeners + [analytics.on_change])
+
+    def call(method, url, body=None):
+        with db.using(path), app.test_request_context(url, method=method, json=body):
+            response = app.full_dispatch_request()
+        assert response.status_code in (200, 201), response.get_json()
+        return response.get_json()
+
+    def answers(enabled):
+        monkeypatch.setattr(analytics, 'ENABLED', enabled)
+        with db.using(path):
+            response_cache.clear()
+        return [call('GET', url.format(**values)) for url in URLS]
+
+    assert answers(True) == answers(False)
+    assert analytics.store.instance(path).stats()['loaded']
+
+    call('POST', '/api/attendance', {'student_id': values['student_id'],
+                                     'date': values['middle'], 'status': 'late'})
+    call('PUT', f"/api/students/{values['student_id']}",
+         {'name': 'Moved Student', 'course': 'Transfers'})
+    assert answers(True) == answers(False)
+    assert analytics.store.instance(path).stats()['refreshes'] >= 1
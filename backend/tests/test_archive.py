@@ -0,0 +1,115 @@
+"""Reading attendance across archived partitions (archive.py)"""
+import json
+
+import pytest
+
+import app as app_module
+import archive
+import db
+import layout
+import metrics
+
+
+@pytest.fixture(params=sorted(layout.LAYOUTS))
+def archived(request, make_db):
+    """A database with January 2025 archived: (connection, file path)"""
+    conn = make_db(request.param)
+    archive.archive(conn, 'jan', '2025-01-01', '2025-01-31')
+    return conn, conn.execute('PRAGMA database_list').fetchone()[2]
+
+
+def get(app, path, url):
+    """GET url from the database at path, calling the view directly"""
+    with db.using(path), app.test_request_context(url):
+        response = app.full_dispatch_request()
+        return response.status_code, response.get_data()
+
+
+def test_newest_page_reads_only_the_hot_table(app, archived, monkeypatch):
+    conn, path = archived
+    statements = []
+    monkeypatch.setattr(metrics, 'SLOW_QUERY_MS', 1e-9)
+    monkeypatch.setattr(metrics, '_slow_query',
+                        lambda sql, params, elapsed: statements.append((sql, params)))
+    status, body = get(app, path, '/api/attendance?limit=50')
+    assert status == 200
+    assert len(json.loads(body)['items']) == 50
+
+    listing = [(sql, params) for sql, params in statements if 'LIMIT' in sql]
+    assert len(listing) == 1
+    sql, params = listing[0]
+    plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+    assert not any('archive_' in step or 'UNION' in step for step in plan), plan
+    # Walked in date index order, not sorted as a whole
+    assert 'USE TEMP B-TREE FOR ORDER BY' not in plan, plan
+
+
+def test_pages_cross_into_partitions_in_order(app, archived):
+    _, path = archived
+    status, body = get(app, path, '/api/attendance?fields=id,date')
+    everything = json.loads(body)
+    assert any(record['date'].startswith('2025-01') for record in everything)
+    assert [record['date'] for record in everything] == sorted(
+        (record['date'] for record in everything), reverse=True)
+
+    paged, cursor = [], None
+    while True:
+        url = '/api/attendance?fields=id,date&limit=400' + (f'&cursor={cursor}' if cursor else '')
+        status, body = get(app, path, url)
+        page = json.loads(body)
+        paged += page['items']
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert paged == everything
+
+
+def test_export_is_in_date_order_across_partitions(app, archived):
+    conn, path = archived
+    status, body = get(app, path, '/api/attendance/export?fields=date&from=2024-12-15&to=2025-02-15')
+    dates = [json.loads(line)['date'] for line in body.decode().splitlines()]
+    assert dates == sorted(dates)
+    assert len(dates) == conn.execute(
+        'SELECT COUNT(*) FROM attendance WHERE date BETWEEN ? AND ?',
+        ('2024-12-15', '2025-02-15')).fetchone()[0] + archive.partitions(conn)[0]['records']
+
+
+def test_archived_records_keep_their_course(app, archived):
+    import analytics
+    import stats
+    import summaries
+
+    conn, path = archived
+    student_id, course = conn.execute(
+        'SELECT student_id, course FROM students ORDER BY student_id').fetchone()
+    with conn:
+        conn.execute("UPDATE students SET course = 'Transfers' WHERE student_id = ?", (student_id,))
+    assert not summaries.verify(conn)
+
+    def listed(course, month):
+        _, body = get(app, path, f'/api/attendance?course={course}&from={month}-01&to={month}-28'
+                                 f'&fields=student_id,course')
+        return json.loads(body)
+
+    january = listed(course, '2025-01')
+    assert any(record['student_id'] == student_id for record in january)
+    assert {record['course'] for record in january} == {course}
+    assert not listed('Transfers', '2025-01')
+    assert {record['student_id'] for record in listed('Transfers', '2025-02')} == {student_id}
+
+    for course_filter in (course, 'Transfers'):
+        for date_from, date_to in (('2025-01-01', '2025-01-31'), ('2024-12-01', '2025-03-31')):
+            expected = stats.summary_counts(conn, course=course_filter,
+                                            date_from=date_from, date_to=date_to)
+            assert stats.scan_status_counts(conn, course=course_filter, date_from=date_from,
+                                            date_to=date_to) == expected
+
+    analytics.load_numpy()
+    archive.tables(conn)
+    columns = analytics.AttendanceStore().read(conn)
+    assert len(columns.moved) > 0
+    for date_from in (None, '2025-01-15'):
+        assert columns.course_counts(date_from) == stats.summary_course_counts(conn, date_from)
+        for course_filter in (course, 'Transfers'):
+            assert columns.counts(course=course_filter, date_from=date_from) == \
+                stats.summary_counts(conn, course=course_filter, date_from=date_from)
@@ -0,0 +1,200 @@
+"""Lanes, backpressure and cancellation of the asyncio serving mode (asgi.py)"""
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+import asgi
+import db
+
+EXPORT = '/api/attendance/export'
+
+# Counts without end until the connection's progress handler interrupts it
+ENDLESS = 'WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n'
+
+
+def scope(method, path):
+    return {'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+            'headers': [], 'http_version': '1.1'}
+
+
+class Client:
+    """An ASGI client that sends `body`, then stays until disconnect()"""
+
+    def __init__(self, body=b''):
+        self.body = body
+        self.sent = []
+        self.gone = asyncio.Event()
+        self.requested = False
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {'type': 'http.request', 'body': self.body, 'more_body': False}
+        await self.gone.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    def disconnect(self):
+        self.gone.set()
+
+    @property
+    def status(self):
+        return self.sent[0]['status'] if self.sent else None
+
+    @property
+    def body_sent(self):
+        return b''.join(message.get('body', b'') for message in self.sent[1:])
+
+
+class Backend:
+    """A WSGI app whose exports block until release() (with a pool: run a
+    query until it is interrupted) and whose other routes answer at once"""
+
+    def __init__(self, pool=None):
+        self.pool = pool
+        self.running = threading.Event()
+        self.released = threading.Event()
+        self.calls = []
+        self.errors = []
+
+    def release(self):
+        self.released.set()
+
+    def __call__(self, environ, start_response):
+        path = environ['PATH_INFO']
+        self.calls.append(path)
+        if path == EXPORT:
+            self.running.set()
+            if self.pool is None:
+                self.released.wait(5)
+            else:
+                with self.pool.connection() as conn:
+                    # Should the disconnect not interrupt it, fail, not hang
+                    failsafe = threading.Timer(
+                        2, lambda: (self.errors.append('failsafe'), conn.interrupt()))
+                    failsafe.start()
+                    try:
+                        conn.execute(ENDLESS).fetchone()
+                    except sqlite3.OperationalError as e:
+                        self.errors.append(str(e))
+                        raise
+                    finally:
+                        failsafe.cancel()
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [path.encode()]
+
+
+@pytest.fixture
+def backend():
+    backend = Backend()
+    yield backend
+    backend.release()
+
+
+def serve(wsgi_app, test, **lanes):
+    """Run `await test(adapter)` on a new event loop"""
+    adapter = asgi.AsgiAdapter(wsgi_app, **dict(dict(light_threads=1, heavy_threads=1,
+                                                     queue_limit=0), **lanes))
+
+    async def main():
+        try:
+            await asyncio.wait_for(test(adapter), 5)
+        finally:
+            for lane in (adapter.light, adapter.heavy):
+                lane.executor.shutdown(wait=False, cancel_futures=True)
+
+    asyncio.run(main())
+
+
+async def started(backend):
+    await asyncio.get_running_loop().run_in_executor(None, backend.running.wait, 5)
+
+
+def request(adapter, client, method, path):
+    return asyncio.ensure_future(adapter(scope(method, path), client.receive, client.send))
+
+
+def test_light_requests_are_served_while_the_heavy_lane_is_busy(backend):
+    async def test(adapter):
+        exporter = Client()
+        export = request(adapter, exporter, 'GET', EXPORT)
+        await started(backend)
+
+        refused = Client()
+        await request(adapter, refused, 'GET', EXPORT)
+        assert refused.status == 503
+        assert (b'retry-after', b'1') in refused.sent[0]['headers']
+
+        dashboard = Client()
+        await request(adapter, dashboard, 'GET', '/api/statistics/overview')
+        assert (dashboard.status, dashboard.body_sent) == (200, b'/api/statistics/overview')
+        assert not export.done()
+
+        backend.release()
+        await export
+        assert (exporter.status, exporter.body_sent) == (200, EXPORT.encode())
+        assert adapter.heavy.in_flight == adapter.light.in_flight == 0
+
+    serve(backend, test)
+    assert backend.calls == [EXPORT, '/api/statistics/overview']
+
+
+def test_queued_request_of_a_departed_client_never_runs(backend):
+    async def test(adapter):
+        first = request(adapter, Client(), 'GET', EXPORT)
+        await started(backend)
+
+        departed = Client()
+        queued = request(adapter, departed, 'GET', EXPORT)
+        await asyncio.sleep(0.05)
+        assert adapter.heavy.in_flight == 2
+        departed.disconnect()
+        await queued
+        assert adapter.heavy.in_flight == 1
+        assert not departed.sent
+
+        backend.release()
+        await first
+
+    serve(backend, test, queue_limit=1)
+    assert backend.calls == [EXPORT]
+
+
+def test_disconnect_interrupts_the_running_query(tmp_path):
+    pool = db.ConnectionPool(str(tmp_path / 'cancel.db'), size=1)
+    backend = Backend(pool)
+
+    async def test(adapter):
+        client = Client()
+        export = request(adapter, client, 'GET', EXPORT)
+        await started(backend)
+        await asyncio.sleep(0.05)
+        client.disconnect()
+        await export
+        assert not client.sent
+        assert adapter.heavy.in_flight == 0
+
+    try:
+        serve(backend, test)
+        assert backend.errors == ['interrupted']
+        with pool.connection() as conn:
+            assert conn.execute('SELECT 1').fetchone()[0] == 1
+    finally:
+        pool.close_all()
+
+
+def test_oversized_body_is_refused(backend, monkeypatch):
+    monkeypatch.setattr(asgi, 'MAX_BODY_SIZE', 10)
+
+    async def test(adapter):
+        client = Client(b'x' * 11)
+        await request(adapter, client, 'POST', '/api/attendance/bulk')
+        assert client.status == 413
+        assert adapter.heavy.in_flight == 0
+
+    serve(backend, test)
+    assert not backend.calls
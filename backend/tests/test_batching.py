@@ -0,0 +1,58 @@
+"""The write-coalescing queue (batching.py)"""
+import pytest
+
+import batching
+import layout
+
+
+class BadRow(tuple):
+    """A row that fails with TypeError, not sqlite3.Error, when bound"""
+
+    def __getitem__(self, index):
+        raise TypeError('bad row')
+
+
+@pytest.fixture
+def queue(make_db):
+    conn = make_db()
+    path = conn.execute('PRAGMA database_list').fetchone()[2]
+    writer = batching.WriteQueue(db_path=path, max_delay=0.001)
+    yield writer
+    writer.stop()
+
+
+def mark(student_id='STU0001', day='2025-04-01', status='absent'):
+    return (student_id, day, status, None)
+
+
+def test_writer_commits_durably(queue):
+    conn = queue._connect()
+    assert conn.execute('PRAGMA synchronous').fetchone()[0] == 2  # FULL
+    conn.close()
+    queue.submit([mark()], timeout=5)
+    assert queue.stats()['acknowledged'] == 1
+
+
+def test_unexpected_row_error_fails_its_request(queue):
+    with pytest.raises(batching.WriteFailed, match='bad row'):
+        queue.submit([BadRow(mark())], timeout=5)
+    queue.submit([mark(day='2025-04-02')], timeout=5)
+    stats = queue.stats()
+    assert (stats['acknowledged'], stats['failed']) == (2, 1)
+
+
+def test_writer_survives_a_failing_batch(queue, monkeypatch):
+    statement = layout.statement
+    calls = []
+
+    def failing_once(conn, name):
+        calls.append(name)
+        if len(calls) == 1:
+            raise RuntimeError('broken batch')
+        return statement(conn, name)
+
+    monkeypatch.setattr(layout, 'statement', failing_once)
+    with pytest.raises(batching.WriteFailed, match='broken batch'):
+        queue.submit([mark()], timeout=5)
+    queue.submit([mark(day='2025-04-03')], timeout=5)
+    assert queue.stats()['failed'] == 1
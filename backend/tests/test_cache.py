@@ -0,0 +1,59 @@
+"""Cached statistics responses and their revalidation (cache.py)"""
+import pytest
+
+import cache
+import db
+
+URL = '/api/statistics/overview'
+
+
+@pytest.fixture
+def database(make_db):
+    conn = make_db()
+    return conn, conn.execute('PRAGMA database_list').fetchone()[2]
+
+
+def get(app, path, url=URL, **headers):
+    """GET url from the database at path: (status, headers, body)"""
+    with db.using(path), app.test_request_context(url, headers=headers):
+        response = app.full_dispatch_request()
+        return response.status_code, response.headers, response.get_json()
+
+
+def test_unchanged_response_is_not_modified(app, database):
+    _, path = database
+    status, headers, _ = get(app, path)
+    assert status == 200
+    assert 'Last-Modified' not in headers
+    assert get(app, path, **{'If-None-Match': headers['ETag']})[0] == 304
+
+
+def test_write_changes_the_etag(app, database):
+    conn, path = database
+    _, headers, before = get(app, path)
+    conn.execute("UPDATE attendance SET status = 'absent' WHERE status = 'present' "
+                 "AND date = '2025-03-31' AND student_id = 'STU0001'")
+    conn.execute("UPDATE attendance SET status = 'late' WHERE status <> 'late' "
+                 "AND date = '2025-03-31' AND student_id = 'STU0002'")
+    conn.commit()
+    status, _, after = get(app, path, **{'If-None-Match': headers['ETag']})
+    assert status == 200
+    assert after != before
+
+
+def test_no_stale_not_modified_after_a_reset(app, database):
+    """A bulk load bypassing the change log clears the cache; revalidating
+    by date in the same second must not get 304"""
+    conn, path = database
+    _, headers, before = get(app, path)
+    with db.using(path):
+        cache.response_cache.clear()
+    conn.execute("DELETE FROM attendance WHERE date = '2025-03-31'")
+    conn.commit()
+    with db.using(path):
+        cache.response_cache.clear()
+    status, _, after = get(app, path, **{'If-Modified-Since': 'Fri, 31 Dec 2100 00:00:00 GMT'})
+    assert status == 200
+    assert after['total_records'] < before['total_records']
+    status, _, _ = get(app, path, **{'If-None-Match': headers['ETag']})
+    assert status == 200
@@ -0,0 +1,116 @@
+"""The connection pool (db.py)"""
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import db
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = db.ConnectionPool(str(tmp_path / 'pool.db'), size=2, timeout=0.05)
+    yield pool
+    pool.close_all()
+
+
+def test_checkout_reuses_connections(pool):
+    with pool.connection() as first:
+        first.execute('CREATE TABLE t (x)')
+    with pool.connection() as second:
+        assert second is first
+    stats = pool.stats()
+    assert (stats['created'], stats['in_use'], stats['idle'], stats['checkouts']) == (1, 0, 1, 2)
+
+
+def test_open_transactions_are_rolled_back(pool):
+    with pool.connection() as conn:
+        conn.execute('CREATE TABLE t (x)')
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.execute('INSERT INTO t VALUES (1)')
+            raise RuntimeError
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+
+
+def test_checkout_times_out_when_exhausted(pool):
+    with pool.connection(), pool.connection():
+        with pytest.raises(db.PoolTimeout):
+            with pool.connection():
+                pass
+    with pool.connection():
+        assert pool.stats()['created'] == 2
+
+
+def test_waiter_gets_a_released_connection(pool):
+    pool.timeout = 5
+    got = []
+    with pool.connection() as first, pool.connection() as second:
+        waiter = threading.Thread(target=lambda: got.append(pool._acquire()))
+        waiter.start()
+        time.sleep(0.05)
+        assert not got
+    waiter.join(5)
+    assert got[0] is first or got[0] is second
+    pool._release(got[0], os.getpid())
+
+
+def stale(pool, monkeypatch):
+    """Make the idle connection look unused for longer than the interval"""
+    monkeypatch.setattr(db, 'HEALTH_CHECK_INTERVAL', -1)
+    monkeypatch.setattr(db.ConnectionPool, '_is_healthy', lambda self, conn: False)
+
+
+def test_failed_health_check_reconnects(pool, monkeypatch):
+    with pool.connection() as first:
+        pass
+    stale(pool, monkeypatch)
+    with pool.connection() as second:
+        assert second is not first
+        assert second.execute('SELECT 1').fetchone()[0] == 1
+    with pytest.raises(sqlite3.ProgrammingError):
+        first.execute('SELECT 1')
+    stats = pool.stats()
+    assert (stats['created'], stats['health_check_failures']) == (1, 1)
+
+
+def test_failed_reconnect_frees_its_slot(pool, monkeypatch):
+    with pool.connection():
+        pass
+    stale(pool, monkeypatch)
+
+    def refuse(self):
+        raise sqlite3.OperationalError('unable to open database file')
+
+    connect = db.ConnectionPool._connect
+    monkeypatch.setattr(db.ConnectionPool, '_connect', refuse)
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection():
+            pass
+    assert pool.stats()['created'] == 0
+    monkeypatch.setattr(db.ConnectionPool, '_connect', connect)
+    with pool.connection(), pool.connection():
+        assert pool.stats()['created'] == 2
+
+
+def test_forked_process_does_not_reuse_connections(pool, monkeypatch):
+    with pool.connection() as parents:
+        pass
+    child = pool._pid + 1
+    monkeypatch.setattr(os, 'getpid', lambda: child)
+    with pool.connection() as childs:
+        assert childs is not parents
+    stats = pool.stats()
+    assert (stats['created'], stats['checkouts'], stats['idle']) == (1, 1, 1)
+
+
+def test_connection_released_after_fork_is_dropped(pool, monkeypatch):
+    pid = pool._pid
+    conn = pool._acquire()
+    monkeypatch.setattr(os, 'getpid', lambda: pid + 1)
+    pool._release(conn, pid)
+    assert pool._idle.qsize() == 0
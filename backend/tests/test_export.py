@@ -0,0 +1,50 @@
+"""GET /api/attendance/export (export.py)"""
+import csv
+import io
+import json
+
+import pytest
+
+PATH = '/api/attendance/export'
+
+
+@pytest.mark.parametrize('query, error', [
+    ({'format': 'xml'}, 'format must be ndjson or csv'),
+    ({'fields': 'date,grade'}, 'Unknown field(s): grade'),
+    ({'from': '2025-02-30'}, None),
+    ({'to': 'yesterday'}, None),
+])
+def test_invalid_arguments(client, query, error):
+    response = client.get(PATH, query_string=query)
+    assert response.status_code == 400
+    if error is not None:
+        assert response.get_json() == {'error': error}
+
+
+def test_ndjson_matches_the_listing(client):
+    query = {'student_id': 'STU0003', 'fields': 'id,date,status,notes,student_name'}
+    response = client.get(PATH, query_string=query)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=attendance.ndjson'
+    exported = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    listed = client.get('/api/attendance', query_string=query).get_json()
+    assert exported == sorted(listed, key=lambda record: record['date'])
+
+
+def test_csv_has_a_header_and_one_line_per_record(client):
+    query = {'format': 'csv', 'fields': 'student_id,date,status', 'date': '2025-03-03'}
+    response = client.get(PATH, query_string=query)
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ['student_id', 'date', 'status']
+    listed = client.get('/api/attendance', query_string={'date': '2025-03-03'}).get_json()
+    assert len(rows) - 1 == len(listed) > 0
+    assert [row[0] for row in rows[1:]] == sorted(row[0] for row in rows[1:])
+
+
+def test_empty_export(client):
+    response = client.get(PATH, query_string={'format': 'csv', 'fields': 'date',
+                                              'from': '2030-01-01'})
+    assert response.get_data(as_text=True).splitlines() == ['date']
+    assert client.get(PATH, query_string={'from': '2030-01-01'}).get_data() == b''
@@ -0,0 +1,104 @@
+"""POST /api/attendance and POST /api/attendance/bulk (ingest.py)"""
+import pytest
+
+import db
+
+
+@pytest.fixture
+def database(make_db):
+    conn = make_db()
+    return conn, conn.execute('PRAGMA database_list').fetchone()[2]
+
+
+def post(app, path, url, **kwargs):
+    """POST to url on the database at path: (status, JSON body)"""
+    with db.using(path), app.test_request_context(url, method='POST', **kwargs):
+        response = app.full_dispatch_request()
+        return response.status_code, response.get_json()
+
+
+def mark(student_id='STU0001', day='2025-04-01', status='absent', **extra):
+    return {'student_id': student_id, 'date': day, 'status': status, **extra}
+
+
+def count(conn, student_id):
+    return conn.execute('SELECT COUNT(*) FROM attendance WHERE student_id = ?',
+                        (student_id,)).fetchone()[0]
+
+
+def test_unknown_student_is_rejected(app, database):
+    """Changed with the bulk import: these used to be stored, unseen"""
+    conn, path = database
+    status, body = post(app, path, '/api/attendance', json=mark('NOBODY'))
+    assert status == 400
+    assert body['errors'] == [{'row': 0, 'errors': ['unknown student_id']}]
+    assert count(conn, 'NOBODY') == 0
+
+
+def test_mark_is_all_or_nothing(app, database):
+    conn, path = database
+    before = count(conn, 'STU0001')
+    status, body = post(app, path, '/api/attendance',
+                        json=[mark(), mark(day='2025-02-30'), mark(status='away')])
+    assert status == 400
+    assert [error['row'] for error in body['errors']] == [1, 2]
+    assert count(conn, 'STU0001') == before
+    status, _ = post(app, path, '/api/attendance', json=[mark(), mark(day='2025-04-02')])
+    assert status == 201
+    assert count(conn, 'STU0001') == before + 2
+
+
+def test_upsert_keeps_the_record_id(app, database):
+    conn, path = database
+    record_id = conn.execute("SELECT id FROM attendance WHERE student_id = 'STU0001' "
+                             "AND date = '2025-03-31'").fetchone()[0]
+    status, _ = post(app, path, '/api/attendance',
+                     json=mark(day='2025-03-31', status='late', notes='bus'))
+    assert status == 201
+    assert conn.execute('SELECT id, status, notes FROM attendance WHERE id = ?',
+                        (record_id,)).fetchone() == (record_id, 'late', 'bus')
+
+
+@pytest.mark.parametrize('record, error', [
+    ({'date': '2025-04-01', 'status': 'late'}, 'student_id is required'),
+    (mark(day='04/01/2025'), 'date must be YYYY-MM-DD'),
+    (mark(status='Present'), 'status must be one of present, absent, late'),
+    (mark(notes=7), 'notes must be a string'),
+    ('STU0001', 'record must be an object'),
+])
+def test_bulk_reports_invalid_rows(app, database, record, error):
+    conn, path = database
+    status, body = post(app, path, '/api/attendance/bulk', json=[mark(), record])
+    assert status == 200
+    assert (body['written'], body['rejected']) == (1, 1)
+    assert body['errors'][0]['row'] == 1
+    assert error in body['errors'][0]['errors']
+
+
+def test_bulk_atomic_writes_nothing(app, database):
+    conn, path = database
+    before = count(conn, 'STU0001')
+    status, body = post(app, path, '/api/attendance/bulk?atomic=1',
+                        json={'records': [mark(), mark('NOBODY')]})
+    assert status == 400
+    assert body['written'] == 0
+    assert count(conn, 'STU0001') == before
+
+
+def test_bulk_csv(app, database):
+    conn, path = database
+    csv = 'student_id,date,status,notes\nSTU0001,2025-04-01,late,\nSTU0002,2025-04-01,present,ok\n'
+    status, body = post(app, path, '/api/attendance/bulk', data=csv, content_type='text/csv')
+    assert (status, body['written']) == (201, 2)
+    status, body = post(app, path, '/api/attendance/bulk', data='student_id,status\n',
+                        content_type='text/csv')
+    assert status == 400
+    assert body == {'error': 'CSV header is missing column(s): date'}
+
+
+@pytest.mark.parametrize('payload', [{'json': {'student_id': 'STU0001'}}, {'data': 'nope'}])
+def test_bulk_needs_a_list_or_csv(app, database, payload):
+    _, path = database
+    status, body = post(app, path, '/api/attendance/bulk', **payload)
+    assert status == 400
+    assert body == {'error': 'Expected a JSON list of records or a text/csv body'}
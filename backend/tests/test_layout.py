@@ -0,0 +1,91 @@
+"""Converting between the storage layouts (layout.py)"""
+import pytest
+
+import db
+import layout
+import summaries
+from cache import response_cache
+
+URLS = [
+    '/api/attendance?limit=100',
+    '/api/attendance?date={date}',
+    '/api/attendance?student_id={student_id}',
+    '/api/attendance?course={course}&from={first}&to={date}',
+    '/api/attendance/date/{date}',
+    '/api/attendance/export?from={first}',
+    '/api/attendance/export?format=csv&student_id={student_id}',
+    '/api/students/{student_id}',
+    '/api/statistics/overview?from={first}&to={date}',
+    '/api/statistics/student/{student_id}?from={first}',
+    '/api/statistics/students',
+    '/api/sync?date={date}',
+]
+
+
+def records(conn):
+    return [tuple(row) for row in conn.execute('SELECT * FROM attendance ORDER BY id')]
+
+
+def test_conversion_round_trips_the_records(make_db):
+    conn = make_db()
+    with conn:
+        # The highest id must not be handed out again after conversion
+        conn.execute('DELETE FROM attendance WHERE id = (SELECT MAX(id) FROM attendance)')
+    deleted = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'attendance'").fetchone()[0]
+    original = records(conn)
+
+    for target in ('compact', 'rowid', 'compact'):
+        assert layout.convert(conn, target)
+        assert layout.current(conn) == target
+        assert records(conn) == original
+        assert not summaries.verify(conn)
+    assert not layout.convert(conn, 'compact')
+
+    with conn:
+        conn.execute("INSERT INTO attendance (student_id, date, status) "
+                     "VALUES ('STU0001', '2025-04-01', 'late')")
+    assert conn.execute('SELECT MAX(id) FROM attendance').fetchone()[0] == deleted + 1
+
+
+def test_api_output_is_byte_identical(app, make_db):
+    conn = make_db(students=20, days=30)
+    path = conn.execute('PRAGMA database_list').fetchone()[2]
+    student_id, course = conn.execute(
+        'SELECT student_id, course FROM students ORDER BY student_id').fetchone()
+    first, date = conn.execute('SELECT MIN(date), MAX(date) FROM attendance').fetchone()
+    urls = [url.format(student_id=student_id, course=course, first=first, date=date)
+            for url in URLS]
+
+    def bodies():
+        with db.using(path):
+            response_cache.clear()
+        answers = []
+        for url in urls:
+            with db.using(path), app.test_request_context(url):
+                response = app.full_dispatch_request()
+                assert response.status_code == 200, url
+                answers.append(response.get_data())
+        return answers
+
+    rowid = bodies()
+    layout.convert(conn, 'compact')
+    assert bodies() == rowid
+    layout.convert(conn, 'rowid')
+    assert bodies() == rowid
+
+
+@pytest.mark.parametrize('bad_row, problem', [
+    (('NOBODY', '2025-04-01'), 'refer to a missing student'),
+    (('STU0001', '2025-4-1'), 'have a date that is not YYYY-MM-DD'),
+])
+def test_unconvertible_rows_leave_the_database_alone(make_db, bad_row, problem):
+    conn = make_db(students=5, days=5)
+    with conn:
+        conn.execute("INSERT INTO attendance (student_id, date, status) VALUES (?, ?, 'present')",
+                     bad_row)
+    original = records(conn)
+    with pytest.raises(ValueError, match=problem):
+        layout.convert(conn, 'compact')
+    assert layout.current(conn) == 'rowid'
+    assert records(conn) == original
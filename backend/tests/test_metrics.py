@@ -0,0 +1,51 @@
+"""GET /api/metrics and /api/metrics/slow-queries (metrics.py)"""
+import re
+
+import metrics
+
+TYPE = re.compile(r'^# TYPE (\S+) (\S+)$', re.M)
+
+
+def families(text):
+    return dict(TYPE.findall(text))
+
+
+def test_exposition_types(client):
+    client.get('/api/students')
+    response = client.get('/api/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    types = families(response.get_data(as_text=True))
+    for name, kind in types.items():
+        # Running totals are counters named *_total; everything else is not
+        assert (kind == 'counter') == name.endswith('_total'), (name, kind)
+    for name in ('attendance_requests_total', 'attendance_db_pool_checkouts_total',
+                 'attendance_cache_hits_total', 'attendance_stream_events_total'):
+        assert types[name] == 'counter'
+    assert types['attendance_db_pool_in_use'] == 'gauge'
+    assert types['attendance_request_duration_seconds'] == 'histogram'
+
+
+def test_counters_only_go_up(client):
+    def hits():
+        text = client.get('/api/metrics').get_data(as_text=True)
+        return float(re.search(r'^attendance_cache_hits_total (\S+)$', text, re.M).group(1))
+
+    client.get('/api/statistics/overview')
+    before = hits()
+    client.get('/api/statistics/overview')
+    assert hits() == before + 1
+
+
+def test_slow_queries_are_listed(client, monkeypatch):
+    monkeypatch.setattr(metrics, 'SLOW_QUERY_MS', 1e-9)
+    client.get('/api/students', query_string={'limit': 3})
+    body = client.get('/api/metrics/slow-queries').get_json()
+    assert body['threshold_ms'] == 1e-9
+    assert any('FROM students' in query['sql'] for query in body['queries'])
+
+
+def test_label_values_are_escaped():
+    path = 'C:\\data\\"north"\nschool.db'
+    text = metrics.render_prometheus(gauges=[('attendance_test', 'Test.', [({'db_path': path}, 1)])])
+    assert 'attendance_test{db_path="C:\\\\data\\\\\\"north\\"\\nschool.db"} 1\n' in text
@@ -0,0 +1,62 @@
+"""Keyset pagination and field projection of the list endpoints"""
+import base64
+import json
+
+import pytest
+
+import pagination
+
+
+def token(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def test_cursor_round_trip():
+    cursor = pagination.encode_cursor(['2025-03-31', 'Ann', 7])
+    assert pagination.decode_cursor(cursor, (str, str, int)) == ['2025-03-31', 'Ann', 7]
+
+
+@pytest.mark.parametrize('values', [
+    [{}, 1, 2], ['2025-03-31', 'Ann'], ['2025-03-31', 'Ann', '7'],
+    ['2025-03-31', None, 7], ['2025-03-31', 'Ann', True], ['2025-03-31', 'Ann', 7.5],
+    {'date': '2025-03-31'},
+])
+def test_cursor_rejects_wrong_shapes_and_types(values):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        pagination.decode_cursor(token(values), (str, str, int))
+
+
+@pytest.mark.parametrize('path, cursor', [
+    ('/api/students', 'not base64!'),
+    ('/api/students', token([[1], 2])),
+    ('/api/students', token(['Ann'])),
+    ('/api/attendance', 'not base64!'),
+    ('/api/attendance', token([{}, 1, 2])),
+    ('/api/attendance', token(['2025-03-31', 'Ann', 'x'])),
+])
+def test_invalid_cursor_is_a_bad_request(client, path, cursor):
+    response = client.get(path, query_string={'cursor': cursor})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
+
+
+@pytest.mark.parametrize('path', ['/api/students', '/api/attendance'])
+@pytest.mark.parametrize('query, error', [
+    ({'limit': 'ten'}, 'limit must be an integer'),
+    ({'limit': '0'}, 'limit must be positive'),
+    ({'fields': 'nope'}, 'Unknown field(s): nope'),
+    ({'shape': 'table'}, 'shape must be one of: rows, columns'),
+])
+def test_invalid_list_arguments(client, path, query, error):
+    response = client.get(path, query_string=query)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
+
+
+@pytest.mark.parametrize('path', ['/api/students', '/api/attendance'])
+def test_pages_follow_each_other(client, path):
+    everything = client.get(path, query_string={'fields': 'student_id'}).get_json()
+    first = client.get(path, query_string={'fields': 'student_id', 'limit': 25}).get_json()
+    second = client.get(path, query_string={'fields': 'student_id', 'limit': 25,
+                                            'cursor': first['next_cursor']}).get_json()
+    assert first['items'] + second['items'] == everything[:50]
@@ -0,0 +1,65 @@
+"""Hot API requests must stay on their indexes (migrations.HOT_REQUESTS)"""
+import pytest
+
+import archive
+import layout
+import migrations
+
+
+def test_migrations_check(capsys):
+    assert migrations.check() == 0
+    assert f'All {len(migrations.HOT_REQUESTS)} hot requests' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('archived', [False, True])
+@pytest.mark.parametrize('storage', sorted(layout.LAYOUTS))
+def test_hot_requests_use_their_indexes(app, make_db, storage, archived):
+    conn = make_db(storage)
+    assert layout.current(conn) == storage
+    if archived:
+        archive.archive(conn, 'jan', '2025-01-01', '2025-01-31')
+    path = conn.execute('PRAGMA database_list').fetchone()[2]
+    assert migrations.check_query_plans(path) == {}
+
+
+def test_statements_come_from_the_route(app, make_db):
+    conn = make_db()
+    path = conn.execute('PRAGMA database_list').fetchone()[2]
+    statements = migrations.request_statements(path, '/api/attendance?limit=5')
+    assert any('ORDER BY a.date DESC, s.name, a.id' in sql and 'CROSS JOIN' not in sql
+               for sql, _ in statements)
+
+
+def test_a_missing_index_is_reported(app, make_db):
+    conn = make_db()
+    with conn:
+        conn.execute('DROP INDEX idx_attendance_date_student')
+    path = conn.execute('PRAGMA database_list').fetchone()[2]
+    failures = migrations.check_query_plans(path)
+    for name in ('attendance page', 'attendance page after cursor', 'export'):
+        assert failures[name] == ['sorts its rows for ORDER BY']
+
+
+@pytest.mark.parametrize('storage', sorted(layout.LAYOUTS))
+def test_archive_union_reads_each_table_through_an_index(make_db, storage):
+    conn = make_db(storage)
+    archive.archive(conn, 'jan', '2025-01-01', '2025-01-31')
+
+    counted, params = archive.source(conn, columns=archive.COUNTED)
+    from_sql, columns, joined_params = archive.joined(
+        conn, {'date': 'a.date', 'name': 's.name'}, '2025-01-15', '2025-02-15')
+    queries = {
+        'student records': (
+            f'SELECT date, status FROM {counted} WHERE student_id = ? ORDER BY date',
+            params + ['STU0001']),
+        'date range': (
+            f"SELECT status, COUNT(*) FROM {counted} WHERE date BETWEEN ? AND ? GROUP BY status",
+            params + ['2025-01-20', '2025-02-10']),
+        'records of a date range with names': (
+            f"SELECT {columns['date']}, {columns['name']} FROM {from_sql} "
+            f"WHERE {columns['date']} >= ? AND {columns['date']} <= ?",
+            joined_params + ['2025-01-15', '2025-02-15']),
+    }
+    for name, (sql, query_params) in queries.items():
+        assert 'UNION ALL' in sql, name
+        assert migrations.full_scans(conn, sql, query_params) == [], name
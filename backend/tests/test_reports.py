@@ -0,0 +1,76 @@
+"""GET /api/statistics/series and the term calendar (reports.py)"""
+import pytest
+
+import reports
+
+SERIES = '/api/statistics/series'
+TERM = {'name': 'Winter 2025', 'start_date': '2025-01-06', 'end_date': '2025-03-21'}
+
+
+@pytest.fixture
+def term(client):
+    response = client.post('/api/terms', json=TERM)
+    assert response.status_code == 201
+    term_id = response.get_json()['id']
+    yield term_id
+    client.delete(f'/api/terms/{term_id}')
+
+
+@pytest.mark.parametrize('query, error', [
+    ({'group': 'year'}, f"group must be one of: {', '.join(reports.GROUPS)}"),
+    ({'from': '2025-02-29'}, None),
+    ({'to': '31/03/2025'}, None),
+])
+def test_invalid_series_arguments(client, query, error):
+    response = client.get(SERIES, query_string=query)
+    assert response.status_code == 400
+    if error is not None:
+        assert response.get_json() == {'error': error}
+
+
+@pytest.mark.parametrize('group', ['day', 'week', 'month'])
+def test_series_adds_up_to_the_overview(client, group):
+    series = client.get(SERIES, query_string={'group': group}).get_json()
+    overview = client.get('/api/statistics/overview').get_json()
+    assert sum(series['total']) == overview['total_records']
+    assert sum(series['absent']) == overview['absent_count']
+    assert series['start'] == sorted(series['start'])
+
+
+def test_student_series(client):
+    series = client.get(SERIES, query_string={'group': 'month', 'student_id': 'STU0004'}).get_json()
+    student = client.get('/api/statistics/student/STU0004').get_json()
+    assert series['periods'] == ['2025-01', '2025-02', '2025-03']
+    assert sum(series['total']) == student['total_records']
+
+
+def test_term_series_follows_the_calendar(client, term):
+    series = client.get(SERIES, query_string={'group': 'term'}).get_json()
+    assert series['periods'] == [TERM['name']]
+    assert (series['start'], series['end']) == ([TERM['start_date']], [TERM['end_date']])
+
+    client.put(f'/api/terms/{term}', json={**TERM, 'end_date': '2025-01-31'})
+    series = client.get(SERIES, query_string={'group': 'term'}).get_json()
+    assert series['end'] == ['2025-01-31']
+
+
+@pytest.mark.parametrize('body, error', [
+    ([], 'Expected a JSON object'),
+    ({**TERM, 'name': ' '}, 'name is required'),
+    ({'name': 'Spring', 'start_date': '2025-04-01'}, 'start_date and end_date are required'),
+    ({**TERM, 'end_date': '2025-13-01'}, None),
+    ({**TERM, 'start_date': '2025-04-01'}, 'start_date must not be after end_date'),
+])
+def test_invalid_terms(client, body, error):
+    response = client.post('/api/terms', json=body)
+    assert response.status_code == 400
+    if error is not None:
+        assert response.get_json() == {'error': error}
+
+
+def test_term_names_are_unique_and_missing_terms_404(client, term):
+    response = client.post('/api/terms', json=TERM)
+    assert response.get_json() == {'error': 'Term name already exists'}
+    assert [t['name'] for t in client.get('/api/terms').get_json()] == [TERM['name']]
+    assert client.put('/api/terms/9999', json=TERM).status_code == 404
+    assert client.delete('/api/terms/9999').status_code == 404
@@ -0,0 +1,54 @@
+"""JSON encoding, compression and the columnar shape (responses.py)"""
+import gzip
+
+import pytest
+
+import responses
+
+URLS = ['/api/students', '/api/attendance?limit=200', '/api/statistics/students',
+        '/api/statistics/courses']
+
+
+@pytest.mark.parametrize('url', URLS)
+def test_orjson_and_stdlib_write_the_same_json(client, monkeypatch, url):
+    pytest.importorskip('orjson')
+    bodies = []
+    for encoder in ('orjson', 'stdlib'):
+        monkeypatch.setattr(responses, 'JSON_ENCODER', encoder)
+        response = client.get(url, headers={'Accept-Encoding': 'identity'})
+        assert response.status_code == 200
+        bodies.append(response.get_data())
+    assert bodies[0] == bodies[1]
+
+
+@pytest.mark.parametrize('path', ['/api/students', '/api/attendance'])
+def test_columns_shape_holds_the_same_records(client, path):
+    rows = client.get(path, query_string={'limit': 50}).get_json()
+    columnar = client.get(path, query_string={'limit': 50, 'shape': 'columns'}).get_json()
+    assert columnar['next_cursor'] == rows['next_cursor']
+    assert responses.records(columnar) == rows['items']
+
+
+def test_large_bodies_are_gzipped(client):
+    identity = client.get('/api/students', headers={'Accept-Encoding': 'identity'})
+    compressed = client.get('/api/students', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in identity.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.get_data()) == identity.get_data()
+
+
+def test_small_bodies_are_not_compressed(client):
+    response = client.get('/api/health', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_compressed_cached_response_has_a_weak_etag(client, monkeypatch):
+    monkeypatch.setattr(responses, 'COMPRESS_MIN_BYTES', 1)
+    response = client.get('/api/statistics/overview', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+    again = client.get('/api/statistics/overview',
+                       headers={'Accept-Encoding': 'identity', 'If-None-Match': etag})
+    assert again.status_code == 304
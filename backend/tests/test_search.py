@@ -0,0 +1,51 @@
+"""GET /api/students/search (search.py)"""
+import pytest
+
+import search
+
+PATH = '/api/students/search'
+
+
+@pytest.mark.parametrize('limit, error', [('ten', 'limit must be an integer'),
+                                          ('0', 'limit must be positive')])
+def test_invalid_limit(client, limit, error):
+    response = client.get(PATH, query_string={'q': 'mar', 'limit': limit})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
+
+
+@pytest.mark.parametrize('query', ['', '  ', '*', '"', '-()'])
+def test_queries_without_words_match_nothing(client, query):
+    response = client.get(PATH, query_string={'q': query})
+    assert response.status_code == 200
+    assert response.get_json() == {'query': query, 'items': []}
+
+
+@pytest.mark.parametrize('query', ['name:x', 'a OR b', 'NEAR(a b)', 'stu0001 AND'])
+def test_fts_syntax_is_taken_literally(client, query):
+    assert client.get(PATH, query_string={'q': query}).status_code == 200
+
+
+def test_prefixes_of_every_word_must_match(client):
+    items = client.get(PATH, query_string={'q': 'dan mart'}).get_json()['items']
+    assert items[0] == {'student_id': 'STU0001', 'name': 'Daniel Martinez',
+                        'email': 'daniel.martinez@university.edu', 'course': 'Mathematics'}
+    assert all('dan' in item['name'].lower() or 'dan' in item['email'] for item in items)
+
+
+def test_course_filter_and_limit(client):
+    items = client.get(PATH, query_string={'q': 'university', 'course': 'History',
+                                           'limit': 500}).get_json()['items']
+    assert items and all(item['course'] == 'History' for item in items)
+    assert len(client.get(PATH, query_string={'q': 'u', 'limit': 3}).get_json()['items']) == 3
+    capped = client.get(PATH, query_string={'q': 'university', 'limit': 500}).get_json()
+    assert len(capped['items']) == min(40, search.MAX_LIMIT)
+
+
+def test_index_follows_student_writes(make_db):
+    conn = make_db()
+    conn.execute("UPDATE students SET name = 'Zebulon Quill', email = NULL WHERE student_id = 'STU0001'")
+    assert [s['student_id'] for s in search.search(conn, 'zeb')] == ['STU0001']
+    assert search.search(conn, 'daniel martinez') == []
+    conn.execute("DELETE FROM students WHERE student_id = 'STU0001'")
+    assert search.search(conn, 'zeb') == []
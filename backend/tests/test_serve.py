@@ -0,0 +1,14 @@
+"""Start-up work done by serve.py before binding"""
+import pytest
+
+import serve
+import timelines
+
+
+@pytest.mark.parametrize('preload', [False, True])
+def test_timelines_preload_is_opt_in(app, monkeypatch, preload):
+    loaded = []
+    monkeypatch.setattr(timelines, 'PRELOAD', preload)
+    monkeypatch.setattr(timelines.TimelineStore, 'snapshot', lambda store, conn: loaded.append(conn))
+    serve.prepare()
+    assert len(loaded) == preload
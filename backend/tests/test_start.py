@@ -0,0 +1,78 @@
+"""Setup steps start.py runs before launching the backend"""
+import importlib.util
+import os
+import shutil
+import sqlite3
+import subprocess
+
+import pytest
+
+from conftest import BACKEND
+
+spec = importlib.util.spec_from_file_location(
+    'start', os.path.join(os.path.dirname(BACKEND), 'start.py'))
+start = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(start)
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """A project directory whose backend has a venv that installed the
+    current requirements.txt; returns the scripts start.py runs"""
+    backend = tmp_path / 'backend'
+    (backend / 'venv').mkdir(parents=True)
+    shutil.copy(os.path.join(BACKEND, 'requirements.txt'), backend)
+    (backend / 'venv' / '.requirements.sha256').write_text(start.requirements_hash(backend))
+    monkeypatch.setenv('ATTENDANCE_DB_PATH', str(backend / 'attendance.db'))
+    monkeypatch.chdir(tmp_path)
+
+    ran = []
+    monkeypatch.setattr(subprocess, 'run', lambda command, **kwargs: ran.append(
+        os.path.basename(command[-1]) if command[1] != 'install' else 'pip'))
+    monkeypatch.setattr(subprocess, 'Popen', lambda command, **kwargs: ran.append(command[-1]))
+    return backend, ran
+
+
+def seed(backend, make_db, students=3):
+    conn = make_db(students=students, days=5)
+    copy = sqlite3.connect(backend / 'attendance.db')
+    conn.backup(copy)
+    copy.close()
+
+
+def test_fast_start_skips_the_setup_of_a_current_database(project, make_db):
+    backend, ran = project
+    seed(backend, make_db)
+    start.setup_backend(fast=True)
+    assert ran == ['serve.py']
+
+
+def test_start_keeps_the_data_of_a_populated_database(project, make_db):
+    backend, ran = project
+    seed(backend, make_db)
+    start.setup_backend()
+    assert ran == ['pip', 'init_db.py', 'serve.py']
+
+
+def test_fast_start_migrates_an_outdated_database(project, make_db):
+    backend, ran = project
+    seed(backend, make_db)
+    conn = sqlite3.connect(backend / 'attendance.db')
+    conn.execute('PRAGMA user_version = 1')
+    conn.close()
+    start.setup_backend(fast=True)
+    assert ran == ['init_db.py', 'serve.py']
+
+
+@pytest.mark.parametrize('fast', [False, True])
+def test_mock_data_is_created_for_an_empty_database(project, make_db, fast):
+    backend, ran = project
+    seed(backend, make_db, students=0)
+    start.setup_backend(fast=fast)
+    assert ran[-2:] == ['create_mock_data.py', 'serve.py']
+
+
+def test_mock_data_is_created_without_a_database(project):
+    backend, ran = project
+    start.setup_backend(fast=True)
+    assert ran == ['init_db.py', 'create_mock_data.py', 'serve.py']
@@ -0,0 +1,84 @@
+"""Single-pass status counts (stats.py) against one COUNT(*) per status"""
+import pytest
+
+import db
+import stats
+
+STORAGES = ['rowid', 'compact']
+
+
+def count_queries(conn, student_id=None, course=None, date_from=None, date_to=None):
+    """{status: count} the way the API counted before: a query per status"""
+    conditions = ['a.status = ?']
+    params = []
+    if student_id is not None:
+        conditions.append('a.student_id = ?')
+        params.append(student_id)
+    if course is not None:
+        conditions.append('s.course = ?')
+        params.append(course)
+    if date_from is not None:
+        conditions.append('a.date >= ?')
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append('a.date <= ?')
+        params.append(date_to)
+    query = ('SELECT COUNT(*) FROM attendance a JOIN students s ON a.student_id = s.student_id '
+             f"WHERE {' AND '.join(conditions)}")
+    return {status: conn.execute(query, [status] + params).fetchone()[0]
+            for status in stats.STATUSES}
+
+
+def filters(conn):
+    student_id, course = conn.execute(
+        'SELECT student_id, course FROM students ORDER BY student_id LIMIT 1').fetchone()
+    first, last = conn.execute('SELECT MIN(date), MAX(date) FROM attendance').fetchone()
+    middle = conn.execute('SELECT date FROM attendance ORDER BY date LIMIT 1 OFFSET '
+                          '(SELECT COUNT(*) / 2 FROM attendance)').fetchone()[0]
+    return [
+        {},
+        {'student_id': student_id},
+        {'course': course},
+        {'date_from': middle},
+        {'date_to': middle},
+        {'date_from': first, 'date_to': last},
+        {'student_id': student_id, 'date_from': middle},
+        {'course': course, 'date_to': middle},
+        {'student_id': student_id, 'course': course},
+        {'student_id': 'NOBODY'},
+        {'course': 'No such course'},
+    ]
+
+
+@pytest.mark.parametrize('storage', STORAGES)
+def test_status_counts_match_a_count_per_status(make_db, storage):
+    conn = make_db(storage)
+    for where in filters(conn):
+        expected = count_queries(conn, **where)
+        assert stats.status_counts(conn, **where) == expected, where
+        assert stats.scan_status_counts(conn, **where) == expected, where
+
+
+@pytest.mark.parametrize('storage', STORAGES)
+def test_statistics_endpoints_match_a_count_per_status(app, make_db, storage):
+    conn = make_db(storage)
+    path = conn.execute('PRAGMA database_list').fetchone()[2]
+    student_id, course = conn.execute(
+        'SELECT student_id, course FROM students ORDER BY student_id LIMIT 1').fetchone()
+    first = conn.execute('SELECT MIN(date) FROM attendance').fetchone()[0]
+
+    def get(url, **query):
+        with db.using(path), app.test_request_context(url, query_string=query):
+            response = app.full_dispatch_request()
+        assert response.status_code == 200
+        return response.get_json()
+
+    overview = get('/api/statistics/overview', course=course, to=first)
+    expected = stats.summarize(count_queries(conn, course=course, date_to=first))
+    assert {key: overview[key] for key in expected} == expected
+    assert overview['total_students'] == conn.execute(
+        'SELECT COUNT(*) FROM students WHERE course = ?', (course,)).fetchone()[0]
+
+    student = get(f'/api/statistics/student/{student_id}')
+    assert student == dict(student_id=student_id,
+                           **stats.summarize(count_queries(conn, student_id=student_id)))
@@ -0,0 +1,61 @@
+"""The in-memory stores following writes (stores.py, analytics.py, timelines.py)"""
+import pytest
+
+import analytics
+import timelines
+
+
+def columns(snapshot):
+    return (snapshot.student.tolist(), snapshot.day.tolist(), snapshot.status.tolist(),
+            snapshot.students.index)
+
+
+def per_student(snapshot):
+    return snapshot.timelines, snapshot.students
+
+
+def analytics_store():
+    pytest.importorskip('numpy')
+    analytics.load_numpy()
+    return analytics.AttendanceStore()
+
+
+STORES = {
+    'analytics': (analytics_store, columns),
+    'timelines': (timelines.TimelineStore, per_student),
+}
+
+
+@pytest.mark.parametrize('name', sorted(STORES))
+def test_refresh_matches_a_full_load(make_db, name):
+    make_store, contents = STORES[name]
+    conn = make_db()
+    store = make_store()
+    store.snapshot(conn)
+
+    conn.execute("INSERT INTO students (student_id, name, email, phone, course) "
+                 "VALUES ('STU9999', 'New Student', 'new@example.com', '', 'Physics')")
+    conn.executemany('INSERT INTO attendance (student_id, date, status, notes) VALUES (?, ?, ?, ?)',
+                     [('STU9999', '2025-04-01', 'late', None),
+                      ('STU0001', '2025-04-01', 'absent', None)])
+    conn.execute("DELETE FROM attendance WHERE student_id = 'STU0002' AND date = '2025-03-31'")
+    conn.commit()
+    store.on_change('students', set(), {'STU9999'})
+    store.on_change('attendance', {'2025-04-01', '2025-03-31'}, {'STU9999', 'STU0001', 'STU0002'})
+
+    refreshed = store.snapshot(conn)
+    stats = store.stats()
+    assert (stats['loads'], stats['refreshes']) == (1, 1)
+    assert contents(refreshed) == contents(make_store().snapshot(conn))
+
+
+@pytest.mark.parametrize('name', sorted(STORES))
+def test_reset_reloads_everything(make_db, name):
+    make_store, _ = STORES[name]
+    conn = make_db()
+    store = make_store()
+    first = store.snapshot(conn)
+    assert store.snapshot(conn) is first
+    store.on_change('reset', set(), set())
+    assert store.snapshot(conn) is not first
+    assert store.stats()['loads'] == 2
@@ -0,0 +1,113 @@
+"""GET /api/stream and the live event broadcaster (streams.py)"""
+import json
+
+import pytest
+
+import app as app_module
+import changes
+import db
+import streams
+
+
+@pytest.fixture
+def live(app, make_db, monkeypatch):
+    """The app's broadcaster for a fresh database: (broadcaster, connection)"""
+    monkeypatch.setattr(streams, 'COALESCE', 0.01)
+    monkeypatch.setattr(streams, 'POLL_INTERVAL', 0.05)
+    conn = make_db()
+    path = conn.execute('PRAGMA database_list').fetchone()[2]
+    with db.using(path):
+        changes.sync(conn)  # the first sync only records the position
+    broadcaster = app_module.live.instance(path)
+    yield broadcaster, conn
+    broadcaster.stop()
+
+
+def commit(conn):
+    """Commit and publish the change, as the write routes do"""
+    conn.commit()
+    with db.using(conn.execute('PRAGMA database_list').fetchone()[2]):
+        changes.sync(conn)
+
+
+def events(chunk):
+    """[(id, event, data)] in an SSE chunk"""
+    parsed = []
+    for block in chunk.decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line)
+        if 'event' in fields:
+            parsed.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+    return parsed
+
+
+def next_events(broadcaster, cursor):
+    chunks, cursor, _ = broadcaster.wait(cursor, timeout=5)
+    return events(b''.join(chunks)), cursor
+
+
+def test_parse_event_id():
+    assert streams.parse_event_id(' 42 ') == 42
+    assert streams.parse_event_id('-1') is None
+    assert streams.parse_event_id('abc') is None
+    assert streams.parse_event_id(None) is None
+
+
+def test_subscriber_gets_the_overview_then_changes(live):
+    broadcaster, conn = live
+    cursor, first = broadcaster.open()
+    try:
+        assert first.startswith(f'retry: {streams.RETRY_MS}\n\n'.encode())
+        [(version, event, data)] = events(first)
+        assert (version, event) == (cursor, 'overview')
+        total = data['overall']['total_records']
+
+        conn.execute("DELETE FROM attendance WHERE student_id = 'STU0001' AND date = '2025-03-31'")
+        commit(conn)
+        published, cursor = next_events(broadcaster, cursor)
+        assert [event for _, event, _ in published] == ['attendance', 'overview']
+        change, counters = published[0][2], published[1][2]
+        assert change['dates'] == ['2025-03-31']
+        assert change['deleted'][0]['student_id'] == 'STU0001'
+        assert counters['overall']['total_records'] == total - 1
+        assert published[0][0] == cursor > version
+    finally:
+        broadcaster.unsubscribe()
+
+
+def test_reconnect_replays_missed_events(live):
+    broadcaster, conn = live
+    cursor, _ = broadcaster.open()
+    try:
+        conn.execute("UPDATE attendance SET notes = 'late bus' WHERE date = '2025-03-31'")
+        commit(conn)
+        published, latest = next_events(broadcaster, cursor)
+        assert published
+    finally:
+        broadcaster.unsubscribe()
+
+    replayed_cursor, replay = broadcaster.open(cursor)
+    broadcaster.unsubscribe()
+    assert replayed_cursor == latest
+    assert events(replay) == published
+
+
+def test_unknown_event_id_gets_a_reset(live):
+    broadcaster, _ = live
+    cursor, first = broadcaster.open(10 ** 9)
+    broadcaster.unsubscribe()
+    assert [event for _, event, _ in events(first)] == ['reset', 'overview']
+
+
+def test_stream_endpoint(client, monkeypatch):
+    response = client.get('/api/stream')
+    try:
+        assert response.mimetype == 'text/event-stream'
+        assert response.headers['Cache-Control'] == 'no-cache'
+        assert [event for _, event, _ in events(next(response.response))] == ['overview']
+    finally:
+        response.close()
+
+    monkeypatch.setattr(streams, 'MAX_SUBSCRIBERS', 0)
+    response = client.get('/api/stream')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '5'
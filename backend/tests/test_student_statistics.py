@@ -0,0 +1,64 @@
+"""GET|POST /api/statistics/students"""
+import pytest
+
+import stats
+
+PATH = '/api/statistics/students'
+
+
+@pytest.mark.parametrize('query, error', [
+    ({'min_records': 'inf'}, 'min_records must be a non-negative integer'),
+    ({'min_records': 'nan'}, 'min_records must be a non-negative integer'),
+    ({'min_records': '1.5'}, 'min_records must be a non-negative integer'),
+    ({'min_records': '-1'}, 'min_records must be a non-negative integer'),
+    ({'below': 'nan'}, 'below must be a number'),
+    ({'above': 'inf'}, 'above must be a number'),
+    ({'above': 'high'}, 'above must be a number'),
+    ({'from': '2025-02-30'}, None),
+    ({'order': 'up'}, 'order must be asc or desc'),
+    ({'sort': 'email'}, f"sort must be one of: {', '.join(stats.STUDENT_SORTS)}"),
+    ({'limit': '0'}, 'limit must be positive'),
+])
+def test_invalid_query_arguments(client, query, error):
+    response = client.get(PATH, query_string=query)
+    assert response.status_code == 400
+    if error is not None:
+        assert response.get_json() == {'error': error}
+
+
+@pytest.mark.parametrize('body, error', [
+    ([], 'Expected a JSON object'),
+    ({'student_ids': 'STU0001'}, 'student_ids must be a list of strings'),
+    ({'student_ids': [1, 2]}, 'student_ids must be a list of strings'),
+    ({'student_ids': ['STU0001'] * (stats.MAX_STUDENT_IDS + 1)},
+     f'At most {stats.MAX_STUDENT_IDS} student_ids per request'),
+    ({'min_records': True}, 'min_records must be a non-negative integer'),
+    ({'min_records': 2.5}, 'min_records must be a non-negative integer'),
+])
+def test_invalid_body(client, body, error):
+    response = client.post(PATH, json=body)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
+
+
+def test_filters_sort_and_limit(client):
+    everyone = client.get(PATH).get_json()
+    assert everyone['matched'] == len(everyone['items']) == 40
+
+    most = max(item['total_records'] for item in everyone['items'])
+    busiest = client.get(PATH, query_string={'min_records': most}).get_json()
+    assert busiest['items'] and all(item['total_records'] == most for item in busiest['items'])
+
+    worst = client.get(PATH, query_string={'sort': 'absent_count', 'order': 'desc',
+                                           'limit': 3}).get_json()
+    assert worst['matched'] == 40
+    counts = [item['absent_count'] for item in worst['items']]
+    assert counts == sorted(counts, reverse=True) == sorted(
+        (item['absent_count'] for item in everyone['items']), reverse=True)[:3]
+
+
+def test_post_selects_students(client):
+    response = client.post(PATH, json={'student_ids': ['STU0002', 'STU0001', 'NOBODY'],
+                                       'sort': 'student_id', 'min_records': '0'})
+    assert response.status_code == 200
+    assert [item['student_id'] for item in response.get_json()['items']] == ['STU0001', 'STU0002']
@@ -0,0 +1,90 @@
+"""Trigger-maintained summary tables (summaries.py) across the write routes"""
+import pytest
+
+import db
+import layout
+import stats
+import summaries
+
+
+@pytest.fixture(params=sorted(layout.LAYOUTS))
+def database(request, make_db):
+    """(connection, file path) of a generated database in each layout"""
+    conn = make_db(request.param, students=10, days=20)
+    return conn, conn.execute('PRAGMA database_list').fetchone()[2]
+
+
+def call(app, path, method, url, body=None):
+    with db.using(path), app.test_request_context(url, method=method, json=body):
+        response = app.full_dispatch_request()
+    assert response.status_code in (200, 201), response.get_json()
+    return response.get_json()
+
+
+def total(conn):
+    return stats.summary_counts(conn)
+
+
+def test_summaries_follow_every_write_route(app, database):
+    conn, path = database
+    student_id, course = conn.execute(
+        'SELECT student_id, course FROM students ORDER BY student_id').fetchone()
+    day = conn.execute('SELECT MAX(date) FROM attendance').fetchone()[0]
+    before = total(conn)
+
+    def check(**change):
+        assert not summaries.verify(conn)
+        after = total(conn)
+        assert {status: after[status] - before[status] for status in stats.STATUSES} == \
+            dict(dict.fromkeys(stats.STATUSES, 0), **change)
+
+    call(app, path, 'POST', '/api/students',
+         {'student_id': 'NEW001', 'name': 'New Student', 'course': course})
+    check()
+    call(app, path, 'POST', '/api/attendance',
+         [{'student_id': 'NEW001', 'date': day, 'status': 'late'},
+          {'student_id': 'NEW001', 'date': '2000-01-03', 'status': 'present'}])
+    check(late=1, present=1)
+
+    old_status = conn.execute('SELECT status FROM attendance WHERE student_id = ? AND date = ?',
+                              (student_id, day)).fetchone()[0]
+    new_status = 'absent' if old_status != 'absent' else 'late'
+    call(app, path, 'POST', '/api/attendance/bulk',
+         [{'student_id': student_id, 'date': day, 'status': new_status}])
+    before[old_status] -= 1
+    before[new_status] += 1
+    check(late=1, present=1)
+
+    record_id = conn.execute("SELECT id FROM attendance WHERE student_id = 'NEW001' "
+                             "AND status = 'late'").fetchone()[0]
+    call(app, path, 'PUT', f'/api/attendance/{record_id}', {'status': 'absent', 'notes': 'ill'})
+    check(absent=1, present=1)
+    call(app, path, 'DELETE', f'/api/attendance/{record_id}')
+    check(present=1)
+
+    for new_course in ('Transfers', None, '', course):
+        call(app, path, 'PUT', f'/api/students/{student_id}',
+             {'name': 'Moved Student', 'course': new_course})
+        check(present=1)
+    assert conn.execute('SELECT SUM(present_count) FROM attendance_summary_course_date '
+                        "WHERE course = 'Transfers'").fetchone()[0] is None
+
+    removed = stats.scan_status_counts(conn, student_id=student_id)
+    call(app, path, 'DELETE', f'/api/students/{student_id}')
+    for status in stats.STATUSES:
+        before[status] -= removed[status]
+    check(present=1)
+
+
+def test_verify_reports_and_rebuild_repairs_drift(database):
+    conn, _ = database
+    assert not summaries.verify(conn)
+    with conn:
+        conn.execute('UPDATE attendance_summary_total SET present_count = present_count + 1')
+        conn.execute('DELETE FROM attendance_summary_date WHERE date = '
+                     '(SELECT MIN(date) FROM attendance_summary_date)')
+    assert summaries.verify(conn) == {'attendance_summary_total': 1,
+                                      'attendance_summary_date': 1}
+    with conn:
+        summaries.rebuild(conn)
+    assert not summaries.verify(conn)
@@ -0,0 +1,82 @@
+"""GET /api/sync (deltas.py)"""
+import pytest
+
+import db
+
+DAY = '2025-03-31'
+
+
+@pytest.fixture
+def database(make_db):
+    conn = make_db()
+    return conn, conn.execute('PRAGMA database_list').fetchone()[2]
+
+
+def sync(app, path, **query):
+    """GET /api/sync on the database at path: (status, JSON body)"""
+    with db.using(path), app.test_request_context('/api/sync', query_string=query):
+        response = app.full_dispatch_request()
+        return response.status_code, response.get_json()
+
+
+@pytest.mark.parametrize('query, error', [
+    ({}, 'A snapshot needs date or student_id'),
+    ({'date': DAY, 'since': 'abc'}, 'since must be a non-negative integer'),
+    ({'date': DAY, 'since': '-1'}, 'since must be a non-negative integer'),
+    ({'date': DAY, 'since': '0', 'limit': '0'}, 'limit must be positive'),
+    ({'date': '2025-31-03'}, None),
+])
+def test_invalid_arguments(app, database, query, error):
+    status, body = sync(app, database[1], **query)
+    assert status == 400
+    if error is not None:
+        assert body == {'error': error}
+
+
+def test_snapshot_then_deltas(app, database):
+    conn, path = database
+    status, snapshot = sync(app, path, date=DAY)
+    assert status == 200
+    assert len(snapshot['attendance']) == conn.execute(
+        'SELECT COUNT(*) FROM attendance WHERE date = ?', (DAY,)).fetchone()[0] > 2
+    version = snapshot['version']
+
+    updated, removed = snapshot['attendance'][0], snapshot['attendance'][1]
+    conn.execute("UPDATE attendance SET status = 'late', notes = 'bus' WHERE id = ?",
+                 (updated['id'],))
+    conn.execute('DELETE FROM attendance WHERE id = ?', (removed['id'],))
+    conn.execute("UPDATE attendance SET notes = 'elsewhere' WHERE date = '2025-03-28'")
+    conn.commit()
+
+    _, delta = sync(app, path, date=DAY, since=str(version))
+    assert (delta['since'], delta['more'], delta['reset']) == (version, False, False)
+    assert [(r['id'], r['status'], r['notes']) for r in delta['attendance']] == [
+        (updated['id'], 'late', 'bus')]
+    assert delta['deleted']['attendance'] == [
+        {'id': removed['id'], 'student_id': removed['student_id'], 'date': DAY}]
+
+    _, nothing = sync(app, path, date=DAY, since=str(delta['version']))
+    assert (nothing['attendance'], nothing['deleted']['attendance']) == ([], [])
+
+
+def test_limit_pages_through_the_log(app, database):
+    conn, path = database
+    version = sync(app, path, date=DAY)[1]['version']
+    conn.execute("UPDATE attendance SET notes = 'checked' WHERE date = ?", (DAY,))
+    conn.commit()
+    seen, more = set(), True
+    while more:
+        _, delta = sync(app, path, date=DAY, since=str(version), limit='7')
+        assert len(delta['attendance']) <= 7
+        seen.update(record['id'] for record in delta['attendance'])
+        version, more = delta['version'], delta['more']
+    assert len(seen) == conn.execute(
+        'SELECT COUNT(*) FROM attendance WHERE date = ?', (DAY,)).fetchone()[0]
+
+
+def test_future_version_needs_a_reset(app, database):
+    _, path = database
+    version = sync(app, path, date=DAY)[1]['version']
+    _, delta = sync(app, path, date=DAY, since=str(version + 100))
+    assert delta['reset'] is True
+    assert delta['version'] == version
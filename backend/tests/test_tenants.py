@@ -0,0 +1,92 @@
+"""Tenant routing and the cross-tenant statistics (tenants.py)"""
+import sqlite3
+
+import pytest
+
+import create_mock_data
+import migrations
+import tenants
+from conftest import END
+
+
+@pytest.fixture(scope='module')
+def north(app, tmp_path_factory):
+    """A tenant holding a copy of a 30-student database"""
+    source = str(tmp_path_factory.mktemp('north') / 'source.db')
+    conn = sqlite3.connect(source)
+    migrations.migrate(conn)
+    create_mock_data.generate(conn, 30, 20, seed=3, end=END)
+    conn.close()
+    return tenants.create('north', source=source)
+
+
+def test_header_and_prefix_route_to_the_tenant(client, north):
+    by_header = client.get('/api/statistics/overview', headers={'X-Tenant': 'north'})
+    by_prefix = client.get('/t/north/api/statistics/overview')
+    default = client.get('/api/statistics/overview')
+    assert by_header.get_json() == by_prefix.get_json()
+    assert by_header.get_json()['total_students'] == 30
+    assert default.get_json()['total_students'] == 40
+
+
+@pytest.mark.parametrize('path, headers, status, error', [
+    ('/t/south/api/students', {}, 404, 'Unknown tenant: south'),
+    ('/api/students', {'X-Tenant': 'south'}, 404, 'Unknown tenant: south'),
+    ('/api/students', {'X-Tenant': '../etc'}, 404, None),
+    ('/t/north/api/students', {'X-Tenant': 'south'}, 400,
+     'X-Tenant header and /t/ path prefix name different tenants'),
+])
+def test_routing_errors(client, north, path, headers, status, error):
+    response = client.get(path, headers=headers)
+    assert response.status_code == status
+    if error is not None:
+        assert response.get_json() == {'error': error}
+
+
+def test_statistics_include_the_default_database(client, north):
+    response = client.get('/api/statistics/tenants')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert set(body['tenants']) == {tenants.DEFAULT_NAME, 'north'}
+    assert body['tenants'][tenants.DEFAULT_NAME]['total_students'] == 40
+    assert body['total']['tenants'] == 1
+    assert body['total']['total_students'] == 70
+    assert body['total']['total_records'] == sum(
+        result['total_records'] for result in body['tenants'].values())
+
+
+def test_statistics_reject_a_bad_date(client):
+    response = client.get('/api/statistics/tenants', query_string={'from': '2025-13-01'})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('path, headers', [
+    ('/t/north/api/statistics/tenants', {}),
+    ('/api/statistics/tenants', {'X-Tenant': 'north'}),
+])
+def test_tenants_cannot_read_the_other_schools(client, north, path, headers):
+    response = client.get(path, headers=headers)
+    assert response.status_code == 403
+    assert response.get_json() == {'error': 'Not available to tenant requests'}
+
+
+def test_lookup_rereads_the_catalog_only_after_a_write(north, monkeypatch):
+    reads = []
+    catalog = tenants.catalog
+    monkeypatch.setattr(tenants, 'catalog', lambda: reads.append(1) or catalog())
+    tenants.lookup('north')
+    for _ in range(3):
+        with pytest.raises(tenants.UnknownTenant):
+            tenants.lookup('west')
+    assert len(reads) <= 1
+
+    conn = tenants.connect_catalog()
+    with conn:
+        conn.execute("INSERT INTO tenants (name, path) VALUES ('west', '/srv/west.db')")
+    try:
+        assert tenants.lookup('west') == '/srv/west.db'
+        assert tenants.lookup('north') == north
+    finally:
+        with conn:
+            conn.execute("DELETE FROM tenants WHERE name = 'west'")
+        conn.close()
@@ -0,0 +1,123 @@
+"""Streaks, rolling windows and alerts (timelines.py)"""
+from itertools import groupby
+
+import pytest
+
+import archive
+import db
+import stats
+import timelines
+
+STATUSES = f"status must be one of: {', '.join(stats.STATUSES)}"
+
+
+@pytest.mark.parametrize('path, query, error', [
+    ('streaks', {'status': 'away'}, STATUSES),
+    ('streaks', {'min_length': '0'}, 'min_length must be positive'),
+    ('streaks', {'min_length': 'two'}, 'min_length must be an integer'),
+    ('streaks', {'limit': '0'}, 'limit must be positive'),
+    ('windows', {'order': 'up'}, 'order must be asc or desc'),
+    ('windows', {'sort': 'email'}, f"sort must be one of: {', '.join(timelines.WINDOW_SORTS)}"),
+    ('windows', {'sessions': '0'}, f'sessions must be between 1 and {timelines.MAX_SESSIONS}'),
+    ('windows', {'sessions': str(timelines.MAX_SESSIONS + 1)},
+     f'sessions must be between 1 and {timelines.MAX_SESSIONS}'),
+    ('windows', {'to': '2025-04-31'}, None),
+    ('alerts', {'status': 'Absent'}, STATUSES),
+    ('alerts', {'sessions': '5', 'min': '6'}, 'min must be between 1 and 5'),
+    ('alerts', {'min': '11'}, 'min must be between 1 and 10'),
+    ('alerts', {'streak': '0'}, 'streak must be positive'),
+    ('alerts', {'limit': 'all'}, 'limit must be an integer'),
+])
+def test_invalid_arguments(client, path, query, error):
+    response = client.get(f'/api/statistics/{path}', query_string=query)
+    assert response.status_code == 400
+    if error is not None:
+        assert response.get_json() == {'error': error}
+
+
+def test_course_streaks_match_the_student_streaks(client):
+    body = client.get('/api/statistics/streaks').get_json()
+    assert body['matched'] == len(body['items']) == 40
+    for item in body['items'][:5]:
+        student = client.get(f"/api/statistics/student/{item['student_id']}/streaks").get_json()
+        assert {key: item[key] for key in student} == student
+
+
+def test_students_on_a_run(client):
+    body = client.get('/api/statistics/streaks', query_string={
+        'status': 'absent', 'min_length': 2, 'limit': 3}).get_json()
+    lengths = [item['current_streak']['length'] for item in body['items']]
+    assert len(lengths) == min(3, body['matched'])
+    assert lengths == sorted(lengths, reverse=True)
+    assert all(item['current_streak']['status'] == 'absent' and length >= 2
+               for item, length in zip(body['items'], lengths))
+
+
+def test_windows_cover_the_last_sessions(client):
+    body = client.get('/api/statistics/windows', query_string={
+        'sessions': 5, 'to': '2025-03-14', 'course': 'History'}).get_json()
+    assert body['items'] and all(item['course'] == 'History' for item in body['items'])
+    for item in body['items']:
+        assert item['total_records'] == 5
+        assert item['end'] <= '2025-03-14'
+    percentages = [item['attendance_percentage'] for item in body['items']]
+    assert percentages == sorted(percentages)
+
+
+def test_alerts_agree_with_the_windows(client):
+    alerts = client.get('/api/statistics/alerts', query_string={'min': 3, 'streak': 3}).get_json()
+    windows = {item['student_id']: item for item in
+               client.get('/api/statistics/windows', query_string={'limit': 100}).get_json()['items']}
+    assert alerts['matched'] == len(alerts['items']) > 0
+    for item in alerts['items']:
+        window = windows[item['student_id']]
+        assert item['count'] == window['absent_count']
+        assert ('window' in item['reasons']) == (item['count'] >= 3)
+        assert ('streak' in item['reasons']) == (
+            item['current_streak']['status'] == 'absent'
+            and item['current_streak']['length'] >= 3)
+    flagged = {student_id for student_id, window in windows.items() if window['absent_count'] >= 3}
+    assert flagged <= {item['student_id'] for item in alerts['items']}
+    counts = [item['count'] for item in alerts['items']]
+    assert counts == sorted(counts, reverse=True)
+
+
+def expected_streaks(conn, student_id):
+    """The streaks computed directly from the student's records"""
+    rows = conn.execute('SELECT date, status FROM attendance WHERE student_id = ? ORDER BY date',
+                        (student_id,)).fetchall()
+    runs = []
+    for status, group in groupby(rows, key=lambda row: row[1]):
+        dates = [row[0] for row in group]
+        runs.append({'status': status, 'length': len(dates), 'start': dates[0], 'end': dates[-1]})
+    longest = dict.fromkeys(stats.STATUSES)
+    for run in runs:
+        if longest[run['status']] is None or run['length'] > longest[run['status']]['length']:
+            longest[run['status']] = {key: run[key] for key in ('length', 'start', 'end')}
+    return {'student_id': student_id, 'total_records': len(rows),
+            'current_streak': runs[-1] if runs else None, 'longest_streaks': longest}
+
+
+def test_student_streaks_cover_archived_records_and_follow_writes(app, make_db):
+    conn = make_db()
+    path = conn.execute('PRAGMA database_list').fetchone()[2]
+    student_id = 'STU0003'
+    expected = expected_streaks(conn, student_id)
+    archive.archive(conn, 'jan', '2025-01-01', '2025-01-31')
+
+    def streaks(method='GET', json=None):
+        url = f'/api/statistics/student/{student_id}/streaks' if json is None else '/api/attendance'
+        with db.using(path), app.test_request_context(url, method=method, json=json):
+            return app.full_dispatch_request().get_json()
+
+    assert streaks() == expected
+    streaks('POST', {'student_id': student_id, 'date': '2025-04-01', 'status': 'late'})
+    after = streaks()
+    assert after['total_records'] == expected['total_records'] + 1
+    current = expected['current_streak']
+    if current['status'] == 'late':
+        assert after['current_streak'] == {**current, 'length': current['length'] + 1,
+                                           'end': '2025-04-01'}
+    else:
+        assert after['current_streak'] == {'status': 'late', 'length': 1,
+                                           'start': '2025-04-01', 'end': '2025-04-01'}
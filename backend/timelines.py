@@ -0,0 +1,284 @@
+"""
+Per-student attendance timelines for streak, rolling-window and alert
+queries over whole courses.
+
+Each server process keeps every student's records in date order, as two
+strings:
+
+    records   'YYYY-MM-DD' plus the status letter ('p', 'a', 'l') for
+              each record: 11 characters per record
+    codes     just the status letters, one character per record
+
+together with the longest run of each status. Windows and runs are over
+the student's own records (sessions): "the last 10 sessions" are the 10
+most recent dates the student was marked on. Every streak endpoint, for
+one student or a whole course, is answered from here. Counting a status in a window is one str.count()
+over the end of ``codes`` and the current run is one rstrip(), so a
+course's alerts take a few microseconds per student however long its
+history is.
+
+Timelines load on first use: one correlated scan per student, about a
+second per million records, including archived partitions. serve.py
+preloads them before forking workers only with
+ATTENDANCE_TIMELINES_PRELOAD=1, so a large database still starts fast.
+They follow writes through changes.py like the analytics store
+(stores.Store): the next query re-reads just the students that changed,
+whatever the write path (marks, updates, bulk imports, deletes, other
+worker processes). Queries work on an immutable Timelines snapshot. Each
+database file (tenants.py) has a store of its own.
+"""
+import os
+import re
+from collections import namedtuple
+
+import db
+import stores
+from stores import RECORD_WIDTH
+from summaries import STATUSES
+from stats import summarize
+
+DATE_WIDTH = 10
+LETTERS = {status[0]: status for status in STATUSES}
+RUN = re.compile(r'(.)\1*')
+
+# Load the timelines in serve.py before forking workers instead of on first use
+PRELOAD = os.environ.get('ATTENDANCE_TIMELINES_PRELOAD', '0') == '1'
+
+# Longest window a query may ask for
+MAX_SESSIONS = 1000
+
+# Sort keys of Timelines.course_windows()
+WINDOW_SORTS = ('attendance_percentage', 'total_records', 'present_count', 'absent_count',
+                'late_count', 'name', 'student_id')
+
+# records/codes as described above; longest maps a status letter to the
+# (length, first index) of its longest run, the earliest of equal ones
+Timeline = namedtuple('Timeline', 'records codes longest')
+Student = namedtuple('Student', 'name course')
+
+
+def longest_runs(codes):
+    longest = {}
+    for match in RUN.finditer(codes):
+        length = match.end() - match.start()
+        letter = codes[match.start()]
+        if length > longest.get(letter, (0, 0))[0]:
+            longest[letter] = (length, match.start())
+    return longest
+
+
+def make_timeline(records):
+    """Timeline from a student's 11-character records, in any order"""
+    parts = sorted(records[i:i + RECORD_WIDTH] for i in range(0, len(records), RECORD_WIDTH))
+    records = ''.join(parts)
+    codes = records[DATE_WIDTH::RECORD_WIDTH]
+    return Timeline(records, codes, longest_runs(codes))
+
+
+def read_timelines(conn, student_ids=None):
+    """{student_id: Timeline} for all students or the given ones"""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    timelines = {}
+    for sql, params in stores.timeline_queries(conn, 's.student_id', student_ids):
+        for student_id, records in cursor.execute(sql, params):
+            timelines[student_id] = make_timeline(records)
+    return timelines
+
+
+def read_students(conn):
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return {student_id: Student(name, course) for student_id, name, course in
+            cursor.execute('SELECT student_id, name, course FROM students ORDER BY student_id')}
+
+
+def _date(records, index):
+    start = index * RECORD_WIDTH
+    return records[start:start + DATE_WIDTH]
+
+
+def _span(length, first, records):
+    return {'length': length, 'start': _date(records, first),
+            'end': _date(records, first + length - 1)}
+
+
+def _sessions(timeline, date_to):
+    """Number of the timeline's records dated on or before date_to"""
+    records = timeline.records
+    lo, hi = 0, len(timeline.codes)
+    if date_to is None or hi == 0 or _date(records, hi - 1) <= date_to:
+        return hi
+    while lo < hi:
+        middle = (lo + hi) // 2
+        if _date(records, middle) <= date_to:
+            lo = middle + 1
+        else:
+            hi = middle
+    return lo
+
+
+def current_run(timeline, end=None):
+    """Current run of the first `end` records (default: all), or None"""
+    codes = timeline.codes if end is None else timeline.codes[:end]
+    if not codes:
+        return None
+    letter = codes[-1]
+    length = len(codes) - len(codes.rstrip(letter))
+    return {'status': LETTERS[letter], **_span(length, len(codes) - length, timeline.records)}
+
+
+class Timelines:
+    """Immutable snapshot of every student's timeline"""
+
+    def __init__(self, timelines, students, courses=None):
+        self.timelines = timelines
+        self.students = students
+        if courses is None:
+            courses = {}
+            for student_id, student in students.items():
+                courses.setdefault(student.course, []).append(student_id)
+        # course -> its students, in student_id order
+        self.courses = courses
+
+    @property
+    def records(self):
+        return sum(len(timeline.codes) for timeline in self.timelines.values())
+
+    def student_ids(self, course=None):
+        """Students in student_id order, of one course if given"""
+        if course is None:
+            return list(self.students)
+        return self.courses.get(course, [])
+
+    def _item(self, student_id):
+        student = self.students[student_id]
+        return {'student_id': student_id, 'name': student.name, 'course': student.course}
+
+    def streaks(self, student_id):
+        """Current and longest run of each status over the student's records"""
+        timeline = self.timelines.get(student_id)
+        if timeline is None:
+            timeline = Timeline('', '', {})
+        longest = dict.fromkeys(STATUSES)
+        for letter, (length, first) in timeline.longest.items():
+            longest[LETTERS[letter]] = _span(length, first, timeline.records)
+        return {
+            'student_id': student_id,
+            'total_records': len(timeline.codes),
+            'current_streak': current_run(timeline),
+            'longest_streaks': longest,
+        }
+
+    def course_streaks(self, course=None, status=None, min_length=1):
+        """streaks() of every student (of a course); with a status, only
+        students whose current run is of it and at least min_length long,
+        longest first"""
+        items = []
+        for student_id in self.student_ids(course):
+            streaks = self.streaks(student_id)
+            if status is not None:
+                current = streaks['current_streak']
+                if current is None or current['status'] != status or current['length'] < min_length:
+                    continue
+            items.append({**self._item(student_id), **streaks})
+        if status is not None:
+            items.sort(key=lambda item: -item['current_streak']['length'])
+        return items
+
+    def window(self, student_id, sessions, date_to=None):
+        """Statistics over the last `sessions` records (up to date_to)"""
+        timeline = self.timelines.get(student_id)
+        end = 0 if timeline is None else _sessions(timeline, date_to)
+        start = max(0, end - sessions)
+        codes = timeline.codes[start:end] if end else ''
+        result = {'start': _date(timeline.records, start) if codes else None,
+                  'end': _date(timeline.records, end - 1) if codes else None}
+        result.update(summarize({status: codes.count(letter)
+                                 for letter, status in LETTERS.items()}))
+        return result
+
+    def course_windows(self, course=None, sessions=10, date_to=None,
+                       sort='attendance_percentage', descending=False):
+        """window() of every student (of a course), sorted by a WINDOW_SORTS
+        key (ties in student_id order)"""
+        items = [{**self._item(student_id), **self.window(student_id, sessions, date_to)}
+                 for student_id in self.student_ids(course)]
+        items.sort(key=lambda item: item[sort], reverse=descending)
+        return items
+
+    def alerts(self, course=None, status='absent', minimum=3, sessions=10, streak=None,
+               date_to=None):
+        """Students with at least `minimum` records of `status` in their last
+        `sessions`, or (with streak) a current run of it at least `streak`
+        long; most records of the status first"""
+        letter = status[0]
+        found = []
+        for student_id in self.student_ids(course):
+            timeline = self.timelines.get(student_id)
+            if timeline is None:
+                continue
+            end = _sessions(timeline, date_to)
+            start = max(0, end - sessions)
+            count = timeline.codes.count(letter, start, end)
+            current = current_run(timeline, end)
+            run = current['length'] if current is not None and current['status'] == status else 0
+            reasons = []
+            if count >= minimum:
+                reasons.append('window')
+            if streak is not None and run >= streak:
+                reasons.append('streak')
+            if not reasons:
+                continue
+            found.append((-count, -run, {
+                **self._item(student_id),
+                'status': status,
+                'count': count,
+                'sessions': end - start,
+                'start': _date(timeline.records, start) if end else None,
+                'end': _date(timeline.records, end - 1) if end else None,
+                'current_streak': current,
+                'reasons': reasons,
+            }))
+        found.sort(key=lambda entry: entry[:2])
+        return [item for _, _, item in found]
+
+
+class TimelineStore(stores.Store):
+    """The process-wide timelines, refreshed lazily from the change log"""
+
+    def read(self, conn):
+        return Timelines(read_timelines(conn), read_students(conn))
+
+    def read_students(self, conn):
+        return read_students(conn)
+
+    def splice(self, conn, old, dirty, students, students_changed):
+        timelines = dict(old.timelines)
+        for student_id in dirty:
+            timelines.pop(student_id, None)
+        if students_changed:
+            for student_id in set(timelines) - set(students):
+                del timelines[student_id]
+        timelines.update(read_timelines(conn, dirty))
+        return Timelines(timelines, students, None if students_changed else old.courses)
+
+    def describe(self, snapshot):
+        return f"{len(snapshot.timelines)} students' timelines"
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'loaded': snapshot is not None,
+            'students': 0 if snapshot is None else len(snapshot.timelines),
+            'records': 0 if snapshot is None else snapshot.records,
+            **self.timings(),
+        }
+
+
+store = db.PerDatabase(lambda path: TimelineStore())
+
+
+def on_change(kind, dates, student_ids):
+    """changes.py listener for the current database's timelines"""
+    store.on_change(kind, dates, student_ids)
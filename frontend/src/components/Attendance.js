@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import api from '../api';
 
 const Attendance = () => {
@@ -8,6 +8,11 @@ const Attendance = () => {
   const [loading, setLoading] = useState(true);
   const [saving, setSaving] = useState(false);
   const [error, setError] = useState(null);
+  // Local replica of the selected date's records, kept current through
+  // /api/sync: a snapshot when the date changes, then only the changes
+  const [records, setRecords] = useState([]);
+  const [recordsLoading, setRecordsLoading] = useState(true);
+  const replica = useRef({ date: null, version: 0, records: {} });
 
   useEffect(() => {
     fetchStudents();
@@ -19,44 +24,88 @@ const Attendance = () => {
     }
   }, [selectedDate, students.length]);
 
-  const fetchStudents = async () => {
-    try {
-      setLoading(true);
-      setError(null);
-      const response = await api.get('/api/students');
-      setStudents(response.data);
-    } catch (error) {
-      console.error('Error fetching students:', error);
-      setError('Failed to load students. Please check if backend is running.');
-    } finally {
-      setLoading(false);
+  useEffect(() => {
+    const timer = setInterval(() => {
+      if (replica.current.date) {
+        syncRecords().catch(error => console.error('Error syncing records:', error));
+      }
+    }, 30000);
+    return () => clearInterval(timer);
+  }, []);
+
+  const sortedRecords = (byId) =>
+    Object.values(byId).sort((a, b) => (a.student_name || '').localeCompare(b.student_name || ''));
+
+  const initializeAttendance = (recordList) => {
+    const attendanceMap = {};
+    recordList.forEach(record => {
+      attendanceMap[record.student_id] = record.status;
+    });
+    
+    // Initialize attendance for all students
+    const initialAttendance = {};
+    students.forEach(student => {
+      initialAttendance[student.student_id] = attendanceMap[student.student_id] || 'absent';
+    });
+    setAttendance(initialAttendance);
+  };
+
+  const loadSnapshot = async (date) => {
+    const response = await api.get('/api/sync', { params: { date } });
+    const byId = {};
+    response.data.attendance.forEach(record => {
+      byId[record.id] = record;
+    });
+    replica.current = { date, version: response.data.version, records: byId };
+    return sortedRecords(byId);
+  };
+
+  // Apply the changes since the replica's version; returns the records
+  const syncRecords = async () => {
+    const { date } = replica.current;
+    for (;;) {
+      const response = await api.get('/api/sync', {
+        params: { date, since: replica.current.version },
+      });
+      const delta = response.data;
+      if (replica.current.date !== date) {
+        return null; // the date changed meanwhile
+      }
+      if (delta.reset) {
+        const recordList = await loadSnapshot(date);
+        setRecords(recordList);
+        return recordList;
+      }
+      const byId = { ...replica.current.records };
+      delta.deleted.attendance.forEach(tombstone => {
+        delete byId[tombstone.id];
+      });
+      delta.attendance.forEach(record => {
+        byId[record.id] = record;
+      });
+      replica.current = { date, version: delta.version, records: byId };
+      if (!delta.more) {
+        const recordList = sortedRecords(byId);
+        setRecords(recordList);
+        return recordList;
+      }
     }
   };
 
   const fetchAttendance = async () => {
     try {
       setError(null);
-      const response = await api.get(`/api/attendance?date=${selectedDate}`);
-      const attendanceMap = {};
-      response.data.forEach(record => {
-        attendanceMap[record.student_id] = record.status;
-      });
-      
-      // Initialize attendance for all students
-      const initialAttendance = {};
-      students.forEach(student => {
-        initialAttendance[student.student_id] = attendanceMap[student.student_id] || 'absent';
-      });
-      
-      setAttendance(initialAttendance);
+      setRecordsLoading(true);
+      const recordList = await loadSnapshot(selectedDate);
+      setRecords(recordList);
+      initializeAttendance(recordList);
     } catch (error) {
       console.error('Error fetching attendance:', error);
+      setRecords([]);
       // Initialize all as absent if fetch fails
-      const initialAttendance = {};
-      students.forEach(student => {
-        initialAttendance[student.student_id] = 'absent';
-      });
-      setAttendance(initialAttendance);
+      initializeAttendance([]);
+    } finally {
+      setRecordsLoading(false);
     }
   };
 
@@ -76,7 +125,10 @@ const Attendance = () => {
       
       await api.post('/api/attendance', records);
       alert('✅ Attendance saved successfully!');
-      fetchAttendance();
+      const recordList = await syncRecords();
+      if (recordList) {
+        initializeAttendance(recordList);
+      }
     } catch (error) {
       const errorMsg = error.response?.data?.error || 'Error saving attendance. Please try again.';
       alert(`❌ ${errorMsg}`);
@@ -195,33 +247,13 @@ const Attendance = () => {
 
       <div className="card">
         <div className="card-title">📋 Attendance Records</div>
-        <AttendanceRecords selectedDate={selectedDate} />
+        <AttendanceRecords records={records} loading={recordsLoading} />
       </div>
     </div>
   );
 };
 
-const AttendanceRecords = ({ selectedDate }) => {
-  const [records, setRecords] = useState([]);
-  const [loading, setLoading] = useState(true);
-
-  useEffect(() => {
-    fetchRecords();
-  }, [selectedDate]);
-
-  const fetchRecords = async () => {
-    try {
-      setLoading(true);
-      const response = await api.get(`/api/attendance?date=${selectedDate}`);
-      setRecords(response.data);
-    } catch (error) {
-      console.error('Error fetching records:', error);
-      setRecords([]);
-    } finally {
-      setLoading(false);
-    }
-  };
-
+const AttendanceRecords = ({ records, loading }) => {
   if (loading) {
     return (
       <div style={{ textAlign: 'center', padding: '2rem', color: '#6b7280' }}>
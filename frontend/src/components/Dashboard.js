@@ -3,22 +3,64 @@ import api from '../api';
 
 const Dashboard = () => {
   const [stats, setStats] = useState(null);
-  const [recentAttendance, setRecentAttendance] = useState([]);
+  const [todayRecords, setTodayRecords] = useState([]);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
     fetchData();
+    return subscribe();
   }, []);
 
+  // Live updates over server-sent events; the browser reconnects on its
+  // own and the server replays what was missed
+  const subscribe = () => {
+    if (typeof EventSource === 'undefined') {
+      return undefined;
+    }
+    const source = new EventSource(`${api.defaults.baseURL}/api/stream`);
+    source.addEventListener('overview', (event) => {
+      setStats(JSON.parse(event.data).overall);
+    });
+    source.addEventListener('attendance', (event) => {
+      const data = JSON.parse(event.data);
+      const today = new Date().toISOString().split('T')[0];
+      if (!data.dates.includes(today)) {
+        return;
+      }
+      if (data.more) {
+        fetchData();
+        return;
+      }
+      setTodayRecords((records) => {
+        const byId = {};
+        records.forEach((record) => {
+          byId[record.id] = record;
+        });
+        data.deleted.forEach((tombstone) => {
+          delete byId[tombstone.id];
+        });
+        data.attendance
+          .filter((record) => record.date === today)
+          .forEach((record) => {
+            byId[record.id] = record;
+          });
+        return Object.values(byId).sort((x, y) =>
+          (x.student_name || '').localeCompare(y.student_name || ''));
+      });
+    });
+    source.addEventListener('reset', () => fetchData());
+    return () => source.close();
+  };
+
   const fetchData = async () => {
     try {
       const today = new Date().toISOString().split('T')[0];
       const [statsRes, attendanceRes] = await Promise.all([
         api.get('/api/statistics/overview'),
-        api.get(`/api/attendance?date=${today}`)
+        api.get(`/api/attendance/date/${today}`)
       ]);
       setStats(statsRes.data);
-      setRecentAttendance(attendanceRes.data.slice(0, 10));
+      setTodayRecords(attendanceRes.data);
     } catch (error) {
       console.error('Error fetching data:', error);
       // Set default values on error
@@ -30,12 +72,14 @@ const Dashboard = () => {
         late_count: 0,
         attendance_percentage: 0
       });
-      setRecentAttendance([]);
+      setTodayRecords([]);
     } finally {
       setLoading(false);
     }
   };
 
+  const recentAttendance = todayRecords.slice(0, 10);
+
   if (loading) {
     return (
       <div className="card">
@@ -1,11 +1,18 @@
 import React, { useState, useEffect } from 'react';
 import api from '../api';
 
+// Records are fetched one keyset page at a time, newest first
+const PAGE_SIZE = 50;
+const HISTORY_FIELDS = 'id,date,status,notes';
+const RECORD_FIELDS = 'id,date,student_id,student_name,course,status,notes';
+const ALERT_LIMIT = 100;
+
 const Reports = () => {
   const [students, setStudents] = useState([]);
   const [selectedStudent, setSelectedStudent] = useState('');
   const [studentStats, setStudentStats] = useState(null);
   const [attendanceHistory, setAttendanceHistory] = useState([]);
+  const [historyCursor, setHistoryCursor] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -42,13 +49,25 @@ const Reports = () => {
     }
   };
 
-  const fetchAttendanceHistory = async () => {
+  const fetchAttendanceHistory = async (cursor = null) => {
     try {
-      const response = await api.get(`/api/attendance?student_id=${selectedStudent}`);
-      setAttendanceHistory(response.data.sort((a, b) => new Date(b.date) - new Date(a.date)));
+      const response = await api.get('/api/attendance', {
+        params: {
+          student_id: selectedStudent,
+          fields: HISTORY_FIELDS,
+          limit: PAGE_SIZE,
+          ...(cursor && { cursor }),
+        },
+      });
+      const { items, next_cursor } = response.data;
+      setAttendanceHistory((previous) => (cursor ? [...previous, ...items] : items));
+      setHistoryCursor(next_cursor);
     } catch (error) {
       console.error('Error fetching attendance history:', error);
-      setAttendanceHistory([]);
+      if (!cursor) {
+        setAttendanceHistory([]);
+      }
+      setHistoryCursor(null);
     }
   };
 
@@ -137,6 +156,15 @@ const Reports = () => {
                   </tbody>
                 </table>
               </div>
+              {historyCursor && (
+                <button
+                  className="btn btn-secondary"
+                  style={{ marginTop: '1rem' }}
+                  onClick={() => fetchAttendanceHistory(historyCursor)}
+                >
+                  Load more
+                </button>
+              )}
             </div>
           </>
         )}
@@ -158,32 +186,53 @@ const Reports = () => {
         <div className="card-title">📊 All Attendance Records</div>
         <AllAttendanceRecords />
       </div>
+
+      <div className="card">
+        <div className="card-title">🚨 Attendance Alerts</div>
+        <AttendanceAlerts />
+      </div>
     </div>
   );
 };
 
 const AllAttendanceRecords = () => {
   const [records, setRecords] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [dateFilter, setDateFilter] = useState('');
 
   useEffect(() => {
     fetchRecords();
   }, [dateFilter]);
 
-  const fetchRecords = async () => {
+  const fetchRecords = async (cursor = null) => {
     try {
-      setLoading(true);
-      const url = dateFilter 
-        ? `/api/attendance?date=${dateFilter}`
-        : '/api/attendance';
-      const response = await api.get(url);
-      setRecords(response.data.slice(0, 50)); // Limit to 50 most recent
+      if (cursor) {
+        setLoadingMore(true);
+      } else {
+        setLoading(true);
+      }
+      const response = await api.get('/api/attendance', {
+        params: {
+          fields: RECORD_FIELDS,
+          limit: PAGE_SIZE,
+          ...(dateFilter && { date: dateFilter }),
+          ...(cursor && { cursor }),
+        },
+      });
+      const { items, next_cursor } = response.data;
+      setRecords((previous) => (cursor ? [...previous, ...items] : items));
+      setNextCursor(next_cursor);
     } catch (error) {
       console.error('Error fetching records:', error);
-      setRecords([]);
+      if (!cursor) {
+        setRecords([]);
+      }
+      setNextCursor(null);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -234,6 +283,16 @@ const AllAttendanceRecords = () => {
               ))}
             </tbody>
           </table>
+          {nextCursor && (
+            <button
+              className="btn btn-secondary"
+              style={{ marginTop: '1rem' }}
+              onClick={() => fetchRecords(nextCursor)}
+              disabled={loadingMore}
+            >
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          )}
         </div>
       ) : (
         <p style={{ color: '#6b7280', textAlign: 'center', padding: '2rem' }}>
@@ -244,5 +303,142 @@ const AllAttendanceRecords = () => {
   );
 };
 
+const AttendanceAlerts = () => {
+  const [alerts, setAlerts] = useState([]);
+  const [matched, setMatched] = useState(0);
+  const [loading, setLoading] = useState(true);
+  const [status, setStatus] = useState('absent');
+  const [minimum, setMinimum] = useState(3);
+  const [sessions, setSessions] = useState(10);
+  const [course, setCourse] = useState('');
+
+  useEffect(() => {
+    fetchAlerts();
+  }, [status, minimum, sessions, course]);
+
+  const fetchAlerts = async () => {
+    if (!(minimum >= 1 && sessions >= minimum)) {
+      return;
+    }
+    try {
+      setLoading(true);
+      const response = await api.get('/api/statistics/alerts', {
+        params: {
+          status,
+          min: minimum,
+          sessions,
+          limit: ALERT_LIMIT,
+          ...(course && { course }),
+        },
+      });
+      setAlerts(response.data.items);
+      setMatched(response.data.matched);
+    } catch (error) {
+      console.error('Error fetching alerts:', error);
+      setAlerts([]);
+      setMatched(0);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  return (
+    <div>
+      <div style={{ marginBottom: '1rem', display: 'flex', gap: '1rem', alignItems: 'flex-end', flexWrap: 'wrap' }}>
+        <div className="form-group">
+          <label className="form-label">Status</label>
+          <select className="form-input" value={status} onChange={(e) => setStatus(e.target.value)}>
+            <option value="absent">Absent</option>
+            <option value="late">Late</option>
+          </select>
+        </div>
+        <div className="form-group">
+          <label className="form-label">At least</label>
+          <input
+            type="number"
+            className="form-input"
+            min="1"
+            value={minimum}
+            onChange={(e) => setMinimum(Number(e.target.value))}
+            style={{ maxWidth: '100px' }}
+          />
+        </div>
+        <div className="form-group">
+          <label className="form-label">Of the last sessions</label>
+          <input
+            type="number"
+            className="form-input"
+            min="1"
+            max="1000"
+            value={sessions}
+            onChange={(e) => setSessions(Number(e.target.value))}
+            style={{ maxWidth: '100px' }}
+          />
+        </div>
+        <div className="form-group">
+          <label className="form-label">Course (optional)</label>
+          <input
+            type="text"
+            className="form-input"
+            value={course}
+            onChange={(e) => setCourse(e.target.value)}
+            style={{ maxWidth: '200px' }}
+          />
+        </div>
+      </div>
+
+      {loading ? (
+        <p>Loading...</p>
+      ) : alerts.length > 0 ? (
+        <div className="table-container">
+          {matched > alerts.length && (
+            <p style={{ color: '#6b7280' }}>
+              Showing {alerts.length} of {matched} students.
+            </p>
+          )}
+          <table className="table">
+            <thead>
+              <tr>
+                <th>Student ID</th>
+                <th>Name</th>
+                <th>Course</th>
+                <th>{status.charAt(0).toUpperCase() + status.slice(1)}</th>
+                <th>Current Streak</th>
+                <th>Window</th>
+              </tr>
+            </thead>
+            <tbody>
+              {alerts.map((alert) => (
+                <tr key={alert.student_id}>
+                  <td>{alert.student_id}</td>
+                  <td>{alert.name}</td>
+                  <td>{alert.course}</td>
+                  <td>
+                    <span className={`badge badge-${alert.status}`}>
+                      {alert.count} / {alert.sessions}
+                    </span>
+                  </td>
+                  <td>
+                    {alert.current_streak
+                      ? `${alert.current_streak.length} ${alert.current_streak.status}`
+                      : '-'}
+                  </td>
+                  <td>
+                    {new Date(alert.start).toLocaleDateString()} – {new Date(alert.end).toLocaleDateString()}
+                  </td>
+                </tr>
+              ))}
+            </tbody>
+          </table>
+        </div>
+      ) : (
+        <p style={{ color: '#6b7280', textAlign: 'center', padding: '2rem' }}>
+          No students match these alert settings.
+        </p>
+      )}
+    </div>
+  );
+};
+
 export default Reports;
 
@@ -1,18 +1,40 @@
 #!/usr/bin/env python3
 """
 Simple Python script to start both backend and frontend servers
+
+    python3 start.py          # install dependencies, initialize, start
+    python3 start.py --fast   # skip the setup steps whose inputs are unchanged
+
+start.sh and start.bat run this script. Mock data is only created for an
+empty database, so existing records are never replaced. With --fast, pip
+runs only when requirements.txt changed since the last successful
+install, and init_db.py only when the database is not at the latest
+schema version. Either way the backend counts as started once
+/api/health answers.
 """
+import argparse
+import hashlib
+import sqlite3
 import subprocess
 import sys
 import os
 import time
 import signal
 import platform
+import urllib.request
+
+BACKEND_HEALTH_URL = 'http://localhost:5001/api/health'
+FRONTEND_URL = 'http://localhost:3000'
+BACKEND_TIMEOUT = 30
+POLL_INTERVAL = 0.05
+
+# npm is a batch file on Windows, which Popen only finds by its full name
+NPM = 'npm.cmd' if platform.system() == 'Windows' else 'npm'
 
 def check_requirements():
     """Check if Python and Node.js are installed"""
     try:
-        subprocess.run(['python3', '--version'], check=True, capture_output=True)
+        subprocess.run([sys.executable, '--version'], check=True, capture_output=True)
     except (subprocess.CalledProcessError, FileNotFoundError):
         print("❌ Python 3 is not installed. Please install Python 3 first.")
         sys.exit(1)
@@ -23,7 +45,53 @@ def check_requirements():
         print("❌ Node.js is not installed. Please install Node.js first.")
         sys.exit(1)
 
-def setup_backend():
+def responds(url):
+    """True if GET url answers 200"""
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+def wait_until_ready(url, process, timeout):
+    """Poll url until it answers; returns the seconds waited, or None if the
+    process ended or the timeout passed first"""
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        if process.poll() is not None:
+            return None
+        if responds(url):
+            return time.monotonic() - started
+        time.sleep(POLL_INTERVAL)
+    return None
+
+def requirements_hash(backend_dir):
+    with open(os.path.join(backend_dir, 'requirements.txt'), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def database_state(backend_dir):
+    """(schema is at the latest version, database has students)"""
+    db_path = os.path.join(backend_dir, os.environ.get('ATTENDANCE_DB_PATH', 'attendance.db'))
+    if not os.path.exists(db_path):
+        return False, False
+    # migrations.py needs only the standard library, so this interpreter can load it
+    sys.path.insert(0, backend_dir)
+    try:
+        import migrations
+    finally:
+        sys.path.remove(backend_dir)
+    conn = sqlite3.connect(db_path)
+    try:
+        current = migrations.current_version(conn) == migrations.latest_version()
+        try:
+            seeded = conn.execute('SELECT EXISTS (SELECT 1 FROM students)').fetchone()[0] == 1
+        except sqlite3.OperationalError:
+            seeded = False
+        return current, seeded
+    finally:
+        conn.close()
+
+def setup_backend(fast=False):
     """Setup and start backend"""
     backend_dir = os.path.join(os.getcwd(), 'backend')
     os.chdir(backend_dir)
@@ -42,46 +110,66 @@ def setup_backend():
         pip_path = os.path.join(venv_path, 'bin', 'pip')
         python_path = os.path.join(venv_path, 'bin', 'python')
     
-    # Install dependencies
-    print("📥 Installing Python dependencies...")
-    try:
-        subprocess.run([pip_path, 'install', '-q', '-r', 'requirements.txt'], 
-                      check=True, cwd=backend_dir, timeout=120)
-    except subprocess.TimeoutExpired:
-        print("⚠️  Installation taking longer than expected, continuing...")
-    except Exception as e:
-        print(f"⚠️  Warning: {e}")
+    # Install dependencies, unless requirements.txt is unchanged since the
+    # last successful install into this venv
+    stamp_path = os.path.join(venv_path, '.requirements.sha256')
+    digest = requirements_hash(backend_dir)
+    installed = None
+    if os.path.exists(stamp_path):
+        with open(stamp_path) as f:
+            installed = f.read().strip()
+    if fast and installed == digest:
+        print("⏭️  Python dependencies unchanged, skipping pip")
+    else:
+        print("📥 Installing Python dependencies...")
+        try:
+            subprocess.run([pip_path, 'install', '-q', '-r', 'requirements.txt'], 
+                          check=True, cwd=backend_dir, timeout=120)
+            with open(stamp_path, 'w') as f:
+                f.write(digest)
+        except subprocess.TimeoutExpired:
+            print("⚠️  Installation taking longer than expected, continuing...")
+        except Exception as e:
+            print(f"⚠️  Warning: {e}")
+    
+    schema_current, seeded = database_state(backend_dir)
     
     # Initialize database
-    print("🗄️  Initializing database...")
-    try:
-        subprocess.run([python_path, 'init_db.py'], 
-                      check=True, cwd=backend_dir, timeout=10,
-                      stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        print("✅ Database initialized!")
-    except Exception as e:
-        print(f"⚠️  Database init: {e}")
+    if fast and schema_current:
+        print("⏭️  Database schema is up to date, skipping init_db.py")
+    else:
+        print("🗄️  Initializing database...")
+        try:
+            subprocess.run([python_path, 'init_db.py'], 
+                          check=True, cwd=backend_dir, timeout=10,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            print("✅ Database initialized!")
+        except Exception as e:
+            print(f"⚠️  Database init: {e}")
     
     # Create mock data
-    print("📊 Creating mock data...")
-    try:
-        result = subprocess.run([python_path, 'create_mock_data.py'], 
-                              check=True, cwd=backend_dir, timeout=30,
-                              capture_output=True, text=True)
-        print("✅ Mock data created!")
-    except subprocess.TimeoutExpired:
-        print("⚠️  Mock data creation timed out")
-    except Exception as e:
-        print(f"⚠️  Mock data warning: {e}")
+    if seeded:
+        print("⏭️  Keeping the existing data")
+    else:
+        print("📊 Creating mock data...")
+        try:
+            result = subprocess.run([python_path, 'create_mock_data.py'], 
+                                  check=True, cwd=backend_dir, timeout=30,
+                                  capture_output=True, text=True)
+            print("✅ Mock data created!")
+        except subprocess.TimeoutExpired:
+            print("⚠️  Mock data creation timed out")
+        except Exception as e:
+            print(f"⚠️  Mock data warning: {e}")
     
     # Start backend
     print("🔙 Starting backend server...")
     if platform.system() == 'Windows':
-        backend_process = subprocess.Popen([python_path, 'app.py'], 
+        backend_process = subprocess.Popen([python_path, 'serve.py'], 
                                           cwd=backend_dir,
                                           creationflags=subprocess.CREATE_NEW_CONSOLE)
     else:
-        backend_process = subprocess.Popen([python_path, 'app.py'], 
+        backend_process = subprocess.Popen([python_path, 'serve.py'], 
                                           cwd=backend_dir,
                                           stdout=subprocess.PIPE,
                                           stderr=subprocess.PIPE)
@@ -101,7 +189,7 @@ def setup_frontend():
     if not os.path.exists(node_modules_path) or not os.path.exists(react_scripts_path):
         print("📦 Installing Node.js dependencies (this may take a few minutes)...")
         try:
-            result = subprocess.run(['npm', 'install'], 
+            result = subprocess.run([NPM, 'install'], 
                                   check=True, 
                                   cwd=frontend_dir, 
                                   timeout=300,
@@ -120,11 +208,11 @@ def setup_frontend():
     # Start frontend
     print("🎨 Starting frontend server...")
     if platform.system() == 'Windows':
-        frontend_process = subprocess.Popen(['npm', 'start'], 
+        frontend_process = subprocess.Popen([NPM, 'start'], 
                                            cwd=frontend_dir,
                                            creationflags=subprocess.CREATE_NEW_CONSOLE)
     else:
-        frontend_process = subprocess.Popen(['npm', 'start'], 
+        frontend_process = subprocess.Popen([NPM, 'start'], 
                                            cwd=frontend_dir,
                                            stdout=subprocess.PIPE,
                                            stderr=subprocess.PIPE)
@@ -134,6 +222,11 @@ def setup_frontend():
 
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description='Start the backend and frontend servers')
+    parser.add_argument('--fast', action='store_true',
+                        help='skip pip and init_db.py when nothing changed')
+    args = parser.parse_args()
+    
     print("🚀 Starting Attendance Management System...")
     print("")
     
@@ -146,13 +239,17 @@ def main():
     frontend_process = None
     
     try:
-        backend_process = setup_backend()
+        backend_process = setup_backend(fast=args.fast)
         print("⏳ Waiting for backend to start...")
-        time.sleep(3)
+        waited = wait_until_ready(BACKEND_HEALTH_URL, backend_process, BACKEND_TIMEOUT)
+        if waited is None:
+            print(f"⚠️  Backend did not answer {BACKEND_HEALTH_URL} "
+                  f"within {BACKEND_TIMEOUT} s")
+        else:
+            print(f"✅ Backend ready in {waited:.1f} s")
         
         frontend_process = setup_frontend()
-        print("⏳ Waiting for frontend to start...")
-        time.sleep(5)
+        frontend_ready = False
         
         print("")
         print("=" * 50)
@@ -171,6 +268,9 @@ def main():
         try:
             while True:
                 time.sleep(1)
+                if not frontend_ready and responds(FRONTEND_URL):
+                    frontend_ready = True
+                    print("✅ Frontend ready")
                 # Check if processes are still alive
                 if backend_process and backend_process.poll() is not None:
                     print("⚠️  Backend process ended unexpectedly")